@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Everything SDK 字段投影的基准测试脚本
+
+用纯 Python 的假 DLL 替代 Everything64.dll（可在 Linux 上运行），统计不同字段投影下
+每条结果的 DLL 调用次数和耗时，并核对投影结果与全字段结果的一致性：
+    python scripts/benchmark_everything_projection.py --results 100000
+
+--call-cost 模拟每次 DLL 调用的额外开销（微秒），近似真实 ctypes 调用和 IPC 数据访问。
+"""
+
+import argparse
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+# 添加 Everything 搜索服务的源码目录到Python路径
+src_path = (
+    Path(__file__).parent.parent
+    / "src"
+    / "mcpsectrace"
+    / "mcp_servers"
+    / "everything_mcp"
+    / "src"
+)
+sys.path.insert(0, str(src_path))
+
+from mcp_server_everything_search.everything_sdk import (
+    ALL_FIELDS,
+    EVERYTHING_OK,
+    EverythingSDK,
+)
+
+# 2024-01-01 的 Windows 文件时间
+SAMPLE_FILETIME = 133485408000000000
+
+PROJECTIONS = {
+    "全部字段": None,
+    "路径+文件名": ["path", "filename"],
+    "路径+大小+修改时间": ["path", "size", "modified"],
+}
+
+
+class _FakeFunction:
+    """可设置 argtypes/restype 的假 DLL 函数，记录调用次数。"""
+
+    def __init__(self, dll: "FakeEverythingDLL", name: str, impl):
+        self._dll = dll
+        self._name = name
+        self._impl = impl
+        self.argtypes = None
+        self.restype = None
+
+    def __call__(self, *args):
+        self._dll.calls[self._name] += 1
+        if self._dll.call_cost:
+            deadline = time.perf_counter() + self._dll.call_cost
+            while time.perf_counter() < deadline:
+                pass
+        return self._impl(*args)
+
+
+class FakeEverythingDLL:
+    """Everything64.dll 的测试替身：返回 result_count 条合成结果。"""
+
+    def __init__(self, result_count: int, call_cost_us: float = 0.0):
+        self.result_count = result_count
+        self.call_cost = call_cost_us / 1e6
+        self.calls: Counter = Counter()
+        self.request_flags = None
+        self._max = 0
+        self._offset = 0
+
+        def set_max(value):
+            self._max = value
+
+        def set_offset(value):
+            self._offset = value
+
+        def set_flags(value):
+            self.request_flags = value
+
+        def full_path(i, buffer, size):
+            i += self._offset
+            buffer.value = f"C:\\Windows\\Temp\\dir_{i % 100}\\sample_{i}.exe"[
+                : size - 1
+            ]
+            return len(buffer.value)
+
+        def out_value(value):
+            def impl(i, target):
+                target.value = value
+                return True
+
+            return impl
+
+        implementations = {
+            "Everything_SetSearchW": lambda query: None,
+            "Everything_SetMatchPath": lambda value: None,
+            "Everything_SetMatchCase": lambda value: None,
+            "Everything_SetMatchWholeWord": lambda value: None,
+            "Everything_SetRegex": lambda value: None,
+            "Everything_SetMax": set_max,
+            "Everything_SetSort": lambda value: None,
+            "Everything_SetOffset": set_offset,
+            "Everything_SetRequestFlags": set_flags,
+            "Everything_QueryW": lambda wait: True,
+            "Everything_GetNumResults": lambda: max(
+                0, min(self.result_count - self._offset, self._max)
+            ),
+            "Everything_GetLastError": lambda: EVERYTHING_OK,
+            "Everything_Reset": lambda: None,
+            "Everything_GetResultFileNameW": lambda i: f"sample_{self._offset + i}.exe",
+            "Everything_GetResultExtensionW": lambda i: "exe",
+            "Everything_GetResultPathW": lambda i: (
+                f"C:\\Windows\\Temp\\dir_{(self._offset + i) % 100}"
+            ),
+            "Everything_GetResultFullPathNameW": full_path,
+            "Everything_GetResultDateCreated": out_value(SAMPLE_FILETIME),
+            "Everything_GetResultDateModified": out_value(SAMPLE_FILETIME),
+            "Everything_GetResultDateAccessed": out_value(SAMPLE_FILETIME),
+            "Everything_GetResultSize": out_value(4096),
+            "Everything_GetResultAttributes": lambda i: 0x20,
+            "Everything_GetResultRunCount": lambda i: 0,
+            "Everything_GetResultHighlightedFileNameW": lambda i: (
+                f"*sample*_{self._offset + i}.exe"
+            ),
+            "Everything_GetResultHighlightedPathW": lambda i: "C:\\Windows\\Temp",
+        }
+        for name, impl in implementations.items():
+            setattr(self, name, _FakeFunction(self, name, impl))
+
+    def result_calls(self) -> int:
+        """逐条结果获取函数的调用总数。"""
+        return sum(
+            v for k, v in self.calls.items() if k.startswith("Everything_GetResult")
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Everything SDK 字段投影基准测试")
+    parser.add_argument("--results", type=int, default=100_000, help="合成结果数")
+    parser.add_argument(
+        "--call-cost", type=float, default=1.0, help="每次 DLL 调用的模拟开销（微秒）"
+    )
+    args = parser.parse_args()
+
+    baseline = None
+    print(f"{'投影':<20}{'耗时':>10}{'调用/结果':>12}{'请求标志':>12}")
+    for label, fields in PROJECTIONS.items():
+        dll = FakeEverythingDLL(args.results, args.call_cost)
+        sdk = EverythingSDK("fake.dll", dll=dll)
+        start = time.perf_counter()
+        results = sdk.search_files("sample", max_results=args.results, fields=fields)
+        elapsed = time.perf_counter() - start
+        print(
+            f"{label:<20}{elapsed:>9.2f}s{dll.result_calls() / len(results):>12.1f}"
+            f"{dll.request_flags:>#12x}"
+        )
+
+        # 投影结果的已请求字段必须与全字段结果一致
+        if baseline is None:
+            baseline = results
+            continue
+        requested = set(fields) | {"path", "filename"}
+        for full, projected in zip(baseline, results):
+            for field in ALL_FIELDS:
+                expected = getattr(full, field) if field in requested else None
+                assert getattr(projected, field) == expected, (label, field)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+IOC 抓取流程离线基准测试脚本
+
+先联网录制一次（需要已登录的浏览器配置）：
+    python scripts/benchmark_ioc_pipeline.py record ip 8.8.8.8 --out logs/ioc_replay/8.8.8.8
+
+之后在无网络环境下反复回放并统计各阶段耗时：
+    python scripts/benchmark_ioc_pipeline.py bench ip 8.8.8.8 --record-dir logs/ioc_replay/8.8.8.8 --runs 3
+"""
+
+import argparse
+import statistics
+import sys
+from pathlib import Path
+
+# 添加src目录到Python路径
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+from mcpsectrace.mcp_servers.ioc_mcp import (
+    SeleniumDriver,
+    build_threatbook_config,
+    run_target_analysis,
+)
+from mcpsectrace.mcp_servers.ioc_replay import RecordingDriver, ReplayServer
+
+
+def record(args):
+    """联网跑一次完整分析，保存页面快照和接口数据"""
+    selenium_driver = SeleniumDriver()
+    driver = selenium_driver.setup_driver(capture_network=True)
+    recording_driver = RecordingDriver(driver, args.out)
+    try:
+        result = run_target_analysis(
+            build_threatbook_config(args.target_type, args.target_value),
+            recording_driver,
+        )
+        manifest_path = recording_driver.flush()
+    finally:
+        selenium_driver.quit_driver()
+
+    print(
+        f"分析{'成功' if result.success else '失败'}: {result.error or result.report_path}"
+    )
+    print(f"录制清单: {manifest_path}")
+
+
+def bench(args):
+    """回放录制内容，多次运行并输出各阶段耗时统计"""
+    stage_samples = {}
+    with ReplayServer(args.record_dir) as server:
+        # 回放页面是静态快照，无需等待脚本渲染；等待时间只作用于本次构建的配置
+        config = build_threatbook_config(
+            args.target_type,
+            args.target_value,
+            site_url=server.base_url,
+            sample_site_url=server.base_url,
+            page_load_wait=args.page_load_wait,
+        )
+        selenium_driver = SeleniumDriver()
+        driver = selenium_driver.setup_driver(profile=args.profile)
+        try:
+            for run in range(1, args.runs + 1):
+                result = run_target_analysis(config, driver)
+                status = "成功" if result.success else f"失败: {result.error}"
+                print(f"第 {run} 次: {result.elapsed_seconds:.2f}s {status}")
+                stage_samples.setdefault("total", []).append(result.elapsed_seconds)
+                for stage, seconds in result.stage_timings.items():
+                    stage_samples.setdefault(stage, []).append(seconds)
+        finally:
+            selenium_driver.quit_driver()
+
+    print(f"\n{'阶段':<16}{'平均':>10}{'最小':>10}{'最大':>10}")
+    for stage, samples in stage_samples.items():
+        print(
+            f"{stage:<16}{statistics.mean(samples):>10.2f}"
+            f"{min(samples):>10.2f}{max(samples):>10.2f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="IOC 抓取流程离线录制与基准测试")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = subparsers.add_parser("record", help="联网录制一次分析过程")
+    record_parser.add_argument("target_type", choices=["ip", "domain"])
+    record_parser.add_argument("target_value")
+    record_parser.add_argument("--out", required=True, help="录制输出目录")
+    record_parser.set_defaults(func=record)
+
+    bench_parser = subparsers.add_parser("bench", help="基于录制内容离线回放并计时")
+    bench_parser.add_argument("target_type", choices=["ip", "domain"])
+    bench_parser.add_argument("target_value")
+    bench_parser.add_argument("--record-dir", required=True, help="录制目录")
+    bench_parser.add_argument("--runs", type=int, default=3, help="运行次数")
+    bench_parser.add_argument(
+        "--page-load-wait", type=float, default=1, help="页面加载等待秒数"
+    )
+    bench_parser.add_argument(
+        "--profile",
+        choices=["default", "lean"],
+        default="lean",
+        help="驱动配置，默认使用无头的 lean 配置",
+    )
+    bench_parser.set_defaults(func=bench)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+内置文件名索引与 plocate 的基准测试脚本
+
+在临时目录生成合成目录树（默认 100 万个文件），分别建立内置索引和 plocate 数据库，
+再用同一组查询比较建索引耗时、索引大小和查询延迟：
+    python scripts/benchmark_native_index.py --files 1000000 --runs 5
+
+未安装 plocate（或 updatedb）时只测试内置索引。
+"""
+
+import argparse
+import os
+import random
+import shutil
+import statistics
+import string
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# 添加 Everything 搜索服务的源码目录到Python路径
+src_path = (
+    Path(__file__).parent.parent
+    / "src"
+    / "mcpsectrace"
+    / "mcp_servers"
+    / "everything_mcp"
+    / "src"
+)
+sys.path.insert(0, str(src_path))
+
+from mcp_server_everything_search.native_index import NativeIndex, build_index
+
+EXTENSIONS = ["exe", "dll", "sys", "txt", "log", "tmp", "dat", "py", "js", "png"]
+
+# 查询：常见后缀、稀有文件名、短片段、目录限定
+QUERIES = ["svchost", "update_7", ".dll", "zz", "path:dir_3 readme"]
+
+
+def make_tree(root: str, files: int, files_per_dir: int, seed: int):
+    """生成合成目录树：三级目录，每个目录 files_per_dir 个随机文件名"""
+    rng = random.Random(seed)
+    words = ["svchost", "update", "readme", "config", "setup", "driver", "cache"]
+    created = 0
+    dir_index = 0
+    while created < files:
+        directory = os.path.join(
+            root,
+            f"dir_{dir_index % 10}",
+            f"sub_{(dir_index // 10) % 100}",
+            f"leaf_{dir_index}",
+        )
+        os.makedirs(directory, exist_ok=True)
+        for _ in range(min(files_per_dir, files - created)):
+            stem = (
+                rng.choice(words)
+                + "_"
+                + "".join(rng.choices(string.ascii_lowercase + string.digits, k=6))
+            )
+            name = f"{stem}.{rng.choice(EXTENSIONS)}"
+            open(os.path.join(directory, name), "wb").close()
+            created += 1
+        dir_index += 1
+
+
+def time_queries(search, runs: int):
+    """每个查询运行多次，返回 {查询: (平均秒数, 结果数)}"""
+    timings = {}
+    for query in QUERIES:
+        samples = []
+        count = 0
+        for _ in range(runs):
+            start = time.perf_counter()
+            count = len(search(query))
+            samples.append(time.perf_counter() - start)
+        timings[query] = (statistics.mean(samples), count)
+    return timings
+
+
+def plocate_search(db_path: str):
+    def search(query):
+        # plocate 不支持 path: 语法，用第一个词近似
+        query = query.replace("path:", "").split()[-1]
+        result = subprocess.run(
+            ["plocate", "-d", db_path, "-i", "-l", "1000", query],
+            capture_output=True,
+            text=True,
+        )
+        return result.stdout.splitlines()
+
+    return search
+
+
+def main():
+    parser = argparse.ArgumentParser(description="内置索引与 plocate 基准测试")
+    parser.add_argument("--files", type=int, default=1_000_000, help="合成文件数")
+    parser.add_argument("--files-per-dir", type=int, default=200)
+    parser.add_argument("--runs", type=int, default=5, help="每个查询的运行次数")
+    parser.add_argument("--workers", type=int, default=8, help="遍历线程数")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep", action="store_true", help="保留生成的目录树")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="native_index_bench_")
+    tree = os.path.join(work_dir, "tree")
+    index_path = os.path.join(work_dir, "index.bin")
+    try:
+        start = time.perf_counter()
+        make_tree(tree, args.files, args.files_per_dir, args.seed)
+        print(f"生成 {args.files} 个文件: {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        count = build_index([tree], index_path, args.workers)
+        build_seconds = time.perf_counter() - start
+        print(
+            f"内置索引: {count} 个条目，建立 {build_seconds:.1f}s，"
+            f"大小 {os.path.getsize(index_path) / 1e6:.1f}MB"
+        )
+
+        index = NativeIndex(index_path)
+        start = time.perf_counter()
+        NativeIndex(index_path).close()
+        print(f"内置索引加载: {(time.perf_counter() - start) * 1000:.1f}ms")
+        results = {
+            "native": time_queries(
+                lambda q: index.search(q, max_results=1000), args.runs
+            )
+        }
+        index.close()
+
+        if shutil.which("plocate") and shutil.which("updatedb"):
+            db_path = os.path.join(work_dir, "plocate.db")
+            start = time.perf_counter()
+            subprocess.run(
+                ["updatedb", "-l", "0", "-U", tree, "-o", db_path], check=True
+            )
+            print(
+                f"plocate: 建立 {time.perf_counter() - start:.1f}s，"
+                f"大小 {os.path.getsize(db_path) / 1e6:.1f}MB"
+            )
+            results["plocate"] = time_queries(plocate_search(db_path), args.runs)
+        else:
+            print("未安装 plocate/updatedb，跳过对比")
+
+        print()
+        print(f"{'查询':<22}" + "".join(f"{name:>22}" for name in results))
+        for query in QUERIES:
+            cells = "".join(
+                f"{timings[query][0] * 1000:>12.2f}ms ({timings[query][1]:>4})"
+                for timings in results.values()
+            )
+            print(f"{query:<22}{cells}")
+    finally:
+        if args.keep:
+            print(f"目录树保留在: {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
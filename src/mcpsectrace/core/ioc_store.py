@@ -0,0 +1,476 @@
+"""
+本地威胁情报库
+
+把外部情报源（文本/CSV）和历次 IOC 分析的输出（*_threat_report.md、
+*_threat_data.csv、*_release_files.csv）导入本地 SQLite 数据库，在发起耗时的在线
+查询前先查本地结论。
+
+索引：
+- 域名、SHA256、单个IP：(类型, 值) 主键上的精确查找，批量查询按块 IN 查询
+- CIDR 网段：内存中的二进制前缀树（radix trie），查询IP时沿位路径收集所有包含它的网段
+"""
+
+import csv
+import glob
+import ipaddress
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+SHA256_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+# 规范化（小写、无末尾点）后的域名：顶级域为字母或 punycode（xn--）
+DOMAIN_PATTERN = re.compile(
+    r"^(?=.{1,253}$)(?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+"
+    r"(?:[a-z]{2,63}|xn--[a-z0-9-]{1,59})$"
+)
+
+# 批量查询时每条 SQL 的参数个数
+_QUERY_CHUNK_SIZE = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS indicators (
+    kind TEXT NOT NULL,
+    value TEXT NOT NULL,
+    source TEXT NOT NULL,
+    verdict TEXT NOT NULL,
+    detail TEXT NOT NULL DEFAULT '{}',
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (kind, value, source)
+);
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL
+);
+"""
+
+
+def classify_indicator(raw_value: str) -> Optional[Tuple[str, str]]:
+    """
+    识别指标类型并规范化
+
+    Returns:
+        Optional[Tuple[str, str]]: (类型, 规范化值)，类型为 ip/cidr/domain/sha256，无法识别返回None
+    """
+    value = raw_value.strip().strip('"').lower()
+    value = value.replace("[.]", ".").replace("(.)", ".").rstrip(".")
+    if not value:
+        return None
+    if SHA256_PATTERN.match(value):
+        return "sha256", value
+    if "/" in value:
+        try:
+            return "cidr", str(ipaddress.ip_network(value, strict=False))
+        except ValueError:
+            return None
+    try:
+        return "ip", str(ipaddress.ip_address(value))
+    except ValueError:
+        pass
+    if DOMAIN_PATTERN.match(value):
+        return "domain", value
+    return None
+
+
+def report_in_progress(report_path: str) -> bool:
+    """报告是否仍在写入或中途崩溃（MarkdownReportWriter 的进度文件还在）"""
+    return os.path.exists(report_path + ".progress.json")
+
+
+class PrefixTrie:
+    """IPv4/IPv6 网段的二进制前缀树，节点为 [0子树, 1子树, 该前缀上的记录列表]"""
+
+    def __init__(self):
+        self._roots = {4: [None, None, []], 6: [None, None, []]}
+
+    @staticmethod
+    def _bits(address: int, length: int, max_length: int):
+        for i in range(length):
+            yield (address >> (max_length - 1 - i)) & 1
+
+    def insert(self, network: ipaddress._BaseNetwork, record):
+        node = self._roots[network.version]
+        for bit in self._bits(
+            int(network.network_address), network.prefixlen, network.max_prefixlen
+        ):
+            if node[bit] is None:
+                node[bit] = [None, None, []]
+            node = node[bit]
+        node[2].append(record)
+
+    def remove(self, network: ipaddress._BaseNetwork, predicate):
+        """删除该前缀上满足条件的记录"""
+        node = self._roots[network.version]
+        for bit in self._bits(
+            int(network.network_address), network.prefixlen, network.max_prefixlen
+        ):
+            node = node[bit]
+            if node is None:
+                return
+        node[2] = [record for record in node[2] if not predicate(record)]
+
+    def lookup(self, address: ipaddress._BaseAddress) -> List:
+        """返回所有包含该地址的网段记录，按前缀从短到长排列"""
+        node = self._roots[address.version]
+        matches = list(node[2])
+        for bit in self._bits(
+            int(address), address.max_prefixlen, address.max_prefixlen
+        ):
+            node = node[bit]
+            if node is None:
+                break
+            matches.extend(node[2])
+        return matches
+
+
+class IOCStore:
+    """本地威胁情报库"""
+
+    def __init__(self, db_path: str):
+        """
+        Args:
+            db_path: SQLite 数据库路径，不存在时自动创建
+        """
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(_SCHEMA)
+        self._trie = PrefixTrie()
+        for row in self._conn.execute("SELECT * FROM indicators WHERE kind = 'cidr'"):
+            self._trie.insert(
+                ipaddress.ip_network(row["value"]), self._row_to_match(row)
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # ------------------------------------------------------------------ 写入
+
+    def add_indicators(
+        self,
+        items: Iterable[Tuple[str, str, str, Optional[dict]]],
+        source: str,
+        updated_at: Optional[datetime] = None,
+    ) -> int:
+        """
+        写入指标（同一来源的同一指标会被覆盖）
+
+        Args:
+            items: (类型, 规范化值, 结论, 详情) 迭代器
+            source: 来源名称
+            updated_at: 指标的更新时间，默认为当前时间
+
+        Returns:
+            int: 写入条数
+        """
+        updated_at = (updated_at or datetime.now()).strftime("%Y-%m-%d %H:%M:%S")
+        rows = [
+            (
+                kind,
+                value,
+                source,
+                verdict,
+                json.dumps(detail or {}, ensure_ascii=False),
+                updated_at,
+            )
+            for kind, value, verdict, detail in items
+        ]
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO indicators "
+                    "(kind, value, source, verdict, detail, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+            for kind, value, source_name, verdict, detail, _ in rows:
+                if kind != "cidr":
+                    continue
+                network = ipaddress.ip_network(value)
+                self._trie.remove(network, lambda match: match["source"] == source_name)
+                self._trie.insert(
+                    network,
+                    {
+                        "kind": kind,
+                        "value": value,
+                        "source": source_name,
+                        "verdict": verdict,
+                        "detail": json.loads(detail),
+                        "updated_at": updated_at,
+                    },
+                )
+        return len(rows)
+
+    def ingest_feed(
+        self,
+        path: str,
+        default_verdict: str = "malicious",
+        source: Optional[str] = None,
+    ) -> int:
+        """
+        导入情报源文件
+
+        每行一个指标，"#" 开头为注释；CSV 格式时第1列为指标，可选第2列结论、第3列说明。
+
+        Returns:
+            int: 导入的有效指标数
+        """
+        source = source or f"feed:{os.path.basename(path)}"
+        items = []
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            for row in csv.reader(f):
+                if not row or row[0].lstrip().startswith("#"):
+                    continue
+                classified = classify_indicator(row[0])
+                if classified is None:
+                    continue
+                verdict = (
+                    row[1].strip()
+                    if len(row) > 1 and row[1].strip()
+                    else default_verdict
+                )
+                detail = (
+                    {"note": row[2].strip()}
+                    if len(row) > 2 and row[2].strip()
+                    else None
+                )
+                items.append((*classified, verdict, detail))
+        return self.add_indicators(items, source)
+
+    def ingest_threat_data_csv(self, path: str, target_value: str) -> int:
+        """导入 <目标>_threat_data.csv：相关样本的SHA256及目标与样本的关联"""
+        items = []
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            rows = list(csv.reader(f))
+        for row in rows[1:]:
+            if len(row) < 7 or not SHA256_PATTERN.match(row[3].strip().lower()):
+                continue
+            items.append(
+                (
+                    "sha256",
+                    row[3].strip().lower(),
+                    row[6].strip() or "unknown",
+                    {
+                        "file_name": row[0],
+                        "file_type": row[1],
+                        "scan_time": row[2],
+                        "engines": row[4],
+                        "family": row[5],
+                        "related_target": target_value,
+                    },
+                )
+            )
+        return self.add_indicators(items, "threat_data")
+
+    def ingest_release_files_csv(self, path: str) -> int:
+        """导入 <目标>_release_files.csv：样本释放的文件"""
+        items = []
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            rows = list(csv.reader(f))
+        for row in rows[1:]:
+            if len(row) < 7 or not SHA256_PATTERN.match(row[6].strip().lower()):
+                continue
+            items.append(
+                (
+                    "sha256",
+                    row[6].strip().lower(),
+                    "dropped_by_sample",
+                    {
+                        "related_target": row[0],
+                        "parent_sha256": row[1],
+                        "environment": row[2],
+                        "file_name": row[3],
+                        "file_path": row[5],
+                    },
+                )
+            )
+        return self.add_indicators(items, "release_files")
+
+    def ingest_report(
+        self, report_path: str, target_type: str, target_value: str
+    ) -> int:
+        """
+        记录目标已有分析报告，相关样本数从同目录的 threat_data.csv 统计
+
+        更新时间取报告文件的修改时间，历史报告按实际生成时间判断是否过期；
+        仍在写入或中途崩溃的报告（存在 .progress.json）不导入。
+        """
+        classified = classify_indicator(target_value)
+        if classified is None or report_in_progress(report_path):
+            return 0
+        output_dir = os.path.dirname(report_path)
+        sanitized_target = re.sub(r'[\\/:*?"<>|]', "_", target_value)
+        threat_data_path = os.path.join(
+            output_dir, f"{sanitized_target}_threat_data.csv"
+        )
+        sample_count = 0
+        if os.path.exists(threat_data_path):
+            with open(threat_data_path, "r", encoding="utf-8", newline="") as f:
+                sample_count = max(0, sum(1 for _ in csv.reader(f)) - 1)
+        verdict = "has_related_samples" if sample_count else "analyzed"
+        detail = {
+            "report_path": report_path,
+            "target_type": target_type,
+            "related_samples": sample_count,
+        }
+        return self.add_indicators(
+            [(*classified, verdict, detail)],
+            "report",
+            updated_at=datetime.fromtimestamp(os.path.getmtime(report_path)),
+        )
+
+    def ingest_target_outputs(
+        self, output_dir: str, target_type: str, target_value: str
+    ) -> int:
+        """导入单个目标的全部输出文件"""
+        sanitized_target = re.sub(r'[\\/:*?"<>|]', "_", target_value)
+        count = 0
+        report_path = os.path.join(
+            output_dir, f"{sanitized_target}_{target_type}_threat_report.md"
+        )
+        if os.path.exists(report_path):
+            count += self.ingest_report(report_path, target_type, target_value)
+        threat_data_path = os.path.join(
+            output_dir, f"{sanitized_target}_threat_data.csv"
+        )
+        if os.path.exists(threat_data_path):
+            count += self.ingest_threat_data_csv(threat_data_path, target_value)
+        release_path = os.path.join(output_dir, f"{sanitized_target}_release_files.csv")
+        if os.path.exists(release_path):
+            count += self.ingest_release_files_csv(release_path)
+        return count
+
+    def sync_sources(self, output_dir: str, feeds: Iterable[str] = ()) -> int:
+        """
+        增量导入：只处理新增或修改过的情报源与分析输出
+
+        Returns:
+            int: 本次导入的指标数
+        """
+        count = 0
+        for feed_path in feeds:
+            if os.path.exists(feed_path) and self._source_changed(feed_path):
+                count += self.ingest_feed(feed_path)
+                self._mark_source(feed_path)
+
+        report_pattern = re.compile(r"^(.+)_(ip|domain)_threat_report\.md$")
+        for report_path in glob.glob(os.path.join(output_dir, "*_threat_report.md")):
+            match = report_pattern.match(os.path.basename(report_path))
+            if not match or not self._source_changed(report_path):
+                continue
+            # 未完成的报告不标记为已导入，写完后下次同步再导入
+            if report_in_progress(report_path):
+                continue
+            target_value, target_type = match.groups()
+            count += self.ingest_target_outputs(output_dir, target_type, target_value)
+            self._mark_source(report_path)
+        return count
+
+    def _source_changed(self, path: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT mtime FROM sources WHERE path = ?", (os.path.abspath(path),)
+            ).fetchone()
+        return row is None or row["mtime"] != os.path.getmtime(path)
+
+    def _mark_source(self, path: str):
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO sources (path, mtime) VALUES (?, ?)",
+                    (os.path.abspath(path), os.path.getmtime(path)),
+                )
+
+    # ------------------------------------------------------------------ 查询
+
+    @staticmethod
+    def _row_to_match(row: sqlite3.Row) -> dict:
+        return {
+            "kind": row["kind"],
+            "value": row["value"],
+            "source": row["source"],
+            "verdict": row["verdict"],
+            "detail": json.loads(row["detail"]),
+            "updated_at": row["updated_at"],
+        }
+
+    def lookup(self, raw_value: str) -> List[dict]:
+        """查询单个指标"""
+        return self.lookup_many([raw_value]).get(raw_value, [])
+
+    def lookup_many(self, raw_values: Iterable[str]) -> Dict[str, List[dict]]:
+        """
+        批量查询
+
+        Args:
+            raw_values: 原始指标值
+
+        Returns:
+            Dict[str, List[dict]]: 原始值 -> 命中记录（精确命中在前，网段命中按前缀从短到长）；
+            无法识别的指标不出现在结果中
+        """
+        classified: Dict[str, Tuple[str, str]] = {}
+        for raw_value in raw_values:
+            result = classify_indicator(raw_value)
+            if result is not None:
+                classified[raw_value] = result
+
+        exact: Dict[Tuple[str, str], List[dict]] = {}
+        keys = sorted(set(classified.values()))
+        with self._lock:
+            for kind in {kind for kind, _ in keys}:
+                values = [value for key_kind, value in keys if key_kind == kind]
+                for start in range(0, len(values), _QUERY_CHUNK_SIZE):
+                    chunk = values[start : start + _QUERY_CHUNK_SIZE]
+                    placeholders = ",".join("?" * len(chunk))
+                    for row in self._conn.execute(
+                        f"SELECT * FROM indicators WHERE kind = ? AND value IN ({placeholders})",
+                        [kind, *chunk],
+                    ):
+                        exact.setdefault((kind, row["value"]), []).append(
+                            self._row_to_match(row)
+                        )
+
+            results: Dict[str, List[dict]] = {}
+            for raw_value, (kind, value) in classified.items():
+                matches = list(exact.get((kind, value), []))
+                if kind == "ip":
+                    matches.extend(self._trie.lookup(ipaddress.ip_address(value)))
+                results[raw_value] = matches
+        return results
+
+    def fresh_report(
+        self,
+        target_value: str,
+        max_age_days: float,
+        verdicts: Optional[Iterable[str]] = None,
+    ) -> Optional[dict]:
+        """
+        返回目标在有效期内、报告文件仍存在的分析记录
+
+        Args:
+            target_value: 查询目标
+            max_age_days: 报告有效期（天）
+            verdicts: 只返回结论属于其中的报告（analyzed / has_related_samples），None 表示不限
+        """
+        cutoff = datetime.now() - timedelta(days=max_age_days)
+        if verdicts is not None:
+            verdicts = set(verdicts)
+        for match in self.lookup(target_value):
+            if match["source"] != "report":
+                continue
+            if verdicts is not None and match["verdict"] not in verdicts:
+                continue
+            updated_at = datetime.strptime(match["updated_at"], "%Y-%m-%d %H:%M:%S")
+            if updated_at >= cutoff and os.path.exists(
+                match["detail"].get("report_path", "")
+            ):
+                return match
+        return None
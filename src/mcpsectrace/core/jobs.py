@@ -0,0 +1,476 @@
+"""
+长耗时 MCP 工具的后台任务框架
+
+全盘查杀、HRKill 扫描和 IOC 分析等工具可能运行数分钟到一小时。工具通过
+JobManager.start() 把实际工作提交到后台线程并立即返回任务ID，智能体可以同时处理
+其他工作，再用 get_job_status / get_job_result / cancel_job 查看、等待或取消任务。
+
+任务函数运行在工作线程中，当前任务保存在线程局部变量里，深层代码通过模块函数
+report_progress() 上报进度、cancellable_sleep() 等待并响应取消，无需逐层传参。
+进度会以 MCP 日志通知推送给提交任务的会话；get_job_result 等待期间还会以进度通知
+（notifications/progress）推送给发起等待的请求。取消是协作式的：排队中的任务直接取消，
+运行中的任务在下一次 cancellable_sleep() / check_cancelled() 时结束。
+"""
+
+import asyncio
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+# 任务状态
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+STATUS_LABELS = {
+    PENDING: "排队中",
+    RUNNING: "运行中",
+    SUCCEEDED: "已完成",
+    FAILED: "失败",
+    CANCELLED: "已取消",
+}
+
+_local = threading.local()
+
+
+class JobCancelled(Exception):
+    """任务被取消时在任务线程中抛出"""
+
+
+@dataclass
+class Job:
+    """单个后台任务的状态"""
+
+    job_id: str
+    name: str
+    status: str = PENDING
+    progress: float = 0.0
+    total: Optional[float] = None
+    message: str = ""
+    result: Any = None
+    error: str = ""
+    created_at: datetime = field(default_factory=datetime.now)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    traceback: str = field(default="", repr=False)
+    _cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+    _done_event: threading.Event = field(default_factory=threading.Event, repr=False)
+    _listeners: List[Callable[["Job"], None]] = field(default_factory=list, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def elapsed_seconds(self) -> float:
+        """已运行的秒数，未开始时为0"""
+        if self.started_at is None:
+            return 0.0
+        end = self.finished_at or datetime.now()
+        return (end - self.started_at).total_seconds()
+
+    def add_listener(self, listener: Callable[["Job"], None]):
+        """注册进度和状态变化回调（在任务线程中调用，需自行保证线程安全）"""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[["Job"], None]):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def notify(self):
+        """通知所有监听者，单个回调出错不影响任务"""
+        with self._lock:
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener(self)
+            except Exception:
+                pass
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待任务结束，返回是否已结束"""
+        return self._done_event.wait(timeout)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """任务状态摘要（不含结果）"""
+        return {
+            "job_id": self.job_id,
+            "name": self.name,
+            "status": self.status,
+            "progress": self.progress,
+            "total": self.total,
+            "message": self.message,
+            "error": self.error,
+            "created_at": self.created_at.strftime("%Y-%m-%d %H:%M:%S"),
+            "elapsed_seconds": round(self.elapsed_seconds(), 1),
+        }
+
+    def format_status(self) -> str:
+        """生成单行的任务状态描述"""
+        parts = [
+            f"任务 {self.job_id}（{self.name}）: {STATUS_LABELS.get(self.status, self.status)}"
+        ]
+        if self.total:
+            parts.append(f"进度 {self.progress:g}/{self.total:g}")
+        elif self.progress:
+            parts.append(f"进度 {self.progress:g}")
+        if self.started_at is not None:
+            parts.append(f"已运行 {int(self.elapsed_seconds())} 秒")
+        if self.message:
+            parts.append(self.message)
+        if self.error:
+            parts.append(f"错误: {self.error}")
+        return "，".join(parts)
+
+
+def current_job() -> Optional[Job]:
+    """当前线程正在执行的任务，不在任务中时返回None"""
+    return getattr(_local, "job", None)
+
+
+def report_progress(progress: float, total: Optional[float] = None, message: str = ""):
+    """
+    上报当前任务的进度，不在任务中时为空操作
+
+    Args:
+        progress: 当前进度
+        total: 总量，未知时为None
+        message: 进度说明
+    """
+    job = current_job()
+    if job is None:
+        return
+    job.progress = progress
+    if total is not None:
+        job.total = total
+    if message:
+        job.message = message
+    job.notify()
+
+
+@contextmanager
+def bind_job(job: Optional[Job]):
+    """
+    把任务绑定到当前线程
+
+    任务函数自行创建的线程（如批量分析的浏览器池工作线程）中没有当前任务，
+    绑定后这些线程里的 report_progress / check_cancelled / cancellable_sleep 同样作用于该任务。
+    """
+    previous = current_job()
+    _local.job = job
+    try:
+        yield job
+    finally:
+        _local.job = previous
+
+
+def check_cancelled():
+    """当前任务已请求取消时抛出 JobCancelled"""
+    job = current_job()
+    if job is not None and job.cancel_requested:
+        raise JobCancelled(f"任务 {job.job_id} 已取消")
+
+
+def cancellable_sleep(seconds: float):
+    """等待指定秒数；在任务中时可被取消打断并抛出 JobCancelled"""
+    job = current_job()
+    if job is None:
+        time.sleep(seconds)
+        return
+    if job._cancel_event.wait(max(0.0, seconds)):
+        raise JobCancelled(f"任务 {job.job_id} 已取消")
+
+
+class JobManager:
+    """
+    后台任务管理器
+
+    在有限的工作线程上运行任务，保留最近结束的任务供查询。
+    """
+
+    def __init__(
+        self, max_workers: int = 2, max_finished_jobs: int = 50, enabled: bool = True
+    ):
+        """
+        Args:
+            max_workers: 同时运行的任务数，超出的任务排队
+            max_finished_jobs: 保留的已结束任务数量，超出时丢弃最早结束的
+            enabled: 为False时 start() 在线程中同步执行并直接返回结果
+        """
+        self.max_finished_jobs = max_finished_jobs
+        self.enabled = enabled
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, max_workers), thread_name_prefix="mcp-job"
+        )
+        self._jobs: Dict[str, Job] = {}
+        self._futures: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, name: str, func: Callable[..., Any], *args, **kwargs) -> Job:
+        """
+        提交任务
+
+        Args:
+            name: 任务名称（通常为工具名）
+            func: 任务函数，返回值作为任务结果
+            *args, **kwargs: 传给任务函数的参数
+
+        Returns:
+            Job: 新建的任务
+        """
+        return self._submit(
+            Job(job_id=uuid.uuid4().hex[:12], name=name), func, args, kwargs
+        )
+
+    def _submit(self, job: Job, func: Callable[..., Any], args, kwargs) -> Job:
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._prune()
+            # 持有锁提交，保证任务结束时 _finish 能移除对应的 future
+            self._futures[job.job_id] = self._executor.submit(
+                self._run, job, func, args, kwargs
+            )
+        return job
+
+    def _run(self, job: Job, func: Callable[..., Any], args, kwargs):
+        """在工作线程中执行任务并记录结果"""
+        if job.cancel_requested:
+            self._finish(job, CANCELLED)
+            return
+        job.status = RUNNING
+        job.started_at = datetime.now()
+        job.notify()
+        _local.job = job
+        try:
+            job.result = func(*args, **kwargs)
+            # 任务在取消后提前返回部分结果时，保留结果并标记为已取消
+            self._finish(job, CANCELLED if job.cancel_requested else SUCCEEDED)
+        except JobCancelled:
+            self._finish(job, CANCELLED)
+        except Exception as e:
+            job.error = str(e) or type(e).__name__
+            job.traceback = traceback.format_exc()
+            self._finish(job, FAILED)
+        finally:
+            _local.job = None
+
+    def _finish(self, job: Job, status: str):
+        job.status = status
+        job.finished_at = datetime.now()
+        if job.started_at is None:
+            job.started_at = job.finished_at
+        with self._lock:
+            self._futures.pop(job.job_id, None)
+        job._done_event.set()
+        job.notify()
+
+    def _prune(self):
+        """丢弃超出保留数量的已结束任务（调用方持有锁）"""
+        finished = [job for job in self._jobs.values() if job.finished]
+        excess = len(finished) - self.max_finished_jobs
+        if excess <= 0:
+            return
+        finished.sort(key=lambda job: job.finished_at)
+        for job in finished[:excess]:
+            del self._jobs[job.job_id]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list_jobs(self) -> List[Job]:
+        """按创建时间排列的所有任务"""
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda job: job.created_at)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """
+        请求取消任务
+
+        排队中的任务立即取消；运行中的任务在下一个取消检查点结束。
+
+        Returns:
+            Optional[Job]: 对应的任务，不存在时返回None
+        """
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return job
+        job._cancel_event.set()
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None and future.cancel():
+            self._finish(job, CANCELLED)
+        else:
+            job.message = "已请求取消，等待任务在检查点结束"
+            job.notify()
+        return job
+
+    def shutdown(self, wait: bool = False):
+        """取消所有未结束的任务并关闭工作线程"""
+        for job in self.list_jobs():
+            if not job.finished:
+                self.cancel(job.job_id)
+        self._executor.shutdown(wait=wait)
+
+    async def start(
+        self, name: str, func: Callable[..., Any], *args, ctx=None, **kwargs
+    ) -> str:
+        """
+        供异步 MCP 工具调用：提交任务并立即返回说明文字
+
+        提供 FastMCP Context 时，任务的进度和状态变化会以日志通知推送给该会话。
+        任务框架未启用时在线程中同步执行，直接返回任务函数的结果。
+
+        Returns:
+            str: 包含任务ID和后续操作说明的文本
+        """
+        if not self.enabled:
+            return await asyncio.to_thread(func, *args, **kwargs)
+
+        job = Job(job_id=uuid.uuid4().hex[:12], name=name)
+        if ctx is not None:
+            # 在提交前注册，避免漏掉任务开始的通知
+            job.add_listener(_session_log_forwarder(ctx))
+        self._submit(job, func, args, kwargs)
+        if ctx is not None:
+            try:
+                await ctx.report_progress(0, None, f"已提交后台任务 {job.job_id}")
+            except Exception:
+                pass
+        return (
+            f"已提交后台任务 {job.job_id}（{name}）。\n"
+            f"使用 get_job_status 查看进度，get_job_result 获取结果（可设置等待秒数），"
+            f"cancel_job 取消任务。"
+        )
+
+    async def wait_result(self, job_id: str, wait_seconds: float = 0, ctx=None):
+        """
+        等待任务结束，等待期间把任务进度转发为当前请求的进度通知
+
+        Returns:
+            Optional[Job]: 对应的任务，不存在时返回None
+        """
+        job = self.get(job_id)
+        if job is None or job.finished or wait_seconds <= 0:
+            return job
+
+        listener = None
+        if ctx is not None:
+            loop = asyncio.get_running_loop()
+
+            def listener(updated: Job):
+                asyncio.run_coroutine_threadsafe(
+                    ctx.report_progress(
+                        updated.progress, updated.total, updated.message or None
+                    ),
+                    loop,
+                )
+
+            job.add_listener(listener)
+        try:
+            await asyncio.to_thread(job.wait, wait_seconds)
+        finally:
+            if listener is not None:
+                job.remove_listener(listener)
+        return job
+
+
+def _session_log_forwarder(ctx) -> Callable[[Job], None]:
+    """把任务进度以 MCP 日志通知推送给提交任务的会话"""
+    loop = asyncio.get_running_loop()
+    session = ctx.session
+
+    def forward(job: Job):
+        if loop.is_closed():
+            return
+        asyncio.run_coroutine_threadsafe(
+            session.send_log_message(level="info", data=job.to_dict(), logger="jobs"),
+            loop,
+        )
+
+    return forward
+
+
+def format_job_result(job: Optional[Job], job_id: str) -> str:
+    """生成 get_job_result 的返回文本"""
+    if job is None:
+        return f"任务 {job_id} 不存在（可能已过期被清理）"
+    if not job.finished:
+        return job.format_status() + "\n任务尚未结束，可稍后再次查询或设置等待秒数。"
+    if job.result is None:
+        return job.format_status()
+    if job.status == SUCCEEDED:
+        return str(job.result)
+    return job.format_status() + "\n" + str(job.result)
+
+
+def register_job_tools(mcp, manager: JobManager):
+    """
+    在 FastMCP 服务上注册任务管理工具：get_job_status、get_job_result、cancel_job
+
+    Args:
+        mcp: FastMCP 实例
+        manager: 该服务使用的任务管理器
+    """
+    from mcp.server.fastmcp import Context
+
+    @mcp.tool()
+    def get_job_status(job_id: Optional[str] = None) -> str:
+        """
+        查看后台任务的状态和进度。
+
+        Args:
+            job_id (str): 任务ID，不提供时列出所有任务。
+        """
+        if job_id:
+            job = manager.get(job_id)
+            if job is None:
+                return f"任务 {job_id} 不存在（可能已过期被清理）"
+            return job.format_status()
+        jobs = manager.list_jobs()
+        if not jobs:
+            return "当前没有后台任务"
+        return "\n".join(job.format_status() for job in jobs)
+
+    @mcp.tool()
+    async def get_job_result(
+        job_id: str, wait_seconds: float = 0, ctx: Context = None
+    ) -> str:
+        """
+        获取后台任务的结果，任务未结束时返回当前状态。
+
+        Args:
+            job_id (str): 任务ID。
+            wait_seconds (float): 任务未结束时最多等待的秒数，等待期间推送进度通知，默认不等待。
+        """
+        job = await manager.wait_result(job_id, wait_seconds, ctx)
+        return format_job_result(job, job_id)
+
+    @mcp.tool()
+    def cancel_job(job_id: str) -> str:
+        """
+        取消后台任务。排队中的任务立即取消，运行中的任务在下一个检查点结束。
+
+        Args:
+            job_id (str): 任务ID。
+        """
+        job = manager.cancel(job_id)
+        if job is None:
+            return f"任务 {job_id} 不存在（可能已过期被清理）"
+        return job.format_status()
@@ -0,0 +1,160 @@
+"""批量文件名扫描。
+
+全局检查成千上万个释放文件名时，逐个（或分批）发送查询的次数与文件名数成正比。
+批量扫描把全部目标文件名编译成一个匹配器，对搜索后端枚举出的全部文件名
+（Everything 全量列表、locate 数据库或内置索引）只遍历一遍，一次得到所有命中。
+
+匹配语义与逐行检查一致：结果文件名包含目标文件名（不区分大小写）。
+- contains：Aho-Corasick 自动机，单次遍历同时匹配全部目标文件名的子串
+- exact：哈希集合，只匹配完全相同的文件名，速度更快
+"""
+
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+# 每个目标文件名最多保留的命中路径数
+DEFAULT_MAX_PATHS_PER_NAME = 10
+
+
+class AhoCorasick:
+    """多模式子串匹配自动机。"""
+
+    def __init__(self, patterns: Sequence[str]):
+        # 状态转移、失败指针和各状态输出的模式编号
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]
+        for pattern_id, pattern in enumerate(patterns):
+            self._add(pattern, pattern_id)
+        self._build()
+
+    def _add(self, pattern: str, pattern_id: int):
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = next_state
+        self._out[state] += (pattern_id,)
+
+    def _build(self):
+        """按广度优先计算失败指针，并把失败链上的输出合并到各状态。"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._out[next_state] += self._out[self._fail[next_state]]
+
+    def find(self, text: str) -> set:
+        """text 中出现的全部模式编号。"""
+        goto, fail, out = self._goto, self._fail, self._out
+        found = set()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
+
+
+class FilenameMatcher:
+    """把目标文件名编译成单个匹配器（不区分大小写）。"""
+
+    def __init__(self, names: Iterable[str], mode: str = "contains"):
+        """
+        Args:
+            names: 目标文件名
+            mode: contains（文件名包含目标）或 exact（文件名等于目标）
+
+        Raises:
+            ValueError: 未知的匹配模式
+        """
+        if mode not in ("contains", "exact"):
+            raise ValueError(f"未知的匹配模式: {mode}")
+        self.mode = mode
+        self.names = list(dict.fromkeys(name for name in names if name))
+        # 小写文件名 -> 原始文件名（大小写不同的重复项共用一个模式）
+        self._by_lower: Dict[str, List[str]] = {}
+        for name in self.names:
+            self._by_lower.setdefault(name.lower(), []).append(name)
+        self._patterns = list(self._by_lower)
+        self._automaton = AhoCorasick(self._patterns) if mode == "contains" else None
+
+    def match(self, filename: str) -> List[str]:
+        """filename 命中的目标文件名。"""
+        lowered = filename.lower()
+        if self._automaton is None:
+            return self._by_lower.get(lowered, [])
+        matched = []
+        for pattern_id in self._automaton.find(lowered):
+            matched.extend(self._by_lower[self._patterns[pattern_id]])
+        return matched
+
+
+@dataclass
+class SweepStats:
+    """批量扫描统计。"""
+
+    # 遍历的文件数
+    scanned: int = 0
+    # 命中的目标文件名数
+    matched_names: int = 0
+    seconds: float = 0.0
+
+    def format_summary(self) -> str:
+        """生成单行的扫描统计。"""
+        return (
+            f"遍历 {self.scanned} 个文件，命中 {self.matched_names} 个文件名，"
+            f"耗时 {self.seconds:.2f}s"
+        )
+
+
+def sweep_filenames(
+    files: Iterable[Tuple[str, str]],
+    names: Iterable[str],
+    mode: str = "contains",
+    max_paths_per_name: int = DEFAULT_MAX_PATHS_PER_NAME,
+) -> Tuple[Dict[str, List[str]], SweepStats]:
+    """
+    单次遍历文件列表，查找全部目标文件名。
+
+    Args:
+        files: (文件名, 完整路径) 的枚举，通常为 SearchProvider.iter_all_files()
+        names: 目标文件名
+        mode: 匹配模式，见 FilenameMatcher
+        max_paths_per_name: 每个目标文件名最多保留的路径数
+
+    Returns:
+        (目标文件名 -> 命中路径, 统计)，未命中的文件名不在结果中
+    """
+    start = time.perf_counter()
+    matcher = FilenameMatcher(names, mode)
+    hits: Dict[str, List[str]] = {}
+    stats = SweepStats()
+    if not matcher.names:
+        return hits, stats
+    for filename, path in files:
+        stats.scanned += 1
+        for name in matcher.match(filename):
+            paths = hits.setdefault(name, [])
+            if len(paths) < max_paths_per_name:
+                paths.append(path)
+    stats.matched_names = len(hits)
+    stats.seconds = time.perf_counter() - start
+    print(f"批量文件名扫描: {stats.format_summary()}", file=sys.stderr)
+    return hits, stats
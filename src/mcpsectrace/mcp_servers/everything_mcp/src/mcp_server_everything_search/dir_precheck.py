@@ -0,0 +1,115 @@
+"""释放文件各层目录的存在性预检查。
+
+CSV 中的预期路径多来自沙箱（如 C:\\Users\\<沙箱用户>\\AppData\\...），本机上往往没有对应目录，
+对这些目录发送 path:<目录> <文件名> 查询必然没有结果。分层检查前先在本地判断各层目录是否存在，
+不存在的层直接跳过：
+- 展开 %APPDATA%、%TEMP% 等环境变量（不区分大小写，未定义的变量保留原样）
+- C:\\Users\\<用户名> 不存在时替换为本机用户目录（EVERYTHING_TARGET_USER，默认当前登录用户）
+- 每个目录只检查一次，每个预期路径的各层目录只解析一次
+"""
+
+import getpass
+import ntpath
+import os
+import posixpath
+import re
+from typing import Callable, Dict, List, Mapping, Optional, Tuple
+
+_ENV_VAR = re.compile(r"%([^%\\/]+)%")
+_USER_DIR = re.compile(r"^([A-Za-z]:\\Users\\)([^\\]+)", re.IGNORECASE)
+_DRIVE = re.compile(r"^[A-Za-z]:")
+
+
+def _path_module(path: str):
+    """Windows 风格路径（盘符或反斜杠）按 ntpath 处理，其余按 posixpath。"""
+    if "\\" in path or _DRIVE.match(path):
+        return ntpath
+    return posixpath
+
+
+def _default_user() -> Optional[str]:
+    try:
+        return getpass.getuser()
+    except (OSError, KeyError, ImportError):
+        return None
+
+
+class DirectoryPrecheck:
+    """预期路径各层目录的本地存在性检查（带缓存）。"""
+
+    def __init__(
+        self,
+        environ: Optional[Mapping[str, str]] = None,
+        target_user: Optional[str] = None,
+        isdir: Callable[[str], bool] = os.path.isdir,
+    ):
+        """
+        Args:
+            environ: 展开 %VAR% 使用的环境变量，默认为当前进程环境
+            target_user: 替换沙箱用户名的本机用户，默认读取 EVERYTHING_TARGET_USER，
+                未设置时为当前登录用户
+            isdir: 目录判断函数
+        """
+        environ = os.environ if environ is None else environ
+        self._environ = {key.upper(): value for key, value in environ.items()}
+        if target_user is None:
+            target_user = os.getenv("EVERYTHING_TARGET_USER") or _default_user()
+        self.target_user = target_user
+        self._isdir = isdir
+        self._exists: Dict[str, bool] = {}
+        self._ancestors: Dict[Tuple[str, int], List[Optional[str]]] = {}
+
+    @classmethod
+    def from_env(cls) -> Optional["DirectoryPrecheck"]:
+        """EVERYTHING_DIR_PRECHECK=0 时关闭预检查，返回 None。"""
+        if os.getenv("EVERYTHING_DIR_PRECHECK", "1").lower() in ("0", "false", "no"):
+            return None
+        return cls()
+
+    def exists(self, directory: str) -> bool:
+        """目录是否存在（每个目录只检查一次）。"""
+        key = directory.lower() if _path_module(directory) is ntpath else directory
+        exists = self._exists.get(key)
+        if exists is None:
+            exists = self._exists[key] = self._isdir(directory)
+        return exists
+
+    def expand_vars(self, path: str) -> str:
+        """展开 %VAR% 形式的环境变量，未定义的保留原样。"""
+        return _ENV_VAR.sub(
+            lambda m: self._environ.get(m.group(1).upper(), m.group(0)), path
+        )
+
+    def normalize(self, path: str) -> str:
+        """展开环境变量，并把不存在的用户目录替换为本机用户目录。"""
+        path = self.expand_vars(path)
+        match = _USER_DIR.match(path)
+        if match and self.target_user and match.group(2) != self.target_user:
+            user_dir = match.group(0)
+            target_dir = match.group(1) + self.target_user
+            if not self.exists(user_dir) and self.exists(target_dir):
+                path = target_dir + path[match.end() :]
+        return path
+
+    def ancestors(self, file_path: str, max_level: int) -> List[Optional[str]]:
+        """
+        预期路径第 0 至 max_level 层的目录（第0层为所在目录）。
+
+        Returns:
+            各层目录，本地不存在的层为 None
+        """
+        key = (file_path, max_level)
+        cached = self._ancestors.get(key)
+        if cached is not None:
+            return cached
+        path = self.normalize(file_path)
+        module = _path_module(path)
+        directories: List[Optional[str]] = []
+        directory = module.dirname(path)
+        for _ in range(max_level + 1):
+            directories.append(
+                directory if directory and self.exists(directory) else None
+            )
+            directory = module.dirname(directory)
+        self._ancestors[key] = directories
+        return directories
@@ -4,7 +4,8 @@ import ctypes
 import datetime
 import struct
 import sys
-from typing import Any, List
+import threading
+from typing import Any, Dict, List, Optional, Sequence
 
 from pydantic import BaseModel
 
@@ -36,6 +37,54 @@ EVERYTHING_REQUEST_HIGHLIGHTED_FILE_NAME = 0x00002000
 EVERYTHING_REQUEST_HIGHLIGHTED_PATH = 0x00004000
 EVERYTHING_REQUEST_HIGHLIGHTED_FULL_PATH_AND_FILE_NAME = 0x00008000
 
+# 结果字段 -> 需要的请求标志（字段投影）
+FIELD_REQUEST_FLAGS: Dict[str, int] = {
+    "path": EVERYTHING_REQUEST_FILE_NAME | EVERYTHING_REQUEST_PATH,
+    "filename": EVERYTHING_REQUEST_FILE_NAME,
+    "extension": EVERYTHING_REQUEST_EXTENSION,
+    "size": EVERYTHING_REQUEST_SIZE,
+    "created": EVERYTHING_REQUEST_DATE_CREATED,
+    "modified": EVERYTHING_REQUEST_DATE_MODIFIED,
+    "accessed": EVERYTHING_REQUEST_DATE_ACCESSED,
+    "attributes": EVERYTHING_REQUEST_ATTRIBUTES,
+    "run_count": EVERYTHING_REQUEST_RUN_COUNT,
+    "highlighted_filename": EVERYTHING_REQUEST_HIGHLIGHTED_FILE_NAME,
+    "highlighted_path": EVERYTHING_REQUEST_HIGHLIGHTED_PATH,
+}
+ALL_FIELDS = tuple(FIELD_REQUEST_FLAGS)
+# 始终返回的字段
+REQUIRED_FIELDS = ("path", "filename")
+
+
+def normalize_fields(fields: Optional[Sequence[str]]) -> tuple:
+    """
+    校验字段投影，补上必需字段。
+
+    Args:
+        fields: 需要的字段，None 表示全部字段
+
+    Raises:
+        ValueError: 包含未知字段
+    """
+    if fields is None:
+        return ALL_FIELDS
+    unknown = [f for f in fields if f not in FIELD_REQUEST_FLAGS]
+    if unknown:
+        raise ValueError(
+            f"未知字段: {', '.join(unknown)}（可选: {', '.join(ALL_FIELDS)}）"
+        )
+    requested = set(fields) | set(REQUIRED_FIELDS)
+    return tuple(f for f in ALL_FIELDS if f in requested)
+
+
+def request_flags_for(fields: Sequence[str]) -> int:
+    """字段投影对应的请求标志。"""
+    flags = 0
+    for field in fields:
+        flags |= FIELD_REQUEST_FLAGS[field]
+    return flags
+
+
 # 排序选项
 EVERYTHING_SORT_NAME_ASCENDING = 1
 EVERYTHING_SORT_NAME_DESCENDING = 2
@@ -71,6 +120,9 @@ POSIX_EPOCH = datetime.datetime.strptime("1970-01-01 00:00:00", "%Y-%m-%d %H:%M:
 EPOCH_DIFF = (POSIX_EPOCH - WINDOWS_EPOCH).total_seconds()
 WINDOWS_TICKS_TO_POSIX_EPOCH = EPOCH_DIFF * WINDOWS_TICKS
 
+# 串行化 Everything 查询（所有 EverythingSDK 实例共用同一个 DLL）
+_QUERY_LOCK = threading.Lock()
+
 
 class SearchResult(BaseModel):
     """搜索结果的模型。"""
@@ -78,7 +130,7 @@ class SearchResult(BaseModel):
     path: str
     filename: str
     extension: str | None = None
-    size: int
+    size: int | None = None
     created: str | None = None
     modified: str | None = None
     accessed: str | None = None
@@ -111,10 +163,16 @@ class EverythingError(Exception):
 class EverythingSDK:
     """Everything SDK 功能的包装器。"""
 
-    def __init__(self, dll_path: str):
-        """使用指定的 DLL 路径初始化 Everything SDK。"""
+    def __init__(self, dll_path: str, dll: Any = None):
+        """
+        使用指定的 DLL 路径初始化 Everything SDK。
+
+        Args:
+            dll_path: Everything64.dll 路径
+            dll: 已加载的 DLL 对象（测试替身等），提供时不再加载 dll_path
+        """
         try:
-            self.dll = ctypes.WinDLL(dll_path)
+            self.dll = dll if dll is not None else ctypes.WinDLL(dll_path)
             self._configure_dll()
         except Exception as e:
             print(f"加载 Everything SDK DLL 失败: {e}", file=sys.stderr)
@@ -130,6 +188,7 @@ class EverythingSDK:
         self.dll.Everything_SetRegex.argtypes = [ctypes.c_bool]
         self.dll.Everything_SetMax.argtypes = [ctypes.c_uint]
         self.dll.Everything_SetSort.argtypes = [ctypes.c_uint]
+        self.dll.Everything_SetOffset.argtypes = [ctypes.c_uint]
         self.dll.Everything_SetRequestFlags.argtypes = [ctypes.c_uint]
 
         # 查询函数
@@ -198,105 +257,109 @@ class EverythingSDK:
         match_regex: bool = False,
         sort_by: int = EVERYTHING_SORT_NAME_ASCENDING,
         request_flags: int | None = None,
+        fields: Optional[Sequence[str]] = None,
+        offset: int = 0,
     ) -> List[SearchResult]:
-        """使用 Everything SDK 执行文件搜索。"""
-        print(f"调试: 使用查询设置搜索: {query}", file=sys.stderr)
-
-        # 设置搜索参数
-        self.dll.Everything_SetSearchW(query)
-        self.dll.Everything_SetMatchPath(match_path)
-        self.dll.Everything_SetMatchCase(match_case)
-        self.dll.Everything_SetMatchWholeWord(match_whole_word)
-        self.dll.Everything_SetRegex(match_regex)
-        self.dll.Everything_SetMax(max_results)
-        self.dll.Everything_SetSort(sort_by)
-
-        # 设置请求标志
-        if request_flags is None:
-            request_flags = (
-                EVERYTHING_REQUEST_FILE_NAME
-                | EVERYTHING_REQUEST_PATH
-                | EVERYTHING_REQUEST_EXTENSION
-                | EVERYTHING_REQUEST_SIZE
-                | EVERYTHING_REQUEST_DATE_CREATED
-                | EVERYTHING_REQUEST_DATE_MODIFIED
-                | EVERYTHING_REQUEST_DATE_ACCESSED
-                | EVERYTHING_REQUEST_ATTRIBUTES
-                | EVERYTHING_REQUEST_RUN_COUNT
-                | EVERYTHING_REQUEST_HIGHLIGHTED_FILE_NAME
-                | EVERYTHING_REQUEST_HIGHLIGHTED_PATH
-            )
-        self.dll.Everything_SetRequestFlags(request_flags)
-
-        # 执行搜索
-        print("调试: 执行搜索查询", file=sys.stderr)
-        if not self.dll.Everything_QueryW(True):
-            self._check_error()
-            raise RuntimeError("搜索查询失败")
-
-        # 获取结果
-        print("调试: 获取搜索结果", file=sys.stderr)
-        num_results = min(self.dll.Everything_GetNumResults(), max_results)
-        results = []
-
-        filename_buffer = ctypes.create_unicode_buffer(260)
-        date_created = ctypes.c_ulonglong()
-        date_modified = ctypes.c_ulonglong()
-        date_accessed = ctypes.c_ulonglong()
-        file_size = ctypes.c_ulonglong()
-
-        for i in range(num_results):
-            try:
-                self.dll.Everything_GetResultFullPathNameW(i, filename_buffer, 260)
-
-                # 获取时间戳
-                self.dll.Everything_GetResultDateCreated(i, date_created)
-                self.dll.Everything_GetResultDateModified(i, date_modified)
-                self.dll.Everything_GetResultDateAccessed(i, date_accessed)
-                self.dll.Everything_GetResultSize(i, file_size)
-
-                # 获取其他属性
-                filename = self.dll.Everything_GetResultFileNameW(i)
-                extension = self.dll.Everything_GetResultExtensionW(i)
-                attributes = self.dll.Everything_GetResultAttributes(i)
-                run_count = self.dll.Everything_GetResultRunCount(i)
-                highlighted_filename = (
-                    self.dll.Everything_GetResultHighlightedFileNameW(i)
+        """
+        使用 Everything SDK 执行文件搜索。
+
+        Args:
+            fields: 需要的结果字段（见 ALL_FIELDS），None 表示全部字段；
+                请求标志和逐条调用的结果获取函数都只覆盖这些字段，
+                未请求的字段为 None。path 和 filename 始终返回。
+            request_flags: 显式指定的请求标志，优先于 fields 推导的标志
+            offset: 跳过的结果数，由 Everything 服务端分页
+        """
+        # Everything SDK 的查询参数和结果是 DLL 内的全局状态，同一时间只能执行一个查询
+        with _QUERY_LOCK:
+            print(f"调试: 使用查询设置搜索: {query}", file=sys.stderr)
+            fields = normalize_fields(fields)
+            wanted = set(fields)
+
+            # 设置搜索参数
+            self.dll.Everything_SetSearchW(query)
+            self.dll.Everything_SetMatchPath(match_path)
+            self.dll.Everything_SetMatchCase(match_case)
+            self.dll.Everything_SetMatchWholeWord(match_whole_word)
+            self.dll.Everything_SetRegex(match_regex)
+            self.dll.Everything_SetMax(max_results)
+            self.dll.Everything_SetOffset(offset)
+            self.dll.Everything_SetSort(sort_by)
+
+            # 设置请求标志
+            if request_flags is None:
+                request_flags = request_flags_for(fields)
+            self.dll.Everything_SetRequestFlags(request_flags)
+
+            # 执行搜索
+            print("调试: 执行搜索查询", file=sys.stderr)
+            if not self.dll.Everything_QueryW(True):
+                self._check_error()
+                raise RuntimeError("搜索查询失败")
+
+            # 获取结果
+            print("调试: 获取搜索结果", file=sys.stderr)
+            num_results = min(self.dll.Everything_GetNumResults(), max_results)
+            results = []
+
+            filename_buffer = ctypes.create_unicode_buffer(260)
+            file_size = ctypes.c_ulonglong()
+            # 需要读取的时间字段: (字段, 获取函数)
+            date_getters = [
+                (field, getattr(self.dll, getter))
+                for field, getter in (
+                    ("created", "Everything_GetResultDateCreated"),
+                    ("modified", "Everything_GetResultDateModified"),
+                    ("accessed", "Everything_GetResultDateAccessed"),
                 )
-                highlighted_path = self.dll.Everything_GetResultHighlightedPathW(i)
-
-                results.append(
-                    SearchResult(
-                        path=filename_buffer.value,
-                        filename=filename,
-                        extension=extension,
-                        size=file_size.value,
-                        created=(
-                            self._get_time(date_created.value).isoformat()
-                            if date_created.value
-                            else None
-                        ),
-                        modified=(
-                            self._get_time(date_modified.value).isoformat()
-                            if date_modified.value
+                if field in wanted
+            ]
+            filetime = ctypes.c_ulonglong()
+
+            for i in range(num_results):
+                try:
+                    self.dll.Everything_GetResultFullPathNameW(i, filename_buffer, 260)
+                    values = {
+                        "path": filename_buffer.value,
+                        "filename": self.dll.Everything_GetResultFileNameW(i),
+                    }
+
+                    # 获取时间戳
+                    for field, getter in date_getters:
+                        getter(i, filetime)
+                        values[field] = (
+                            self._get_time(filetime.value).isoformat()
+                            if filetime.value
                             else None
-                        ),
-                        accessed=(
-                            self._get_time(date_accessed.value).isoformat()
-                            if date_accessed.value
-                            else None
-                        ),
-                        attributes=attributes,
-                        run_count=run_count,
-                        highlighted_filename=highlighted_filename,
-                        highlighted_path=highlighted_path,
-                    )
-                )
-            except Exception as e:
-                print(f"调试: 处理结果 {i} 出错: {e}", file=sys.stderr)
-                continue
-
-        print("调试: 重置 Everything SDK", file=sys.stderr)
-        self.dll.Everything_Reset()
-
-        return results
+                        )
+                    if "size" in wanted:
+                        self.dll.Everything_GetResultSize(i, file_size)
+                        values["size"] = file_size.value
+
+                    # 获取其他属性
+                    if "extension" in wanted:
+                        values["extension"] = self.dll.Everything_GetResultExtensionW(i)
+                    if "attributes" in wanted:
+                        values["attributes"] = self.dll.Everything_GetResultAttributes(
+                            i
+                        )
+                    if "run_count" in wanted:
+                        values["run_count"] = self.dll.Everything_GetResultRunCount(i)
+                    if "highlighted_filename" in wanted:
+                        values["highlighted_filename"] = (
+                            self.dll.Everything_GetResultHighlightedFileNameW(i)
+                        )
+                    if "highlighted_path" in wanted:
+                        values["highlighted_path"] = (
+                            self.dll.Everything_GetResultHighlightedPathW(i)
+                        )
+
+                    results.append(SearchResult(**values))
+                except Exception as e:
+                    print(f"调试: 处理结果 {i} 出错: {e}", file=sys.stderr)
+                    continue
+
+            print("调试: 重置 Everything SDK", file=sys.stderr)
+            self.dll.Everything_Reset()
+
+            return results
@@ -0,0 +1,223 @@
+"""释放文件的 SHA256 校验。
+
+文件名匹配只说明存在同名文件，setup.exe 之类的常见文件名容易误报。
+校验阶段计算候选文件的 SHA256 并与 CSV 中的「文件SHA256」比对：
+- 线程池并行计算（hashlib 在大块数据上释放 GIL），大文件使用 mmap，其余按 1MB 块读取
+- 哈希结果按 (路径, 大小, 修改时间) 缓存在 SQLite 中，文件未变化时不再重新读取
+"""
+
+import hashlib
+import mmap
+import os
+import sqlite3
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# 校验结论
+CONFIRMED = "哈希一致"
+MISMATCHED = "哈希不一致"
+UNREADABLE = "无法读取"
+NO_EXPECTED_HASH = "无预期哈希"
+
+DEFAULT_HASH_WORKERS = 4
+# 按块读取的块大小
+READ_CHUNK_SIZE = 1024 * 1024
+# 不小于该大小的文件使用 mmap
+MMAP_THRESHOLD = 16 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS file_hashes (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL
+);
+"""
+
+
+def sha256_file(path: str, size: Optional[int] = None) -> str:
+    """计算文件的 SHA256（小写十六进制）。"""
+    digest = hashlib.sha256()
+    if size is None:
+        size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        if size >= MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                digest.update(mapped)
+        else:
+            buffer = bytearray(READ_CHUNK_SIZE)
+            view = memoryview(buffer)
+            while True:
+                count = f.readinto(buffer)
+                if not count:
+                    break
+                digest.update(view[:count])
+    return digest.hexdigest()
+
+
+def default_cache_path() -> str:
+    cache_dir = os.getenv("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(cache_dir, "mcp-everything-search", "hashes.db")
+
+
+class HashCache:
+    """按 (路径, 大小, 修改时间) 缓存文件哈希。"""
+
+    def __init__(self, db_path: str):
+        """
+        Args:
+            db_path: SQLite 数据库路径，不存在时自动创建；":memory:" 表示只在内存中缓存
+        """
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+
+    @classmethod
+    def from_env(cls) -> "HashCache":
+        """EVERYTHING_HASH_CACHE 指定缓存数据库路径。"""
+        return cls(os.getenv("EVERYTHING_HASH_CACHE", default_cache_path()))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def get(self, path: str, size: int, mtime_ns: int) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sha256 FROM file_hashes WHERE path = ? AND size = ? "
+                "AND mtime_ns = ?",
+                (path, size, mtime_ns),
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, path: str, size: int, mtime_ns: int, sha256: str):
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO file_hashes VALUES (?, ?, ?, ?)",
+                    (path, size, mtime_ns, sha256),
+                )
+
+
+@dataclass
+class HashVerification:
+    """单个释放文件的校验结果。"""
+
+    expected: str
+    status: str
+    # 与预期哈希一致的路径
+    matched_paths: List[str] = field(default_factory=list)
+    # 路径 -> 实际哈希（无法读取的为 None）
+    actual: Dict[str, Optional[str]] = field(default_factory=dict)
+
+    def describe(self) -> str:
+        """单行描述。"""
+        if self.status == CONFIRMED:
+            return f"{CONFIRMED}: {', '.join(self.matched_paths[:3])}"
+        if self.status == MISMATCHED:
+            return f"{MISMATCHED}（同名文件 {len(self.actual)} 个，内容均不同）"
+        return self.status
+
+
+@dataclass
+class HashStats:
+    """校验统计。"""
+
+    confirmed: int = 0
+    mismatched: int = 0
+    unreadable: int = 0
+    # 实际读取计算的文件数与字节数
+    hashed_files: int = 0
+    hashed_bytes: int = 0
+    cache_hits: int = 0
+
+    def format_summary(self) -> str:
+        """生成单行的校验统计。"""
+        return (
+            f"一致 {self.confirmed}，不一致 {self.mismatched}，"
+            f"无法读取 {self.unreadable}（计算 {self.hashed_files} 个文件 "
+            f"{self.hashed_bytes / 1e6:.1f}MB，缓存命中 {self.cache_hits}）"
+        )
+
+
+class HashVerifier:
+    """并行计算候选文件哈希并与预期值比对。"""
+
+    def __init__(
+        self,
+        cache: Optional[HashCache] = None,
+        workers: int = DEFAULT_HASH_WORKERS,
+    ):
+        self.cache = cache
+        self.workers = max(1, workers)
+        self.stats = HashStats()
+        self._stats_lock = threading.Lock()
+
+    def _hash_path(self, path: str) -> Optional[str]:
+        """计算单个文件的哈希（优先使用缓存），无法读取时返回 None。"""
+        try:
+            stat = os.stat(path)
+            if self.cache is not None:
+                cached = self.cache.get(path, stat.st_size, stat.st_mtime_ns)
+                if cached is not None:
+                    with self._stats_lock:
+                        self.stats.cache_hits += 1
+                    return cached
+            sha256 = sha256_file(path, stat.st_size)
+        except OSError as e:
+            print(f"计算哈希失败 {path}: {e}", file=sys.stderr)
+            return None
+        with self._stats_lock:
+            self.stats.hashed_files += 1
+            self.stats.hashed_bytes += stat.st_size
+        if self.cache is not None:
+            self.cache.put(path, stat.st_size, stat.st_mtime_ns, sha256)
+        return sha256
+
+    def verify(
+        self, items: Sequence[Tuple[str, Sequence[str]]]
+    ) -> List[HashVerification]:
+        """
+        校验一批释放文件。
+
+        Args:
+            items: (预期 SHA256, 候选路径列表)
+
+        Returns:
+            与 items 顺序一致的校验结果；任一候选路径哈希一致即为一致
+        """
+        unique_paths = list(
+            dict.fromkeys(
+                path for expected, paths in items if expected for path in paths
+            )
+        )
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            hashes = dict(
+                zip(unique_paths, executor.map(self._hash_path, unique_paths))
+            )
+
+        results = []
+        for expected, paths in items:
+            expected = expected.strip().lower()
+            if not expected:
+                results.append(HashVerification(expected, NO_EXPECTED_HASH))
+                continue
+            actual = {path: hashes.get(path) for path in paths}
+            matched = [path for path, sha256 in actual.items() if sha256 == expected]
+            if matched:
+                status = CONFIRMED
+                self.stats.confirmed += 1
+            elif any(sha256 is not None for sha256 in actual.values()):
+                status = MISMATCHED
+                self.stats.mismatched += 1
+            else:
+                status = UNREADABLE
+                self.stats.unreadable += 1
+            results.append(HashVerification(expected, status, matched, actual))
+        return results
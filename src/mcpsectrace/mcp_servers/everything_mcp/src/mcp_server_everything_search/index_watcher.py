@@ -0,0 +1,402 @@
+"""内置索引的增量更新。
+
+索引文件按固定间隔整体重建，期间新增、删除或重命名的文件查不到或仍然可见。
+监视器订阅文件系统变更事件，把变更记录在内存中的 IndexOverlay 上：
+查询时排除已删除的路径，并追加新增的路径，下次重建索引后丢弃已反映到索引中的记录。
+
+- Linux：通过 ctypes 直接使用 inotify（不需要额外依赖），按索引中的目录逐个添加监视
+- 其他系统：安装了 watchdog 时使用 watchdog
+- 事件队列溢出或变更记录过多时标记为需要重建，由提供者在后台重建索引
+
+fanotify 可以整盘监视，但需要 CAP_SYS_ADMIN，这里不使用。
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+# 变更记录数上限，超过后改为重建索引
+DEFAULT_MAX_CHANGES = 100_000
+
+# inotify 常量（linux/inotify.h）
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (
+    IN_CREATE
+    | IN_DELETE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+    | IN_ONLYDIR
+    | IN_DONT_FOLLOW
+)
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class IndexOverlay:
+    """建索引之后的文件变更记录（线程安全）。"""
+
+    def __init__(self, max_changes: int = DEFAULT_MAX_CHANGES):
+        self.max_changes = max_changes
+        # 路径 -> 记录时间
+        self._added: Dict[str, float] = {}
+        self._removed: Dict[str, float] = {}
+        self._removed_dirs: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        # 每次变更递增，供搜索缓存判断是否失效
+        self.generation = 0
+        # 最近的变更：(版本号, 路径)，路径为 None 表示可能影响任意查询
+        self._log: deque = deque()
+        # 版本号不大于该值的变更已不在 _log 中
+        self._log_floor = 0
+        # 需要重建索引的原因（事件丢失或记录过多），None 表示不需要
+        self.rebuild_reason: Optional[str] = None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._added) + len(self._removed) + len(self._removed_dirs)
+
+    def _changed(self, path: Optional[str]):
+        """调用方持有锁。"""
+        self.generation += 1
+        self._log.append((self.generation, path))
+        if len(self._log) > self.max_changes:
+            self._log_floor = self._log.popleft()[0]
+        size = len(self._added) + len(self._removed) + len(self._removed_dirs)
+        if size > self.max_changes and self.rebuild_reason is None:
+            self.rebuild_reason = f"变更记录超过 {self.max_changes} 条"
+
+    def add(self, path: str):
+        """记录新增（或移入）的路径；索引中的同名旧条目随之隐藏。"""
+        now = time.time()
+        with self._lock:
+            self._added[path] = now
+            self._removed[path] = now
+            self._changed(path)
+
+    def remove(self, path: str, is_dir: bool = False):
+        """记录删除（或移出）的路径；目录连同其下所有条目一起隐藏。"""
+        now = time.time()
+        with self._lock:
+            self._added.pop(path, None)
+            if is_dir:
+                self._removed_dirs[path] = now
+                prefix = path.rstrip(os.sep) + os.sep
+                for added in [p for p in self._added if p.startswith(prefix)]:
+                    del self._added[added]
+                # 目录下的任意条目都可能受影响
+                self._changed(None)
+            else:
+                self._removed[path] = now
+                self._changed(path)
+
+    def mark_stale(self, reason: str):
+        """事件丢失时标记为需要重建。"""
+        with self._lock:
+            if self.rebuild_reason is None:
+                self.rebuild_reason = reason
+            self._changed(None)
+
+    def is_removed(self, path: str) -> bool:
+        """索引中的该路径是否已被删除、移走或被新条目替换。"""
+        with self._lock:
+            if path in self._removed:
+                return True
+            if not self._removed_dirs:
+                return False
+            while True:
+                if path in self._removed_dirs:
+                    return True
+                parent = os.path.dirname(path)
+                if parent == path:
+                    return False
+                path = parent
+
+    def added_paths(self) -> List[str]:
+        with self._lock:
+            return list(self._added)
+
+    def discard_before(self, timestamp: float):
+        """丢弃早于 timestamp 的记录（开始重建索引的时间，这些变更已在新索引中）。"""
+        with self._lock:
+            for records in (self._added, self._removed, self._removed_dirs):
+                for path in [p for p, t in records.items() if t < timestamp]:
+                    del records[path]
+            self.rebuild_reason = None
+            self._changed(None)
+
+    def changes_since(self, generation: int) -> Optional[List[str]]:
+        """
+        版本号 generation 之后新增或删除的文件路径。
+
+        Returns:
+            变更的路径；包含目录删除、事件丢失等无法逐个路径判断的变更，
+            或记录已被丢弃时返回 None
+        """
+        with self._lock:
+            if generation < self._log_floor:
+                return None
+            paths = []
+            for changed_at, path in reversed(self._log):
+                if changed_at <= generation:
+                    break
+                if path is None:
+                    return None
+                paths.append(path)
+            return paths
+
+
+def add_tree(overlay: IndexOverlay, path: str, on_directory=None):
+    """
+    记录新出现的目录及其全部内容（移入的目录不会为其内容单独产生事件）。
+
+    Args:
+        on_directory: 每个目录（含 path 本身）的回调，用于添加监视
+    """
+    overlay.add(path)
+    stack = [path]
+    while stack:
+        directory = stack.pop()
+        if on_directory is not None:
+            on_directory(directory)
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    overlay.add(entry.path)
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                    except OSError:
+                        pass
+        except OSError:
+            pass
+
+
+def _load_libc():
+    name = ctypes.util.find_library("c") or "libc.so.6"
+    libc = ctypes.CDLL(name, use_errno=True)
+    libc.inotify_init1.argtypes = [ctypes.c_int]
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    return libc
+
+
+class InotifyWatcher:
+    """基于 inotify 的监视器（Linux）。"""
+
+    def __init__(
+        self,
+        directories: Callable[[], Iterable[str]],
+        overlay: IndexOverlay,
+        excludes: Sequence[str] = (),
+    ):
+        """
+        Args:
+            directories: 返回需要监视的目录（通常为索引中的全部目录）
+            overlay: 变更记录
+            excludes: 不监视的目录
+        """
+        self._directories = directories
+        self.overlay = overlay
+        self.excludes = {os.path.abspath(p) for p in excludes}
+        self._libc = _load_libc()
+        self._fd = -1
+        # 监视描述符 -> 目录
+        self._watches: Dict[int, str] = {}
+        self._watch_limit_reached = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f"inotify_init1 失败: {os.strerror(err)}")
+        self._fd = fd
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    @property
+    def watch_count(self) -> int:
+        return len(self._watches)
+
+    def _add_watch(self, directory: str):
+        if self._watch_limit_reached or directory in self.excludes:
+            return
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+        if wd >= 0:
+            self._watches[wd] = directory
+            return
+        err = ctypes.get_errno()
+        if err == errno.ENOSPC:
+            self._watch_limit_reached = True
+            print(
+                f"inotify 监视数达到上限（已监视 {len(self._watches)} 个目录），"
+                "其余目录的变更要等下次重建索引，可调大 fs.inotify.max_user_watches",
+                file=sys.stderr,
+            )
+
+    def _forget_tree(self, directory: str):
+        """目录被删除或移走：移除其下所有监视（移入的新位置会重新添加）。"""
+        prefix = directory.rstrip(os.sep) + os.sep
+        for wd, path in list(self._watches.items()):
+            if path == directory or path.startswith(prefix):
+                del self._watches[wd]
+                self._libc.inotify_rm_watch(self._fd, wd)
+
+    def _run(self):
+        for directory in self._directories():
+            if self._stop.is_set():
+                return
+            self._add_watch(directory)
+        while not self._stop.is_set():
+            ready, _, _ = select.select([self._fd], [], [], 0.5)
+            if not ready:
+                continue
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                continue
+            except OSError as e:
+                print(f"读取 inotify 事件失败: {e}", file=sys.stderr)
+                self.overlay.mark_stale("inotify 读取失败")
+                return
+            self._handle(data)
+
+    def _handle(self, data: bytes):
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            raw_name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                self.overlay.mark_stale("inotify 事件队列溢出")
+                continue
+            if mask & IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+            directory = self._watches.get(wd)
+            if directory is None or not raw_name:
+                # IN_DELETE_SELF / IN_MOVE_SELF 由父目录的事件处理
+                continue
+            path = os.path.join(directory, os.fsdecode(raw_name))
+            is_dir = bool(mask & IN_ISDIR)
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                if is_dir:
+                    add_tree(self.overlay, path, self._add_watch)
+                else:
+                    self.overlay.add(path)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                if is_dir:
+                    self._forget_tree(path)
+                self.overlay.remove(path, is_dir)
+
+
+class WatchdogWatcher:
+    """基于 watchdog 的监视器（macOS 等非 Linux 系统，需安装 watchdog）。"""
+
+    def __init__(
+        self, roots: Sequence[str], overlay: IndexOverlay, excludes: Sequence[str] = ()
+    ):
+        self.roots = list(roots)
+        self.overlay = overlay
+        self.excludes = tuple(os.path.abspath(p) for p in excludes)
+        self._observer = None
+
+    def _excluded(self, path: str) -> bool:
+        return any(path == p or path.startswith(p + os.sep) for p in self.excludes)
+
+    def start(self):
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+
+        watcher = self
+
+        class Handler(FileSystemEventHandler):
+            def on_created(self, event):
+                watcher._added(os.fsdecode(event.src_path), event.is_directory)
+
+            def on_deleted(self, event):
+                watcher._removed(os.fsdecode(event.src_path), event.is_directory)
+
+            def on_moved(self, event):
+                watcher._removed(os.fsdecode(event.src_path), event.is_directory)
+                watcher._added(os.fsdecode(event.dest_path), event.is_directory)
+
+        self._observer = Observer()
+        for root in self.roots:
+            self._observer.schedule(Handler(), root, recursive=True)
+        self._observer.start()
+
+    def stop(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=5)
+
+    def _added(self, path: str, is_dir: bool):
+        if self._excluded(path):
+            return
+        if is_dir:
+            add_tree(self.overlay, path)
+        else:
+            self.overlay.add(path)
+
+    def _removed(self, path: str, is_dir: bool):
+        if not self._excluded(path):
+            self.overlay.remove(path, is_dir)
+
+
+def create_watcher(
+    roots: Sequence[str],
+    directories: Callable[[], Iterable[str]],
+    overlay: IndexOverlay,
+    excludes: Sequence[str] = (),
+):
+    """
+    按平台选择监视器。
+
+    Returns:
+        未启动的监视器；当前平台不可用时返回 None
+    """
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(directories, overlay, excludes)
+        except (OSError, AttributeError) as e:
+            print(f"inotify 不可用: {e}", file=sys.stderr)
+    try:
+        import watchdog  # noqa: F401
+    except ImportError:
+        print("未安装 watchdog，内置索引不做增量更新", file=sys.stderr)
+        return None
+    return WatchdogWatcher(roots, overlay, excludes)
@@ -0,0 +1,784 @@
+"""内置文件名索引，作为 Linux/macOS 的搜索后端。
+
+不依赖 locate/plocate 和 updatedb：并行的 os.scandir 遍历器把文件名和目录写入
+紧凑的磁盘索引，查询时内存映射索引文件，在进程内完成，不启动子进程。
+
+索引文件布局（小端）：
+- 文件头：魔数、目录数、条目数、三元组数、创建时间，以及各段的 (偏移, 长度)
+- 目录表：dir_offsets (uint64) + dir_blob（完整目录路径）
+- 条目表：按小写文件名排序，name/lname 的 offsets (uint64) + blob（\\0 分隔），
+  parents (uint32) 为所在目录编号
+- 三元组表：小写文件名的 UTF-8 三字节组，tri_keys (uint32，升序) + tri_offsets (uint64)
+  + postings (uint32，条目编号升序)
+
+查询支持 Everything 语法的常用子集：空格分隔的词为 AND，path:<文本> 匹配完整路径，
+含 * / ? 的词按通配符匹配整个文件名，其余为子串匹配。
+"""
+
+import argparse
+import bisect
+import fnmatch
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+import threading
+import time
+from array import array
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+from .index_watcher import DEFAULT_MAX_CHANGES, IndexOverlay, create_watcher
+from .search_interface import SearchProvider, SearchResult
+
+MAGIC = b"MCPIDX01"
+SECTIONS = (
+    "dir_offsets",
+    "dir_blob",
+    "name_offsets",
+    "name_blob",
+    "lname_offsets",
+    "lname_blob",
+    "parents",
+    "tri_keys",
+    "tri_offsets",
+    "postings",
+)
+_HEADER = struct.Struct("<8sQQQd" + "QQ" * len(SECTIONS))
+
+# 遍历 / 时默认跳过的伪文件系统
+DEFAULT_EXCLUDES = ("/proc", "/sys", "/dev", "/run")
+
+# 查询词：path:"带空格的路径"、"带空格的词" 或普通词
+_TOKEN_PATTERN = re.compile(r'(?:[^\s"]*"[^"]*")+[^\s"]*|\S+')
+# 通配符中不是字面字符的部分：* ?、[...] 字符类（含 []..] 和 [!]..]），以及未闭合的 [ 之后
+_GLOB_SPECIAL = re.compile(r"[*?]|\[!?\]?[^\]]*\]|\[.*", re.S)
+
+# 目录路径缓存的最大条目数
+DIR_CACHE_SIZE = 65536
+
+
+def _trigrams(data: bytes) -> set:
+    return {
+        (data[i] << 16) | (data[i + 1] << 8) | data[i + 2] for i in range(len(data) - 2)
+    }
+
+
+def _u64(values) -> bytes:
+    return array("Q", values).tobytes()
+
+
+def _u32(values) -> bytes:
+    return array("I", values).tobytes()
+
+
+def scan_tree(
+    roots: Sequence[str], workers: int = 8, excludes: Sequence[str] = ()
+) -> Tuple[List[bytes], List[Tuple[bytes, int]]]:
+    """
+    并行遍历目录树。
+
+    Args:
+        roots: 根目录列表
+        workers: 并发遍历线程数（os.scandir 期间释放 GIL）
+        excludes: 跳过的目录
+
+    Returns:
+        (目录路径列表, [(文件名, 目录编号)]) ，名称均为 bytes 以保留无法解码的文件名
+    """
+    excluded = {os.fsencode(os.path.abspath(p)) for p in excludes}
+    dirs: List[bytes] = []
+    entries: List[Tuple[bytes, int]] = []
+
+    def scan(dir_id: int, path: bytes):
+        names, subdirs = [], []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    names.append(entry.name)
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                    except OSError:
+                        pass
+        except OSError:
+            pass
+        return dir_id, names, subdirs
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        pending = set()
+        for root in roots:
+            root_bytes = os.fsencode(os.path.abspath(root))
+            dirs.append(root_bytes)
+            pending.add(executor.submit(scan, len(dirs) - 1, root_bytes))
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                dir_id, names, subdirs = future.result()
+                entries.extend((name, dir_id) for name in names)
+                for subdir in subdirs:
+                    if subdir in excluded:
+                        continue
+                    dirs.append(subdir)
+                    pending.add(executor.submit(scan, len(dirs) - 1, subdir))
+    return dirs, entries
+
+
+def build_index(
+    roots: Sequence[str],
+    index_path: str,
+    workers: int = 8,
+    excludes: Optional[Sequence[str]] = None,
+) -> int:
+    """
+    遍历目录树并写入索引文件（先写临时文件再原子替换）。
+
+    Returns:
+        索引的条目数
+    """
+    if excludes is None:
+        excludes = DEFAULT_EXCLUDES
+    dirs, entries = scan_tree(roots, workers, excludes)
+
+    lowered = [
+        (os.fsdecode(name).lower().encode("utf-8", "surrogateescape"), name, parent)
+        for name, parent in entries
+    ]
+    lowered.sort(key=lambda item: item[0])
+
+    dir_offsets, name_offsets, lname_offsets = [0], [0], [0]
+    for path in dirs:
+        dir_offsets.append(dir_offsets[-1] + len(path))
+    parents = array("I")
+    postings_by_key = {}
+    for entry_id, (lname, name, parent) in enumerate(lowered):
+        name_offsets.append(name_offsets[-1] + len(name) + 1)
+        lname_offsets.append(lname_offsets[-1] + len(lname) + 1)
+        parents.append(parent)
+        for key in _trigrams(lname):
+            postings = postings_by_key.get(key)
+            if postings is None:
+                postings = postings_by_key[key] = array("I")
+            postings.append(entry_id)
+
+    tri_keys = sorted(postings_by_key)
+    tri_offsets = [0]
+    postings = array("I")
+    for key in tri_keys:
+        postings.extend(postings_by_key[key])
+        tri_offsets.append(len(postings))
+
+    sections = {
+        "dir_offsets": _u64(dir_offsets),
+        "dir_blob": b"".join(dirs),
+        "name_offsets": _u64(name_offsets),
+        "name_blob": b"".join(name + b"\0" for _, name, _ in lowered),
+        "lname_offsets": _u64(lname_offsets),
+        "lname_blob": b"".join(lname + b"\0" for lname, _, _ in lowered),
+        "parents": parents.tobytes(),
+        "tri_keys": _u32(tri_keys),
+        "tri_offsets": _u64(tri_offsets),
+        "postings": postings.tobytes(),
+    }
+
+    index_dir = os.path.dirname(os.path.abspath(index_path))
+    os.makedirs(index_dir, exist_ok=True)
+    layout = []
+    offset = _HEADER.size
+    for name in SECTIONS:
+        # 各段按 8 字节对齐
+        offset = (offset + 7) & ~7
+        layout.extend([offset, len(sections[name])])
+        offset += len(sections[name])
+    # 临时文件名每次唯一，同时进行的多次建立（如多个进程）不会写入同一个文件
+    fd, tmp_path = tempfile.mkstemp(
+        prefix=os.path.basename(index_path) + ".", suffix=".tmp", dir=index_dir
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(
+                _HEADER.pack(
+                    MAGIC, len(dirs), len(lowered), len(tri_keys), time.time(), *layout
+                )
+            )
+            for i, name in enumerate(SECTIONS):
+                f.write(b"\0" * (layout[2 * i] - f.tell()))
+                f.write(sections[name])
+        os.replace(tmp_path, index_path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    return len(lowered)
+
+
+class _Term:
+    """单个查询词。"""
+
+    def __init__(self, text: str, on_path: bool, match_case: bool, whole_word: bool):
+        self.on_path = on_path
+        self.text = text if match_case else text.lower()
+        self.wildcard = "*" in text or "?" in text
+        self.regex = None
+        if self.wildcard:
+            self.regex = re.compile(fnmatch.translate(self.text), re.S)
+        elif whole_word:
+            self.regex = re.compile(r"(?<!\w)" + re.escape(self.text) + r"(?!\w)")
+
+    def literal(self) -> str:
+        """可用于三元组筛选的最长字面片段。"""
+        if not self.wildcard:
+            return self.text
+        # 字符类只匹配其中一个字符，其内容不能作为字面片段
+        return max(_GLOB_SPECIAL.split(self.text), key=len)
+
+    def matches(self, value: str) -> bool:
+        if self.regex is not None:
+            if self.wildcard:
+                return self.regex.match(value) is not None
+            return self.regex.search(value) is not None
+        return self.text in value
+
+
+class NativeIndex:
+    """
+    只读的内存映射索引。
+
+    提供者切换到重建后的索引时调用 retire()，旧索引在进行中的查询
+    （acquire / release 之间）全部结束后关闭，释放映射、文件描述符和文件名副本。
+    """
+
+    def __init__(self, index_path: str):
+        self.index_path = index_path
+        self._users = 0
+        self._retired = False
+        self._users_lock = threading.Lock()
+        self._file = open(index_path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        header = _HEADER.unpack_from(self._mmap, 0)
+        if header[0] != MAGIC:
+            self.close()
+            raise ValueError(f"不是有效的索引文件: {index_path}")
+        self.dir_count, self.entry_count, self.trigram_count = header[1:4]
+        self.created_at = header[4]
+        view = memoryview(self._mmap)
+        layout = header[5:]
+        sections = {}
+        for i, name in enumerate(SECTIONS):
+            offset, length = layout[2 * i], layout[2 * i + 1]
+            sections[name] = view[offset : offset + length]
+        self._dir_offsets = sections["dir_offsets"].cast("Q")
+        self._dir_blob = sections["dir_blob"]
+        self._name_offsets = sections["name_offsets"].cast("Q")
+        self._name_blob = sections["name_blob"]
+        self._lname_offsets = sections["lname_offsets"].cast("Q")
+        # 小写文件名整体复制一份，子串扫描使用 bytes.find
+        self._lname_blob = sections["lname_blob"].tobytes()
+        self._parents = sections["parents"].cast("I")
+        self._tri_keys = sections["tri_keys"].cast("I")
+        self._tri_offsets = sections["tri_offsets"].cast("Q")
+        self._postings = sections["postings"].cast("I")
+        self._dir_cache = {}
+
+    def acquire(self):
+        """开始使用索引（调用方随后必须调用 release）。"""
+        with self._users_lock:
+            self._users += 1
+
+    def release(self):
+        with self._users_lock:
+            self._users -= 1
+            close = self._retired and self._users == 0
+        if close:
+            self.close()
+
+    def retire(self):
+        """索引已被替换：没有进行中的查询时立即关闭，否则在最后一个查询结束时关闭。"""
+        with self._users_lock:
+            self._retired = True
+            close = self._users == 0
+        if close:
+            self.close()
+
+    @property
+    def closed(self) -> bool:
+        return self._mmap.closed
+
+    def close(self):
+        self._dir_cache = {}
+        self._lname_blob = b""
+        for name in list(vars(self)):
+            if name.startswith("_") and isinstance(getattr(self, name), memoryview):
+                getattr(self, name).release()
+        if getattr(self, "_mmap", None) is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass
+        self._file.close()
+
+    def __len__(self) -> int:
+        return self.entry_count
+
+    def name(self, entry_id: int) -> str:
+        start = self._name_offsets[entry_id]
+        end = self._name_offsets[entry_id + 1] - 1
+        return os.fsdecode(bytes(self._name_blob[start:end]))
+
+    def lname(self, entry_id: int) -> str:
+        start = self._lname_offsets[entry_id]
+        end = self._lname_offsets[entry_id + 1] - 1
+        return self._lname_blob[start:end].decode("utf-8", "surrogateescape")
+
+    def directory(self, dir_id: int) -> str:
+        path = self._dir_cache.get(dir_id)
+        if path is None:
+            start, end = self._dir_offsets[dir_id], self._dir_offsets[dir_id + 1]
+            path = os.fsdecode(bytes(self._dir_blob[start:end]))
+            if len(self._dir_cache) >= DIR_CACHE_SIZE:
+                self._dir_cache = {}
+            self._dir_cache[dir_id] = path
+        return path
+
+    def path(self, entry_id: int) -> str:
+        return os.path.join(
+            self.directory(self._parents[entry_id]), self.name(entry_id)
+        )
+
+    def _postings_for(self, key: int) -> memoryview:
+        i = bisect.bisect_left(self._tri_keys, key)
+        if i == len(self._tri_keys) or self._tri_keys[i] != key:
+            return self._postings[0:0]
+        return self._postings[self._tri_offsets[i] : self._tri_offsets[i + 1]]
+
+    def trigram_candidates(self, literal: str) -> List[int]:
+        """包含该小写字面片段全部三元组的条目编号（升序）。"""
+        keys = _trigrams(literal.encode("utf-8", "surrogateescape"))
+        lists = sorted((self._postings_for(key) for key in keys), key=len)
+        if not lists:
+            return []
+        candidates = set(lists[0])
+        for postings in lists[1:]:
+            if not candidates:
+                break
+            candidates.intersection_update(postings)
+        return sorted(candidates)
+
+    def substring_candidates(self, literal: str) -> Iterator[int]:
+        """在小写文件名中直接查找子串（短于三个字节的片段使用）。"""
+        needle = literal.encode("utf-8", "surrogateescape")
+        blob, offsets = self._lname_blob, self._lname_offsets
+        position = blob.find(needle)
+        while position != -1:
+            entry_id = bisect.bisect_right(offsets, position) - 1
+            yield entry_id
+            position = blob.find(needle, offsets[entry_id + 1])
+
+    def search(
+        self,
+        query: str,
+        max_results: int = 100,
+        match_path: bool = False,
+        match_case: bool = False,
+        match_whole_word: bool = False,
+        match_regex: bool = False,
+        overlay=None,
+        offset: int = 0,
+    ) -> List[str]:
+        """
+        执行查询，返回第 offset 个起的最多 max_results 个匹配路径（按文件名排序）。
+
+        overlay 为 index_watcher.IndexOverlay 时，排除建索引后已删除的路径，
+        并在末尾追加之后新增的匹配路径。
+        """
+        matches = self.iter_search(
+            query, match_path, match_case, match_whole_word, match_regex, overlay
+        )
+        return list(islice(matches, offset, offset + max_results))
+
+    def iter_search(
+        self,
+        query: str,
+        match_path: bool = False,
+        match_case: bool = False,
+        match_whole_word: bool = False,
+        match_regex: bool = False,
+        overlay=None,
+    ) -> Iterator[str]:
+        """逐个产生匹配的完整路径，不在内存中保留结果。"""
+        if match_regex:
+            pattern = re.compile(query, 0 if match_case else re.I)
+            value = (lambda p: p) if match_path else os.path.basename
+            yield from self._iter_matches(
+                range(self.entry_count),
+                lambda e: pattern.search(self.path(e) if match_path else self.name(e)),
+                overlay,
+                lambda p: pattern.search(value(p)) is not None,
+            )
+            return
+
+        terms = _parse_terms(query, match_path, match_case, match_whole_word)
+        if not terms:
+            return
+
+        # 选择最长的文件名字面片段筛选候选条目
+        name_literals = [t.literal().lower() for t in terms if not t.on_path]
+        literal = max(name_literals, key=len, default="")
+        if len(literal.encode("utf-8", "surrogateescape")) >= 3:
+            candidates = self.trigram_candidates(literal)
+        elif literal:
+            candidates = self.substring_candidates(literal)
+        else:
+            candidates = range(self.entry_count)
+
+        def matches(entry_id: int) -> bool:
+            name = self.name(entry_id) if match_case else self.lname(entry_id)
+            full_path = None
+            for term in terms:
+                if term.on_path:
+                    if full_path is None:
+                        full_path = self.path(entry_id)
+                        if not match_case:
+                            full_path = full_path.lower()
+                    value = full_path
+                else:
+                    value = name
+                if not term.matches(value):
+                    return False
+            return True
+
+        yield from self._iter_matches(
+            candidates,
+            matches,
+            overlay,
+            lambda p: _terms_match_path(terms, p, match_case),
+        )
+
+    def _iter_matches(
+        self, candidates, predicate, overlay, overlay_predicate
+    ) -> Iterator[str]:
+        """索引中的匹配（排除已删除的），之后是建索引后新增的匹配。"""
+        removed = overlay.is_removed if overlay is not None else None
+        for entry_id in candidates:
+            if predicate(entry_id):
+                path = self.path(entry_id)
+                if removed is None or not removed(path):
+                    yield path
+        if overlay is None:
+            return
+        # 新增路径会同时隐藏索引中的同名条目，不会重复
+        for path in overlay.added_paths():
+            if overlay_predicate(path):
+                yield path
+
+
+def _parse_terms(
+    query: str, match_path: bool, match_case: bool, match_whole_word: bool
+) -> List[_Term]:
+    """把查询拆成 AND 关系的查询词。"""
+    terms = []
+    for token in _TOKEN_PATTERN.findall(query):
+        on_path = match_path
+        if token.lower().startswith("path:"):
+            token, on_path = token[5:], True
+        token = token.replace('"', "")
+        if token:
+            terms.append(_Term(token, on_path, match_case, match_whole_word))
+    return terms
+
+
+def _terms_match_path(terms: List[_Term], path: str, match_case: bool) -> bool:
+    """对不在索引中的完整路径判断是否匹配全部查询词。"""
+    if not match_case:
+        path = path.lower()
+    name = os.path.basename(path)
+    return all(term.matches(path if term.on_path else name) for term in terms)
+
+
+def default_index_path() -> str:
+    cache_dir = os.getenv("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(cache_dir, "mcp-everything-search", "index.bin")
+
+
+class NativeIndexSearchProvider(SearchProvider):
+    """使用内置索引的搜索实现（Linux/macOS）。"""
+
+    def __init__(
+        self,
+        index_path: Optional[str] = None,
+        roots: Optional[Sequence[str]] = None,
+        max_age_seconds: Optional[float] = None,
+        workers: Optional[int] = None,
+        watch: Optional[bool] = None,
+    ):
+        """
+        参数未提供时读取环境变量：
+        EVERYTHING_NATIVE_INDEX（索引文件）、EVERYTHING_NATIVE_INDEX_ROOTS（根目录，
+        os.pathsep 分隔，默认 /）、EVERYTHING_NATIVE_INDEX_MAX_AGE（秒，超过后在后台重建，
+        默认 86400，0 表示不自动重建）、EVERYTHING_NATIVE_INDEX_WORKERS（遍历线程数）、
+        EVERYTHING_NATIVE_INDEX_WATCH（1 表示监视文件变更并增量更新，默认关闭）、
+        EVERYTHING_NATIVE_INDEX_WATCH_MAX_CHANGES（变更记录上限，超过后在后台重建）。
+        """
+        self.index_path = index_path or os.getenv(
+            "EVERYTHING_NATIVE_INDEX", default_index_path()
+        )
+        if roots is None:
+            roots = os.getenv("EVERYTHING_NATIVE_INDEX_ROOTS", os.sep).split(os.pathsep)
+        self.roots = [root for root in roots if root]
+        if max_age_seconds is None:
+            max_age_seconds = float(os.getenv("EVERYTHING_NATIVE_INDEX_MAX_AGE", 86400))
+        self.max_age_seconds = max_age_seconds
+        self.workers = workers or int(os.getenv("EVERYTHING_NATIVE_INDEX_WORKERS", 8))
+        # 重建索引后搜索缓存随之失效
+        self.index_db_paths = (self.index_path,)
+        self._index: Optional[NativeIndex] = None
+        self._lock = threading.Lock()
+        # 串行化索引建立：首次使用的并发查询和后台重建只会遍历一次目录树
+        self._build_lock = threading.Lock()
+        self._rebuilding = False
+        if watch is None:
+            watch = os.getenv("EVERYTHING_NATIVE_INDEX_WATCH", "").lower() in (
+                "1",
+                "true",
+                "yes",
+            )
+        self._overlay: Optional[IndexOverlay] = None
+        if watch:
+            self._overlay = IndexOverlay(
+                int(
+                    os.getenv(
+                        "EVERYTHING_NATIVE_INDEX_WATCH_MAX_CHANGES",
+                        DEFAULT_MAX_CHANGES,
+                    )
+                )
+            )
+        self._watcher = None
+
+    @property
+    def index_generation(self) -> int:
+        """增量变更的版本号，搜索缓存据此调用 changes_affect 判断条目是否仍有效。"""
+        return self._overlay.generation if self._overlay is not None else 0
+
+    def changes_affect(
+        self,
+        generation: int,
+        query: str,
+        match_path: bool = False,
+        match_case: bool = False,
+        match_whole_word: bool = False,
+        match_regex: bool = False,
+    ) -> bool:
+        """
+        版本号 generation 之后的增量变更是否可能改变该查询的结果。
+
+        查询结果只取决于匹配的路径，新增或删除的路径都不匹配时结果不变，
+        /tmp、/var/log 下无关的写入不会使缓存的查询失效。
+        """
+        overlay = self._overlay
+        if overlay is None:
+            return False
+        paths = overlay.changes_since(generation)
+        if paths is None:
+            return True
+        if not paths:
+            return False
+        if match_regex:
+            pattern = re.compile(query, 0 if match_case else re.I)
+            return any(
+                pattern.search(path if match_path else os.path.basename(path))
+                for path in paths
+            )
+        terms = _parse_terms(query, match_path, match_case, match_whole_word)
+        return any(_terms_match_path(terms, path, match_case) for path in paths)
+
+    def rebuild(self) -> int:
+        """重建索引并切换到新索引，返回条目数。"""
+        with self._build_lock:
+            return self._rebuild_locked()
+
+    def _rebuild_locked(self) -> int:
+        """重建索引（调用方持有 _build_lock）。"""
+        started_at = time.time()
+        count = build_index(self.roots, self.index_path, self.workers)
+        new_index = NativeIndex(self.index_path)
+        with self._lock:
+            old_index, self._index = self._index, new_index
+        if old_index is not None:
+            old_index.retire()
+        if self._overlay is not None:
+            # 遍历开始前的变更已反映在新索引中
+            self._overlay.discard_before(started_at)
+        return count
+
+    def _index_directories(self) -> Iterator[str]:
+        """当前索引中的全部目录（遍历期间索引被替换也不会关闭）。"""
+        index = self._acquire_index()
+        try:
+            for dir_id in range(index.dir_count):
+                yield index.directory(dir_id)
+        finally:
+            index.release()
+
+    def _start_watcher(self):
+        """按索引中的目录开始监视（只启动一次，重建后新目录由事件动态加入）。"""
+        with self._lock:
+            if self._watcher is not None or self._overlay is None:
+                return
+            self._watcher = create_watcher(
+                self.roots,
+                self._index_directories,
+                self._overlay,
+                DEFAULT_EXCLUDES,
+            )
+            if self._watcher is None:
+                self._overlay = None
+                return
+        try:
+            self._watcher.start()
+        except Exception as e:
+            print(f"启动文件变更监视失败: {e}", file=sys.stderr)
+            self._watcher = None
+            self._overlay = None
+
+    def stop_watching(self):
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+
+    def _rebuild_in_background(self):
+        def run():
+            try:
+                self.rebuild()
+            except Exception as e:
+                print(f"重建内置索引失败: {e}", file=sys.stderr)
+            finally:
+                with self._lock:
+                    self._rebuilding = False
+
+        # 检查和设置标志在同一个锁内，并发调用只启动一个重建线程
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+        threading.Thread(target=run, daemon=True).start()
+
+    def _acquire_index(self) -> NativeIndex:
+        """取得当前索引并标记为使用中，用完后调用 release()。"""
+        self._get_index()
+        with self._lock:
+            index = self._index
+            index.acquire()
+        return index
+
+    def _get_index(self) -> NativeIndex:
+        with self._lock:
+            index = self._index
+        if index is None:
+            with self._build_lock:
+                # 等待锁期间其他线程可能已建立或加载索引
+                with self._lock:
+                    index = self._index
+                if index is None:
+                    if not os.path.exists(self.index_path):
+                        print(
+                            f"首次使用，正在建立内置索引: {self.roots}", file=sys.stderr
+                        )
+                        self._rebuild_locked()
+                    else:
+                        loaded = NativeIndex(self.index_path)
+                        with self._lock:
+                            self._index = loaded
+                    with self._lock:
+                        index = self._index
+        if self._overlay is not None and self._watcher is None:
+            self._start_watcher()
+        if self._rebuilding:
+            return index
+        if (
+            self.max_age_seconds
+            and time.time() - index.created_at > self.max_age_seconds
+        ):
+            self._rebuild_in_background()
+        elif self._overlay is not None and self._overlay.rebuild_reason:
+            print(
+                f"内置索引需要重建（{self._overlay.rebuild_reason}）", file=sys.stderr
+            )
+            self._rebuild_in_background()
+        return index
+
+    def iter_all_files(self) -> Iterator[Tuple[str, str]]:
+        index = self._acquire_index()
+        overlay = self._overlay
+        removed = overlay.is_removed if overlay is not None else None
+        try:
+            for entry_id in range(index.entry_count):
+                path = index.path(entry_id)
+                if removed is None or not removed(path):
+                    yield os.path.basename(path), path
+        finally:
+            index.release()
+        if overlay is not None:
+            for path in overlay.added_paths():
+                yield os.path.basename(path), path
+
+    def search_files(
+        self,
+        query: str,
+        max_results: int = 100,
+        match_path: bool = False,
+        match_case: bool = False,
+        match_whole_word: bool = False,
+        match_regex: bool = False,
+        sort_by: Optional[int] = None,
+        fields: Optional[Sequence[str]] = None,
+        offset: int = 0,
+    ) -> List[SearchResult]:
+        index = self._acquire_index()
+        try:
+            paths = index.search(
+                query,
+                max_results=max_results,
+                match_path=match_path,
+                match_case=match_case,
+                match_whole_word=match_whole_word,
+                match_regex=match_regex,
+                overlay=self._overlay,
+                offset=offset,
+            )
+        finally:
+            index.release()
+        return [self._convert_path_to_result(path) for path in paths]
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    """命令行：建立索引或查询。"""
+    parser = argparse.ArgumentParser(description="内置文件名索引")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build", help="建立索引")
+    build_parser.add_argument("roots", nargs="+")
+    build_parser.add_argument("--index", default=default_index_path())
+    build_parser.add_argument("--workers", type=int, default=8)
+    query_parser = subparsers.add_parser("query", help="查询索引")
+    query_parser.add_argument("query")
+    query_parser.add_argument("--index", default=default_index_path())
+    query_parser.add_argument("--max-results", type=int, default=100)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        start = time.perf_counter()
+        count = build_index(args.roots, args.index, args.workers)
+        print(f"已索引 {count} 个条目，耗时 {time.perf_counter() - start:.2f}s")
+    else:
+        index = NativeIndex(args.index)
+        for path in index.search(args.query, max_results=args.max_results):
+            print(path)
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
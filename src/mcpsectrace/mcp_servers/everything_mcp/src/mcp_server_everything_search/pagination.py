@@ -0,0 +1,41 @@
+"""search 工具的分页游标。
+
+单次搜索最多返回 1000 条结果。结果数达到页大小时，工具在输出末尾附带游标，
+把游标连同相同的查询参数再次调用即可取下一页。游标只记录偏移量和查询参数的摘要，
+服务器不保存任何状态；查询参数与游标不符时拒绝，避免用错游标静默跳过结果。
+"""
+
+import base64
+import hashlib
+import json
+from typing import Any, Dict
+
+
+def query_signature(params: Dict[str, Any]) -> str:
+    """查询参数（不含游标）的摘要。"""
+    payload = json.dumps(params, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def encode_cursor(signature: str, offset: int) -> str:
+    """生成指向第 offset 条结果的游标。"""
+    payload = json.dumps({"s": signature, "o": offset}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("ascii")).decode("ascii")
+
+
+def decode_cursor(cursor: str, signature: str) -> int:
+    """
+    解析游标，返回偏移量。
+
+    Raises:
+        ValueError: 游标格式无效，或不属于当前查询
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        offset = int(payload["o"])
+        cursor_signature = payload["s"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"无效的分页游标: {cursor}") from e
+    if cursor_signature != signature or offset < 0:
+        raise ValueError("分页游标与当前查询参数不匹配，请使用相同的查询参数")
+    return offset
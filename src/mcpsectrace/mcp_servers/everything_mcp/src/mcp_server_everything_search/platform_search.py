@@ -2,7 +2,7 @@
 
 import platform
 from enum import Enum
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Literal, Optional
 
 from pydantic import BaseModel, Field
 
@@ -19,6 +19,37 @@ class BaseSearchQuery(BaseModel):
         le=1000,
         description="Maximum number of results to return (1-1000)",
     )
+    fields: Optional[List[str]] = Field(
+        default=None,
+        description=(
+            "Result fields to return (path and filename are always included): "
+            "extension, size, created, modified, accessed, attributes, run_count, "
+            "highlighted_filename, highlighted_path. Omit to return all fields; "
+            "requesting fewer fields makes large searches faster."
+        ),
+    )
+    cursor: Optional[str] = Field(
+        default=None,
+        description=(
+            "Pagination cursor from the previous page's output. Repeat the same "
+            "query parameters with the cursor to fetch the next page."
+        ),
+    )
+    output_format: Literal["text", "json", "ndjson"] = Field(
+        default="text",
+        description=(
+            "Output format: text, compact json, or ndjson (summary first, "
+            "stable field names)."
+        ),
+    )
+    output_file: Optional[str] = Field(
+        default=None,
+        description=(
+            "Write the full results to this file inside the output directory "
+            "(EVERYTHING_OUTPUT_DIR) and return only a summary and the file "
+            "path. Existing files are never overwritten."
+        ),
+    )
 
 
 class MacSpecificParams(BaseModel):
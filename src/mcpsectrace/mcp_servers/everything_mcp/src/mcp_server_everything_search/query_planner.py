@@ -0,0 +1,355 @@
+"""释放文件分层检查的批量查询规划。
+
+逐行检查时每个 CSV 行最多需要四次搜索（预期目录、上一层、上两层、全局）。
+规划器按层处理所有未命中的行：对文件名和目录去重，把同一层的多个 (目录, 文件名)
+组合成 OR 查询批量发送，再在内存中把结果分配回各行，分层结论与逐行检查一致。
+
+批量查询的结果数达到上限时可能被截断，此时把该批拆成两半重新查询，
+直到单个 (目录, 文件名) 为止，保证不会因截断漏报。
+
+全局层待查的文件名较多时，改为对全部文件做一次批量文件名扫描（见 bulk_matcher）。
+
+指定 dir_precheck 时，先在本地判断各层目录是否存在（见 dir_precheck），
+目录不存在的层不发送查询。
+
+同一层的各批查询互不依赖，在允许并发查询的提供者（locate、mdfind、内置索引）上
+由线程池并行发送；Everything 只能同时执行一个查询，按顺序发送。
+"""
+
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .bulk_matcher import sweep_filenames
+from .dir_precheck import DirectoryPrecheck
+from .search_interface import SearchProvider, SearchResult
+
+# 分层检查：(层级, 状态, 结论模板)，第3层为全局搜索
+LEVELS = [
+    (0, "文件存在", "在预期目录 {} 中找到"),
+    (1, "上一层目录存在", "在上一层目录 {} 中找到"),
+    (2, "上两层目录存在", "在上两层目录 {} 中找到"),
+]
+GLOBAL_STATUS = "全局范围存在"
+
+# 不支持 OR 查询的提供者，全局层待查文件名达到该数量时改为批量扫描
+DEFAULT_SWEEP_THRESHOLD = 100
+# 同一层并行发送的查询数
+DEFAULT_QUERY_WORKERS = 4
+
+# Everything 查询中需要加引号的字符
+_QUOTE_CHARS = set(' |<>!"')
+
+
+@dataclass
+class ReleaseFileCheck:
+    """单个释放文件的检查结果。"""
+
+    file_name: str
+    file_path: str
+    status: Optional[str] = None
+    check_result: Optional[str] = None
+    # 找到时的层级（0-3），未找到为 None
+    level: Optional[int] = None
+    # 命中的文件路径（供哈希校验）
+    paths: List[str] = field(default_factory=list)
+
+
+@dataclass
+class QueryStats:
+    """查询次数统计。"""
+
+    # 实际发送的查询数
+    queries: int = 0
+    # 结果达到上限后拆分重查的次数
+    splits: int = 0
+    # 失败的查询数
+    failures: int = 0
+    # 逐行检查需要的查询数（用于对比）
+    row_by_row_queries: int = 0
+    # 各层实际发送的查询数
+    queries_by_level: Dict[str, int] = field(default_factory=dict)
+    # 全局层批量扫描遍历的文件数，未扫描为 None
+    swept_files: Optional[int] = None
+    # 因目录不存在跳过的 (行, 层) 数
+    skipped_levels: int = 0
+
+    def format_summary(self) -> str:
+        """生成单行的查询统计。"""
+        levels = ", ".join(f"{k}={v}" for k, v in self.queries_by_level.items())
+        summary = (
+            f"批量查询 {self.queries} 次（逐行检查需 {self.row_by_row_queries} 次）"
+        )
+        if levels:
+            summary += f"，按层: {levels}"
+        if self.splits:
+            summary += f"，结果截断拆分 {self.splits} 次"
+        if self.skipped_levels:
+            summary += f"，目录不存在跳过 {self.skipped_levels} 次"
+        if self.swept_files is not None:
+            summary += f"，全局层批量扫描 {self.swept_files} 个文件"
+        if self.failures:
+            summary += f"，失败 {self.failures} 次"
+        return summary
+
+
+def _quote(term: str) -> str:
+    """必要时为 Everything 查询词加引号。"""
+    if any(c in _QUOTE_CHARS for c in term):
+        return '"' + term.replace('"', "") + '"'
+    return term
+
+
+def _normalize(text: str) -> str:
+    """统一大小写和路径分隔符，用于在内存中比较。"""
+    return text.lower().replace("/", "\\")
+
+
+def _ancestor_dir(file_path: str, level: int) -> str:
+    """文件所在目录向上 level 层的目录。"""
+    directory = Path(file_path).parent
+    for _ in range(level):
+        directory = directory.parent
+    return str(directory)
+
+
+def _in_directory(directory: str, path: str) -> bool:
+    """path 是否位于 directory 之下（按目录边界比较，/x/a 不匹配 /x/ab/...）。"""
+    prefix = _normalize(directory).rstrip("\\") + "\\"
+    return _normalize(path).startswith(prefix)
+
+
+def _name_matches(file_name: str, result: SearchResult) -> bool:
+    """与逐行检查相同的文件名判定：结果文件名包含预期文件名（不区分大小写）。"""
+    return file_name.lower() in (result.filename or "").lower()
+
+
+class ReleaseFileQueryPlanner:
+    """释放文件分层检查的批量查询规划器。"""
+
+    def __init__(
+        self,
+        search_provider: SearchProvider,
+        max_search_depth: int = 2,
+        batch_size: int = 50,
+        max_results: int = 1000,
+        sweep_threshold: Optional[int] = None,
+        workers: Optional[int] = None,
+        dir_precheck: Optional[DirectoryPrecheck] = None,
+    ):
+        """
+        Args:
+            search_provider: 搜索提供者
+            max_search_depth: 最大向上检查目录层数
+            batch_size: 每个 OR 查询包含的 (目录, 文件名) 组合数
+            max_results: 批量查询的最大结果数，达到该值时拆分重查
+            sweep_threshold: 全局层待查文件名达到该数量时改为批量扫描，0 表示不扫描；
+                None 时读取环境变量 EVERYTHING_BULK_SWEEP_THRESHOLD，默认对不支持
+                OR 查询的提供者为 100，对 Everything 不扫描（OR 批量查询已足够快）
+            workers: 同一层并行发送的查询数，None 时读取环境变量
+                EVERYTHING_QUERY_WORKERS；不超过提供者的 max_concurrency
+            dir_precheck: 目录存在性预检查，None 表示不检查、每层都查询
+        """
+        self.search_provider = search_provider
+        self.max_search_depth = max_search_depth
+        self.batch_size = max(1, batch_size)
+        self.max_results = max_results
+        # 不支持 OR 语法的提供者（locate/mdfind）只做去重，不合并查询
+        supports_boolean = getattr(search_provider, "supports_boolean_query", False)
+        if not supports_boolean:
+            self.batch_size = 1
+        if sweep_threshold is None:
+            default = 0 if supports_boolean else DEFAULT_SWEEP_THRESHOLD
+            sweep_threshold = int(os.getenv("EVERYTHING_BULK_SWEEP_THRESHOLD", default))
+        self.sweep_threshold = sweep_threshold
+        if workers is None:
+            workers = int(os.getenv("EVERYTHING_QUERY_WORKERS", DEFAULT_QUERY_WORKERS))
+        max_concurrency = getattr(search_provider, "max_concurrency", None)
+        if max_concurrency:
+            workers = min(workers, max_concurrency)
+        self.workers = max(1, workers)
+        self.dir_precheck = dir_precheck
+        self.stats = QueryStats()
+        self._stats_lock = threading.Lock()
+
+    def resolve(self, rows: List[Tuple[str, str]]) -> List[ReleaseFileCheck]:
+        """
+        按层检查所有释放文件。
+
+        Args:
+            rows: (文件名, 预期路径) 列表
+
+        Returns:
+            与 rows 顺序一致的检查结果
+        """
+        checks = [ReleaseFileCheck(name, path) for name, path in rows]
+        max_level = min(self.max_search_depth, len(LEVELS) - 1)
+
+        for level, status, template in LEVELS:
+            if level > self.max_search_depth:
+                break
+            pending = [c for c in checks if c.status is None]
+            if not pending:
+                break
+            by_key: Dict[Tuple[str, str], List[ReleaseFileCheck]] = {}
+            for check in pending:
+                if self.dir_precheck is None:
+                    directory = _ancestor_dir(check.file_path, level)
+                else:
+                    directory = self.dir_precheck.ancestors(check.file_path, max_level)[
+                        level
+                    ]
+                    if directory is None:
+                        self.stats.skipped_levels += 1
+                        continue
+                by_key.setdefault((directory, check.file_name), []).append(check)
+
+            found = self._run_level(f"第{level}层", list(by_key), scoped=True)
+            for (directory, file_name), key_checks in by_key.items():
+                if (directory, file_name) in found:
+                    for check in key_checks:
+                        check.status = status
+                        check.check_result = template.format(directory)
+                        check.level = level
+                        check.paths = found[(directory, file_name)]
+
+        pending = [c for c in checks if c.status is None]
+        if pending:
+            names = list(dict.fromkeys(c.file_name for c in pending))
+            if self.sweep_threshold and len(names) >= self.sweep_threshold:
+                found = self._sweep(names)
+            else:
+                found = self._run_level("第3层", [("", name) for name in names], False)
+            for check in pending:
+                paths = found.get(("", check.file_name))
+                if paths:
+                    check.status = GLOBAL_STATUS
+                    check.check_result = f"在全局范围内找到: {', '.join(paths[:3])}"
+                    check.level = 3
+                    check.paths = paths
+
+        self.stats.row_by_row_queries = sum(
+            self._row_by_row_count(check) for check in checks
+        )
+        return checks
+
+    def _sweep(self, names: List[str]) -> Dict[Tuple[str, str], List[str]]:
+        """全局层：对全部文件做一次批量文件名扫描，失败时退回逐个查询。"""
+        try:
+            hits, sweep_stats = sweep_filenames(
+                self.search_provider.iter_all_files(), names
+            )
+        except Exception as e:
+            print(f"批量文件名扫描失败，改为逐个查询: {e}", file=sys.stderr)
+            return self._run_level("第3层", [("", name) for name in names], False)
+        self.stats.swept_files = sweep_stats.scanned
+        return {("", name): paths for name, paths in hits.items()}
+
+    def _row_by_row_count(self, check: ReleaseFileCheck) -> int:
+        """逐行检查该行需要的查询次数。"""
+        scoped_levels = min(self.max_search_depth, len(LEVELS) - 1) + 1
+        if check.level is None:
+            return scoped_levels + 1
+        return min(check.level, scoped_levels) + 1
+
+    def _run_level(
+        self, label: str, keys: List[Tuple[str, str]], scoped: bool
+    ) -> Dict[Tuple[str, str], List[str]]:
+        """分批查询一层，返回命中的 (目录, 文件名) -> 匹配路径。"""
+        batches = [
+            keys[start : start + self.batch_size]
+            for start in range(0, len(keys), self.batch_size)
+        ]
+        found: Dict[Tuple[str, str], List[str]] = {}
+        if self.workers <= 1 or len(batches) <= 1:
+            for batch in batches:
+                found.update(self._query_batch(label, batch, scoped))
+            return found
+        with ThreadPoolExecutor(
+            max_workers=min(self.workers, len(batches))
+        ) as executor:
+            for batch_found in executor.map(
+                lambda batch: self._query_batch(label, batch, scoped), batches
+            ):
+                found.update(batch_found)
+        return found
+
+    def _query_batch(
+        self,
+        label: str,
+        keys: List[Tuple[str, str]],
+        scoped: bool,
+    ) -> Dict[Tuple[str, str], List[str]]:
+        """发送一个批量查询，返回命中的组合；结果被截断时拆分重查。"""
+        single = len(keys) == 1
+        # 单个组合使用与逐行检查相同的结果数
+        max_results = 10 if single else self.max_results
+        with self._stats_lock:
+            self.stats.queries += 1
+            self.stats.queries_by_level[label] = (
+                self.stats.queries_by_level.get(label, 0) + 1
+            )
+        try:
+            results = self.search_provider.search_files(
+                query=self._build_query(keys, scoped),
+                max_results=max_results,
+                # 只需要路径和文件名
+                fields=("path", "filename"),
+            )
+        except Exception as e:
+            with self._stats_lock:
+                self.stats.failures += 1
+            print(f"{label}查询失败: {e}", file=sys.stderr)
+            return {}
+
+        if not single and len(results) >= max_results:
+            with self._stats_lock:
+                self.stats.splits += 1
+            middle = len(keys) // 2
+            found = self._query_batch(label, keys[:middle], scoped)
+            found.update(self._query_batch(label, keys[middle:], scoped))
+            return found
+
+        found: Dict[Tuple[str, str], List[str]] = {}
+        for directory, file_name in keys:
+            # path: 在搜索端是子串匹配，命中的路径还需按目录边界过滤
+            paths = [
+                r.path
+                for r in results
+                if _name_matches(file_name, r)
+                and (not scoped or _in_directory(directory, r.path))
+            ]
+            if paths:
+                found[(directory, file_name)] = paths
+        return found
+
+    @staticmethod
+    def _build_query(keys: List[Tuple[str, str]], scoped: bool) -> str:
+        """
+        构建查询：单个组合为 path:<目录> <文件名>，多个组合使用 Everything 的 OR 语法。
+
+        两种情况下目录和文件名都按需加引号，含空格的目录（如 C:\\Program Files）
+        不会被拆成多个查询词，结论不随所在批次变化。
+        """
+        if len(keys) == 1:
+            directory, file_name = keys[0]
+            if scoped:
+                return f"path:{_quote(directory)} {_quote(file_name)}"
+            return file_name
+
+        if not scoped:
+            return "<" + "|".join(_quote(name) for _, name in keys) + ">"
+
+        # 同一目录下的多个文件名合并为 path:<目录> <a|b|c>
+        names_by_dir: Dict[str, List[str]] = {}
+        for directory, file_name in keys:
+            names_by_dir.setdefault(directory, []).append(file_name)
+        groups = [
+            f"<path:{_quote(directory)} <{'|'.join(_quote(n) for n in names)}>>"
+            for directory, names in names_by_dir.items()
+        ]
+        return groups[0] if len(groups) == 1 else "|".join(groups)
@@ -0,0 +1,237 @@
+"""搜索结果缓存。
+
+CachingSearchProvider 包装任意 SearchProvider（Everything、locate、mdfind），
+以全部查询参数为键缓存结果：容量有限的 LRU 加过期时间（TTL），并可在索引数据库
+（如 plocate.db）修改时间变化或提供者的增量版本号（index_generation）变化时整体失效。
+提供者实现 changes_affect 时（内置索引的增量更新），版本号变化不清空缓存，
+命中时只淘汰可能受之后变更影响的条目。同一 CSV 中重复的文件名和 path: 前缀、
+以及服务器运行期间的重复查询都直接命中缓存。
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .search_interface import SearchProvider, SearchResult
+
+# 默认缓存条目数与过期时间（秒）
+DEFAULT_CACHE_SIZE = 1024
+DEFAULT_CACHE_TTL = 300.0
+
+
+@dataclass
+class CacheStats:
+    """缓存命中统计。"""
+
+    hits: int = 0
+    misses: int = 0
+    # 超出容量被淘汰的条目数
+    evictions: int = 0
+    # 过期的条目数
+    expirations: int = 0
+    # 因索引数据库更新而整体失效的次数
+    invalidations: int = 0
+
+    def since(self, earlier: "CacheStats") -> "CacheStats":
+        """与之前的快照相比的增量。"""
+        return CacheStats(
+            hits=self.hits - earlier.hits,
+            misses=self.misses - earlier.misses,
+            evictions=self.evictions - earlier.evictions,
+            expirations=self.expirations - earlier.expirations,
+            invalidations=self.invalidations - earlier.invalidations,
+        )
+
+    def format_summary(self) -> str:
+        """生成单行的缓存统计。"""
+        total = self.hits + self.misses
+        rate = f"{self.hits / total:.0%}" if total else "-"
+        summary = f"命中 {self.hits} 次，未命中 {self.misses} 次（命中率 {rate}）"
+        if self.invalidations:
+            summary += f"，索引更新失效 {self.invalidations} 次"
+        return summary
+
+
+class CachingSearchProvider(SearchProvider):
+    """为任意搜索提供者增加 LRU + TTL 结果缓存。"""
+
+    def __init__(
+        self,
+        provider: SearchProvider,
+        max_entries: int = DEFAULT_CACHE_SIZE,
+        ttl_seconds: float = DEFAULT_CACHE_TTL,
+        index_paths: Optional[Sequence[str]] = None,
+    ):
+        """
+        Args:
+            provider: 被包装的搜索提供者
+            max_entries: 最大缓存条目数
+            ttl_seconds: 条目过期时间（秒），0 表示不过期
+            index_paths: 索引数据库文件，修改时间变化时清空缓存；
+                为 None 时使用提供者的 index_db_paths
+        """
+        self.provider = provider
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        if index_paths is None:
+            index_paths = getattr(provider, "index_db_paths", ())
+        self.index_paths = [p for p in index_paths if p]
+        self.supports_boolean_query = provider.supports_boolean_query
+        self.max_concurrency = provider.max_concurrency
+        self.stats = CacheStats()
+        # 键 -> (写入时间, 写入时的增量版本号, 结果)
+        self._entries: "OrderedDict[Tuple, Tuple[float, Optional[int], List]]" = (
+            OrderedDict()
+        )
+        self._index_mtimes = self._read_index_mtimes()
+        self._generation = getattr(provider, "index_generation", None)
+        # 提供者能判断增量变更影响哪些查询时，版本号变化不清空缓存
+        self._changes_affect = getattr(provider, "changes_affect", None)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, provider: SearchProvider) -> SearchProvider:
+        """
+        按环境变量包装提供者。
+
+        EVERYTHING_SEARCH_CACHE_SIZE: 缓存条目数，0 表示不缓存
+        EVERYTHING_SEARCH_CACHE_TTL: 过期时间（秒）
+        EVERYTHING_SEARCH_INDEX_DB: 额外的索引数据库路径（多个用 os.pathsep 分隔）
+        """
+        size = int(os.getenv("EVERYTHING_SEARCH_CACHE_SIZE", DEFAULT_CACHE_SIZE))
+        if size <= 0:
+            return provider
+        ttl = float(os.getenv("EVERYTHING_SEARCH_CACHE_TTL", DEFAULT_CACHE_TTL))
+        index_paths = list(getattr(provider, "index_db_paths", ()))
+        extra = os.getenv("EVERYTHING_SEARCH_INDEX_DB", "")
+        index_paths.extend(p for p in extra.split(os.pathsep) if p)
+        return cls(provider, size, ttl, index_paths)
+
+    def __getattr__(self, name):
+        # 其他属性（如 everything_sdk、locate_cmd）透传给被包装的提供者
+        provider = self.__dict__.get("provider")
+        if provider is None:
+            raise AttributeError(name)
+        return getattr(provider, name)
+
+    def iter_all_files(self) -> Iterator[Tuple[str, str]]:
+        # 全量枚举不经过缓存
+        return self.provider.iter_all_files()
+
+    def _read_index_mtimes(self) -> Dict[str, Optional[float]]:
+        mtimes = {}
+        for path in self.index_paths:
+            try:
+                mtimes[path] = os.stat(path).st_mtime
+            except OSError:
+                mtimes[path] = None
+        return mtimes
+
+    def _check_index(self):
+        """索引数据库或增量变更更新后清空缓存（调用方持有锁）。"""
+        generation = getattr(self.provider, "index_generation", None)
+        mtimes = self._read_index_mtimes() if self.index_paths else {}
+        if mtimes != self._index_mtimes or (
+            generation != self._generation and self._changes_affect is None
+        ):
+            self._index_mtimes = mtimes
+            if self._entries:
+                self._entries.clear()
+                self.stats.invalidations += 1
+        self._generation = generation
+
+    def clear(self):
+        """清空缓存。"""
+        with self._lock:
+            self._entries.clear()
+
+    def snapshot(self) -> CacheStats:
+        """当前统计的副本，配合 CacheStats.since 计算单次工具调用的命中情况。"""
+        with self._lock:
+            return replace(self.stats)
+
+    def search_files(
+        self,
+        query: str,
+        max_results: int = 100,
+        match_path: bool = False,
+        match_case: bool = False,
+        match_whole_word: bool = False,
+        match_regex: bool = False,
+        sort_by: Optional[int] = None,
+        fields: Optional[Sequence[str]] = None,
+        offset: int = 0,
+        **kwargs,
+    ) -> List[SearchResult]:
+        key = (
+            query,
+            max_results,
+            match_path,
+            match_case,
+            match_whole_word,
+            match_regex,
+            sort_by,
+            tuple(fields) if fields is not None else None,
+            offset,
+            # 平台参数可能包含列表等不可哈希的值
+            repr(sorted(kwargs.items())),
+        )
+        now = time.monotonic()
+        with self._lock:
+            self._check_index()
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, generation, results = entry
+                if self.ttl_seconds and now - stored_at > self.ttl_seconds:
+                    del self._entries[key]
+                    self.stats.expirations += 1
+                elif generation != self._generation and self._changes_affect(
+                    generation,
+                    query,
+                    match_path=match_path,
+                    match_case=match_case,
+                    match_whole_word=match_whole_word,
+                    match_regex=match_regex,
+                ):
+                    del self._entries[key]
+                    self.stats.invalidations += 1
+                else:
+                    # 之后的变更与该查询无关，下次只需检查更新的变更
+                    self._entries[key] = (stored_at, self._generation, results)
+                    self._entries.move_to_end(key)
+                    self.stats.hits += 1
+                    return list(results)
+            self.stats.misses += 1
+            # 查询期间索引更新时，按旧索引得到的结果不写入缓存
+            index_state = (self._generation, self._index_mtimes)
+
+        # 查询本身不持锁，避免慢查询阻塞其他命中
+        results = self.provider.search_files(
+            query=query,
+            max_results=max_results,
+            match_path=match_path,
+            match_case=match_case,
+            match_whole_word=match_whole_word,
+            match_regex=match_regex,
+            sort_by=sort_by,
+            fields=fields,
+            offset=offset,
+            **kwargs,
+        )
+
+        with self._lock:
+            self._check_index()
+            if self._index_mtimes != index_state[1] or (
+                self._generation != index_state[0] and self._changes_affect is None
+            ):
+                return results
+            # 记录查询前的版本号，查询期间的变更在命中时检查
+            self._entries[key] = (time.monotonic(), index_state[0], list(results))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+        return results
@@ -3,11 +3,26 @@
 import abc
 import os
 import platform
+import shutil
 import subprocess
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# 批量读取文件元数据的默认线程数
+DEFAULT_STAT_WORKERS = 16
+# iter_search 的默认页大小
+DEFAULT_PAGE_SIZE = 1000
+
+# get_provider 创建过的提供者，服务器运行期间复用
+_providers: Dict[str, "SearchProvider"] = {}
+_providers_lock = threading.Lock()
 
 
 @dataclass
@@ -24,9 +39,154 @@ class SearchResult:
     attributes: Optional[str] = None
 
 
+def _lazy_metadata(name: str) -> property:
+    def getter(self):
+        return self.load_metadata()[name]
+
+    def setter(self, value):
+        self.load_metadata()[name] = value
+
+    return property(getter, setter)
+
+
+class LazySearchResult(SearchResult):
+    """
+    文件元数据延迟读取的搜索结果。
+
+    路径、文件名和扩展名立即可用；size 和三个时间戳在首次访问时才 stat 一次文件，
+    只需要文件名的调用方（如释放文件检查）不再为每个结果付出 stat 的开销。
+    """
+
+    size = _lazy_metadata("size")
+    created = _lazy_metadata("created")
+    modified = _lazy_metadata("modified")
+    accessed = _lazy_metadata("accessed")
+
+    def __init__(self, path: str):
+        path_obj = Path(path)
+        self.path = str(path_obj)
+        self.filename = path_obj.name
+        self.extension = path_obj.suffix[1:] if path_obj.suffix else None
+        self.attributes = None
+        self._metadata: Optional[dict] = None
+
+    @property
+    def metadata_loaded(self) -> bool:
+        return self._metadata is not None
+
+    def load_metadata(self) -> dict:
+        """读取文件元数据（只读取一次）；无法访问文件时各项为 None。"""
+        if self._metadata is None:
+            try:
+                stat = os.stat(self.path)
+                metadata = {
+                    "size": stat.st_size,
+                    "created": datetime.fromtimestamp(stat.st_ctime),
+                    "modified": datetime.fromtimestamp(stat.st_mtime),
+                    "accessed": datetime.fromtimestamp(stat.st_atime),
+                }
+            except (OSError, ValueError):
+                metadata = dict.fromkeys(("size", "created", "modified", "accessed"))
+            self._metadata = metadata
+        return self._metadata
+
+
+def prefetch_metadata(
+    results: Sequence[SearchResult], workers: int = DEFAULT_STAT_WORKERS
+) -> Sequence[SearchResult]:
+    """
+    用线程池批量读取延迟结果的元数据（os.stat 期间释放 GIL），
+    在网络文件系统等 stat 较慢的场景下比逐个访问快得多。
+
+    Returns:
+        传入的 results，便于链式调用
+    """
+    pending = [
+        r for r in results if isinstance(r, LazySearchResult) and not r.metadata_loaded
+    ]
+    if len(pending) <= 1 or workers <= 1:
+        for result in pending:
+            result.load_metadata()
+        return results
+    with ThreadPoolExecutor(max_workers=min(workers, len(pending))) as executor:
+        # 消费迭代器以传播异常
+        list(executor.map(LazySearchResult.load_metadata, pending))
+    return results
+
+
+def stream_command_lines(
+    cmd: List[str], max_results: int, offset: int = 0
+) -> Tuple[List[str], int, str]:
+    """
+    流式读取命令输出的第 offset 行起的 max_results 行，读够后立即终止进程。
+
+    宽泛的查询可能输出上百万行，一次性读入全部输出既慢又占内存；
+    跳过的 offset 行只计数，不保留。
+
+    Returns:
+        (输出行, 返回码, 标准错误)；因读够行数而终止进程时返回码为 0
+    """
+    # 标准错误写入临时文件，避免管道写满后与读取标准输出互相等待
+    with tempfile.TemporaryFile() as stderr_file:
+        process = subprocess.Popen(
+            cmd, stdout=subprocess.PIPE, stderr=stderr_file, text=True
+        )
+        lines: List[str] = []
+        skipped = 0
+        truncated = False
+        try:
+            for line in process.stdout:
+                if skipped < offset:
+                    skipped += 1
+                    continue
+                if len(lines) >= max_results:
+                    truncated = True
+                    break
+                lines.append(line.rstrip("\n"))
+        finally:
+            if process.poll() is None and (truncated or sys.exc_info()[0]):
+                process.kill()
+            process.stdout.close()
+            returncode = process.wait()
+        stderr_file.seek(0)
+        stderr = stderr_file.read().decode(errors="replace")
+    return lines, 0 if truncated else returncode, stderr
+
+
+def iter_command_lines(cmd: List[str]) -> Iterator[str]:
+    """
+    逐行产生命令输出，用于枚举整个 locate 数据库等超大输出。
+
+    提前关闭生成器时终止进程；命令失败时抛出 RuntimeError。
+    """
+    with tempfile.TemporaryFile() as stderr_file:
+        process = subprocess.Popen(
+            cmd, stdout=subprocess.PIPE, stderr=stderr_file, text=True
+        )
+        finished = False
+        try:
+            for line in process.stdout:
+                yield line.rstrip("\n")
+            finished = True
+        finally:
+            if process.poll() is None and not finished:
+                process.kill()
+            process.stdout.close()
+            returncode = process.wait()
+        if returncode != 0:
+            stderr_file.seek(0)
+            stderr = stderr_file.read().decode(errors="replace")
+            raise RuntimeError(f"{cmd[0]} 失败: {stderr}")
+
+
 class SearchProvider(abc.ABC):
     """平台特定搜索实现的抽象基类。"""
 
+    # 是否支持 Everything 的 OR（|）和分组（< >）查询语法
+    supports_boolean_query = False
+    # 可同时执行的查询数，None 表示不限制（每次查询独立的命令行进程等）
+    max_concurrency: Optional[int] = None
+
     @abc.abstractmethod
     def search_files(
         self,
@@ -37,40 +197,116 @@ class SearchProvider(abc.ABC):
         match_whole_word: bool = False,
         match_regex: bool = False,
         sort_by: Optional[int] = None,
+        fields: Optional[Sequence[str]] = None,
+        offset: int = 0,
     ) -> List[SearchResult]:
-        """使用平台特定方法执行文件搜索。"""
+        """
+        使用平台特定方法执行文件搜索。
+
+        fields 为需要的结果字段（字段投影，见 everything_sdk.ALL_FIELDS），
+        None 表示全部字段。Everything 只向服务请求这些字段；其他提供者的结果
+        本身延迟读取元数据，未访问的字段不产生开销。
+
+        offset 为跳过的匹配数，与 max_results 组合实现分页（见 iter_search）。
+        """
         pass
 
+    def iter_search(
+        self, query: str, page_size: int = DEFAULT_PAGE_SIZE, **kwargs
+    ) -> Iterator[List[SearchResult]]:
+        """
+        按页产生全部匹配结果，不受单次 max_results 上限限制，内存只保留一页。
+
+        Args:
+            query: 搜索查询
+            page_size: 每页结果数
+            **kwargs: 传给 search_files 的其他参数（match_path、sort_by、fields 等）
+        """
+        offset = 0
+        while True:
+            page = self.search_files(
+                query=query, max_results=page_size, offset=offset, **kwargs
+            )
+            if page:
+                yield page
+            if len(page) < page_size:
+                return
+            offset += len(page)
+
+    def iter_all_files(self) -> Iterator[Tuple[str, str]]:
+        """
+        枚举索引中的全部文件，产生 (文件名, 完整路径)，供批量文件名扫描使用。
+
+        默认以空查询分页获取全部结果（Everything 的空查询匹配所有文件）。
+        """
+        for page in self.iter_search(
+            "", page_size=DEFAULT_PAGE_SIZE * 10, fields=("path", "filename")
+        ):
+            for result in page:
+                yield result.filename, result.path
+
+    @classmethod
+    def get_provider(cls, backend: Optional[str] = None) -> "SearchProvider":
+        """
+        工厂方法：获取当前平台的适当搜索提供者。
+
+        backend 未指定时读取环境变量 EVERYTHING_SEARCH_BACKEND：
+        auto（默认）、everything、mdfind、locate、native（内置索引）。
+        auto 模式下 Linux 未安装 locate/plocate 时使用内置索引。
+
+        同一 backend 的检测和创建只进行一次，之后返回同一个提供者；
+        EVERYTHING_SEARCH_WORKER=1 时 locate/mdfind 查询交给常驻工作进程（见 search_worker）。
+        """
+        backend = (backend or os.getenv("EVERYTHING_SEARCH_BACKEND", "auto")).lower()
+        with _providers_lock:
+            provider = _providers.get(backend)
+            if provider is None:
+                provider = cls.create_provider(backend)
+                worker_backend = {
+                    LinuxSearchProvider: "locate",
+                    MacSearchProvider: "mdfind",
+                }.get(type(provider))
+                if worker_backend:
+                    from .search_worker import WorkerSearchProvider
+
+                    provider = WorkerSearchProvider.from_env(provider, worker_backend)
+                _providers[backend] = provider
+            return provider
+
     @classmethod
-    def get_provider(cls) -> "SearchProvider":
-        """工厂方法：获取当前平台的适当搜索提供者。"""
+    def create_provider(cls, backend: str = "auto") -> "SearchProvider":
+        """创建 backend 对应的提供者（不复用、不包装）。"""
+        backend = backend.lower()
+        if backend == "native":
+            from .native_index import NativeIndexSearchProvider
+
+            return NativeIndexSearchProvider()
+        if backend == "everything":
+            return WindowsSearchProvider()
+        if backend == "mdfind":
+            return MacSearchProvider()
+        if backend == "locate":
+            return LinuxSearchProvider()
+
         system = platform.system().lower()
         if system == "darwin":
             return MacSearchProvider()
         elif system == "linux":
-            return LinuxSearchProvider()
+            try:
+                return LinuxSearchProvider()
+            except (RuntimeError, OSError) as e:
+                from .native_index import NativeIndexSearchProvider
+
+                print(f"{e}\n改用内置索引", file=sys.stderr)
+                return NativeIndexSearchProvider()
         elif system == "windows":
             return WindowsSearchProvider()
         else:
             raise NotImplementedError(f"没有可用的搜索提供者用于 {system}")
 
     def _convert_path_to_result(self, path: str) -> SearchResult:
-        """将路径转换为带有文件信息的 SearchResult。"""
-        try:
-            path_obj = Path(path)
-            stat = path_obj.stat()
-            return SearchResult(
-                path=str(path_obj),
-                filename=path_obj.name,
-                extension=path_obj.suffix[1:] if path_obj.suffix else None,
-                size=stat.st_size,
-                created=datetime.fromtimestamp(stat.st_ctime),
-                modified=datetime.fromtimestamp(stat.st_mtime),
-                accessed=datetime.fromtimestamp(stat.st_atime),
-            )
-        except (OSError, ValueError) as e:
-            # 如果无法访问文件，返回基本信息
-            return SearchResult(path=str(path), filename=os.path.basename(path))
+        """将路径转换为 SearchResult，文件信息在首次访问时读取。"""
+        return LazySearchResult(path)
 
 
 class MacSearchProvider(SearchProvider):
@@ -85,6 +321,8 @@ class MacSearchProvider(SearchProvider):
         match_whole_word: bool = False,
         match_regex: bool = False,
         sort_by: Optional[int] = None,
+        fields: Optional[Sequence[str]] = None,
+        offset: int = 0,
     ) -> List[SearchResult]:
         try:
             # 构建 mdfind 命令
@@ -95,49 +333,63 @@ class MacSearchProvider(SearchProvider):
             else:
                 cmd.extend(["-name", query])
 
-            # 执行搜索
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            if result.returncode != 0:
-                raise RuntimeError(f"mdfind 失败: {result.stderr}")
+            # mdfind 没有数量限制参数，读够结果后终止进程
+            paths, returncode, stderr = stream_command_lines(cmd, max_results, offset)
+            if returncode != 0:
+                raise RuntimeError(f"mdfind 失败: {stderr}")
 
             # 处理结果
-            paths = result.stdout.splitlines()[:max_results]
             return [self._convert_path_to_result(path) for path in paths]
 
         except subprocess.CalledProcessError as e:
             raise RuntimeError(f"搜索失败: {e}")
 
+    def iter_all_files(self) -> Iterator[Tuple[str, str]]:
+        # Spotlight 没有数量限制地列出全部已索引文件
+        for path in iter_command_lines(["mdfind", 'kMDItemFSName == "*"']):
+            yield os.path.basename(path), path
+
+
+@lru_cache(maxsize=None)
+def _detect_locate() -> Optional[Tuple[str, str]]:
+    """查找 locate 命令，返回 (命令, 类型)；只检测一次。"""
+    # 首先检查 plocate（更新的版本），其次 mlocate
+    if shutil.which("plocate"):
+        return "plocate", "plocate"
+    if shutil.which("locate"):
+        return "locate", "mlocate"
+    return None
+
 
 class LinuxSearchProvider(SearchProvider):
     """使用 locate/plocate 的 Linux 搜索实现。"""
 
+    # locate 数据库，updatedb 后修改时间变化，用于使搜索缓存失效
+    index_db_paths = (
+        "/var/lib/plocate/plocate.db",
+        "/var/lib/mlocate/mlocate.db",
+    )
+
     def __init__(self):
         """检查 locate/plocate 是否已安装且数据库是否就绪。"""
-        self.locate_cmd = None
-        self.locate_type = None
-
-        # 首先检查 plocate（更新的版本）
-        plocate_check = subprocess.run(["which", "plocate"], capture_output=True)
-        if plocate_check.returncode == 0:
-            self.locate_cmd = "plocate"
-            self.locate_type = "plocate"
-        else:
-            # 检查 mlocate
-            mlocate_check = subprocess.run(["which", "locate"], capture_output=True)
-            if mlocate_check.returncode == 0:
-                self.locate_cmd = "locate"
-                self.locate_type = "mlocate"
-            else:
-                raise RuntimeError(
-                    "Neither 'locate' nor 'plocate' is installed. Please install one:\n"
-                    "Ubuntu/Debian: sudo apt-get install plocate\n"
-                    "              or\n"
-                    "              sudo apt-get install mlocate\n"
-                    "Fedora: sudo dnf install mlocate\n"
-                    "After installation, the database will be updated automatically, or run:\n"
-                    "For plocate: sudo updatedb\n"
-                    "For mlocate: sudo /etc/cron.daily/mlocate"
-                )
+        detected = _detect_locate()
+        if detected is None:
+            raise RuntimeError(
+                "Neither 'locate' nor 'plocate' is installed. Please install one:\n"
+                "Ubuntu/Debian: sudo apt-get install plocate\n"
+                "              or\n"
+                "              sudo apt-get install mlocate\n"
+                "Fedora: sudo dnf install mlocate\n"
+                "After installation, the database will be updated automatically, or run:\n"
+                "For plocate: sudo updatedb\n"
+                "For mlocate: sudo /etc/cron.daily/mlocate"
+            )
+        self.locate_cmd, self.locate_type = detected
+
+    def iter_all_files(self) -> Iterator[Tuple[str, str]]:
+        # 所有路径都包含 /，一次输出整个数据库
+        for path in iter_command_lines([self.locate_cmd, "/"]):
+            yield os.path.basename(path), path
 
     def _update_database(self):
         """更新 locate 数据库。"""
@@ -155,6 +407,8 @@ class LinuxSearchProvider(SearchProvider):
         match_whole_word: bool = False,
         match_regex: bool = False,
         sort_by: Optional[int] = None,
+        fields: Optional[Sequence[str]] = None,
+        offset: int = 0,
     ) -> List[SearchResult]:
         try:
             # 构建 locate 命令
@@ -163,20 +417,21 @@ class LinuxSearchProvider(SearchProvider):
                 cmd.append("-i")
             if match_regex:
                 cmd.append("--regex" if self.locate_type == "mlocate" else "-r")
+            # 数量限制交给 locate，避免输出全部匹配
+            cmd.extend(["-l", str(offset + max_results)])
             cmd.append(query)
 
             # 执行搜索
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            if result.returncode != 0:
-                error_msg = result.stderr.lower()
+            paths, returncode, stderr = stream_command_lines(cmd, max_results, offset)
+            if returncode != 0:
+                error_msg = stderr.lower()
                 if "no such file or directory" in error_msg or "database" in error_msg:
                     raise RuntimeError(
                         f"{self.locate_type} 数据库需要创建。" f"请运行: sudo updatedb"
                     )
-                raise RuntimeError(f"{self.locate_cmd} 失败: {result.stderr}")
+                raise RuntimeError(f"{self.locate_cmd} 失败: {stderr}")
 
             # 处理结果
-            paths = result.stdout.splitlines()[:max_results]
             return [self._convert_path_to_result(path) for path in paths]
 
         except FileNotFoundError:
@@ -194,6 +449,10 @@ class LinuxSearchProvider(SearchProvider):
 class WindowsSearchProvider(SearchProvider):
     """使用 Everything SDK 的 Windows 搜索实现。"""
 
+    supports_boolean_query = True
+    # Everything IPC 同一时间只能执行一个查询
+    max_concurrency = 1
+
     def __init__(self):
         """初始化 Everything SDK。"""
         import os
@@ -215,6 +474,8 @@ class WindowsSearchProvider(SearchProvider):
         match_whole_word: bool = False,
         match_regex: bool = False,
         sort_by: Optional[int] = None,
+        fields: Optional[Sequence[str]] = None,
+        offset: int = 0,
     ) -> List[SearchResult]:
         # 将双反斜杠替换为单反斜杠
         query = query.replace("\\\\", "\\")
@@ -229,4 +490,6 @@ class WindowsSearchProvider(SearchProvider):
             match_whole_word=match_whole_word,
             match_regex=match_regex,
             sort_by=sort_by,
+            fields=fields,
+            offset=offset,
         )
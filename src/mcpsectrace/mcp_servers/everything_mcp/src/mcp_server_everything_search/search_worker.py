@@ -0,0 +1,410 @@
+"""命令行搜索后端的常驻工作进程。
+
+locate/mdfind 每次搜索都要新建一个进程，CSV 批量检查因此要 fork 成千上万次。
+常驻模式下，服务器启动固定数量的工作进程（python -m mcp_server_everything_search.search_worker），
+每个工作进程只运行一次 locate / 或 mdfind 读入全部路径，之后通过管道逐行接收 JSON 查询、
+在内存中匹配并返回结果。工作进程数即并发上限，空闲进程不足时请求排队等待。
+
+匹配语义与命令行一致：
+- locate：匹配完整路径；含通配符（* ? [）时整条路径按通配符匹配，否则为子串匹配
+- mdfind -name：匹配文件名子串；match_path 时改为匹配完整路径（不支持 Spotlight 的内容搜索）
+- match_case 关闭时不区分大小写，match_regex 时使用正则搜索
+
+locate 数据库修改时间变化或快照超过 EVERYTHING_SEARCH_WORKER_MAX_AGE 秒后，工作进程在下一次查询前重新读取。
+工作进程异常退出时自动重启一次，仍然失败则回退为直接调用命令行。
+"""
+
+import argparse
+import bisect
+import fnmatch
+import itertools
+import json
+import os
+import queue
+import re
+import subprocess
+import sys
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .search_interface import SearchProvider, SearchResult
+
+# 快照的默认最长使用时间（秒）
+DEFAULT_SNAPSHOT_MAX_AGE = 300.0
+DEFAULT_WORKER_COUNT = 1
+
+_GLOB_CHARS = frozenset("*?[")
+
+
+class WorkerError(RuntimeError):
+    """工作进程不可用（启动失败、管道断开或异常退出）。"""
+
+
+def compile_matcher(
+    query: str,
+    match_case: bool = False,
+    match_regex: bool = False,
+) -> Callable[[str], bool]:
+    """
+    按 locate 的规则编译查询。
+
+    Raises:
+        ValueError: 正则表达式无效
+    """
+    if match_regex:
+        try:
+            pattern = re.compile(query, 0 if match_case else re.IGNORECASE)
+        except re.error as e:
+            raise ValueError(f"无效的正则表达式: {e}") from e
+        return lambda text: pattern.search(text) is not None
+    if not match_case:
+        query = query.lower()
+    if _GLOB_CHARS.intersection(query):
+        return lambda text: fnmatch.fnmatchcase(text, query)
+    return lambda text: query in text
+
+
+class _PathBuffer:
+    """以换行连接的路径，子串查询用 str.find 在整块文本上扫描。"""
+
+    def __init__(self, lines: List[str]):
+        self.lines = lines
+        self.text = "\n".join(lines) + "\n"
+        # 各行在 text 中的起始位置
+        self.starts = list(
+            itertools.accumulate((len(line) + 1 for line in lines), initial=0)
+        )
+
+    def find_lines(self, needle: str) -> Iterator[int]:
+        """包含 needle 的行号（按顺序，不重复）。"""
+        if not needle:
+            yield from range(len(self.lines))
+            return
+        find, starts = self.text.find, self.starts
+        pos = find(needle)
+        while pos >= 0:
+            line = bisect.bisect_right(starts, pos) - 1
+            yield line
+            pos = find(needle, starts[line + 1])
+
+
+class PathSnapshot:
+    """工作进程内的全部路径快照。"""
+
+    def __init__(
+        self,
+        provider: SearchProvider,
+        match_name: bool = False,
+        max_age_seconds: float = DEFAULT_SNAPSHOT_MAX_AGE,
+    ):
+        """
+        Args:
+            provider: 提供全部路径的命令行搜索提供者（iter_all_files）
+            match_name: 默认只匹配文件名（mdfind -name），否则匹配完整路径（locate）
+            max_age_seconds: 快照最长使用时间，0 表示只在数据库变化时重新读取
+        """
+        self.provider = provider
+        self.match_name = match_name
+        self.max_age_seconds = max_age_seconds
+        self.paths: List[str] = []
+        # 原始路径与小写路径，首次使用时生成
+        self._buffers: Dict[bool, _PathBuffer] = {}
+        self._loaded_at = 0.0
+        self._db_mtimes: Optional[Dict[str, Optional[float]]] = None
+
+    def _read_db_mtimes(self) -> Dict[str, Optional[float]]:
+        mtimes = {}
+        for path in getattr(self.provider, "index_db_paths", ()):
+            try:
+                mtimes[path] = os.stat(path).st_mtime
+            except OSError:
+                mtimes[path] = None
+        return mtimes
+
+    def refresh_if_stale(self):
+        """首次使用、数据库变化或快照过期时重新读取全部路径。"""
+        mtimes = self._read_db_mtimes()
+        expired = (
+            self.max_age_seconds > 0
+            and time.monotonic() - self._loaded_at > self.max_age_seconds
+        )
+        if self._db_mtimes is not None and mtimes == self._db_mtimes and not expired:
+            return
+        start = time.perf_counter()
+        self.paths = [path for _, path in self.provider.iter_all_files()]
+        self._buffers = {}
+        self._loaded_at = time.monotonic()
+        self._db_mtimes = mtimes
+        print(
+            f"搜索工作进程已读取 {len(self.paths)} 个路径，"
+            f"耗时 {time.perf_counter() - start:.2f}s",
+            file=sys.stderr,
+        )
+
+    def _buffer(self, match_case: bool) -> _PathBuffer:
+        buffer = self._buffers.get(match_case)
+        if buffer is None:
+            lines = self.paths if match_case else [p.lower() for p in self.paths]
+            buffer = self._buffers[match_case] = _PathBuffer(lines)
+        return buffer
+
+    def search(
+        self,
+        query: str,
+        max_results: int = 100,
+        offset: int = 0,
+        match_path: bool = False,
+        match_case: bool = False,
+        match_regex: bool = False,
+        **_ignored,
+    ) -> List[str]:
+        """返回第 offset 个匹配起的 max_results 个路径（保持数据库顺序）。"""
+        self.refresh_if_stale()
+        matches = compile_matcher(query, match_case, match_regex)
+        # 正则在原始路径上匹配（大小写由正则标志控制）
+        buffer = self._buffer(match_case or match_regex)
+        on_name = self.match_name and not match_path
+        if match_regex or _GLOB_CHARS.intersection(query) or "\n" in query:
+            candidates: Iterator[int] = iter(range(len(buffer.lines)))
+        else:
+            # 子串查询先在整块文本上定位候选行
+            candidates = buffer.find_lines(query if match_case else query.lower())
+        lines = buffer.lines
+        hits = (
+            index
+            for index in candidates
+            if matches(lines[index].rpartition("/")[2] if on_name else lines[index])
+        )
+        return [
+            self.paths[index]
+            for index in itertools.islice(hits, offset, offset + max_results)
+        ]
+
+
+class _Worker:
+    """单个工作进程的管道客户端（调用方保证同一时间只有一个请求）。"""
+
+    def __init__(self, backend: str):
+        self.backend = backend
+        self.process: Optional[subprocess.Popen] = None
+        self._next_id = 0
+
+    def start(self):
+        src_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(
+            p for p in (src_dir, env.get("PYTHONPATH")) if p
+        )
+        try:
+            self.process = subprocess.Popen(
+                [
+                    sys.executable,
+                    "-m",
+                    "mcp_server_everything_search.search_worker",
+                    "--backend",
+                    self.backend,
+                ],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                text=True,
+                encoding="utf-8",
+                env=env,
+            )
+        except OSError as e:
+            raise WorkerError(f"无法启动搜索工作进程: {e}") from e
+
+    def close(self):
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+            self.process.wait()
+        self.process = None
+
+    def request(self, params: dict) -> List[str]:
+        """
+        发送一次查询并等待结果。
+
+        Raises:
+            WorkerError: 工作进程不可用
+            RuntimeError: 工作进程执行查询时出错（如正则无效）
+        """
+        if self.process is None or self.process.poll() is not None:
+            self.start()
+        self._next_id += 1
+        payload = json.dumps({"id": self._next_id, "params": params}) + "\n"
+        try:
+            self.process.stdin.write(payload)
+            self.process.stdin.flush()
+            line = self.process.stdout.readline()
+        except (OSError, ValueError) as e:
+            self.close()
+            raise WorkerError(f"搜索工作进程管道断开: {e}") from e
+        if not line:
+            self.close()
+            raise WorkerError("搜索工作进程异常退出")
+        response = json.loads(line)
+        if response.get("id") != self._next_id:
+            self.close()
+            raise WorkerError("搜索工作进程响应错乱")
+        if "error" in response:
+            raise RuntimeError(response["error"])
+        return response["paths"]
+
+
+class WorkerSearchProvider(SearchProvider):
+    """把 locate/mdfind 查询发给常驻工作进程的搜索提供者。"""
+
+    def __init__(
+        self,
+        provider: SearchProvider,
+        backend: str,
+        workers: int = DEFAULT_WORKER_COUNT,
+    ):
+        """
+        Args:
+            provider: 被包装的命令行搜索提供者，工作进程不可用时直接调用
+            backend: 工作进程中创建的后端（locate 或 mdfind）
+            workers: 工作进程数，即同时执行的查询上限
+        """
+        self.provider = provider
+        self.backend = backend
+        self.index_db_paths = tuple(getattr(provider, "index_db_paths", ()))
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._workers = [_Worker(backend) for _ in range(max(1, workers))]
+        for worker in self._workers:
+            self._idle.put(worker)
+        self._fallback = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, provider: SearchProvider, backend: str) -> SearchProvider:
+        """
+        按环境变量包装提供者。
+
+        EVERYTHING_SEARCH_WORKER: 1 启用常驻工作进程（默认关闭）
+        EVERYTHING_SEARCH_WORKER_COUNT: 工作进程数
+        """
+        if os.getenv("EVERYTHING_SEARCH_WORKER", "0").lower() not in (
+            "1",
+            "true",
+            "yes",
+        ):
+            return provider
+        workers = int(os.getenv("EVERYTHING_SEARCH_WORKER_COUNT", DEFAULT_WORKER_COUNT))
+        return cls(provider, backend, workers)
+
+    def __getattr__(self, name):
+        # locate_cmd 等属性透传给被包装的提供者
+        provider = self.__dict__.get("provider")
+        if provider is None:
+            raise AttributeError(name)
+        return getattr(provider, name)
+
+    def close(self):
+        """关闭全部工作进程。"""
+        for worker in self._workers:
+            worker.close()
+
+    def iter_all_files(self) -> Iterator[Tuple[str, str]]:
+        # 全量枚举本身只需一个进程，直接调用
+        return self.provider.iter_all_files()
+
+    def search_files(
+        self,
+        query: str,
+        max_results: int = 100,
+        match_path: bool = False,
+        match_case: bool = False,
+        match_whole_word: bool = False,
+        match_regex: bool = False,
+        sort_by: Optional[int] = None,
+        fields: Optional[Sequence[str]] = None,
+        offset: int = 0,
+    ) -> List[SearchResult]:
+        if self._fallback:
+            return self.provider.search_files(
+                query=query,
+                max_results=max_results,
+                match_path=match_path,
+                match_case=match_case,
+                match_whole_word=match_whole_word,
+                match_regex=match_regex,
+                sort_by=sort_by,
+                fields=fields,
+                offset=offset,
+            )
+        params = {
+            "query": query,
+            "max_results": max_results,
+            "offset": offset,
+            "match_path": match_path,
+            "match_case": match_case,
+            "match_regex": match_regex,
+        }
+        worker = self._idle.get()
+        try:
+            try:
+                paths = worker.request(params)
+            except WorkerError as e:
+                print(f"{e}，重启搜索工作进程", file=sys.stderr)
+                paths = worker.request(params)
+        except WorkerError as e:
+            with self._lock:
+                self._fallback = True
+            print(f"{e}，改为直接调用 {self.backend}", file=sys.stderr)
+            return self.search_files(
+                query,
+                max_results,
+                match_path,
+                match_case,
+                match_whole_word,
+                match_regex,
+                sort_by,
+                fields,
+                offset,
+            )
+        finally:
+            self._idle.put(worker)
+        return [self._convert_path_to_result(path) for path in paths]
+
+
+def serve_worker(backend: str, stdin=None, stdout=None):
+    """工作进程主循环：每行一个 JSON 请求，每行一个 JSON 响应。"""
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    provider = SearchProvider.create_provider(backend)
+    max_age = float(
+        os.getenv("EVERYTHING_SEARCH_WORKER_MAX_AGE", DEFAULT_SNAPSHOT_MAX_AGE)
+    )
+    snapshot = PathSnapshot(
+        provider, match_name=backend == "mdfind", max_age_seconds=max_age
+    )
+    for line in stdin:
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        try:
+            response = {
+                "id": request["id"],
+                "paths": snapshot.search(**request["params"]),
+            }
+        except Exception as e:
+            response = {"id": request.get("id"), "error": f"搜索失败: {e}"}
+        stdout.write(json.dumps(response, ensure_ascii=False) + "\n")
+        stdout.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="locate/mdfind 常驻搜索工作进程")
+    parser.add_argument("--backend", choices=("locate", "mdfind"), required=True)
+    args = parser.parse_args()
+    serve_worker(args.backend)
+
+
+if __name__ == "__main__":
+    main()
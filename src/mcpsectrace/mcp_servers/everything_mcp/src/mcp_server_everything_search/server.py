@@ -1,24 +1,58 @@
 """跨平台文件搜索的 MCP 服务器实现。"""
 
+import asyncio
 import csv
+import functools
 import json
 import os
 import platform
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Literal, Optional
 
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
 from mcp.types import Prompt, Resource, ResourceTemplate, TextContent, Tool
 from pydantic import BaseModel, Field
 
+from .dir_precheck import DirectoryPrecheck
+from .everything_sdk import normalize_fields
+from .hash_verify import DEFAULT_HASH_WORKERS, HashCache, HashVerifier
+from .pagination import decode_cursor, encode_cursor, query_signature
 from .platform_search import (
     UnifiedSearchQuery,
     WindowsSpecificParams,
     build_search_command,
 )
-from .search_interface import SearchProvider
+from .query_planner import ReleaseFileQueryPlanner
+from .search_cache import CachingSearchProvider
+from .search_interface import SearchProvider, prefetch_metadata
+from .structured_output import OUTPUT_FORMATS, render_structured, write_output
+
+# 同时执行的工具调用数
+DEFAULT_SERVER_WORKERS = 4
+# 需要读取文件元数据的字段
+METADATA_FIELDS = {"size", "created", "modified", "accessed"}
+
+# 释放文件检查状态 -> 结构化输出中的状态代码
+RELEASE_STATUS_CODES = {
+    "文件存在": "file_exists",
+    "上一层目录存在": "parent_dir_exists",
+    "上两层目录存在": "grandparent_dir_exists",
+    "全局范围存在": "found_elsewhere",
+}
+OutputFormat = Literal["text", "json", "ndjson"]
+# 未指定字段投影时结构化输出的字段（与文本输出一致）
+DEFAULT_RECORD_FIELDS = [
+    "path",
+    "filename",
+    "extension",
+    "size",
+    "created",
+    "modified",
+    "accessed",
+]
 
 
 class SearchQuery(BaseModel):
@@ -52,10 +86,68 @@ class MaliciousFileQuery(BaseModel):
     max_search_depth: int = Field(
         default=2, ge=0, le=5, description="最大向上搜索目录层数（默认为2）"
     )
+    verify_sha256: bool = Field(
+        default=False,
+        description="计算找到的文件的 SHA256 并与 CSV 中的文件SHA256 比对（默认为False）",
+    )
+    output_format: OutputFormat = Field(
+        default="text",
+        description="输出格式：text（文本报告）、json 或 ndjson（摘要在前，字段名固定）",
+    )
+    output_file: Optional[str] = Field(
+        default=None,
+        description=(
+            "把完整结果写入输出目录（EVERYTHING_OUTPUT_DIR）下的该文件，"
+            "工具只返回摘要和文件路径；不覆盖已有文件"
+        ),
+    )
+
+
+def search_result_record(result, fields: Optional[List[str]] = None) -> Dict[str, Any]:
+    """结构化输出中的单条搜索结果，只包含请求的字段。"""
+    if fields is None:
+        fields = DEFAULT_RECORD_FIELDS
+    return {field: getattr(result, field, None) for field in fields}
+
+
+def format_search_result(result, fields: Optional[List[str]] = None) -> str:
+    """按字段投影格式化单条搜索结果，fields 为 None 时输出全部常用字段。"""
+    show = set(fields) if fields is not None else None
+
+    def wanted(field: str) -> bool:
+        return show is None or field in show
+
+    extension = getattr(result, "extension", None) if wanted("extension") else None
+    lines = [
+        f"Path: {result.path}",
+        f"Filename: {result.filename}{f' ({extension})' if extension else ''}",
+    ]
+    if wanted("size"):
+        size = result.size
+        lines.append(f"Size: {f'{size:,} bytes' if size is not None else 'N/A'}")
+    for field in ("created", "modified", "accessed"):
+        if wanted(field):
+            value = getattr(result, field)
+            lines.append(f"{field.capitalize()}: {value if value else 'N/A'}")
+    if show is not None:
+        for field in (
+            "attributes",
+            "run_count",
+            "highlighted_filename",
+            "highlighted_path",
+        ):
+            if field in show:
+                lines.append(f"{field}: {getattr(result, field, None)}")
+    return "\n".join(lines) + "\n"
 
 
 def query_malicious_files_from_csv(
-    csv_path: str, search_provider: SearchProvider, max_search_depth: int = 2
+    csv_path: str,
+    search_provider: SearchProvider,
+    max_search_depth: int = 2,
+    verify_sha256: bool = False,
+    output_format: str = "text",
+    output_file: Optional[str] = None,
 ) -> str:
     """
     从CSV文件查询恶意释放的文件。
@@ -66,15 +158,24 @@ def query_malicious_files_from_csv(
     - 第2层：在上两层目录下，使用Everything查找文件
     - 第3层：在全局范围内，使用Everything查找文件
 
+    各层由 ReleaseFileQueryPlanner 批量查询，结论与逐行检查一致。
+    verify_sha256 为 True 时，再计算找到的文件的 SHA256 与 CSV 比对，
+    排除同名文件造成的误报（哈希按路径、大小和修改时间缓存）。
+
     Args:
         csv_path: CSV文件路径
         search_provider: 搜索提供者
         max_search_depth: 最大向上检查目录层数
+        verify_sha256: 是否校验文件哈希
+        output_format: 输出格式（text、json、ndjson，见 structured_output）
+        output_file: 完整结果写入的文件（输出目录内，不覆盖已有文件），指定时只返回摘要和文件路径
 
     Returns:
         查询结果字符串
     """
     try:
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"不支持的输出格式: {output_format}")
         # 检查CSV文件是否存在
         if not os.path.exists(csv_path):
             return f"错误: CSV文件不存在: {csv_path}"
@@ -89,6 +190,7 @@ def query_malicious_files_from_csv(
             "未找到的文件": [],
         }
 
+        file_infos = []
         with open(csv_path, "r", encoding="utf-8") as f:
             csv_reader = csv.DictReader(f)
 
@@ -103,99 +205,65 @@ def query_malicious_files_from_csv(
                     continue
 
                 # 文件信息记录
-                file_info = {
-                    "查询目标": target,
-                    "环境": environment,
-                    "文件名": file_name,
-                    "预期路径": file_path,
-                    "SHA256": sha256,
-                }
+                file_infos.append(
+                    {
+                        "查询目标": target,
+                        "环境": environment,
+                        "文件名": file_name,
+                        "预期路径": file_path,
+                        "SHA256": sha256,
+                    }
+                )
+
+        cache_before = (
+            search_provider.snapshot()
+            if isinstance(search_provider, CachingSearchProvider)
+            else None
+        )
 
-                found = False
-                found_status = None
-                check_result = None
-
-                # 第0层：在预期路径所在目录下查找文件
-                try:
-                    file_dir = str(Path(file_path).parent)
-                    search_query = f"path:{file_dir} {file_name}"
-                    results = search_provider.search_files(
-                        query=search_query, max_results=10
-                    )
-                    if results and any(
-                        file_name.lower() in r.filename.lower() for r in results
-                    ):
-                        found = True
-                        found_status = "文件存在"
-                        check_result = f"在预期目录 {file_dir} 中找到"
-                except Exception as e:
-                    print(f"第0层查询失败: {e}", file=sys.stderr)
-
-                # 如果文件未找到，检查第1层：上一层目录下查找文件
-                if not found and max_search_depth >= 1:
-                    try:
-                        parent_dir = str(Path(file_path).parent.parent)
-                        search_query = f"path:{parent_dir} {file_name}"
-                        results = search_provider.search_files(
-                            query=search_query, max_results=10
-                        )
-                        if results and any(
-                            file_name.lower() in r.filename.lower() for r in results
-                        ):
-                            found = True
-                            found_status = "上一层目录存在"
-                            check_result = f"在上一层目录 {parent_dir} 中找到"
-                    except Exception as e:
-                        print(f"第1层查询失败: {e}", file=sys.stderr)
-
-                # 如果仍未找到，检查第2层：上两层目录下查找文件
-                if not found and max_search_depth >= 2:
-                    try:
-                        grandparent_dir = str(Path(file_path).parent.parent.parent)
-                        search_query = f"path:{grandparent_dir} {file_name}"
-                        results = search_provider.search_files(
-                            query=search_query, max_results=10
-                        )
-                        if results and any(
-                            file_name.lower() in r.filename.lower() for r in results
-                        ):
-                            found = True
-                            found_status = "上两层目录存在"
-                            check_result = f"在上两层目录 {grandparent_dir} 中找到"
-                    except Exception as e:
-                        print(f"第2层查询失败: {e}", file=sys.stderr)
-
-                # 如果仍未找到，检查第3层：在全局范围内查找文件
-                if not found:
-                    try:
-                        search_query = file_name
-                        results = search_provider.search_files(
-                            query=search_query, max_results=10
-                        )
-                        if results and any(
-                            file_name.lower() in r.filename.lower() for r in results
-                        ):
-                            found = True
-                            found_status = "全局范围存在"
-                            found_paths = [
-                                r.path
-                                for r in results
-                                if file_name.lower() in r.filename.lower()
-                            ]
-                            check_result = (
-                                f"在全局范围内找到: {', '.join(found_paths[:3])}"
-                            )
-                    except Exception as e:
-                        print(f"第3层查询失败: {e}", file=sys.stderr)
-
-                # 记录结果
-                if found:
-                    file_info["检查结果"] = check_result
-                    file_info["状态"] = found_status
-                    results_by_status["找到的文件"].append(file_info)
-                    results_by_status[found_status].append(file_info)
-                else:
-                    results_by_status["未找到的文件"].append(file_info)
+        # 按层批量查询：去重文件名和目录，合并为 OR 查询后在内存中分配结果
+        # 本地不存在的目录（如沙箱用户目录）不发送分层查询
+        planner = ReleaseFileQueryPlanner(
+            search_provider, max_search_depth, dir_precheck=DirectoryPrecheck.from_env()
+        )
+        checks = planner.resolve(
+            [(info["文件名"], info["预期路径"]) for info in file_infos]
+        )
+
+        # 记录结果
+        for file_info, check in zip(file_infos, checks):
+            if check.status:
+                file_info["检查结果"] = check.check_result
+                file_info["状态"] = check.status
+                results_by_status["找到的文件"].append(file_info)
+                results_by_status[check.status].append(file_info)
+            else:
+                results_by_status["未找到的文件"].append(file_info)
+
+        hash_stats = None
+        # id(file_info) -> 哈希校验结果
+        verifications_by_file = {}
+        if verify_sha256:
+            found_pairs = [
+                (file_info, check)
+                for file_info, check in zip(file_infos, checks)
+                if check.status
+            ]
+            cache = HashCache.from_env()
+            try:
+                verifier = HashVerifier(
+                    cache,
+                    int(os.getenv("EVERYTHING_HASH_WORKERS", DEFAULT_HASH_WORKERS)),
+                )
+                verifications = verifier.verify(
+                    [(info["SHA256"], check.paths) for info, check in found_pairs]
+                )
+            finally:
+                cache.close()
+            for (file_info, _), verification in zip(found_pairs, verifications):
+                file_info["哈希校验"] = verification.describe()
+                verifications_by_file[id(file_info)] = verification
+            hash_stats = verifier.stats
 
         # 格式化输出
         output_lines = []
@@ -223,7 +291,57 @@ def query_malicious_files_from_csv(
             f"    └─ 全局范围存在（第3层）: {len(results_by_status['全局范围存在'])}个 ⭐"
         )
         output_lines.append(f"  未找到: {len(results_by_status['未找到的文件'])}个 ✓")
+        output_lines.append(f"  查询次数: {planner.stats.format_summary()}")
+        if cache_before is not None:
+            cache_stats = search_provider.snapshot().since(cache_before)
+            output_lines.append(f"  搜索缓存: {cache_stats.format_summary()}")
+        if hash_stats is not None:
+            output_lines.append(f"  哈希校验: {hash_stats.format_summary()}")
         output_lines.append("")
+        summary_text = "\n".join(output_lines)
+
+        if output_format != "text":
+            summary = {
+                "csv_file": csv_path,
+                "total": total_files,
+                "found": len(results_by_status["找到的文件"]),
+                "not_found": len(results_by_status["未找到的文件"]),
+                "by_status": {
+                    code: len(results_by_status[status])
+                    for status, code in RELEASE_STATUS_CODES.items()
+                },
+                "queries": planner.stats.format_summary(),
+            }
+            if cache_before is not None:
+                summary["search_cache"] = cache_stats.format_summary()
+            if hash_stats is not None:
+                summary["hash_check"] = {
+                    "confirmed": hash_stats.confirmed,
+                    "mismatched": hash_stats.mismatched,
+                    "unreadable": hash_stats.unreadable,
+                }
+            records = []
+            for file_info, check in zip(file_infos, checks):
+                record = {
+                    "target": file_info["查询目标"],
+                    "environment": file_info["环境"],
+                    "file_name": file_info["文件名"],
+                    "expected_path": file_info["预期路径"],
+                    "sha256": file_info["SHA256"],
+                    "status": RELEASE_STATUS_CODES.get(check.status, "not_found"),
+                    "level": check.level,
+                    "check_result": check.check_result,
+                    "paths": check.paths,
+                }
+                verification = verifications_by_file.get(id(file_info))
+                if verification is not None:
+                    record["hash_status"] = verification.status
+                    record["hash_matched_paths"] = verification.matched_paths
+                records.append(record)
+            content = render_structured(summary, records, output_format)
+            if output_file:
+                return write_output(content, output_file, summary, output_format)
+            return content
 
         # 文件存在
         if results_by_status["文件存在"]:
@@ -240,6 +358,8 @@ def query_malicious_files_from_csv(
                 output_lines.append(f"  环境: {file_info['环境']}")
                 output_lines.append(f"  预期路径: {file_info['预期路径']}")
                 output_lines.append(f"  SHA256: {file_info['SHA256']}")
+                if "哈希校验" in file_info:
+                    output_lines.append(f"  哈希校验: {file_info['哈希校验']}")
                 output_lines.append("")
 
         # 上一层目录存在
@@ -260,6 +380,8 @@ def query_malicious_files_from_csv(
                 output_lines.append(f"  预期路径: {file_info['预期路径']}")
                 output_lines.append(f"  存在目录: {file_info['检查结果']}")
                 output_lines.append(f"  SHA256: {file_info['SHA256']}")
+                if "哈希校验" in file_info:
+                    output_lines.append(f"  哈希校验: {file_info['哈希校验']}")
                 output_lines.append("")
 
         # 上两层目录存在
@@ -280,6 +402,8 @@ def query_malicious_files_from_csv(
                 output_lines.append(f"  预期路径: {file_info['预期路径']}")
                 output_lines.append(f"  存在目录: {file_info['检查结果']}")
                 output_lines.append(f"  SHA256: {file_info['SHA256']}")
+                if "哈希校验" in file_info:
+                    output_lines.append(f"  哈希校验: {file_info['哈希校验']}")
                 output_lines.append("")
 
         # 全局范围存在
@@ -300,6 +424,8 @@ def query_malicious_files_from_csv(
                 output_lines.append(f"  预期路径: {file_info['预期路径']}")
                 output_lines.append(f"  发现位置: {file_info['检查结果']}")
                 output_lines.append(f"  SHA256: {file_info['SHA256']}")
+                if "哈希校验" in file_info:
+                    output_lines.append(f"  哈希校验: {file_info['哈希校验']}")
                 output_lines.append("")
 
         # 未找到的文件
@@ -319,16 +445,158 @@ def query_malicious_files_from_csv(
                 output_lines.append(f"  SHA256: {file_info['SHA256']}")
                 output_lines.append("")
 
-        return "\n".join(output_lines)
+        text = "\n".join(output_lines)
+        if output_file:
+            return write_output(text, output_file, {}, "text", summary_text)
+        return text
 
     except Exception as e:
         return f"查询失败: {str(e)}"
 
 
+def run_search_tool(
+    arguments: dict, search_provider: SearchProvider, current_platform: str
+) -> str:
+    """
+    执行 search 工具（阻塞调用，由 call_tool 放到线程池中执行）。
+
+    Raises:
+        ValueError: 参数无效
+    """
+    # 解析和验证输入
+    base_params = {}
+    windows_params = {}
+
+    # 处理基础参数
+    if "base" in arguments:
+        if isinstance(arguments["base"], str):
+            try:
+                base_params = json.loads(arguments["base"])
+            except json.JSONDecodeError:
+                # 如果不是有效的 JSON 字符串，将其视为简单的查询字符串
+                base_params = {"query": arguments["base"]}
+        elif isinstance(arguments["base"], dict):
+            # 如果已经是字典，直接使用
+            base_params = arguments["base"]
+        else:
+            raise ValueError("'base' 参数必须是字符串或字典")
+
+    # 处理 Windows 特定参数
+    if "windows_params" in arguments:
+        if isinstance(arguments["windows_params"], str):
+            try:
+                windows_params = json.loads(arguments["windows_params"])
+            except json.JSONDecodeError:
+                raise ValueError("windows_params 中的 JSON 无效")
+        elif isinstance(arguments["windows_params"], dict):
+            # 如果已经是字典，直接使用
+            windows_params = arguments["windows_params"]
+        else:
+            raise ValueError("'windows_params' 必须是字符串或字典")
+
+    # 组合参数
+    query_params = {**base_params, "windows_params": windows_params}
+
+    # 创建统一查询
+    query = UnifiedSearchQuery(**query_params)
+    fields = list(normalize_fields(query.fields)) if query.fields is not None else None
+    # 游标绑定查询参数（不含游标和输出方式，翻页时可改变输出方式）
+    signature = query_signature(
+        query.model_dump(exclude={"cursor", "output_format", "output_file"})
+    )
+    offset = decode_cursor(query.cursor, signature) if query.cursor else 0
+
+    if current_platform == "windows":
+        # 直接使用 Everything SDK
+        platform_params = query.windows_params or WindowsSpecificParams()
+        results = search_provider.search_files(
+            query=query.query,
+            max_results=query.max_results,
+            match_path=platform_params.match_path,
+            match_case=platform_params.match_case,
+            match_whole_word=platform_params.match_whole_word,
+            match_regex=platform_params.match_regex,
+            sort_by=platform_params.sort_by,
+            fields=fields,
+            offset=offset,
+        )
+    else:
+        # 使用命令行工具（mdfind/locate）
+        platform_params = None
+        if current_platform == "darwin":
+            platform_params = query.mac_params or {}
+        elif current_platform == "linux":
+            platform_params = query.linux_params or {}
+
+        results = search_provider.search_files(
+            query=query.query,
+            max_results=query.max_results,
+            fields=fields,
+            offset=offset,
+            **platform_params.dict() if platform_params else {},
+        )
+
+    # 输出需要大小或时间戳时批量读取元数据
+    if fields is None or METADATA_FIELDS & set(fields):
+        prefetch_metadata(results)
+
+    summary = {"count": len(results), "offset": offset}
+    cache_note = ""
+    if isinstance(search_provider, CachingSearchProvider):
+        summary["search_cache"] = search_provider.snapshot().format_summary()
+        cache_note = f"\n[搜索缓存] 累计{summary['search_cache']}"
+
+    page_note = ""
+    summary["next_cursor"] = None
+    if len(results) >= query.max_results:
+        next_cursor = encode_cursor(signature, offset + len(results))
+        summary["next_cursor"] = next_cursor
+        page_note = (
+            f"\n[分页] 第 {offset + 1}-{offset + len(results)} 条，"
+            f"可能还有更多结果，使用相同参数并传入 cursor 获取下一页: "
+            f"{next_cursor}"
+        )
+
+    if query.output_format == "text":
+        content = (
+            "\n".join(format_search_result(r, fields) for r in results)
+            + page_note
+            + cache_note
+        )
+    else:
+        content = render_structured(
+            summary,
+            [search_result_record(r, fields) for r in results],
+            query.output_format,
+        )
+    if query.output_file:
+        content = write_output(
+            content,
+            query.output_file,
+            summary,
+            query.output_format,
+            f"找到 {len(results)} 条结果{page_note}{cache_note}",
+        )
+    return content
+
+
 async def serve() -> None:
     """运行服务器。"""
     current_platform = platform.system().lower()
-    search_provider = SearchProvider.get_provider()
+    # 重复的查询（同一 CSV 内及多次调用之间）由缓存直接返回
+    search_provider = CachingSearchProvider.from_env(SearchProvider.get_provider())
+    # 搜索和 CSV 检查都是阻塞调用，放到线程池中执行，避免一个长时间的检查阻塞其他请求；
+    # Everything 查询由 everything_sdk 串行化
+    executor = ThreadPoolExecutor(
+        max_workers=int(os.getenv("EVERYTHING_SERVER_WORKERS", DEFAULT_SERVER_WORKERS)),
+        thread_name_prefix="everything-search",
+    )
+
+    async def run_blocking(func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            executor, functools.partial(func, *args, **kwargs)
+        )
 
     server = Server("universal-search")
 
@@ -493,6 +761,10 @@ Examples:
 
 【Args 参数】
 - query (str): 搜索查询语句（支持通配符、正则表达式、布尔操作符）
+- cursor (str): 分页游标，上一页输出末尾给出；查询参数须与上一页相同
+- output_format (str): text（默认）、json 或 ndjson（摘要在前，字段名固定）
+- output_file (str): 完整结果写入输出目录（EVERYTHING_OUTPUT_DIR）下的该文件，只返回摘要和文件路径；不覆盖已有文件
+- fields (list[str]): 需要的结果字段（path、filename 始终返回），省略时返回全部字段，只请求所需字段可加快大结果集的搜索
 - max_results (int): 最多返回结果数，范围 1-1000，默认 100
 - match_path (bool): 是否匹配完整路径，默认 False（仅匹配文件名）
 - match_case (bool): 大小写敏感，默认 False
@@ -501,7 +773,7 @@ Examples:
 - sort_by (int): 排序选项，默认 1（按名称升序）
 
 【Return 返回值】
-返回匹配的文件列表（最多 max_results 条），每个文件包含：
+返回匹配的文件列表（每页最多 max_results 条，结果更多时末尾附带下一页的游标），每个文件包含：
 - Path: 完整文件路径
 - Filename: 文件名
 - Extension: 文件扩展名
@@ -528,12 +800,16 @@ Examples:
 - csv_file_path (str): CSV 文件路径，必须包含以下列：
   查询目标、样本SHA256、环境、文件名称、文件类型、文件路径、文件SHA256
 - max_search_depth (int): 最大向上搜索目录层数，范围 0-5，默认 2
+- verify_sha256 (bool): 计算找到的文件的 SHA256 并与 CSV 比对，排除同名文件误报，默认 False
+- output_format (str): text（默认，文本报告）、json 或 ndjson（统计摘要在前，字段名固定）
+- output_file (str): 完整结果写入输出目录（EVERYTHING_OUTPUT_DIR）下的该文件，只返回摘要和文件路径，适合大批量 CSV；不覆盖已有文件
 
 【Return 返回值】
 返回分层统计报告（文本格式），包含：
 - 总体统计信息（文件总数、找到数、未找到数）
 - 各层级分类结果（文件存在/目录存在/完全未找到）
-- 详细的风险等级评估和清理状态说明"""
+- 详细的风险等级评估和清理状态说明
+- 启用 verify_sha256 时，每个找到的文件附带哈希校验结论（哈希一致/哈希不一致/无法读取）"""
 
         return [
             Tool(
@@ -555,14 +831,21 @@ Examples:
             try:
                 csv_path = arguments.get("csv_file_path")
                 max_search_depth = arguments.get("max_search_depth", 2)
+                verify_sha256 = arguments.get("verify_sha256", False)
+                output_format = arguments.get("output_format", "text")
+                output_file = arguments.get("output_file")
 
                 if not csv_path:
                     raise ValueError("csv_file_path 是必需的参数")
 
-                result_text = query_malicious_files_from_csv(
+                result_text = await run_blocking(
+                    query_malicious_files_from_csv,
                     csv_path=csv_path,
                     search_provider=search_provider,
                     max_search_depth=max_search_depth,
+                    verify_sha256=verify_sha256,
+                    output_format=output_format,
+                    output_file=output_file,
                 )
 
                 return [TextContent(type="text", text=result_text)]
@@ -572,86 +855,10 @@ Examples:
         elif name == "search":
             # 处理标准搜索工具
             try:
-                # 解析和验证输入
-                base_params = {}
-                windows_params = {}
-
-                # 处理基础参数
-                if "base" in arguments:
-                    if isinstance(arguments["base"], str):
-                        try:
-                            base_params = json.loads(arguments["base"])
-                        except json.JSONDecodeError:
-                            # 如果不是有效的 JSON 字符串，将其视为简单的查询字符串
-                            base_params = {"query": arguments["base"]}
-                    elif isinstance(arguments["base"], dict):
-                        # 如果已经是字典，直接使用
-                        base_params = arguments["base"]
-                    else:
-                        raise ValueError("'base' 参数必须是字符串或字典")
-
-                # 处理 Windows 特定参数
-                if "windows_params" in arguments:
-                    if isinstance(arguments["windows_params"], str):
-                        try:
-                            windows_params = json.loads(arguments["windows_params"])
-                        except json.JSONDecodeError:
-                            raise ValueError("windows_params 中的 JSON 无效")
-                    elif isinstance(arguments["windows_params"], dict):
-                        # 如果已经是字典，直接使用
-                        windows_params = arguments["windows_params"]
-                    else:
-                        raise ValueError("'windows_params' 必须是字符串或字典")
-
-                # 组合参数
-                query_params = {**base_params, "windows_params": windows_params}
-
-                # 创建统一查询
-                query = UnifiedSearchQuery(**query_params)
-
-                if current_platform == "windows":
-                    # 直接使用 Everything SDK
-                    platform_params = query.windows_params or WindowsSpecificParams()
-                    results = search_provider.search_files(
-                        query=query.query,
-                        max_results=query.max_results,
-                        match_path=platform_params.match_path,
-                        match_case=platform_params.match_case,
-                        match_whole_word=platform_params.match_whole_word,
-                        match_regex=platform_params.match_regex,
-                        sort_by=platform_params.sort_by,
-                    )
-                else:
-                    # 使用命令行工具（mdfind/locate）
-                    platform_params = None
-                    if current_platform == "darwin":
-                        platform_params = query.mac_params or {}
-                    elif current_platform == "linux":
-                        platform_params = query.linux_params or {}
-
-                    results = search_provider.search_files(
-                        query=query.query,
-                        max_results=query.max_results,
-                        **platform_params.dict() if platform_params else {},
-                    )
-
-                return [
-                    TextContent(
-                        type="text",
-                        text="\n".join(
-                            [
-                                f"Path: {r.path}\n"
-                                f"Filename: {r.filename}"
-                                f"{f' ({r.extension})' if r.extension else ''}\n"
-                                f"Size: {r.size:,} bytes\n"
-                                f"Created: {r.created if r.created else 'N/A'}\n"
-                                f"Modified: {r.modified if r.modified else 'N/A'}\n"
-                                f"Accessed: {r.accessed if r.accessed else 'N/A'}\n"
-                                for r in results
-                            ]
-                        ),
-                    )
-                ]
+                content = await run_blocking(
+                    run_search_tool, arguments, search_provider, current_platform
+                )
+                return [TextContent(type="text", text=content)]
             except Exception as e:
                 return [TextContent(type="text", text=f"搜索失败: {str(e)}")]
 
@@ -660,7 +867,10 @@ Examples:
 
     options = server.create_initialization_options()
     async with stdio_server() as (read_stream, write_stream):
-        await server.run(read_stream, write_stream, options, raise_exceptions=True)
+        try:
+            await server.run(read_stream, write_stream, options, raise_exceptions=True)
+        finally:
+            executor.shutdown(wait=False)
 
 
 def configure_windows_console():
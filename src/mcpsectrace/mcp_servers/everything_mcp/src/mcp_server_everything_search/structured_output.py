@@ -0,0 +1,118 @@
+"""工具输出的结构化格式与写入文件。
+
+text 为原有的人类可读文本；json 为单个紧凑 JSON 对象（summary 在前，records 在后）；
+ndjson 每行一个 JSON 对象，第一行为 {"type": "summary", ...}，之后每行一条记录
+{"type": "record", ...}，便于流式处理。字段名固定为英文，不随显示文本变化。
+
+指定 output_file 时完整结果写入文件，工具只返回摘要和文件路径，
+大结果集不再占满 MCP 通道。输出文件只能位于输出目录（EVERYTHING_OUTPUT_DIR）内，
+且不覆盖已有文件。
+"""
+
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+OUTPUT_FORMATS = ("text", "json", "ndjson")
+
+
+def default_output_dir() -> str:
+    cache_dir = os.getenv("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(cache_dir, "mcp-everything-search", "output")
+
+
+def resolve_output_path(output_file: str, output_dir: Optional[str] = None) -> str:
+    """
+    把 output_file 解析为输出目录内的绝对路径。
+
+    相对路径相对于输出目录；解析符号链接后位于输出目录之外的路径被拒绝。
+
+    Args:
+        output_file: 工具参数中的文件路径
+        output_dir: 输出目录，默认读取 EVERYTHING_OUTPUT_DIR
+
+    Raises:
+        ValueError: 路径位于输出目录之外
+    """
+    if output_dir is None:
+        output_dir = os.getenv("EVERYTHING_OUTPUT_DIR") or default_output_dir()
+    output_dir = os.path.realpath(os.path.expanduser(output_dir))
+    path = os.path.realpath(os.path.join(output_dir, os.path.expanduser(output_file)))
+    if os.path.commonpath([output_dir, path]) != output_dir or path == output_dir:
+        raise ValueError(
+            f"输出文件必须位于输出目录 {output_dir} 内（EVERYTHING_OUTPUT_DIR）: "
+            f"{output_file}"
+        )
+    return path
+
+
+def _default(value: Any):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(
+        value, ensure_ascii=False, separators=(",", ":"), default=_default
+    )
+
+
+def render_structured(
+    summary: Dict[str, Any], records: List[Dict[str, Any]], output_format: str
+) -> str:
+    """
+    按 json 或 ndjson 输出摘要和记录。
+
+    Raises:
+        ValueError: 不支持的格式
+    """
+    if output_format == "json":
+        return _dumps({"summary": summary, "records": records})
+    if output_format == "ndjson":
+        lines = [_dumps({"type": "summary", **summary})]
+        lines.extend(_dumps({"type": "record", **record}) for record in records)
+        return "\n".join(lines) + "\n"
+    raise ValueError(
+        f"不支持的输出格式: {output_format}（可选: {', '.join(OUTPUT_FORMATS)}）"
+    )
+
+
+def write_output(
+    content: str,
+    output_file: str,
+    summary: Dict[str, Any],
+    output_format: str,
+    summary_text: Optional[str] = None,
+    output_dir: Optional[str] = None,
+) -> str:
+    """
+    把完整结果写入文件，返回供工具直接返回的摘要。
+
+    Args:
+        content: 完整输出
+        output_file: 目标文件路径，相对于输出目录，见 resolve_output_path
+        summary: 结构化摘要
+        output_format: 输出格式，决定返回摘要的形式
+        summary_text: text 格式下返回的摘要文本
+        output_dir: 输出目录，默认读取 EVERYTHING_OUTPUT_DIR
+
+    Raises:
+        ValueError: 路径位于输出目录之外，或文件已存在
+    """
+    output_file = resolve_output_path(output_file, output_dir)
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    try:
+        # 独占创建，不覆盖已有文件
+        with open(output_file, "x", encoding="utf-8") as f:
+            f.write(content)
+    except FileExistsError:
+        raise ValueError(f"输出文件已存在，不会覆盖: {output_file}") from None
+    size = os.path.getsize(output_file)
+    if output_format == "text":
+        lines = [f"完整结果已写入: {output_file}（{size} 字节）"]
+        if summary_text:
+            lines.append(summary_text)
+        return "\n".join(lines)
+    return _dumps({"summary": summary, "output_file": output_file, "bytes": size})
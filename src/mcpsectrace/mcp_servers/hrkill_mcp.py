@@ -15,6 +15,12 @@ if "pytest" not in sys.modules:
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8")
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding="utf-8")
 from mcpsectrace.config import get_config_value
+from mcpsectrace.core.jobs import (
+    JobManager,
+    cancellable_sleep,
+    register_job_tools,
+    report_progress,
+)
 from mcpsectrace.utils.image_recognition import ImageRecognition
 
 # --- 全局变量 ---
@@ -24,7 +30,7 @@ HRKILL_PATH = None
 
 # --- 导入MCP ---
 try:
-    from mcp.server.fastmcp import FastMCP
+    from mcp.server.fastmcp import Context, FastMCP
 except ImportError:
     print('[致命错误] 请先运行: uv add "mcp[cli]" httpx', file=sys.stderr)
     sys.exit(1)
@@ -32,6 +38,14 @@ except ImportError:
 # --- 创建MCP Server ---
 mcp = FastMCP("hrkill", log_level="ERROR", port=8888)
 
+# 长耗时的查杀工具在后台任务中执行；界面自动化不能并发，同一时间只运行一个任务
+jobs = JobManager(
+    max_workers=1,
+    max_finished_jobs=get_config_value("mcp.jobs.max_finished_jobs", default=50),
+    enabled=get_config_value("mcp.jobs.enabled", default=True),
+)
+register_job_tools(mcp, jobs)
+
 
 def get_sleep_time(base_type: str) -> float:
     """根据设备性能等级和基础时间类型计算实际等待时间"""
@@ -313,8 +327,7 @@ def start_app(exe_path):
         return False
 
 
-@mcp.tool()
-def scan_virus():
+def run_scan_virus():
     """
         执行hrkill软件的病毒查杀功能。
     Args：
@@ -431,14 +444,30 @@ def scan_virus():
                 return msg
 
             print(f"[{int(elapsed_time)}s] 继续等待扫描完成...")
+            report_progress(
+                int(elapsed_time),
+                interval,
+                f"已用 {int(elapsed_time)} 秒，等待扫描完成",
+            )
 
-        time.sleep(1)
+        cancellable_sleep(1)
 
     # 超时返回
     debug_print("扫描监控超时（10分钟）")
     return f"扫描监控超时，最后的截图保存在: {log_dir}"
 
 
+@mcp.tool()
+async def scan_virus(ctx: Context) -> str:
+    """
+        执行hrkill软件的病毒查杀功能（最长约10分钟）。
+        以后台任务运行并立即返回任务ID，使用 get_job_status / get_job_result 查看进度和结果，cancel_job 取消。
+    Args：
+        None
+    """
+    return await jobs.start("scan_virus", run_scan_virus, ctx=ctx)
+
+
 # --- 主函数 ---
 def main():
     """
@@ -478,10 +507,10 @@ def main():
     debug_mode = get_config_value("debug_mode", default=False)
     if debug_mode:
         debug_print("--- 当前处于调试模式 ---")
-        scan_virus()
+        run_scan_virus()
     else:
         debug_print("--- 当前处于MCP运行模式 ---")
-        # scan_virus()
+        # run_scan_virus()
         mcp.run(transport="stdio")
 
 
@@ -21,17 +21,31 @@ if "pytest" not in sys.modules:
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8")
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding="utf-8")
 from mcpsectrace.config import get_config_value
+from mcpsectrace.core.jobs import (
+    JobManager,
+    cancellable_sleep,
+    register_job_tools,
+    report_progress,
+)
 from mcpsectrace.utils.image_recognition import ImageRecognition
 
 # --- 导入MCP ---
 try:
-    from mcp.server.fastmcp import FastMCP
+    from mcp.server.fastmcp import Context, FastMCP
 except ImportError:
     debug_print('[致命错误] 请先运行: uv add "mcp[cli]" httpx')
     sys.exit(1)
 
 mcp = FastMCP("huorong", log_level="ERROR", port=8888)
 
+# 长耗时的查杀工具在后台任务中执行；界面自动化不能并发，同一时间只运行一个任务
+jobs = JobManager(
+    max_workers=1,
+    max_finished_jobs=get_config_value("mcp.jobs.max_finished_jobs", default=50),
+    enabled=get_config_value("mcp.jobs.enabled", default=True),
+)
+register_job_tools(mcp, jobs)
+
 # --- 全局变量 ---
 HUORONG_PATH = ""  # 将在main()中从配置文件加载
 
@@ -300,8 +314,7 @@ def start_huorong(path):
         return None
 
 
-@mcp.tool()
-def quick_scan():
+def run_quick_scan():
     """
         执行火绒安全软件的快速查杀功能。
     Args：
@@ -434,16 +447,20 @@ def quick_scan():
                 return f"快速查杀完成（已处理风险项）。耗时: {int(elapsed_time)}秒，截图保存在: {screenshot_path}"
 
             print(f"[{int(elapsed_time)}s] 继续等待查杀完成...")
+            report_progress(
+                int(elapsed_time),
+                interval,
+                f"已用 {int(elapsed_time)} 秒，等待查杀完成",
+            )
 
-        time.sleep(1)
+        cancellable_sleep(1)
 
     # 超时返回
     debug_print("查杀监控超时（10分钟）")
     return f"查杀监控超时，最后的截图保存在: {log_dir}"
 
 
-@mcp.tool()
-def full_scan():
+def run_full_scan():
     """
         执行火绒安全软件的全盘查杀功能。
     Args：
@@ -598,8 +615,13 @@ def full_scan():
                 return f"全盘查杀完成（已处理风险项）。耗时: {int(elapsed_time)}秒，截图保存在: {screenshot_path}"
 
             print(f"[{int(elapsed_time)}s] 继续等待全盘查杀完成...")
+            report_progress(
+                int(elapsed_time),
+                interval,
+                f"已用 {int(elapsed_time)} 秒，等待全盘查杀完成",
+            )
 
-        time.sleep(1)
+        cancellable_sleep(1)
 
     # 超时返回
     debug_print("全盘查杀监控超时（60分钟）")
@@ -878,6 +900,28 @@ def get_security_log():
     return f"日志导出成功，请查看文件{log_path} + {filename}.txt。"
 
 
+@mcp.tool()
+async def quick_scan(ctx: Context) -> str:
+    """
+        执行火绒安全软件的快速查杀功能（最长约10分钟）。
+        以后台任务运行并立即返回任务ID，使用 get_job_status / get_job_result 查看进度和结果，cancel_job 取消。
+    Args：
+        None
+    """
+    return await jobs.start("quick_scan", run_quick_scan, ctx=ctx)
+
+
+@mcp.tool()
+async def full_scan(ctx: Context) -> str:
+    """
+        执行火绒安全软件的全盘查杀功能（最长约60分钟）。
+        以后台任务运行并立即返回任务ID，使用 get_job_status / get_job_result 查看进度和结果，cancel_job 取消。
+    Args：
+        None
+    """
+    return await jobs.start("full_scan", run_full_scan, ctx=ctx)
+
+
 # --- 主函数 ---
 def main():
     """
@@ -902,7 +946,7 @@ def main():
     print("--- 火绒MCP服务器启动 ---", file=sys.stderr)
     debug_print(f"调试模式: {get_config_value('debug_mode', default=False)}")
     debug_print(f"设备性能等级: {get_config_value('device_level', default=2)}")
-    # full_scan()
+    # run_full_scan()
     # get_quarantine_file()
     # get_trust_zone()
     # get_security_log()
@@ -1,16 +1,25 @@
+import asyncio
+import base64
 import csv
 import io
+import ipaddress
 import json
 import logging
 import os
+import queue
 import re
 import sys
+import threading
 import time
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import List, Optional, Tuple
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
 
-from mcp.server.fastmcp import FastMCP
+import httpx
+from mcp.server.fastmcp import Context, FastMCP
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
@@ -20,6 +29,28 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
 
 from mcpsectrace.config import get_config_value
+from mcpsectrace.core.ioc_store import DOMAIN_PATTERN, IOCStore
+from mcpsectrace.core.jobs import (
+    JobCancelled,
+    JobManager,
+    bind_job,
+    cancellable_sleep,
+    check_cancelled,
+    current_job,
+    register_job_tools,
+    report_progress,
+)
+from mcpsectrace.utils.report_writer import MarkdownReportWriter, iter_markdown_table
+from mcpsectrace.utils.screenshot_pipeline import ScreenshotPipeline
+from mcpsectrace.utils.timing import Deadline, StageTimer, budgeted
+
+# HTTP/2 为 httpx 的可选功能（pip install "httpx[http2]"）
+try:
+    import h2  # noqa: F401
+
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
 
 # 配置日志，将日志输出到文件而不是 stdout（避免污染 MCP JSON-RPC 通信）
 # 日志保存到项目根目录的 logs 目录
@@ -63,6 +94,14 @@ json.dumps = _patched_dumps
 
 mcp = FastMCP("ioc", log_level="ERROR", port=8888)
 
+# 目标分析在后台任务中执行，每个任务从 profile_slots 领取独立的浏览器用户数据目录
+jobs = JobManager(
+    max_workers=get_config_value("ioc.job_max_workers", default=2),
+    max_finished_jobs=get_config_value("mcp.jobs.max_finished_jobs", default=50),
+    enabled=get_config_value("mcp.jobs.enabled", default=True),
+)
+register_job_tools(mcp, jobs)
+
 
 def scroll_to_element_and_wait(driver, element, wait_seconds=2):
     """滚动到元素位置并等待指定时间"""
@@ -72,11 +111,154 @@ def scroll_to_element_and_wait(driver, element, wait_seconds=2):
             "arguments[0].scrollIntoView({behavior: 'smooth', block: 'center'});",
             element,
         )
-        time.sleep(wait_seconds)  # 等待滚动和渲染完成
+        cancellable_sleep(budgeted(wait_seconds))  # 等待滚动和渲染完成
+    except JobCancelled:
+        raise
     except Exception as e:
         log_print(f"滚动到元素时出错: {e}")
 
 
+# Selenium 默认的页面加载超时（秒），不限时调用时恢复为该值
+DEFAULT_PAGE_LOAD_TIMEOUT = 300
+
+
+def screenshots_enabled(profile: Optional[str] = None) -> bool:
+    """
+    驱动配置是否需要截图：lean 配置默认只提取文本，由 ioc.lean_profile.screenshots 开启
+
+    Args:
+        profile: 驱动配置，为None时读取 ioc.driver_profile
+    """
+    if profile is None:
+        profile = get_config_value("ioc.driver_profile", default="default")
+    if profile == "lean":
+        return get_config_value("ioc.lean_profile.screenshots", default=False)
+    return True
+
+
+def driver_screenshots_enabled(driver) -> bool:
+    """按驱动实际使用的配置（setup_driver 记录在 driver.driver_profile）判断是否需要截图"""
+    return screenshots_enabled(getattr(driver, "driver_profile", None))
+
+
+def budgeted_get(driver: webdriver.Chrome, url: str):
+    """打开页面，页面加载超时不超过当前截止时间的剩余时间"""
+    deadline = Deadline.current()
+    if deadline is not None and deadline.limited:
+        driver.set_page_load_timeout(max(1.0, deadline.remaining()))
+    else:
+        driver.set_page_load_timeout(DEFAULT_PAGE_LOAD_TIMEOUT)
+    driver.get(url)
+
+
+class TimeBudget:
+    """
+    单个目标的抓取时间预算
+
+    总预算由 ioc.time_budget.total_seconds 配置（0 表示不限时），各阶段按
+    ioc.time_budget.shares 中的比例分得子截止时间；剩余时间不足
+    ioc.time_budget.min_stage_seconds 的阶段直接跳过并在报告中注明。
+    """
+
+    def __init__(self, total_seconds: Optional[float] = None):
+        if total_seconds is None:
+            total_seconds = get_config_value("ioc.time_budget.total_seconds", default=0)
+        self.total_seconds = total_seconds or 0
+        self.min_stage_seconds = get_config_value(
+            "ioc.time_budget.min_stage_seconds", default=5
+        )
+        self.per_sample_seconds = get_config_value(
+            "ioc.time_budget.per_sample_seconds", default=0
+        )
+        self.deadline = Deadline(self.total_seconds)
+        self.skipped: List[str] = []
+
+    def stage(self, name: str, label: str) -> Optional[Deadline]:
+        """
+        为阶段分配子截止时间
+
+        Args:
+            name: 阶段名称，对应 ioc.time_budget.shares 中的键
+            label: 跳过时记录在报告中的名称
+
+        Returns:
+            Optional[Deadline]: 阶段截止时间，剩余时间不足时返回None
+        """
+        if not self.deadline.limited:
+            return self.deadline
+        if self.deadline.remaining() < self.min_stage_seconds:
+            self.skip(label)
+            return None
+        share = get_config_value(f"ioc.time_budget.shares.{name}", default=1.0)
+        return self.deadline.child(self.total_seconds * share)
+
+    def skip(self, label: str):
+        """记录被跳过的部分"""
+        log_print(f"⏱️ 时间预算不足，跳过: {label}")
+        self.skipped.append(label)
+
+    def markdown(self) -> str:
+        """生成报告中的时间预算说明"""
+        lines = [
+            "\n---\n\n## 时间预算\n\n",
+            f"总预算 {self.total_seconds} 秒，以下部分因时间不足被跳过：\n\n",
+        ]
+        lines.extend(f"- {label}\n" for label in self.skipped)
+        lines.append("\n")
+        return "".join(lines)
+
+
+# 报告中截图链接的前缀（报告位于 logs/ioc 下）
+PIC_LINK_PREFIX = "../../src/mcpsectrace/mcp_servers/artifacts/ioc/ioc_pic"
+
+_screenshot_pipelines: Dict[str, ScreenshotPipeline] = {}
+_screenshot_pipelines_lock = threading.Lock()
+
+
+def get_screenshot_pipeline(output_dir: str) -> ScreenshotPipeline:
+    """获取截图目录对应的后处理流水线（进程内共享，批量分析时跨目标去重）"""
+    key = os.path.abspath(output_dir)
+    with _screenshot_pipelines_lock:
+        if key not in _screenshot_pipelines:
+            _screenshot_pipelines[key] = ScreenshotPipeline(
+                output_dir,
+                image_format=get_config_value(
+                    "ioc.screenshot_pipeline.format", default="png"
+                ),
+                max_width=get_config_value(
+                    "ioc.screenshot_pipeline.max_width", default=0
+                ),
+                quality=get_config_value("ioc.screenshot_pipeline.quality", default=80),
+                dedup=get_config_value("ioc.screenshot_pipeline.dedup", default=True),
+                dedup_distance=get_config_value(
+                    "ioc.screenshot_pipeline.dedup_distance", default=0
+                ),
+                hash_size=get_config_value(
+                    "ioc.screenshot_pipeline.hash_size", default=16
+                ),
+            )
+        return _screenshot_pipelines[key]
+
+
+def save_element_screenshot(element: WebElement, output_dir: str, name: str) -> str:
+    """
+    截取元素并交给后处理流水线
+
+    Args:
+        element: 要截图的元素
+        output_dir: 截图输出目录
+        name: 不含扩展名的文件名
+
+    Returns:
+        str: 截图文件名（重复截图返回已有文件）
+    """
+    filename = get_screenshot_pipeline(output_dir).submit(
+        element.screenshot_as_png, name
+    )
+    log_print(f"截图已提交: {os.path.join(output_dir, filename)}")
+    return filename
+
+
 @dataclass
 class ScreenshotConfig:
     """截图配置信息"""
@@ -95,20 +277,95 @@ class ThreatBookConfig:
     target_value: str
     base_url: str
     screenshot_configs: List[ScreenshotConfig]
+    sample_site_url: str = "https://s.threatbook.com"
+    # 页面加载等待秒数，为None时读取 ioc.page_load_wait_seconds
+    page_load_wait_seconds: Optional[float] = None
+
+
+@dataclass
+class AnalysisResult:
+    """单个目标的分析结果"""
+
+    target_type: str
+    target_value: str
+    success: bool = False
+    report_path: Optional[str] = None
+    related_sample_count: Optional[int] = None
+    elapsed_seconds: float = 0.0
+    error: str = ""
+    # 各阶段耗时（秒），键为阶段名称
+    stage_timings: Dict[str, float] = field(default_factory=dict)
+    # 因时间预算不足而跳过的部分
+    skipped_stages: List[str] = field(default_factory=list)
+
+
+class ProfileSlots:
+    """
+    浏览器用户数据目录序号分配器
+
+    Chrome 不允许多个实例共用同一个用户数据目录。单目标任务和批量分析的浏览器池
+    都从这里领取序号，同时运行的浏览器在进程内不会拿到相同的序号。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_use: Set[int] = set()
+
+    def acquire(self) -> int:
+        """领取当前未被占用的最小序号"""
+        with self._lock:
+            index = 0
+            while index in self._in_use:
+                index += 1
+            self._in_use.add(index)
+            return index
+
+    def release(self, index: int):
+        """归还序号"""
+        with self._lock:
+            self._in_use.discard(index)
+
+
+profile_slots = ProfileSlots()
 
 
 class SeleniumDriver:
     """Selenium WebDriver 管理类"""
 
-    def __init__(self):
+    def __init__(self, profile_index: int = 0):
+        """
+        Args:
+            profile_index: 用户数据目录序号（见 ProfileSlots）。Chrome 不允许多个实例共用同一个
+                用户数据目录，序号大于0的实例会使用 "<chrome_user_data_dir>-pool-<序号>" 目录。
+        """
         self.driver = None
+        self.profile_index = profile_index
+
+    def setup_driver(
+        self, capture_network: Optional[bool] = None, profile: Optional[str] = None
+    ) -> webdriver.Chrome:
+        """
+        设置并返回WebDriver实例
+
+        Args:
+            capture_network: 是否开启 DevTools 网络日志以捕获接口响应（见 NetworkCapture），
+                为None时读取 ioc.capture_network
+            profile: 驱动配置，"default" 为完整有界面浏览器，"lean" 为只取数据的无头浏览器
+                （屏蔽图片/字体/媒体等资源），为None时读取 ioc.driver_profile
+        """
+        if capture_network is None:
+            capture_network = get_config_value("ioc.capture_network", default=False)
+        if profile is None:
+            profile = get_config_value("ioc.driver_profile", default="default")
+        lean = profile == "lean"
+        screenshots = screenshots_enabled(profile)
 
-    def setup_driver(self) -> webdriver.Chrome:
-        """设置并返回WebDriver实例"""
         # 从配置获取路径
         chrome_exe_path = get_config_value("paths.chrome_exe", default="")
         chromedriver_exe_path = get_config_value("paths.chromedriver_exe", default="")
         user_data_dir = get_config_value("paths.chrome_user_data_dir", default="")
+        if user_data_dir and self.profile_index > 0:
+            user_data_dir = f"{user_data_dir}-pool-{self.profile_index}"
 
         # 检查路径是否存在
         if (
@@ -140,6 +397,13 @@ class SeleniumDriver:
         if user_data_dir:
             chrome_options.add_argument(f"--user-data-dir={user_data_dir}")
 
+        if lean:
+            SeleniumDriver._add_lean_arguments(chrome_options, screenshots)
+
+        # 开启性能日志，网络事件会随之写入 driver.get_log("performance")
+        if capture_network:
+            chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+
         # 创建ChromeDriver服务
         if chromedriver_exe_path:
             service = Service(chromedriver_exe_path)
@@ -148,13 +412,57 @@ class SeleniumDriver:
 
         # 创建WebDriver实例
         self.driver = webdriver.Chrome(service=service, options=chrome_options)
+        # 记录实际使用的驱动配置，抓取时据此决定截图还是提取文本
+        self.driver.driver_profile = profile
+        if capture_network or lean:
+            # 启用 Network 域：Network.getResponseBody 和 Network.setBlockedURLs 都依赖它
+            self.driver.execute_cdp_cmd("Network.enable", {})
+        if lean:
+            blocked_urls = SeleniumDriver._lean_blocked_urls(screenshots)
+            self.driver.execute_cdp_cmd(
+                "Network.setBlockedURLs", {"urls": blocked_urls}
+            )
+            log_print(f"lean 配置已屏蔽 {len(blocked_urls)} 类资源")
 
         # 从配置获取窗口大小
-        window_size = get_config_value("ioc.window_size", default=[1920, 1200])
+        if lean:
+            window_size = get_config_value(
+                "ioc.lean_profile.window_size", default=[1280, 900]
+            )
+        else:
+            window_size = get_config_value("ioc.window_size", default=[1920, 1200])
         self.driver.set_window_size(window_size[0], window_size[1])
 
         return self.driver
 
+    @staticmethod
+    def _add_lean_arguments(chrome_options: Options, screenshots: bool):
+        """添加 lean 配置的启动参数：无头、关闭后台网络和非必要组件、限制渲染进程数，不截图时不加载图片"""
+        chrome_options.add_argument("--headless=new")
+        chrome_options.add_argument("--disable-background-networking")
+        chrome_options.add_argument("--disable-component-update")
+        chrome_options.add_argument("--disable-default-apps")
+        chrome_options.add_argument("--disable-sync")
+        chrome_options.add_argument("--disable-features=Translate,MediaRouter")
+        chrome_options.add_argument("--metrics-recording-only")
+        chrome_options.add_argument("--mute-audio")
+        chrome_options.add_argument("--no-first-run")
+        chrome_options.add_argument("--renderer-process-limit=2")
+        if not screenshots:
+            chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+
+    @staticmethod
+    def _lean_blocked_urls(screenshots: bool) -> List[str]:
+        """lean 配置需要屏蔽的URL模式；需要截图时保留图片"""
+        blocked_urls = list(
+            get_config_value("ioc.lean_profile.blocked_url_patterns", default=[])
+        )
+        if not screenshots:
+            blocked_urls += get_config_value(
+                "ioc.lean_profile.blocked_image_patterns", default=[]
+            )
+        return blocked_urls
+
     def quit_driver(self):
         """关闭WebDriver"""
         if self.driver:
@@ -162,6 +470,243 @@ class SeleniumDriver:
             self.driver = None
 
 
+class DriverPool:
+    """WebDriver 池，批量分析时让多个工作线程复用已启动的浏览器"""
+
+    def __init__(self, size: int):
+        self.size = max(1, size)
+        self._idle = queue.Queue()
+        self._members = [
+            SeleniumDriver(profile_index=profile_slots.acquire())
+            for _ in range(self.size)
+        ]
+        for selenium_driver in self._members:
+            self._idle.put(selenium_driver)
+
+    @staticmethod
+    def _is_alive(driver: webdriver.Chrome) -> bool:
+        """检查浏览器会话是否仍然可用"""
+        try:
+            _ = driver.current_url
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _discard(selenium_driver: SeleniumDriver):
+        """关闭失效的浏览器，下次取用时重新启动"""
+        try:
+            selenium_driver.quit_driver()
+        except Exception as e:
+            log_print(f"关闭失效的WebDriver时出错: {e}")
+        selenium_driver.driver = None
+
+    @contextmanager
+    def driver(self):
+        """取出一个浏览器实例（按需启动），用完后归还到池中"""
+        selenium_driver = self._idle.get()
+        try:
+            if selenium_driver.driver is None:
+                selenium_driver.setup_driver()
+            yield selenium_driver.driver
+        finally:
+            if selenium_driver.driver is not None and not self._is_alive(
+                selenium_driver.driver
+            ):
+                log_print(
+                    f"浏览器池实例 {selenium_driver.profile_index} 已失效，将重建"
+                )
+                self._discard(selenium_driver)
+            self._idle.put(selenium_driver)
+
+    def close(self):
+        """关闭池中所有浏览器并归还用户数据目录序号"""
+        for selenium_driver in self._members:
+            self._discard(selenium_driver)
+            profile_slots.release(selenium_driver.profile_index)
+
+
+class RateLimiter:
+    """全局速率限制器，保证相邻两次放行的间隔不小于 60 / rate_per_minute 秒"""
+
+    def __init__(self, rate_per_minute: float):
+        self.interval = 60.0 / rate_per_minute if rate_per_minute > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def acquire(self) -> float:
+        """阻塞直到获得下一个放行时隙，返回实际等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            wait_seconds = max(0.0, self._next_slot - now)
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if wait_seconds > 0:
+            cancellable_sleep(wait_seconds)
+        return wait_seconds
+
+
+class NetworkCapture:
+    """
+    基于 Chrome DevTools 性能日志捕获页面背后的 JSON 接口响应
+
+    目前只与原有的 XPath 抓取和点击并行运行：捕获的接口数据另存为 JSON 并附在报告中，
+    报告内容仍来自页面抓取。各接口的响应结构确认后，再用接口数据替换对应的点击和表格抓取。
+    """
+
+    # 分类 -> URL 片段（不区分大小写，按顺序匹配，先命中者优先），
+    # 可通过 ioc.network_capture_patterns 覆盖
+    DEFAULT_PATTERNS = {
+        "sample_report": ["/report/file", "multiengines", "sandbox"],
+        "related_samples": ["relatedsample", "related_sample", "sample/list"],
+        "intel_insight": ["intelinsight", "insight"],
+        "summary": ["summary", "/basic"],
+    }
+
+    def __init__(self, driver, patterns: Optional[Dict[str, List[str]]] = None):
+        """
+        Args:
+            driver: 开启了性能日志的WebDriver实例，或离线回放用的 RecordedNetworkDriver
+            patterns: URL 分类规则，为None时读取配置
+        """
+        if patterns is None:
+            patterns = get_config_value(
+                "ioc.network_capture_patterns", default=None
+            ) or dict(NetworkCapture.DEFAULT_PATTERNS)
+
+        self.driver = driver
+        self.patterns = {
+            category: [fragment.lower() for fragment in fragments]
+            for category, fragments in patterns.items()
+        }
+        self.responses: Dict[str, List[dict]] = {
+            category: [] for category in self.patterns
+        }
+        # 原始日志和响应体，保存后可由 RecordedNetworkDriver 回放
+        self.recording = {"performance_log": [], "bodies": {}}
+        self._pending: Dict[str, dict] = {}
+
+    def classify(self, url: str) -> Optional[str]:
+        """根据URL判断接口所属分类，未命中返回None"""
+        url_lower = url.lower()
+        for category, fragments in self.patterns.items():
+            if any(fragment in url_lower for fragment in fragments):
+                return category
+        return None
+
+    def collect(self) -> int:
+        """
+        读取自上次调用以来的性能日志，取回已完成的JSON响应
+
+        Returns:
+            int: 本次新捕获的响应数量
+        """
+        try:
+            entries = self.driver.get_log("performance")
+        except Exception as e:
+            log_print(f"读取性能日志失败（是否开启了 ioc.capture_network？）: {e}")
+            return 0
+
+        captured = 0
+        for entry in entries:
+            try:
+                message = json.loads(entry["message"])["message"]
+            except (KeyError, TypeError, ValueError):
+                continue
+
+            method = message.get("method")
+            params = message.get("params", {})
+
+            if method == "Network.responseReceived":
+                response = params.get("response", {})
+                category = self.classify(response.get("url", ""))
+                if category and "json" in response.get("mimeType", "").lower():
+                    self.recording["performance_log"].append(entry)
+                    self._pending[params["requestId"]] = {
+                        "category": category,
+                        "url": response.get("url", ""),
+                        "status": response.get("status"),
+                    }
+
+            elif method == "Network.loadingFinished":
+                request_id = params.get("requestId")
+                if request_id not in self._pending:
+                    continue
+                self.recording["performance_log"].append(entry)
+                info = self._pending.pop(request_id)
+                data = self._fetch_json_body(request_id)
+                if data is not None:
+                    self.responses[info["category"]].append(
+                        {"url": info["url"], "status": info["status"], "data": data}
+                    )
+                    captured += 1
+
+        if captured:
+            log_print(f"捕获接口响应 {captured} 个")
+        return captured
+
+    def _fetch_json_body(self, request_id: str):
+        """通过 Network.getResponseBody 取回并解析响应体"""
+        try:
+            body = self.driver.execute_cdp_cmd(
+                "Network.getResponseBody", {"requestId": request_id}
+            )
+        except Exception as e:
+            log_print(f"获取响应体失败 {request_id}: {e}")
+            return None
+
+        self.recording["bodies"][request_id] = body
+        text = body.get("body", "")
+        if body.get("base64Encoded"):
+            text = base64.b64decode(text).decode("utf-8", errors="replace")
+        try:
+            return json.loads(text)
+        except ValueError as e:
+            log_print(f"响应体不是合法JSON {request_id}: {e}")
+            return None
+
+    def summary_markdown(self) -> str:
+        """生成各分类捕获数量的Markdown列表"""
+        md_content = ""
+        for category, items in self.responses.items():
+            md_content += f"- {category}: {len(items)} 个响应\n"
+        return md_content
+
+    def save_responses(self, path: str):
+        """保存按分类整理的接口数据"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.responses, f, ensure_ascii=False, indent=2)
+        log_print(f"接口数据已保存: {path}")
+
+    def save_recording(self, path: str):
+        """保存原始性能日志和响应体，供离线回放"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.recording, f, ensure_ascii=False)
+        log_print(f"网络录制已保存: {path}")
+
+
+class RecordedNetworkDriver:
+    """回放 NetworkCapture.save_recording 保存的录制，供离线测试使用"""
+
+    def __init__(self, recording_path: str):
+        with open(recording_path, "r", encoding="utf-8") as f:
+            recording = json.load(f)
+        self._log = list(recording.get("performance_log", []))
+        self._bodies = recording.get("bodies", {})
+
+    def get_log(self, log_type: str) -> List[dict]:
+        """与真实驱动一致，每次读取后清空日志缓冲"""
+        entries, self._log = self._log, []
+        return entries
+
+    def execute_cdp_cmd(self, cmd: str, cmd_args: dict) -> dict:
+        if cmd != "Network.getResponseBody":
+            return {}
+        request_id = cmd_args["requestId"]
+        if request_id not in self._bodies:
+            raise KeyError(f"录制中没有请求 {request_id} 的响应体")
+        return self._bodies[request_id]
+
+
 class ElementScreenshot:
     """元素截图处理类"""
 
@@ -178,7 +723,9 @@ class ElementScreenshot:
                 "arguments[0].scrollIntoView({behavior: 'smooth', block: 'center'});",
                 element,
             )
-            time.sleep(wait_seconds)
+            cancellable_sleep(budgeted(wait_seconds))
+        except JobCancelled:
+            raise
         except Exception as e:
             log_print(f"滚动到元素时出错: {e}")
 
@@ -197,7 +744,9 @@ class ElementScreenshot:
         """
         try:
             # 从配置获取超时时间
-            element_timeout = get_config_value("ioc.element_timeout", default=10)
+            element_timeout = budgeted(
+                get_config_value("ioc.element_timeout", default=10)
+            )
 
             # 根据选择器类型查找元素
             if config.selector_type == "class":
@@ -219,24 +768,29 @@ class ElementScreenshot:
             else:
                 raise ValueError(f"不支持的选择器类型: {config.selector_type}")
 
+            # 不截图时直接记录元素文本
+            if not driver_screenshots_enabled(driver):
+                md_content = f"## {config.markdown_title}\n\n{element.text.strip()}\n"
+                return True, None, md_content
+
             # 滚动到元素并等待
             ElementScreenshot.scroll_to_element_and_wait(driver, element)
 
             # 生成安全的文件名
             sanitized_target = re.sub(r'[\\/:*?"<>|]', "_", target_value)
-            screenshot_path = os.path.join(
-                output_dir, f"{sanitized_target}_{config.filename_suffix}.png"
+            filename = save_element_screenshot(
+                element, output_dir, f"{sanitized_target}_{config.filename_suffix}"
             )
-            element.screenshot(screenshot_path)
-
-            log_print(f"截图已保存: {screenshot_path}")
+            screenshot_path = os.path.join(output_dir, filename)
 
             # 生成Markdown内容
             md_content = f"## {config.markdown_title}\n"
-            md_content += f"![{config.markdown_title}](../../src/mcpsectrace/mcp_servers/artifacts/ioc/ioc_pic/{sanitized_target}_{config.filename_suffix}.png)\n"
+            md_content += f"![{config.markdown_title}]({PIC_LINK_PREFIX}/{filename})\n"
 
             return True, screenshot_path, md_content
 
+        except JobCancelled:
+            raise
         except Exception as e:
             error_msg = f"截取元素 {config.element_selector} 时出错: {e}"
             log_print(error_msg)
@@ -246,6 +800,46 @@ class ElementScreenshot:
 class SampleReportAnalyzer:
     """样本报告分析类"""
 
+    # 环境列表项的选取逻辑：优先取带 role 属性的 div，否则退回到带 class 的子 div（最多10个）
+    _ENV_ITEMS_JS = """
+const container = arguments[0];
+let items = Array.from(container.querySelectorAll("div[role]"));
+if (items.length === 0) {
+    items = Array.from(container.querySelectorAll("div"))
+        .filter(item => item !== container && item.getAttribute("class"))
+        .slice(0, 10);
+}
+"""
+
+    # 返回所有环境项的可见文本
+    ENV_ITEM_TEXTS_SCRIPT = (
+        _ENV_ITEMS_JS + "return items.map(item => (item.innerText || '').trim());"
+    )
+
+    # 滚动到第 arguments[1] 个环境项并点击，环境项不存在时返回 false
+    ENV_ITEM_CLICK_SCRIPT = (
+        _ENV_ITEMS_JS
+        + """
+const item = items[arguments[1]];
+if (!item) { return false; }
+item.scrollIntoView({block: 'center'});
+item.click();
+return true;
+"""
+    )
+
+    # 返回发行文件表格每一行第一列的可见文本，表格不存在时返回 null
+    RELEASE_FILE_ROWS_SCRIPT = """
+const container = document.getElementById("releaseFile");
+const tbody = container && container.querySelector("tbody.ant-table-tbody");
+if (!tbody) { return null; }
+return Array.from(tbody.querySelectorAll(".ant-table-row.ant-table-row-level-0"))
+    .map(row => {
+        const cell = row.querySelector("td.ant-table-cell");
+        return cell ? (cell.innerText || "").trim() : "";
+    });
+"""
+
     @staticmethod
     def parse_release_file_info(file_text: str) -> Optional[dict]:
         """
@@ -315,6 +909,9 @@ class SampleReportAnalyzer:
         sha256: str,
         pic_output_dir: str,
         target_value: str = "",
+        network_capture: Optional[NetworkCapture] = None,
+        sample_site_url: str = "https://s.threatbook.com",
+        page_load_wait: Optional[float] = None,
     ) -> Tuple[bool, str, List[List[str]]]:
         """
         访问样本报告页面并进行分析
@@ -324,6 +921,9 @@ class SampleReportAnalyzer:
             sha256: 样本的SHA256值
             pic_output_dir: 截图输出目录
             target_value: 查询目标（IP或域名）
+            network_capture: 接口响应捕获器，提供时在页面加载后收集样本报告接口数据
+            sample_site_url: 样本报告站点地址，离线回放时指向本地服务
+            page_load_wait: 页面加载等待秒数，为None时读取 ioc.page_load_wait_seconds
 
         Returns:
             Tuple[bool, str, List[List[str]]]: (成功标志, Markdown内容, CSV行数据列表)
@@ -332,47 +932,57 @@ class SampleReportAnalyzer:
         csv_rows = []  # 收集CSV数据
 
         try:
-            sample_url = f"https://s.threatbook.com/report/file/{sha256}"
+            sample_url = f"{sample_site_url}/report/file/{sha256}"
             log_print(f"正在分析样本: {sample_url}")
-            driver.get(sample_url)
+            budgeted_get(driver, sample_url)
 
             # 等待页面加载
-            page_load_wait = get_config_value("ioc.page_load_wait_seconds", default=10)
-            time.sleep(page_load_wait)
+            if page_load_wait is None:
+                page_load_wait = get_config_value(
+                    "ioc.page_load_wait_seconds", default=10
+                )
+            cancellable_sleep(budgeted(page_load_wait))
+            if network_capture:
+                network_capture.collect()
 
-            # 截图第一个位置
-            try:
-                element_timeout = get_config_value("ioc.element_timeout", default=10)
-                screenshot_element = WebDriverWait(driver, element_timeout).until(
-                    EC.presence_of_element_located(
-                        (
-                            By.XPATH,
-                            "/html/body/div/span/div/span/div/div/section/main/div/div[1]/div",
+            # 截图第一个位置（不需要截图时跳过）
+            if driver_screenshots_enabled(driver):
+                try:
+                    element_timeout = budgeted(
+                        get_config_value("ioc.element_timeout", default=10)
+                    )
+                    screenshot_element = WebDriverWait(driver, element_timeout).until(
+                        EC.presence_of_element_located(
+                            (
+                                By.XPATH,
+                                "/html/body/div/span/div/span/div/div/section/main/div/div[1]/div",
+                            )
                         )
                     )
-                )
-
-                # 滚动到元素位置
-                driver.execute_script(
-                    "arguments[0].scrollIntoView({behavior: 'smooth', block: 'center'});",
-                    screenshot_element,
-                )
-                time.sleep(2)
 
-                # 保存截图
-                sanitized_sha256 = sha256[:16]  # 只取前16个字符作为文件名
-                screenshot_path = os.path.join(
-                    pic_output_dir, f"sample_{sanitized_sha256}_report.png"
-                )
-                screenshot_element.screenshot(screenshot_path)
-                log_print(f"样本报告截图已保存: {screenshot_path}")
+                    # 滚动到元素位置
+                    driver.execute_script(
+                        "arguments[0].scrollIntoView({behavior: 'smooth', block: 'center'});",
+                        screenshot_element,
+                    )
+                    cancellable_sleep(budgeted(2))
+
+                    # 保存截图
+                    sanitized_sha256 = sha256[:16]  # 只取前16个字符作为文件名
+                    filename = save_element_screenshot(
+                        screenshot_element,
+                        pic_output_dir,
+                        f"sample_{sanitized_sha256}_report",
+                    )
 
-                md_content += f"![样本报告](../../src/mcpsectrace/mcp_servers/artifacts/ioc/ioc_pic/sample_{sanitized_sha256}_report.png)\n\n"
+                    md_content += f"![样本报告]({PIC_LINK_PREFIX}/{filename})\n\n"
 
-            except Exception as e:
-                error_msg = f"截取样本报告失败: {e}"
-                log_print(error_msg)
-                md_content += f"⚠️ {error_msg}\n\n"
+                except JobCancelled:
+                    raise
+                except Exception as e:
+                    error_msg = f"截取样本报告失败: {e}"
+                    log_print(error_msg)
+                    md_content += f"⚠️ {error_msg}\n\n"
 
             # 新增功能：处理环境列表和发行文件表格
             env_md, env_csv_rows = SampleReportAnalyzer.extract_environment_and_files(
@@ -383,6 +993,8 @@ class SampleReportAnalyzer:
 
             return True, md_content, csv_rows
 
+        except JobCancelled:
+            raise
         except Exception as e:
             error_msg = f"样本报告分析失败: {e}"
             log_print(error_msg)
@@ -408,7 +1020,9 @@ class SampleReportAnalyzer:
         csv_rows = []
 
         try:
-            element_timeout = get_config_value("ioc.element_timeout", default=10)
+            element_timeout = budgeted(
+                get_config_value("ioc.element_timeout", default=10)
+            )
 
             # 找到环境列表容器
             env_list_container = WebDriverWait(driver, element_timeout).until(
@@ -417,113 +1031,80 @@ class SampleReportAnalyzer:
                 )
             )
 
-            # 找到环境列表下的所有子元素（div）
-            env_items = env_list_container.find_elements(By.CSS_SELECTOR, "div[role]")
-
-            if not env_items:
-                # 备用选择器
-                env_items = env_list_container.find_elements(By.CSS_SELECTOR, "div")
-                # 过滤掉容器本身，只要子元素
-                env_items = [
-                    item
-                    for item in env_items
-                    if item.get_attribute("class") and item != env_list_container
-                ][
-                    :10
-                ]  # 限制数量，避免选择到过多元素
-
-            if env_items:
-                log_print(f"找到 {len(env_items)} 个环境项")
+            # 一次调用取回所有环境项文本（选取逻辑见 _ENV_ITEMS_JS）
+            env_texts = driver.execute_script(
+                SampleReportAnalyzer.ENV_ITEM_TEXTS_SCRIPT, env_list_container
+            )
+
+            if env_texts:
+                log_print(f"找到 {len(env_texts)} 个环境项")
                 # md_content += "### 不同环境文件释放位置\n\n"
 
-                for idx, env_item in enumerate(env_items, 1):
+                for idx, env_text in enumerate(env_texts, 1):
+                    check_cancelled()
                     try:
-                        # 获取环境项的文本
-                        env_text = env_item.text.strip()
+                        # 跳过空白环境项
                         if not env_text:
                             continue
 
                         log_print(f"处理环境项 {idx}: {env_text}")
                         md_content += f"#### {env_text}环境下常见释放路径\n\n"
 
-                        # 点击环境项
-                        driver.execute_script(
-                            "arguments[0].scrollIntoView({behavior: 'smooth', block: 'center'});",
-                            env_item,
-                        )
-                        time.sleep(1)
-                        env_item.click()
+                        # 点击环境项（脚本内完成滚动和点击）
+                        if not driver.execute_script(
+                            SampleReportAnalyzer.ENV_ITEM_CLICK_SCRIPT,
+                            env_list_container,
+                            idx - 1,
+                        ):
+                            raise RuntimeError("环境项已不在页面中")
 
                         # 等待页面加载
                         wait_time = get_config_value("ioc.scroll_wait_time", default=2)
-                        time.sleep(wait_time)
+                        cancellable_sleep(budgeted(wait_time))
 
-                        # 尝试获取发行文件表格
+                        # 尝试获取发行文件表格（一次调用取回所有行第一列的文本）
                         try:
-                            # 获取id为releaseFile的元素
-                            release_file_container = driver.find_element(
-                                By.ID, "releaseFile"
-                            )
-
-                            # 找到表格的tbody
-                            table_body = release_file_container.find_element(
-                                By.CSS_SELECTOR, "tbody.ant-table-tbody"
-                            )
-
-                            # 找到所有表格行
-                            table_rows = table_body.find_elements(
-                                By.CSS_SELECTOR, ".ant-table-row.ant-table-row-level-0"
+                            table_rows = driver.execute_script(
+                                SampleReportAnalyzer.RELEASE_FILE_ROWS_SCRIPT
                             )
+                            if table_rows is None:
+                                raise RuntimeError("未找到发行文件表格")
 
                             if table_rows:
                                 md_content += (
                                     f"**常见释放文件位置** ({len(table_rows)} 个)\n\n"
                                 )
 
-                                for row_idx, row in enumerate(table_rows, 1):
-                                    try:
-                                        # 找到第一个td（第一列）
-                                        first_cell = row.find_element(
-                                            By.CSS_SELECTOR, "td.ant-table-cell"
-                                        )
-
-                                        # 获取单元格中的所有文本内容
-                                        cell_text = first_cell.text.strip()
-
-                                        if cell_text:
-                                            md_content += f"- {cell_text}\n\n"
-                                            log_print(
-                                                f"  发行版本 {row_idx}: {cell_text}"
-                                            )
+                                for row_idx, cell_text in enumerate(table_rows, 1):
+                                    if cell_text:
+                                        md_content += f"- {cell_text}\n\n"
+                                        log_print(f"  发行版本 {row_idx}: {cell_text}")
 
-                                            # 解析文件信息
-                                            file_info = SampleReportAnalyzer.parse_release_file_info(
-                                                cell_text
-                                            )
+                                        # 解析文件信息
+                                        file_info = SampleReportAnalyzer.parse_release_file_info(
+                                            cell_text
+                                        )
 
-                                            if file_info:
-                                                # 构建 CSV 行数据
-                                                # 第1列：目标(IP或域名)
-                                                # 第2列：样本SHA256
-                                                # 第3列：环境名称
-                                                # 第4列：文件名称
-                                                # 第5列：文件类型
-                                                # 第6列：文件路径
-                                                # 第7列：文件SHA256
-                                                csv_row = [
-                                                    target_value,
-                                                    sha256,
-                                                    env_text,
-                                                    file_info["filename"],
-                                                    file_info["file_type"],
-                                                    file_info["file_path"],
-                                                    file_info["sha256"],
-                                                ]
-                                                csv_rows.append(csv_row)
-                                                log_print(f"  已添加CSV行: {csv_row}")
-
-                                    except Exception as e:
-                                        log_print(f"获取表格行 {row_idx} 失败: {e}")
+                                        if file_info:
+                                            # 构建 CSV 行数据
+                                            # 第1列：目标(IP或域名)
+                                            # 第2列：样本SHA256
+                                            # 第3列：环境名称
+                                            # 第4列：文件名称
+                                            # 第5列：文件类型
+                                            # 第6列：文件路径
+                                            # 第7列：文件SHA256
+                                            csv_row = [
+                                                target_value,
+                                                sha256,
+                                                env_text,
+                                                file_info["filename"],
+                                                file_info["file_type"],
+                                                file_info["file_path"],
+                                                file_info["sha256"],
+                                            ]
+                                            csv_rows.append(csv_row)
+                                            log_print(f"  已添加CSV行: {csv_row}")
 
                                 md_content += "\n"
                             else:
@@ -534,6 +1115,8 @@ class SampleReportAnalyzer:
                             log_print(error_msg)
                             md_content += f"⚠️ {error_msg}\n\n"
 
+                    except JobCancelled:
+                        raise
                     except Exception as e:
                         error_msg = f"处理环境项 {idx} 失败: {e}"
                         log_print(error_msg)
@@ -543,6 +1126,8 @@ class SampleReportAnalyzer:
                 log_print("未找到环境列表项")
                 md_content += "⚠️ 未找到环境列表信息\n\n"
 
+        except JobCancelled:
+            raise
         except Exception as e:
             error_msg = f"提取环境和文件信息失败: {e}"
             log_print(error_msg)
@@ -600,11 +1185,33 @@ class SampleReportAnalyzer:
 class ThreatDataExtractor:
     """威胁数据提取类"""
 
+    # 相关样本表格（CSV）的列
+    TABLE_HEADERS = [
+        "文件名称",
+        "类型",
+        "扫描时间",
+        "SHA256",
+        "多引擎检出",
+        "木马家族和类型",
+        "威胁等级",
+    ]
+
+    # 在页面内一次性读取表格：返回每行（arguments[1]）各单元格（arguments[2]）的 textContent
+    TABLE_ROWS_SCRIPT = """
+return Array.from(arguments[0].querySelectorAll(arguments[1])).map(row =>
+    Array.from(row.querySelectorAll(arguments[2])).map(
+        cell => (cell.textContent || "").trim()
+    )
+);
+"""
+
     @staticmethod
     def click_xpath_element(driver: webdriver.Chrome, xpath: str) -> bool:
         """点击指定XPath元素"""
         try:
-            element_timeout = get_config_value("ioc.element_timeout", default=10)
+            element_timeout = budgeted(
+                get_config_value("ioc.element_timeout", default=10)
+            )
             element = WebDriverWait(driver, element_timeout).until(
                 EC.element_to_be_clickable((By.XPATH, xpath))
             )
@@ -612,9 +1219,13 @@ class ThreatDataExtractor:
                 "arguments[0].scrollIntoView({behavior: 'smooth', block: 'center'});",
                 element,
             )
-            time.sleep(get_config_value("ioc.scroll_wait_time", default=2))
+            cancellable_sleep(
+                budgeted(get_config_value("ioc.scroll_wait_time", default=2))
+            )
             element.click()
             return True
+        except JobCancelled:
+            raise
         except Exception as e:
             log_print(f"点击XPath元素失败 {xpath}: {e}")
             return False
@@ -623,7 +1234,9 @@ class ThreatDataExtractor:
     def get_element_text(driver: webdriver.Chrome, xpath: str) -> Optional[str]:
         """获取指定XPath元素的文本内容"""
         try:
-            element_timeout = get_config_value("ioc.element_timeout", default=10)
+            element_timeout = budgeted(
+                get_config_value("ioc.element_timeout", default=10)
+            )
             element = WebDriverWait(driver, element_timeout).until(
                 EC.presence_of_element_located((By.XPATH, xpath))
             )
@@ -686,15 +1299,19 @@ class ThreatDataExtractor:
     ) -> Tuple[bool, Optional[List[List[str]]]]:
         """提取表格数据并保存为CSV，返回(成功标志, 表格数据)"""
         try:
-            element_timeout = get_config_value("ioc.element_timeout", default=10)
+            element_timeout = budgeted(
+                get_config_value("ioc.element_timeout", default=10)
+            )
             tbody = WebDriverWait(driver, element_timeout).until(
                 EC.presence_of_element_located((By.XPATH, tbody_xpath))
             )
 
-            # 查找所有tr元素
-            rows = tbody.find_elements(
-                By.CSS_SELECTOR,
+            # 一次调用取回所有行的单元格文本
+            rows = driver.execute_script(
+                ThreatDataExtractor.TABLE_ROWS_SCRIPT,
+                tbody,
                 "tr.x-antd-comp-table-row.x-antd-comp-table-row-level-0",
+                "td.x-antd-comp-table-cell",
             )
 
             if not rows:
@@ -702,30 +1319,12 @@ class ThreatDataExtractor:
                 return False, None
 
             # CSV数据
-            csv_data = []
-            headers = [
-                "文件名称",
-                "类型",
-                "扫描时间",
-                "SHA256",
-                "多引擎检出",
-                "木马家族和类型",
-                "威胁等级",
-            ]
-            csv_data.append(headers)
+            csv_data = [list(ThreatDataExtractor.TABLE_HEADERS)]
 
             # 提取每行数据
-            for row in rows:
-                cells = row.find_elements(By.CSS_SELECTOR, "td.x-antd-comp-table-cell")
+            for cells in rows:
                 if len(cells) >= 7:
-                    row_data = []
-                    for cell in cells[:7]:  # 只取前7列
-                        # 获取最里层的文本内容
-                        text = cell.get_attribute("textContent")
-                        if text:
-                            text = text.strip()
-                        row_data.append(text or "")
-                    csv_data.append(row_data)
+                    csv_data.append(cells[:7])  # 只取前7列
 
             # 保存CSV文件
             sanitized_target = re.sub(r'[\\/:*?"<>|]', "_", target_value)
@@ -749,20 +1348,8 @@ class ThreatDataExtractor:
         if not csv_data or len(csv_data) < 1:
             return ""
 
-        # 提取表头和行数据
-        headers = csv_data[0]
-        rows = csv_data[1:]
-
         # 构建Markdown表格
-        md_table = "| " + " | ".join(headers) + " |\n"
-        md_table += "| " + " | ".join(["---"] * len(headers)) + " |\n"
-
-        for row in rows:
-            # 确保行数据与表头列数一致
-            row_with_padding = row + [""] * (len(headers) - len(row))
-            md_table += "| " + " | ".join(row_with_padding[: len(headers)]) + " |\n"
-
-        return md_table
+        return "".join(iter_markdown_table(csv_data[0], csv_data[1:]))
 
 
 class ThreatBookAnalyzer:
@@ -801,7 +1388,16 @@ class ThreatBookAnalyzer:
                 By.CSS_SELECTOR, ".ant-collapse-item"
             )
 
+            deadline = Deadline.current()
             for i, item in enumerate(collapse_items):
+                check_cancelled()
+                # 时间预算用尽时跳过剩余面板
+                if deadline is not None and deadline.expired():
+                    skipped = len(collapse_items) - i
+                    log_print(f"时间预算用尽，跳过剩余 {skipped} 个面板")
+                    md_content += f"⏱️ 时间预算用尽，跳过剩余 {skipped} 个面板\n\n"
+                    break
+
                 try:
                     # 获取clue-type标题
                     clue_type_element = item.find_element(By.CLASS_NAME, "clue-type")
@@ -828,25 +1424,34 @@ class ThreatBookAnalyzer:
                         "ioc.panel_expand_wait_time", default=2
                     )
 
-                    time.sleep(panel_expand_wait)
+                    cancellable_sleep(budgeted(panel_expand_wait))
+
+                    # 不截图时记录展开后的面板文本
+                    if not driver_screenshots_enabled(driver):
+                        md_content += f"### {clue_title}\n\n{item.text.strip()}\n\n"
+                        continue
+
                     scroll_to_element_and_wait(driver, item, 2)
                     # 截图面板
                     sanitized_title = clue_title.replace(" ", "_")
-                    panel_screenshot_path = os.path.join(
+                    filename = save_element_screenshot(
+                        item,
                         output_dir,
-                        f"{sanitized_target}_panel_{i}_{sanitized_title}.png",
+                        f"{sanitized_target}_panel_{i}_{sanitized_title}",
                     )
-                    item.screenshot(panel_screenshot_path)
-                    log_print(f"面板截图已保存: {panel_screenshot_path}")
 
                     # 添加到Markdown
                     md_content += f"### {clue_title}\n"
-                    md_content += f"![{clue_title}](../../src/mcpsectrace/mcp_servers/artifacts/ioc/ioc_pic/{sanitized_target}_panel_{i}_{sanitized_title}.png)\n\n"
+                    md_content += f"![{clue_title}]({PIC_LINK_PREFIX}/{filename})\n\n"
 
+                except JobCancelled:
+                    raise
                 except Exception as e:
                     log_print(f"处理面板 {i} 时出错: {e}")
                     continue
 
+        except JobCancelled:
+            raise
         except Exception as e:
             error_msg = f"展开威胁面板时出错: {e}"
             log_print(error_msg)
@@ -854,18 +1459,755 @@ class ThreatBookAnalyzer:
         return md_content
 
 
-@mcp.tool()
-def analyze_ip_threat(ip_address: str) -> str:
+class ThreatBookAPIError(Exception):
+    """微步在线 API 返回非成功状态"""
+
+
+class ThreatBookAPIClient:
     """
-    分析IP地址的威胁情报信息并生成报告。
+    微步在线 v3 API 客户端
+
+    所有请求共用一个 httpx.AsyncClient（连接池，安装了 h2 时启用 HTTP/2），
+    客户端运行在独立的后台事件循环中，同步代码通过 run() 提交协程。
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = "https://api.threatbook.cn",
+        timeout: float = 30,
+        max_connections: int = 10,
+        max_concurrency: int = 5,
+        http2: bool = True,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        """
+        Args:
+            api_key: 微步在线API密钥
+            base_url: API地址，测试时可指向模拟服务
+            timeout: 单次请求超时（秒）
+            max_connections: 连接池上限
+            max_concurrency: 同时进行的请求数上限
+            http2: 是否启用HTTP/2（需要 h2 包）
+            transport: 自定义传输层，测试时传入 httpx.MockTransport
+        """
+        self.api_key = api_key
+        self._max_concurrency = max_concurrency
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="threatbook-api", daemon=True
+        )
+        self._thread.start()
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+            http2=http2 and HTTP2_AVAILABLE,
+            transport=transport,
+        )
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def run(self, coro, timeout: Optional[float] = None):
+        """在后台事件循环中执行协程并等待结果（可从任意线程调用）"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout)
+
+    def close(self):
+        self.run(self._client.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    async def get(self, path: str, params: Dict[str, str]) -> dict:
+        """发起GET请求，返回响应中的 data 字段"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+        async with self._semaphore:
+            response = await self._client.get(
+                path, params={"apikey": self.api_key, **params}
+            )
+        response.raise_for_status()
+        payload = response.json()
+        if payload.get("response_code") != 0:
+            raise ThreatBookAPIError(
+                f"{path} 返回 {payload.get('response_code')}: {payload.get('verbose_msg')}"
+            )
+        return payload.get("data") or {}
+
+    @staticmethod
+    def _unwrap(data: dict, key: str) -> dict:
+        """部分接口的 data 以查询目标为键"""
+        value = data.get(key)
+        return value if isinstance(value, dict) else data
+
+    async def ip_reputation(self, ip: str) -> dict:
+        data = await self.get("/v3/scene/ip_reputation", {"resource": ip})
+        return self._unwrap(data, ip)
+
+    async def ip_query(self, ip: str) -> dict:
+        data = await self.get("/v3/ip/query", {"resource": ip})
+        return self._unwrap(data, ip)
+
+    async def domain_query(self, domain: str) -> dict:
+        data = await self.get("/v3/domain/query", {"resource": domain})
+        return self._unwrap(data, domain)
+
+    async def file_report(self, sha256: str) -> dict:
+        return await self.get("/v3/file/report", {"sha256": sha256})
+
+    async def fetch_target(
+        self, target_type: str, target_value: str, max_samples: int
+    ) -> dict:
+        """
+        并发获取目标信誉、相关样本及各样本的文件报告
+
+        IP 同时请求 /v3/scene/ip_reputation 和 /v3/ip/query。v3 接口没有
+        域名对应的信誉场景接口，域名只请求 /v3/domain/query，其返回的
+        judgments、severity、tags_classes 等字段即作为域名信誉。
+
+        Returns:
+            dict: {"reputation": ..., "samples": [...], "file_reports": {sha256: 报告或错误}}
+        """
+        if target_type == "ip":
+            reputation, query = await asyncio.gather(
+                self.ip_reputation(target_value), self.ip_query(target_value)
+            )
+        else:
+            query = await self.domain_query(target_value)
+            reputation = query
+
+        samples = [
+            sample
+            for sample in query.get("samples") or []
+            if isinstance(sample, dict) and sample.get("sha256")
+        ][:max_samples]
+
+        reports = await asyncio.gather(
+            *(self.file_report(sample["sha256"]) for sample in samples),
+            return_exceptions=True,
+        )
+        file_reports = {}
+        for sample, report in zip(samples, reports):
+            if isinstance(report, Exception):
+                log_print(f"获取样本报告失败 {sample['sha256']}: {report}")
+                file_reports[sample["sha256"]] = {"error": str(report)}
+            else:
+                file_reports[sample["sha256"]] = report
+
+        return {
+            "reputation": reputation,
+            "samples": samples,
+            "file_reports": file_reports,
+        }
+
+
+_api_client: Optional[ThreatBookAPIClient] = None
+_api_client_lock = threading.Lock()
+
+
+def api_backend_enabled() -> bool:
+    """ioc.backend 为 "api"，或为 "auto" 且配置了API密钥时使用API查询"""
+    backend = get_config_value("ioc.backend", default="browser")
+    if backend == "auto":
+        return bool(get_config_value("security.threatbook_api_key", default=""))
+    return backend == "api"
+
+
+def get_threatbook_api_client() -> ThreatBookAPIClient:
+    """获取进程内共享的API客户端"""
+    global _api_client
+    with _api_client_lock:
+        if _api_client is None:
+            api_key = get_config_value("security.threatbook_api_key", default="")
+            if not api_key:
+                raise ThreatBookAPIError("未配置 security.threatbook_api_key")
+            _api_client = ThreatBookAPIClient(
+                api_key,
+                base_url=get_config_value(
+                    "ioc.api.base_url", default="https://api.threatbook.cn"
+                ),
+                timeout=get_config_value("ioc.api.timeout", default=30),
+                max_connections=get_config_value("ioc.api.max_connections", default=10),
+                max_concurrency=get_config_value("ioc.api.max_concurrency", default=5),
+                http2=get_config_value("ioc.api.http2", default=True),
+            )
+        return _api_client
+
+
+class ThreatBookAPIAnalyzer:
+    """把API响应映射为与浏览器抓取一致的报告和CSV"""
+
+    @staticmethod
+    def related_sample_row(sample: dict, report: dict) -> List[str]:
+        """按 ThreatDataExtractor.TABLE_HEADERS 的列顺序生成相关样本行"""
+        summary = report.get("summary") or {}
+        family_and_type = " / ".join(
+            str(value)
+            for value in (
+                summary.get("malware_family") or sample.get("malware_family"),
+                summary.get("malware_type") or sample.get("malware_type"),
+            )
+            if value
+        )
+        return [
+            str(summary.get("file_name") or sample.get("file_name") or ""),
+            str(summary.get("file_type") or sample.get("file_type") or ""),
+            str(sample.get("scan_time") or summary.get("submit_time") or ""),
+            sample["sha256"],
+            str(sample.get("ratio") or summary.get("multi_engines") or ""),
+            family_and_type,
+            str(summary.get("threat_level") or ""),
+        ]
+
+    @staticmethod
+    def release_file_rows(
+        target_value: str, sha256: str, report: dict
+    ) -> List[List[str]]:
+        """按 save_release_files_csv 的列顺序生成释放文件行"""
+        summary = report.get("summary") or {}
+        environment = str(summary.get("sandbox_type") or "")
+        rows = []
+        for item in report.get("dropped") or []:
+            if not isinstance(item, dict):
+                continue
+            rows.append(
+                [
+                    target_value,
+                    sha256,
+                    environment,
+                    str(item.get("name") or ""),
+                    str(item.get("file_type") or item.get("type") or ""),
+                    str(item.get("path") or ""),
+                    str(item.get("sha256") or ""),
+                ]
+            )
+        return rows
+
+    @staticmethod
+    def reputation_markdown(reputation: dict) -> str:
+        """生成基本信息章节"""
+        basic = reputation.get("basic") or {}
+        location = basic.get("location") or {}
+        tags = [
+            tag
+            for tags_class in reputation.get("tags_classes") or []
+            for tag in tags_class.get("tags") or []
+        ]
+        lines = [
+            ("威胁等级", reputation.get("severity")),
+            ("是否恶意", reputation.get("is_malicious")),
+            ("可信度", reputation.get("confidence_level")),
+            ("情报判定", "、".join(reputation.get("judgments") or [])),
+            ("标签", "、".join(tags)),
+            (
+                "地理位置",
+                " ".join(
+                    str(location[key])
+                    for key in ("country", "province", "city")
+                    if location.get(key)
+                ),
+            ),
+            ("运营商", basic.get("carrier")),
+            ("ASN", (reputation.get("asn") or {}).get("info")),
+            ("更新时间", reputation.get("update_time")),
+        ]
+        md_content = "## 基本信息\n\n"
+        for label, value in lines:
+            if value not in (None, ""):
+                md_content += f"- **{label}**: {value}\n"
+        return md_content + "\n"
+
+    @staticmethod
+    def run_analysis(
+        client: ThreatBookAPIClient,
+        target_type: str,
+        target_value: str,
+        output_dir: str,
+    ) -> AnalysisResult:
+        """
+        通过API分析单个目标并生成报告
+
+        Args:
+            client: API客户端
+            target_type: "ip" 或 "domain"
+            target_value: 查询目标
+            output_dir: 报告和CSV输出目录
+
+        Returns:
+            AnalysisResult: 分析结果
+        """
+        result = AnalysisResult(target_type=target_type, target_value=target_value)
+        start_time = time.time()
+        timer = StageTimer()
+        sanitized_target = re.sub(r'[\\/:*?"<>|]', "_", target_value)
+
+        try:
+            data = client.run(
+                client.fetch_target(
+                    target_type,
+                    target_value,
+                    get_config_value("ioc.api.max_samples", default=10),
+                )
+            )
+            timer.lap("api_fetch")
+
+            with open(
+                os.path.join(output_dir, f"{sanitized_target}_api_responses.json"),
+                "w",
+                encoding="utf-8",
+            ) as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+
+            report_path = os.path.join(
+                output_dir, f"{sanitized_target}_{target_type}_threat_report.md"
+            )
+            with MarkdownReportWriter(report_path, resume=False) as report:
+                report.write(
+                    f"""# {target_type.upper()} 威胁分析报告
+
+**目标**: {target_value}  
+**查询时间**: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}  
+**数据来源**: 微步在线威胁情报API
+
+---
+
+"""
+                )
+                report.write(
+                    ThreatBookAPIAnalyzer.reputation_markdown(data["reputation"])
+                )
+
+                samples = data["samples"]
+                result.related_sample_count = len(samples)
+                report.write("---\n\n## 相关样本\n\n")
+                report.write(f"**相关样本数量**: {len(samples)}\n\n")
+                if samples:
+                    csv_data = [list(ThreatDataExtractor.TABLE_HEADERS)] + [
+                        ThreatBookAPIAnalyzer.related_sample_row(
+                            sample, data["file_reports"].get(sample["sha256"], {})
+                        )
+                        for sample in samples
+                    ]
+                    csv_filename = f"{sanitized_target}_threat_data.csv"
+                    with open(
+                        os.path.join(output_dir, csv_filename),
+                        "w",
+                        newline="",
+                        encoding="utf-8",
+                    ) as csvfile:
+                        csv.writer(csvfile).writerows(csv_data)
+                    report.write_table(csv_data[0], csv_data[1:])
+                    report.write(
+                        f"\n\n💾 详细数据已保存为CSV文件: `{csv_filename}`\n\n"
+                    )
+
+                    report.write("\n---\n\n## 样本常见释放路径分析\n\n")
+                    all_release_files_csv = []
+                    for sample in samples:
+                        sha256 = sample["sha256"]
+                        file_report = data["file_reports"].get(sha256, {})
+                        report.write(f"\n### SHA256: {sha256}\n\n")
+                        if "error" in file_report:
+                            report.write(
+                                f"⚠️ 获取样本报告失败: {file_report['error']}\n\n"
+                            )
+                            continue
+                        release_files = ThreatBookAPIAnalyzer.release_file_rows(
+                            target_value, sha256, file_report
+                        )
+                        if release_files:
+                            report.write_table(
+                                ["文件名称", "文件类型", "文件路径", "文件SHA256"],
+                                (row[3:] for row in release_files),
+                            )
+                            report.write("\n")
+                        else:
+                            report.write("未发现释放文件\n\n")
+                        all_release_files_csv.extend(release_files)
+
+                    if all_release_files_csv:
+                        SampleReportAnalyzer.save_release_files_csv(
+                            all_release_files_csv, target_value, output_dir
+                        )
+            timer.lap("save_report")
+
+            log_print(f"\n✅ 报告已生成: {report_path}")
+            result.success = True
+            result.report_path = report_path
+
+        except Exception as e:
+            result.error = str(e)
+            log_print(f"\n❌ API分析过程中出现错误: {result.error}")
+
+        finally:
+            result.elapsed_seconds = time.time() - start_time
+            result.stage_timings = dict(timer.timings)
+
+        return result
+
+
+def run_api_analysis(target_type: str, target_value: str) -> AnalysisResult:
+    """使用共享API客户端分析单个目标"""
+    try:
+        client = get_threatbook_api_client()
+    except ThreatBookAPIError as e:
+        return AnalysisResult(
+            target_type=target_type, target_value=target_value, error=str(e)
+        )
+    output_dir, _ = ThreatBookAnalyzer.create_output_directories()
+    return ThreatBookAPIAnalyzer.run_analysis(
+        client, target_type, target_value, output_dir
+    )
+
+
+class IOCBatchAnalyzer:
+    """IOC 批量分析类"""
+
+    # 去武装（defang）写法还原表，如 1.2.3[.]4、hxxp://evil[.]com
+    REFANG_REPLACEMENTS = [
+        ("[.]", "."),
+        ("(.)", "."),
+        ("{.}", "."),
+        ("[dot]", "."),
+        ("[:]", ":"),
+        ("hxxps", "https"),
+        ("hxxp", "http"),
+    ]
+
+    SUMMARY_HEADERS = [
+        "查询目标",
+        "类型",
+        "状态",
+        "相关样本数量",
+        "耗时(秒)",
+        "报告路径",
+        "错误信息",
+    ]
+
+    @staticmethod
+    def normalize_target(raw_value: str) -> Optional[Tuple[str, str]]:
+        """
+        规范化单个IOC
+
+        Returns:
+            (目标类型, 规范化后的值)，无法识别时返回None
+        """
+        value = raw_value.strip().strip("\"'<>,;")
+        for old, new in IOCBatchAnalyzer.REFANG_REPLACEMENTS:
+            value = value.replace(old, new)
+        if not value:
+            return None
+
+        # 去掉协议、路径和端口，只保留主机部分
+        if "://" in value:
+            host = urlsplit(value).hostname or ""
+        else:
+            host = value.split("/")[0]
+            if host.startswith("[") and "]" in host:
+                host = host[1 : host.index("]")]
+            elif host.count(":") == 1:
+                host = host.split(":")[0]
+
+        try:
+            return "ip", str(ipaddress.ip_address(host))
+        except ValueError:
+            pass
+
+        host = host.lower().rstrip(".")
+        if DOMAIN_PATTERN.match(host):
+            return "domain", host
+        return None
+
+    @staticmethod
+    def normalize_targets(
+        raw_targets: Iterable[str],
+    ) -> Tuple[List[Tuple[str, str]], List[str], int]:
+        """
+        规范化并去重IOC列表，单个条目内以空白、逗号或分号分隔的多个值会被拆开
+
+        Returns:
+            (按首次出现顺序去重后的目标列表, 无法识别的条目, 去除的重复数量)
+        """
+        targets = []
+        invalid = []
+        seen = set()
+        duplicate_count = 0
+
+        for entry in raw_targets:
+            for raw_value in re.split(r"[\s,;]+", str(entry)):
+                if not raw_value:
+                    continue
+                normalized = IOCBatchAnalyzer.normalize_target(raw_value)
+                if normalized is None:
+                    invalid.append(raw_value)
+                elif normalized in seen:
+                    duplicate_count += 1
+                else:
+                    seen.add(normalized)
+                    targets.append(normalized)
+
+        return targets, invalid, duplicate_count
+
+    @staticmethod
+    def run_batch(
+        targets: List[Tuple[str, str]],
+        max_workers: int,
+        rate_limit_per_minute: float,
+        progress_callback: Optional[Callable[[int, int, AnalysisResult], None]] = None,
+    ) -> List[AnalysisResult]:
+        """
+        在浏览器池上调度批量分析（API模式下各工作线程直接调用共享API客户端）
+
+        Args:
+            targets: (目标类型, 目标值) 列表
+            max_workers: 并发浏览器数量
+            rate_limit_per_minute: 每分钟最多发起的目标查询数，0 表示不限速
+            progress_callback: 每完成一个目标时回调 (已完成数, 总数, 分析结果)
+
+        Returns:
+            与 targets 顺序一致的分析结果列表
+        """
+        total = len(targets)
+        results: List[Optional[AnalysisResult]] = [None] * total
+        pool = DriverPool(min(max_workers, total) if total else 1)
+        limiter = RateLimiter(rate_limit_per_minute)
+        # API模式下浏览器池不会被使用（池中的浏览器按需启动）
+        use_api = api_backend_enabled()
+        # 在后台任务中运行时，任务取消后跳过尚未开始的目标
+        job = current_job()
+
+        def analyze_one(index: int, target_type: str, target_value: str):
+            # 工作线程绑定所属任务，目标内部的等待同样可以被取消打断
+            with bind_job(job):
+                return index, analyze_target(target_type, target_value)
+
+        def analyze_target(target_type: str, target_value: str) -> AnalysisResult:
+            try:
+                limiter.acquire()
+                check_cancelled()
+                if use_api:
+                    return run_api_analysis(target_type, target_value)
+                try:
+                    with pool.driver() as driver:
+                        config = build_threatbook_config(target_type, target_value)
+                        return run_target_analysis(config, driver)
+                except JobCancelled:
+                    raise
+                except Exception as e:
+                    log_print(f"批量分析 {target_value} 时浏览器启动失败: {e}")
+                    return AnalysisResult(
+                        target_type=target_type,
+                        target_value=target_value,
+                        error=str(e),
+                    )
+            except JobCancelled:
+                return AnalysisResult(
+                    target_type=target_type,
+                    target_value=target_value,
+                    error="任务已取消",
+                )
+
+        completed = 0
+        try:
+            with ThreadPoolExecutor(max_workers=pool.size) as executor:
+                futures = [
+                    executor.submit(analyze_one, index, target_type, target_value)
+                    for index, (target_type, target_value) in enumerate(targets)
+                ]
+                for future in as_completed(futures):
+                    index, result = future.result()
+                    results[index] = result
+                    remember_result(result)
+                    completed += 1
+                    status = "成功" if result.success else "失败"
+                    log_print(
+                        f"[批量进度] {completed}/{total} {result.target_value} {status}"
+                    )
+                    if progress_callback:
+                        progress_callback(completed, total, result)
+        finally:
+            pool.close()
+
+        return results
+
+    @staticmethod
+    def save_batch_summary_csv(
+        results: List[AnalysisResult], output_dir: str
+    ) -> Optional[str]:
+        """保存批量分析汇总CSV，返回文件路径"""
+        try:
+            csv_filename = (
+                f"batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}_summary.csv"
+            )
+            csv_path = os.path.join(output_dir, csv_filename)
+
+            with open(csv_path, "w", newline="", encoding="utf-8") as csvfile:
+                writer = csv.writer(csvfile)
+                writer.writerow(IOCBatchAnalyzer.SUMMARY_HEADERS)
+                for result in results:
+                    writer.writerow(
+                        [
+                            result.target_value,
+                            result.target_type,
+                            "成功" if result.success else "失败",
+                            (
+                                ""
+                                if result.related_sample_count is None
+                                else result.related_sample_count
+                            ),
+                            f"{result.elapsed_seconds:.1f}",
+                            result.report_path or "",
+                            result.error,
+                        ]
+                    )
+
+            log_print(f"批量分析汇总CSV已保存: {csv_path}")
+            return csv_path
+
+        except Exception as e:
+            log_print(f"保存批量分析汇总CSV失败: {e}")
+            return None
+
+
+_ioc_store: Optional[IOCStore] = None
+_ioc_store_lock = threading.Lock()
+
+
+def get_ioc_store() -> Optional[IOCStore]:
+    """获取本地情报库（首次打开时增量导入情报源和历史分析输出），未启用时返回None"""
+    global _ioc_store
+    if not get_config_value("ioc.store.enabled", default=True):
+        return None
+    with _ioc_store_lock:
+        if _ioc_store is None:
+            store = IOCStore(
+                get_config_value(
+                    "ioc.store.path", default="./logs/ioc/ioc_store.sqlite"
+                )
+            )
+            output_dir, _ = ThreatBookAnalyzer.create_output_directories()
+            imported = store.sync_sources(
+                output_dir, get_config_value("ioc.store.feeds", default=[])
+            )
+            log_print(f"本地情报库已打开: {store.db_path}，新导入 {imported} 条")
+            _ioc_store = store
+        return _ioc_store
+
+
+def remember_result(result: AnalysisResult):
+    """把成功分析的输出导入本地情报库"""
+    if not result.success or not result.report_path:
+        return
+    try:
+        store = get_ioc_store()
+        if store is not None:
+            store.ingest_target_outputs(
+                os.path.dirname(result.report_path),
+                result.target_type,
+                result.target_value,
+            )
+    except Exception as e:
+        log_print(f"导入本地情报库失败 {result.target_value}: {e}")
+
+
+def format_store_matches(matches: List[dict]) -> List[str]:
+    """把命中记录格式化为Markdown列表行"""
+    lines = []
+    for match in matches:
+        detail = match["detail"]
+        extra = ""
+        if detail.get("report_path"):
+            extra = f"，报告: {detail['report_path']}"
+        elif detail.get("related_target"):
+            extra = f"，关联目标: {detail['related_target']}"
+        lines.append(
+            f"- [{match['source']}] {match['value']}: {match['verdict']}"
+            f"（{match['updated_at']}{extra}）"
+        )
+    return lines
+
+
+def local_verdict_message(
+    target_value: str, reuse_report: bool = False
+) -> Optional[str]:
+    """
+    本地情报库已有结论时返回说明文本，用于跳过在线查询
+
+    结论属于 ioc.store.short_circuit_verdicts 的情报源记录（含网段命中）或有效期内
+    （ioc.store.max_age_days）的分析报告视为已知结论。
 
     Args:
-        ip_address (str): 需要查询的 IP 地址。
+        target_value: 查询目标
+        reuse_report: 复用有效期内的任意分析报告；为False时只复用结论属于
+            short_circuit_verdicts 的报告
+    """
+    if not get_config_value("ioc.store.short_circuit", default=True):
+        return None
+    verdicts = get_config_value(
+        "ioc.store.short_circuit_verdicts", default=["malicious"]
+    )
+    try:
+        store = get_ioc_store()
+        if store is None:
+            return None
+        matches = store.lookup(target_value)
+        report = store.fresh_report(
+            target_value,
+            get_config_value("ioc.store.max_age_days", default=7),
+            None if reuse_report else verdicts,
+        )
+    except Exception as e:
+        log_print(f"查询本地情报库失败 {target_value}: {e}")
+        return None
+
+    known = [
+        match
+        for match in matches
+        if match["source"].startswith("feed:") and match["verdict"] in verdicts
+    ]
+    if report is None and not known:
+        return None
+
+    lines = [f"本地情报库已有 {target_value} 的结论，未发起在线查询："]
+    if report is not None:
+        lines.append(f"报告已成功生成并保存至: {report['detail']['report_path']}")
+    lines.extend(format_store_matches(matches))
+    return "\n".join(lines)
+
+
+def build_threatbook_config(
+    target_type: str,
+    target_value: str,
+    site_url: Optional[str] = None,
+    sample_site_url: Optional[str] = None,
+    page_load_wait: Optional[float] = None,
+) -> ThreatBookConfig:
+    """
+    根据目标类型构建微步在线查询配置
+
+    Args:
+        target_type: "ip" 或 "domain"
+        target_value: 查询目标
+        site_url: 情报查询站点地址，为None时读取 ioc.threatbook_site_url
+        sample_site_url: 样本报告站点地址，为None时读取 ioc.sample_site_url
+        page_load_wait: 页面加载等待秒数，为None时读取 ioc.page_load_wait_seconds
     """
-    config = ThreatBookConfig(
-        target_type="ip",
-        target_value=ip_address,
-        base_url=f"https://x.threatbook.com/v5/ip/{ip_address}",
+    if site_url is None:
+        site_url = get_config_value(
+            "ioc.threatbook_site_url", default="https://x.threatbook.com"
+        )
+    if sample_site_url is None:
+        sample_site_url = get_config_value(
+            "ioc.sample_site_url", default="https://s.threatbook.com"
+        )
+    return ThreatBookConfig(
+        target_type=target_type,
+        target_value=target_value,
+        base_url=f"{site_url.rstrip('/')}/v5/{target_type}/{target_value}",
+        sample_site_url=sample_site_url.rstrip("/"),
+        page_load_wait_seconds=page_load_wait,
         screenshot_configs=[
             ScreenshotConfig("summary-top", "class", "summary_top", "基本信息"),
             ScreenshotConfig(
@@ -877,58 +2219,280 @@ def analyze_ip_threat(ip_address: str) -> str:
         ],
     )
 
-    return analyze_target_with_config(config)
+
+async def start_target_job(
+    target_type: str,
+    target_value: str,
+    ctx: Optional[Context],
+    reuse_report: bool = False,
+) -> str:
+    """本地情报库已有结论时直接返回，否则提交后台分析任务"""
+    # 查询本地情报库会打开SQLite并同步情报源，放到线程中执行以免阻塞事件循环
+    local_message = await asyncio.to_thread(
+        local_verdict_message, target_value, reuse_report
+    )
+    if local_message:
+        return local_message
+    return await jobs.start(
+        f"analyze_{target_type}_threat",
+        analyze_target_with_config,
+        build_threatbook_config(target_type, target_value),
+        check_local=False,
+        ctx=ctx,
+    )
+
+
+@mcp.tool()
+async def analyze_ip_threat(
+    ip_address: str, ctx: Context, reuse_report: bool = False
+) -> str:
+    """
+    分析IP地址的威胁情报信息并生成报告。
+
+    以后台任务运行并立即返回任务ID，使用 get_job_status / get_job_result 查看进度和结果，cancel_job 取消。
+
+    Args:
+        ip_address (str): 需要查询的 IP 地址。
+        reuse_report (bool): 本地情报库中有有效期内的分析报告时直接返回该报告，不发起在线查询。
+    """
+    return await start_target_job("ip", ip_address, ctx, reuse_report)
 
 
 @mcp.tool()
-def analyze_domain_threat(domain_name: str) -> str:
+async def analyze_domain_threat(
+    domain_name: str, ctx: Context, reuse_report: bool = False
+) -> str:
     """
     分析域名的威胁情报信息并生成报告。
 
+    以后台任务运行并立即返回任务ID，使用 get_job_status / get_job_result 查看进度和结果，cancel_job 取消。
+
     Args:
         domain_name (str): 需要查询的域名。
+        reuse_report (bool): 本地情报库中有有效期内的分析报告时直接返回该报告，不发起在线查询。
     """
-    config = ThreatBookConfig(
-        target_type="domain",
-        target_value=domain_name,
-        base_url=f"https://x.threatbook.com/v5/domain/{domain_name}",
-        screenshot_configs=[
-            ScreenshotConfig("summary-top", "class", "summary_top", "基本信息"),
-            ScreenshotConfig(
-                "result-intelInsight_con",
-                "class",
-                "result_intelInsight_con",
-                "情报洞察",
-            ),
-        ],
+    return await start_target_job("domain", domain_name, ctx, reuse_report)
+
+
+@mcp.tool()
+async def analyze_iocs_batch(
+    targets: List[str],
+    ctx: Context,
+    max_workers: Optional[int] = None,
+    rate_limit_per_minute: Optional[float] = None,
+) -> str:
+    """
+    批量分析IP地址和域名的威胁情报信息，为每个目标生成报告并汇总为CSV。
+
+    输入会先规范化（还原 1.2.3[.]4、hxxp:// 等去武装写法，去掉协议、端口和路径）并去重，
+    再在浏览器池上按全局速率限制调度执行。以后台任务运行并立即返回任务ID，
+    使用 get_job_status / get_job_result 查看进度和结果，cancel_job 在下一个等待或阶段检查点打断进行中的目标并跳过尚未开始的目标。
+
+    Args:
+        targets (List[str]): 需要查询的IP地址和域名列表。
+        max_workers (int): 并发浏览器数量，默认读取 ioc.batch_max_workers。
+        rate_limit_per_minute (float): 每分钟最多发起的目标查询数，默认读取 ioc.batch_rate_limit_per_minute，0 表示不限速。
+    """
+    return await jobs.start(
+        "analyze_iocs_batch",
+        run_iocs_batch,
+        targets,
+        max_workers,
+        rate_limit_per_minute,
+        ctx=ctx,
     )
 
-    return analyze_target_with_config(config)
+
+def run_iocs_batch(
+    targets: List[str],
+    max_workers: Optional[int] = None,
+    rate_limit_per_minute: Optional[float] = None,
+) -> str:
+    """执行批量分析并生成结果摘要，在后台任务中运行时上报每个目标的完成进度"""
+    if max_workers is None:
+        max_workers = get_config_value("ioc.batch_max_workers", default=2)
+    if rate_limit_per_minute is None:
+        rate_limit_per_minute = get_config_value(
+            "ioc.batch_rate_limit_per_minute", default=6
+        )
+
+    normalized, invalid, duplicate_count = IOCBatchAnalyzer.normalize_targets(targets)
+    log_print(
+        f"批量分析: 有效目标 {len(normalized)} 个，无效 {len(invalid)} 个，"
+        f"重复 {duplicate_count} 个"
+    )
+
+    lines = [
+        "批量威胁分析结果",
+        f"有效目标: {len(normalized)} 个（已去除重复 {duplicate_count} 个）",
+    ]
+    if invalid:
+        lines.append(f"无法识别的条目 ({len(invalid)} 个): {', '.join(invalid)}")
+    if not normalized:
+        lines.append("没有可分析的目标")
+        return "\n".join(lines)
+
+    output_dir, _ = ThreatBookAnalyzer.create_output_directories()
+    results = IOCBatchAnalyzer.run_batch(
+        normalized,
+        max_workers,
+        rate_limit_per_minute,
+        progress_callback=lambda completed, total, result: report_progress(
+            completed,
+            total,
+            f"{result.target_value} {'成功' if result.success else '失败'}",
+        ),
+    )
+    summary_path = IOCBatchAnalyzer.save_batch_summary_csv(results, output_dir)
+
+    succeeded = sum(1 for result in results if result.success)
+    lines.append(f"成功: {succeeded} 个，失败: {len(results) - succeeded} 个")
+    if summary_path:
+        lines.append(f"汇总CSV: {summary_path}")
+    lines.append("")
+    for result in results:
+        if result.success:
+            lines.append(f"✅ {result.target_value}: {result.report_path}")
+        else:
+            lines.append(f"❌ {result.target_value}: {result.error}")
+
+    return "\n".join(lines)
 
 
-def analyze_target_with_config(config: ThreatBookConfig) -> str:
-    """使用配置分析目标并生成报告"""
-    selenium_driver = SeleniumDriver()
+@mcp.tool()
+def lookup_iocs_bulk(indicators: List[str]) -> str:
+    """
+    在本地情报库中批量查询IP、网段、域名和SHA256，不发起在线查询。
+
+    本地情报库包含配置的情报源（ioc.store.feeds）以及历次分析生成的报告、相关样本和释放文件记录；
+    IP 同时匹配包含它的网段。
+
+    Args:
+        indicators (List[str]): 需要查询的指标列表，支持 1.2.3[.]4 等去武装写法。
+    """
+    store = get_ioc_store()
+    if store is None:
+        return "本地情报库未启用（ioc.store.enabled = false）"
+
+    results = store.lookup_many(indicators)
+    unknown = [value for value in indicators if value not in results]
+    hits = {value: matches for value, matches in results.items() if matches}
+    misses = [value for value, matches in results.items() if not matches]
+
+    lines = [
+        "本地情报库批量查询结果",
+        f"命中: {len(hits)} 个，未命中: {len(misses)} 个，无法识别: {len(unknown)} 个",
+    ]
+    for value, matches in hits.items():
+        lines.append("")
+        lines.append(f"### {value}")
+        lines.extend(format_store_matches(matches))
+    if misses:
+        lines.append("")
+        lines.append(f"未命中: {', '.join(misses)}")
+    if unknown:
+        lines.append(f"无法识别: {', '.join(unknown)}")
+    return "\n".join(lines)
+
+
+def analyze_target_with_config(
+    config: ThreatBookConfig, check_local: bool = True
+) -> str:
+    """
+    使用配置分析目标并生成报告
+
+    Args:
+        config: 微步在线查询配置
+        check_local: 是否先查询本地情报库，已有结论时直接返回（调用方已查询过时传False）
+    """
+    if check_local:
+        local_message = local_verdict_message(config.target_value)
+        if local_message:
+            return local_message
+
+    if api_backend_enabled():
+        result = run_api_analysis(config.target_type, config.target_value)
+    else:
+        result = run_target_analysis(config)
+    remember_result(result)
+    if result.success:
+        return f"报告已成功生成并保存至: {result.report_path}"
+    return f"分析过程中出现错误: {result.error}"
+
+
+def run_target_analysis(
+    config: ThreatBookConfig, driver: Optional[webdriver.Chrome] = None
+) -> AnalysisResult:
+    """
+    分析单个目标并生成报告
+
+    Args:
+        config: 微步在线查询配置
+        driver: 复用的WebDriver实例（由调用方负责关闭），为None时自行创建并在结束后关闭
+
+    Returns:
+        AnalysisResult: 分析结果
+    """
+    selenium_driver = (
+        SeleniumDriver(profile_index=profile_slots.acquire())
+        if driver is None
+        else None
+    )
+    result = AnalysisResult(
+        target_type=config.target_type, target_value=config.target_value
+    )
+    start_time = time.time()
+    timer = StageTimer()
+    budget = TimeBudget()
     output_dir, pic_output_dir = ThreatBookAnalyzer.create_output_directories()
 
+    report = None
+
     try:
+        # 生成安全的文件名，报告边分析边写入，中断后可从检查点继续
+        sanitized_target = re.sub(r'[\\/:*?"<>|]', "_", config.target_value)
+        report_filename = f"{sanitized_target}_{config.target_type}_threat_report.md"
+        report_path = os.path.join(output_dir, report_filename)
+        report = MarkdownReportWriter(
+            report_path,
+            resume=get_config_value("ioc.resume_partial_reports", default=True),
+        )
+        if report.resumed:
+            log_print(f"从未完成的报告继续: 已完成 {', '.join(report.completed)}")
+
         # 设置WebDriver
-        driver = selenium_driver.setup_driver()
+        check_cancelled()
+        if selenium_driver is not None:
+            driver = selenium_driver.setup_driver()
+        network_capture = (
+            NetworkCapture(driver)
+            if get_config_value("ioc.capture_network", default=False)
+            else None
+        )
+        timer.lap("driver_setup")
 
         # 访问目标页面
+        check_cancelled()
         log_print(f"正在访问: {config.base_url}")
-        driver.get(config.base_url)
+        with budget.deadline.activate():
+            budgeted_get(driver, config.base_url)
 
-        # 等待页面加载
-        page_load_wait = get_config_value("ioc.page_load_wait_seconds", default=10)
-        log_print(f"页面加载中，请等待 {page_load_wait} 秒...")
-        time.sleep(page_load_wait)
+            # 等待页面加载
+            page_load_wait = config.page_load_wait_seconds
+            if page_load_wait is None:
+                page_load_wait = get_config_value(
+                    "ioc.page_load_wait_seconds", default=10
+                )
+            log_print(f"页面加载中，请等待 {page_load_wait} 秒...")
+            cancellable_sleep(budgeted(page_load_wait))
+        if network_capture:
+            network_capture.collect()
+        timer.lap("page_load")
 
         # 生成报告头部
-        # 生成安全的文件名
-        sanitized_target = re.sub(r'[\\/:*?"<>|]', "_", config.target_value)
-
-        report_content = f"""# {config.target_type.upper()} 威胁分析报告
+        if not report.is_completed("header"):
+            report.write(
+                f"""# {config.target_type.upper()} 威胁分析报告
 
 **目标**: {config.target_value}  
 **查询时间**: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}  
@@ -937,148 +2501,290 @@ def analyze_target_with_config(config: ThreatBookConfig) -> str:
 ---
 
 """
+            )
+            report.checkpoint("header")
 
         # 截取基础截图
-        for screenshot_config in config.screenshot_configs:
-            success, screenshot_path, md_content = (
-                ElementScreenshot.take_element_screenshot(
-                    driver, screenshot_config, config.target_value, pic_output_dir
-                )
-            )
-            report_content += md_content + "\n"
+        check_cancelled()
+        if not report.is_completed("summary"):
+            summary_deadline = budget.stage("summary", "基础截图")
+            if summary_deadline is not None:
+                with summary_deadline.activate():
+                    for screenshot_config in config.screenshot_configs:
+                        check_cancelled()
+                        success, screenshot_path, md_content = (
+                            ElementScreenshot.take_element_screenshot(
+                                driver,
+                                screenshot_config,
+                                config.target_value,
+                                pic_output_dir,
+                            )
+                        )
+                        report.write(md_content + "\n")
+                report.checkpoint("summary")
+        timer.lap("summary")
 
         # 展开威胁面板并截图
-        threat_panels_md = ThreatBookAnalyzer.expand_threat_panels(
-            driver, config.target_value, pic_output_dir
-        )
-        if threat_panels_md:
-            report_content += "---\n\n## 威胁情报详情\n\n" + threat_panels_md
+        check_cancelled()
+        if not report.is_completed("panels"):
+            panels_deadline = budget.stage("panels", "威胁情报面板")
+            if panels_deadline is not None:
+                with panels_deadline.activate():
+                    threat_panels_md = ThreatBookAnalyzer.expand_threat_panels(
+                        driver, config.target_value, pic_output_dir
+                    )
+                if threat_panels_md:
+                    report.write("---\n\n## 威胁情报详情\n\n" + threat_panels_md)
+                if panels_deadline.expired():
+                    # 面板未全部展开，不记录检查点以便续跑时重新处理
+                    budget.skip("威胁情报面板（部分）")
+                else:
+                    report.checkpoint("panels")
+        timer.lap("panels")
 
         # 新增功能：处理特定威胁数据提取
-        try:
-            # 点击指定的XPath元素 (li[8])
-            li_xpath = "/html/body/div[1]/div[1]/main/div[1]/div/div[3]/div/div[1]/div/div/div/ul/li[8]"
-            if ThreatDataExtractor.click_xpath_element(driver, li_xpath):
-                log_print("成功点击目标元素")
-
-                # 等待页面更新
-                time.sleep(get_config_value("ioc.scroll_wait_time", default=2))
-
-                # 读取数字内容
-
-                span_xpath = "/html/body/div[1]/div[1]/main/div[1]/div/div[3]/div/div[1]/div/div/div/ul/li[8]/div/span[2]"
-                number_text = ThreatDataExtractor.get_element_text(driver, span_xpath)
-                # log_print(number_text)
-                if number_text:
-                    # 使用新的解析函数处理威胁数量（支持K、M等缩写）
-                    threat_count = ThreatDataExtractor.parse_threat_count(number_text)
-                    if threat_count is not None:
-                        log_print(
-                            f"检测到威胁数量: {threat_count} (原始文本: {number_text})"
+        check_cancelled()
+        # 表格提取完成后单独计时，之后的报告写入和文件保存计入 related_samples_report
+        related_extracted = False
+        related_deadline = budget.stage("related_samples", "相关样本")
+        if related_deadline is None:
+            report.write("\n---\n\n## 相关样本\n\n⏱️ 时间预算不足，已跳过\n\n")
+        else:
+            with related_deadline.activate():
+                try:
+                    # 点击指定的XPath元素 (li[8])
+                    li_xpath = "/html/body/div[1]/div[1]/main/div[1]/div/div[3]/div/div[1]/div/div/div/ul/li[8]"
+                    if ThreatDataExtractor.click_xpath_element(driver, li_xpath):
+                        log_print("成功点击目标元素")
+
+                        # 等待页面更新
+                        cancellable_sleep(
+                            budgeted(
+                                get_config_value("ioc.scroll_wait_time", default=2)
+                            )
                         )
-                        log_print("开始提取表格数据")
 
-                        # 提取表格数据（无论威胁数量是多少）
-                        tbody_xpath = "/html/body/div[1]/div[1]/main/div[1]/div/div[3]/div/div[2]/div/div[2]/div/div/div/div/div[1]/div/div/div/div/div/table/tbody"
-                        success, csv_data = ThreatDataExtractor.extract_table_data(
-                            driver, tbody_xpath, config.target_value, output_dir
+                        # 读取数字内容
+
+                        span_xpath = "/html/body/div[1]/div[1]/main/div[1]/div/div[3]/div/div[1]/div/div/div/ul/li[8]/div/span[2]"
+                        number_text = ThreatDataExtractor.get_element_text(
+                            driver, span_xpath
                         )
-                        if success and csv_data:
-                            report_content += "\n---\n\n## 相关样本\n\n"
-                            report_content += f"**相关样本数量**: {threat_count}\n\n"
-
-                            # 如果数量 >= 5，显示数量限制说明
-                            if threat_count >= 5:
-                                report_content += (
-                                    "📝 由于数量限制，我们只获取第一页的内容。\n\n"
+                        # log_print(number_text)
+                        if number_text:
+                            # 使用新的解析函数处理威胁数量（支持K、M等缩写）
+                            threat_count = ThreatDataExtractor.parse_threat_count(
+                                number_text
+                            )
+                            if threat_count is not None:
+                                result.related_sample_count = threat_count
+                                log_print(
+                                    f"检测到威胁数量: {threat_count} (原始文本: {number_text})"
+                                )
+                                log_print("开始提取表格数据")
+
+                                # 提取表格数据（无论威胁数量是多少）
+                                tbody_xpath = "/html/body/div[1]/div[1]/main/div[1]/div/div[3]/div/div[2]/div/div[2]/div/div/div/div/div[1]/div/div/div/div/div/table/tbody"
+                                success, csv_data = (
+                                    ThreatDataExtractor.extract_table_data(
+                                        driver,
+                                        tbody_xpath,
+                                        config.target_value,
+                                        output_dir,
+                                    )
                                 )
+                                if network_capture:
+                                    network_capture.collect()
+                                timer.lap("related_samples")
+                                related_extracted = True
+                                if success and csv_data:
+                                    if not report.is_completed("related_samples"):
+                                        report.write("\n---\n\n## 相关样本\n\n")
+                                        report.write(
+                                            f"**相关样本数量**: {threat_count}\n\n"
+                                        )
 
-                            # 将表格数据转换为Markdown格式并添加到报告
-                            md_table = ThreatDataExtractor.csv_data_to_markdown(
-                                csv_data
-                            )
-                            report_content += md_table + "\n"
-                            report_content += f"\n💾 详细数据已保存为CSV文件: `{sanitized_target}_threat_data.csv`\n\n"
-
-                            # 新增功能：分析每个样本的详细报告
-                            log_print("\n开始分析每个样本的详细报告...")
-                            report_content += "\n---\n\n## 样本常见释放路径分析\n\n"
-
-                            # 收集所有发行文件CSV数据
-                            all_release_files_csv = []
-
-                            # 从CSV数据中提取SHA256（第4列，索引为3）
-                            for row_idx, row in enumerate(csv_data[1:], 1):  # 跳过表头
-                                if len(row) > 3 and row[3].strip():  # SHA256在第4列
-                                    sha256 = row[3].strip()
-                                    log_print(
-                                        f"分析样本 {row_idx}/{len(csv_data)-1}: {sha256}"
+                                        # 如果数量 >= 5，显示数量限制说明
+                                        if threat_count >= 5:
+                                            report.write(
+                                                "📝 由于数量限制，我们只获取第一页的内容。\n\n"
+                                            )
+
+                                        # 将表格数据逐行写入报告
+                                        report.write_table(csv_data[0], csv_data[1:])
+                                        report.write(
+                                            f"\n\n💾 详细数据已保存为CSV文件: `{sanitized_target}_threat_data.csv`\n\n"
+                                        )
+                                        report.write(
+                                            "\n---\n\n## 样本常见释放路径分析\n\n"
+                                        )
+                                        report.checkpoint("related_samples")
+
+                                    # 新增功能：分析每个样本的详细报告
+                                    log_print("\n开始分析每个样本的详细报告...")
+
+                                    # 收集所有发行文件CSV数据
+                                    all_release_files_csv = []
+                                    sample_deadline = budget.stage(
+                                        "sample_reports", "样本报告"
                                     )
 
-                                    success, sample_md, release_files = (
-                                        SampleReportAnalyzer.analyze_sample_report(
-                                            driver,
-                                            sha256,
-                                            pic_output_dir,
+                                    # 从CSV数据中提取SHA256（第4列，索引为3）
+                                    for row_idx, row in enumerate(
+                                        csv_data[1:], 1
+                                    ):  # 跳过表头
+                                        check_cancelled()
+                                        if (
+                                            len(row) > 3 and row[3].strip()
+                                        ):  # SHA256在第4列
+                                            sha256 = row[3].strip()
+                                            sample_stage = f"sample:{sha256}"
+
+                                            # 续写时直接复用已完成样本的发行文件数据
+                                            if report.is_completed(sample_stage):
+                                                log_print(f"跳过已完成的样本: {sha256}")
+                                                all_release_files_csv.extend(
+                                                    report.stage_data(sample_stage, [])
+                                                )
+                                                continue
+
+                                            # 时间预算不足时跳过剩余样本
+                                            if sample_deadline is None:
+                                                continue
+                                            if (
+                                                sample_deadline.remaining()
+                                                < budget.min_stage_seconds
+                                            ):
+                                                budget.skip(f"样本报告 {sha256}")
+                                                report.write(
+                                                    f"\n### SHA256: {sha256}\n\n⏱️ 时间预算用尽，已跳过\n\n"
+                                                )
+                                                continue
+
+                                            log_print(
+                                                f"分析样本 {row_idx}/{len(csv_data)-1}: {sha256}"
+                                            )
+
+                                            with sample_deadline.child(
+                                                budget.per_sample_seconds
+                                            ).activate():
+                                                success, sample_md, release_files = (
+                                                    SampleReportAnalyzer.analyze_sample_report(
+                                                        driver,
+                                                        sha256,
+                                                        pic_output_dir,
+                                                        config.target_value,
+                                                        network_capture,
+                                                        config.sample_site_url,
+                                                        config.page_load_wait_seconds,
+                                                    )
+                                                )
+                                            report.write(sample_md)
+                                            report.checkpoint(
+                                                sample_stage, release_files
+                                            )
+
+                                            # 收集发行文件数据
+                                            all_release_files_csv.extend(release_files)
+
+                                    log_print("样本详细分析完成")
+                                    timer.lap("sample_reports")
+
+                                    # 保存发行文件CSV
+                                    if all_release_files_csv:
+                                        SampleReportAnalyzer.save_release_files_csv(
+                                            all_release_files_csv,
                                             config.target_value,
+                                            output_dir,
                                         )
-                                    )
-                                    if success:
-                                        report_content += sample_md
-                                    else:
-                                        report_content += sample_md
-
-                                    # 收集发行文件数据
-                                    all_release_files_csv.extend(release_files)
-
-                            log_print("样本详细分析完成")
-
-                            # 保存发行文件CSV
-                            if all_release_files_csv:
-                                SampleReportAnalyzer.save_release_files_csv(
-                                    all_release_files_csv,
-                                    config.target_value,
-                                    output_dir,
+                                else:
+                                    log_print("表格数据提取失败")
+                                    report.write("\n---\n\n## 相关样本\n\n")
+                                    report.write("⚠️ 表格数据提取失败\n\n")
+                            else:
+                                log_print(f"无法解析威胁数量: {number_text}")
+                                report.write("\n---\n\n## 相关样本\n\n")
+                                report.write(
+                                    f"⚠️ 无法解析相关样本数量: {number_text}\n\n"
                                 )
                         else:
-                            log_print("表格数据提取失败")
-                            report_content += "\n---\n\n## 相关样本\n\n"
-                            report_content += "⚠️ 表格数据提取失败\n\n"
+                            log_print("无法获取威胁数量文本")
+                            report.write("\n---\n\n## 相关样本\n\n")
+                            report.write("⚠️ 无法获取相关样本数量信息\n\n")
                     else:
-                        log_print(f"无法解析威胁数量: {number_text}")
-                        report_content += "\n---\n\n## 相关样本\n\n"
-                        report_content += f"⚠️ 无法解析相关样本数量: {number_text}\n\n"
-                else:
-                    log_print("无法获取威胁数量文本")
-                    report_content += "\n---\n\n## 相关样本\n\n"
-                    report_content += "⚠️ 无法获取相关样本数量信息\n\n"
-            else:
-                log_print("点击目标元素失败")
-                report_content += "\n---\n\n## 相关样本\n\n"
-                report_content += "⚠️ 无法点击目标相关样本元素\n\n"
+                        log_print("点击目标元素失败")
+                        report.write("\n---\n\n## 相关样本\n\n")
+                        report.write("⚠️ 无法点击目标相关样本元素\n\n")
 
-        except Exception as e:
-            log_print(f"相关样本提取过程出错: {e}")
-            report_content += "\n---\n\n## 相关样本\n\n"
-            report_content += f"❌ 相关样本提取失败: {str(e)}\n\n"
+                except JobCancelled:
+                    raise
+                except Exception as e:
+                    log_print(f"相关样本提取过程出错: {e}")
+                    report.write("\n---\n\n## 相关样本\n\n")
+                    report.write(f"❌ 相关样本提取失败: {str(e)}\n\n")
+        timer.lap("related_samples_report" if related_extracted else "related_samples")
+
+        # 记录因时间预算跳过的部分
+        check_cancelled()
+        if budget.skipped:
+            report.write(budget.markdown())
+
+        # 保存捕获的接口数据
+        if network_capture:
+            network_capture.collect()
+            responses_filename = f"{sanitized_target}_api_responses.json"
+            network_capture.save_responses(os.path.join(output_dir, responses_filename))
+            if get_config_value("ioc.save_network_recording", default=False):
+                network_capture.save_recording(
+                    os.path.join(
+                        output_dir, f"{sanitized_target}_network_recording.json"
+                    )
+                )
+            report.write("\n---\n\n## 接口数据\n\n")
+            report.write(network_capture.summary_markdown())
+            report.write(
+                f"\n💾 接口原始数据已保存为JSON文件: `{responses_filename}`\n\n"
+            )
 
-        # 保存报告
-        report_filename = f"{sanitized_target}_{config.target_type}_threat_report.md"
-        report_path = os.path.join(output_dir, report_filename)
-        with open(report_path, "w", encoding="utf-8") as f:
-            f.write(report_content)
+        # 完成报告
+        report.close(completed=True)
+        timer.lap("save_report")
 
         log_print(f"\n✅ 报告已生成: {report_path}")
-        return f"报告已成功生成并保存至: {report_path}"
+        result.success = True
+        result.report_path = report_path
+
+    except JobCancelled:
+        # 未完成的报告保留检查点，再次分析同一目标时从中断处继续
+        result.error = "任务已取消"
+        log_print(f"\n⏹️ 分析已取消: {config.target_value}")
 
     except Exception as e:
-        error_message = f"分析过程中出现错误: {str(e)}"
-        log_print(f"\n❌ {error_message}")
-        return error_message
+        result.error = str(e)
+        log_print(f"\n❌ 分析过程中出现错误: {result.error}")
 
     finally:
-        # 确保WebDriver被正确关闭
-        selenium_driver.quit_driver()
+        # 未完成的报告保留进度文件，下次分析同一目标时续写
+        if report is not None:
+            report.close(completed=False)
+        # 等待后台截图写盘并保存去重索引
+        if driver_screenshots_enabled(driver):
+            try:
+                get_screenshot_pipeline(pic_output_dir).flush()
+            except Exception as e:
+                log_print(f"截图后处理失败: {e}")
+        # 确保自行创建的WebDriver被正确关闭
+        if selenium_driver is not None:
+            selenium_driver.quit_driver()
+            profile_slots.release(selenium_driver.profile_index)
+        result.elapsed_seconds = time.time() - start_time
+        result.stage_timings = dict(timer.timings)
+        result.skipped_stages = list(budget.skipped)
+        log_print(f"阶段耗时: {timer.format_summary(total=result.elapsed_seconds)}")
+        if budget.skipped:
+            log_print(f"因时间预算跳过: {', '.join(budget.skipped)}")
+
+    return result
 
 
 if __name__ == "__main__":
@@ -0,0 +1,269 @@
+"""
+IOC 抓取流程的离线录制与回放
+
+录制：用 RecordingDriver 包装真实浏览器跑一次 run_target_analysis，离开每个页面前
+保存渲染后的 DOM 快照（去掉脚本、内联样式），并记录该页面期间的 JSON 接口响应。
+
+回放：ReplayServer 在本地起一个 HTTP 服务，按路径返回快照页面和接口数据。把
+ioc.threatbook_site_url / ioc.sample_site_url 指向 ReplayServer.base_url 后，
+完整的分析流程（面板展开、相关样本、样本报告）即可在无网络环境下运行，用于基准测试。
+
+限制：快照是静态页面，点击只作用于录制时已渲染的元素，例如样本报告中切换
+环境标签不会改变释放文件表格。
+"""
+
+import json
+import os
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+from .ioc_mcp import NetworkCapture, log_print
+
+MANIFEST_NAME = "manifest.json"
+
+# 克隆当前DOM，去掉脚本和外链样式，把可读取的样式表内联为一个 <style>
+SNAPSHOT_SCRIPT = """
+var cssText = [];
+for (var i = 0; i < document.styleSheets.length; i++) {
+    try {
+        var rules = document.styleSheets[i].cssRules;
+        for (var j = 0; j < rules.length; j++) { cssText.push(rules[j].cssText); }
+    } catch (e) {}
+}
+var root = document.documentElement.cloneNode(true);
+root.querySelectorAll('script, style, link[rel="stylesheet"], link[rel="preload"]')
+    .forEach(function(node) { node.remove(); });
+var head = root.querySelector('head');
+if (head) {
+    var style = document.createElement('style');
+    style.textContent = cssText.join('\\n');
+    head.appendChild(style);
+}
+return '<!DOCTYPE html>\\n' + root.outerHTML;
+"""
+
+
+def url_key(url: str) -> str:
+    """回放时用于匹配的键：路径加查询串，忽略协议和主机"""
+    parts = urlsplit(url)
+    key = parts.path or "/"
+    if parts.query:
+        key += "?" + parts.query
+    return key
+
+
+class _LogTap:
+    """把 RecordingDriver 截获的性能日志交给内部 NetworkCapture 处理"""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.entries: List[dict] = []
+
+    def get_log(self, log_type: str) -> List[dict]:
+        entries, self.entries = self.entries, []
+        return entries
+
+    def execute_cdp_cmd(self, cmd: str, cmd_args: dict) -> dict:
+        return self.driver.execute_cdp_cmd(cmd, cmd_args)
+
+
+class RecordingDriver:
+    """
+    WebDriver 代理：每次 get() 之前保存当前页面快照，其余调用原样转发
+
+    驱动需要开启性能日志（setup_driver(capture_network=True)）才能录制接口数据，
+    否则只保存页面快照。录制结束后调用 flush() 保存最后一个页面和清单文件。
+    """
+
+    def __init__(self, driver, record_dir: str):
+        self._driver = driver
+        self._record_dir = record_dir
+        self._tap = _LogTap(driver)
+        # 空片段匹配所有URL：录制全部JSON接口，分类交给回放时的 NetworkCapture
+        self._capture = NetworkCapture(self._tap, patterns={"api": [""]})
+        self._recorded_count = 0
+        # 快照时提前读走的性能日志，留给调用方下一次 get_log 返回
+        self._backlog: List[dict] = []
+        self._current_key: Optional[str] = None
+        self.manifest = {
+            "recorded_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "pages": {},
+            "api": {},
+            "page_api": {},
+        }
+        os.makedirs(os.path.join(record_dir, "pages"), exist_ok=True)
+        os.makedirs(os.path.join(record_dir, "api"), exist_ok=True)
+
+    def __getattr__(self, name):
+        return getattr(self._driver, name)
+
+    def get(self, url: str):
+        self._snapshot()
+        self._driver.get(url)
+        self._current_key = url_key(url)
+
+    def get_log(self, log_type: str) -> List[dict]:
+        entries = self._driver.get_log(log_type)
+        if log_type != "performance":
+            return entries
+        self._tap.entries.extend(entries)
+        self._record_api()
+        entries, self._backlog = self._backlog + entries, []
+        return entries
+
+    def flush(self) -> str:
+        """
+        保存当前页面和清单文件
+
+        Returns:
+            str: 清单文件路径
+        """
+        self._snapshot()
+        manifest_path = os.path.join(self._record_dir, MANIFEST_NAME)
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2)
+        log_print(
+            f"录制完成: {len(self.manifest['pages'])} 个页面, "
+            f"{len(self.manifest['api'])} 个接口, 清单 {manifest_path}"
+        )
+        return manifest_path
+
+    def _record_api(self):
+        """处理截获的性能日志，把新的JSON响应记到当前页面名下"""
+        seen = len(self._capture.responses["api"])
+        self._capture.collect()
+        for item in self._capture.responses["api"][seen:]:
+            key = url_key(item["url"])
+            filename = f"api/{len(self.manifest['api']) + 1:04d}.json"
+            with open(
+                os.path.join(self._record_dir, filename), "w", encoding="utf-8"
+            ) as f:
+                json.dump(item["data"], f, ensure_ascii=False)
+            self.manifest["api"][key] = filename
+            if self._current_key is not None:
+                page_api = self.manifest["page_api"].setdefault(self._current_key, [])
+                if key not in page_api:
+                    page_api.append(key)
+
+    def _snapshot(self):
+        """保存当前页面快照，同一地址重复访问时以最后一次为准"""
+        if self._current_key is None:
+            return
+        try:
+            entries = self._driver.get_log("performance")
+        except Exception:
+            # 未开启性能日志时只保存页面
+            entries = []
+        self._tap.entries.extend(entries)
+        self._backlog.extend(entries)
+        self._record_api()
+
+        try:
+            html = self._driver.execute_script(SNAPSHOT_SCRIPT)
+        except Exception as e:
+            log_print(f"页面快照失败 {self._current_key}: {e}")
+            return
+
+        filename = self.manifest["pages"].get(self._current_key)
+        if filename is None:
+            self._recorded_count += 1
+            filename = f"pages/{self._recorded_count:04d}.html"
+        with open(os.path.join(self._record_dir, filename), "w", encoding="utf-8") as f:
+            f.write(html)
+        self.manifest["pages"][self._current_key] = filename
+        log_print(f"已保存页面快照: {self._current_key} -> {filename}")
+
+
+class ReplayServer:
+    """在本地回放 RecordingDriver 录制的页面和接口数据"""
+
+    def __init__(self, record_dir: str, host: str = "127.0.0.1", port: int = 0):
+        """
+        Args:
+            record_dir: 录制目录（包含 manifest.json）
+            host: 监听地址
+            port: 监听端口，0 表示随机可用端口
+        """
+        with open(os.path.join(record_dir, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        self.record_dir = record_dir
+        self.pages: Dict[str, str] = manifest.get("pages", {})
+        self.api: Dict[str, str] = manifest.get("api", {})
+        self.page_api: Dict[str, List[str]] = manifest.get("page_api", {})
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "ReplayServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        log_print(f"回放服务已启动: {self.base_url}")
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "ReplayServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def render_page(self, key: str) -> Optional[bytes]:
+        """读取快照，并注入脚本重新请求录制时该页面加载过的接口"""
+        filename = self.pages.get(key)
+        if filename is None:
+            return None
+        with open(os.path.join(self.record_dir, filename), "r", encoding="utf-8") as f:
+            html = f.read()
+        api_keys = self.page_api.get(key)
+        if api_keys:
+            script = (
+                f"<script>{json.dumps(api_keys)}"
+                ".forEach(function(u) { fetch(u); });</script>"
+            )
+            html = html.replace("</head>", script + "</head>", 1)
+        return html.encode("utf-8")
+
+    def read_api(self, key: str) -> Optional[bytes]:
+        filename = self.api.get(key)
+        if filename is None:
+            return None
+        with open(os.path.join(self.record_dir, filename), "rb") as f:
+            return f.read()
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                key = url_key(self.path)
+                body = server.render_page(key)
+                content_type = "text/html; charset=utf-8"
+                if body is None:
+                    body = server.read_api(key)
+                    content_type = "application/json; charset=utf-8"
+                if body is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,137 @@
+"""
+增量写入的Markdown报告工具
+"""
+
+import json
+import os
+from typing import Any, Dict, Iterable, Optional, Sequence
+
+
+def iter_markdown_table(headers: Sequence[str], rows: Iterable[Sequence[str]]):
+    """
+    逐行生成Markdown表格文本
+
+    Args:
+        headers: 表头
+        rows: 行数据迭代器，列数不足时补空，多出的列被截断
+
+    Yields:
+        str: 以换行结尾的表格行
+    """
+    column_count = len(headers)
+    yield "| " + " | ".join(headers) + " |\n"
+    yield "| " + " | ".join(["---"] * column_count) + " |\n"
+    for row in rows:
+        cells = list(row)[:column_count]
+        cells += [""] * (column_count - len(cells))
+        yield "| " + " | ".join(cells) + " |\n"
+
+
+class MarkdownReportWriter:
+    """
+    边分析边写入的Markdown报告
+
+    每个阶段写完后调用 checkpoint() 刷盘，并把已完成的阶段和文件长度记录到
+    "<报告路径>.progress.json"。中途崩溃时报告保留到最后一个检查点；以 resume=True
+    重新打开同一路径会截掉检查点之后的残缺内容，调用方通过 is_completed() 跳过
+    已完成的阶段。close(completed=True) 后删除进度文件。
+    """
+
+    def __init__(self, path: str, resume: bool = True):
+        """
+        Args:
+            path: 报告文件路径
+            resume: 存在进度文件时是否从上次的检查点继续写入
+        """
+        self.path = path
+        self.progress_path = path + ".progress.json"
+        self.completed: Dict[str, Any] = {}
+
+        offset = 0
+        if resume and os.path.exists(self.progress_path) and os.path.exists(path):
+            try:
+                with open(self.progress_path, "r", encoding="utf-8") as f:
+                    progress = json.load(f)
+                self.completed = dict(progress["completed"])
+                offset = int(progress["offset"])
+            except (OSError, ValueError, KeyError, TypeError):
+                self.completed = {}
+                offset = 0
+
+        self.resumed = bool(self.completed)
+        if self.resumed:
+            self._file = open(path, "r+b")
+            self._file.seek(offset)
+            self._file.truncate()
+        else:
+            self._file = open(path, "wb")
+
+    def __enter__(self) -> "MarkdownReportWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close(completed=exc_type is None)
+
+    def is_completed(self, stage: str) -> bool:
+        """阶段是否已在之前的运行中写入"""
+        return stage in self.completed
+
+    def stage_data(self, stage: str, default=None):
+        """读取检查点时保存的阶段数据"""
+        value = self.completed.get(stage)
+        return default if value is None else value
+
+    def write(self, text: str):
+        """追加文本（写入缓冲区，检查点时刷盘）"""
+        if text:
+            self._file.write(text.encode("utf-8"))
+
+    def write_table(self, headers: Sequence[str], rows: Iterable[Sequence[str]]) -> int:
+        """
+        从行迭代器逐行写入Markdown表格
+
+        Returns:
+            int: 写入的数据行数
+        """
+        row_count = -2  # 表头和分隔行不计入
+        for line in iter_markdown_table(headers, rows):
+            self.write(line)
+            row_count += 1
+        return row_count
+
+    def checkpoint(self, stage: str, data: Optional[Any] = None):
+        """
+        刷盘并记录阶段完成
+
+        Args:
+            stage: 阶段名称
+            data: 需要在续写时恢复的阶段数据（须可JSON序列化）
+        """
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.completed[stage] = data
+        self._save_progress()
+
+    def close(self, completed: bool = True):
+        """
+        关闭报告文件
+
+        Args:
+            completed: 报告是否完整；为False时保留进度文件以便续写
+        """
+        if self._file.closed:
+            return
+        self._file.close()
+        if completed and os.path.exists(self.progress_path):
+            os.remove(self.progress_path)
+
+    def _save_progress(self):
+        """先写临时文件再替换，避免进度文件本身写坏"""
+        progress: Dict[str, Any] = {
+            "offset": self._file.tell(),
+            "completed": self.completed,
+        }
+        temp_path = self.progress_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(progress, f, ensure_ascii=False)
+        os.replace(temp_path, self.progress_path)
@@ -0,0 +1,211 @@
+"""
+截图后处理流水线：后台编码、缩放和感知哈希去重
+"""
+
+import io
+import itertools
+import json
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional
+
+from PIL import Image
+
+INDEX_FILENAME = "phash_index.json"
+
+
+def dhash(image: Image.Image, hash_size: int = 16) -> int:
+    """
+    计算差值哈希（dHash）
+
+    灰度缩放到 (hash_size+1) x hash_size，比较水平相邻像素的亮度，得到
+    hash_size*hash_size 位的整数。
+
+    Args:
+        image: PIL图像
+        hash_size: 哈希边长，越大越能区分细节
+
+    Returns:
+        int: 哈希值
+    """
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = small.tobytes()
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+class ScreenshotPipeline:
+    """
+    截图后处理流水线
+
+    submit() 在调用线程里只做解码和哈希，立即返回最终文件名，供写入Markdown链接；
+    缩放、编码和写盘交给后台线程。与已保存截图（跨目标，记录在 phash_index.json）
+    尺寸相同且哈希距离不超过阈值时不再保存，直接返回已有文件名。
+
+    去重后其他目标的报告可能链接到同一个文件，因此索引中仍存在的文件不会被覆盖：
+    同名截图内容变化时改存为 "<文件名>-<哈希前缀>"。
+    """
+
+    def __init__(
+        self,
+        output_dir: str,
+        image_format: str = "png",
+        max_width: int = 0,
+        quality: int = 80,
+        dedup: bool = True,
+        dedup_distance: int = 0,
+        hash_size: int = 16,
+    ):
+        """
+        Args:
+            output_dir: 截图输出目录
+            image_format: "png" 或 "webp"
+            max_width: 宽度超过该值时等比缩小，0 表示保持原尺寸
+            quality: WebP 压缩质量
+            dedup: 是否按感知哈希去重
+            dedup_distance: 判定为重复的最大汉明距离，0 表示哈希完全相同
+            hash_size: dHash 边长
+        """
+        image_format = image_format.lower()
+        if image_format not in ("png", "webp"):
+            raise ValueError(f"不支持的截图格式: {image_format}")
+
+        self.output_dir = output_dir
+        self.image_format = image_format
+        self.max_width = max_width
+        self.quality = quality
+        self.dedup = dedup
+        self.dedup_distance = dedup_distance
+        self.hash_size = hash_size
+
+        os.makedirs(output_dir, exist_ok=True)
+        self._index_path = os.path.join(output_dir, INDEX_FILENAME)
+        self._index: List[dict] = self._load_index()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="screenshot"
+        )
+        self._pending: List[Future] = []
+        self._submitted = set()
+
+    def submit(self, png_bytes: bytes, name: str) -> str:
+        """
+        提交一张截图
+
+        Args:
+            png_bytes: 浏览器返回的PNG数据
+            name: 不含扩展名的文件名
+
+        Returns:
+            str: 相对输出目录的最终文件名（重复时为已有文件，同名文件仍被引用时带哈希后缀）
+        """
+        image = Image.open(io.BytesIO(png_bytes))
+        image.load()
+        filename = f"{name}.{self.image_format}"
+
+        with self._lock:
+            if self.dedup:
+                image_hash = dhash(image, self.hash_size)
+                canonical = self._find_duplicate(image_hash, image.size)
+                if canonical is not None:
+                    return canonical
+                filename = self._unreferenced_filename(name, image_hash)
+                # 选中的文件名若仍有索引记录，说明原文件已不存在，丢弃该记录
+                self._index = [
+                    entry for entry in self._index if entry["file"] != filename
+                ]
+                self._index.append(
+                    {
+                        "hash": f"{image_hash:x}",
+                        "hash_size": self.hash_size,
+                        "size": list(image.size),
+                        "file": filename,
+                    }
+                )
+            self._submitted.add(filename)
+            self._pending.append(
+                self._executor.submit(self._encode_and_save, image, filename)
+            )
+        return filename
+
+    def flush(self):
+        """等待后台任务完成并保存哈希索引"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        for future in pending:
+            future.result()
+        if self.dedup:
+            with self._lock:
+                self._save_index()
+
+    def close(self):
+        self.flush()
+        self._executor.shutdown(wait=True)
+
+    def _find_duplicate(self, image_hash: int, size) -> Optional[str]:
+        """在索引中查找尺寸相同、哈希距离不超过阈值的截图"""
+        for entry in self._index:
+            if entry.get("hash_size") != self.hash_size:
+                continue
+            if tuple(entry["size"]) != tuple(size):
+                continue
+            if (
+                bin(int(entry["hash"], 16) ^ image_hash).count("1")
+                > self.dedup_distance
+            ):
+                continue
+            if self._file_present(entry["file"]):
+                return entry["file"]
+        return None
+
+    def _file_present(self, filename: str) -> bool:
+        """本次运行提交的文件可能还在后台写入，之前的文件需确认仍然存在"""
+        return filename in self._submitted or os.path.exists(
+            os.path.join(self.output_dir, filename)
+        )
+
+    def _unreferenced_filename(self, name: str, image_hash: int) -> str:
+        """返回索引中没有引用现存文件的文件名，避免覆盖其他报告链接的截图"""
+        referenced = {
+            entry["file"] for entry in self._index if self._file_present(entry["file"])
+        }
+        # 哈希前16位足以区分同名截图的不同内容
+        prefix = f"{name}-{format(image_hash, 'x')[:16]}"
+        stems = itertools.chain(
+            [name, prefix], (f"{prefix}-{n}" for n in itertools.count(2))
+        )
+        for stem in stems:
+            filename = f"{stem}.{self.image_format}"
+            if filename not in referenced:
+                return filename
+
+    def _encode_and_save(self, image: Image.Image, filename: str):
+        if self.max_width and image.width > self.max_width:
+            height = round(image.height * self.max_width / image.width)
+            image = image.resize((self.max_width, height), Image.LANCZOS)
+
+        path = os.path.join(self.output_dir, filename)
+        if self.image_format == "webp":
+            image.save(path, "WEBP", quality=self.quality, method=4)
+        else:
+            image.save(path, "PNG", optimize=True)
+
+    def _load_index(self) -> List[dict]:
+        if not self.dedup or not os.path.exists(self._index_path):
+            return []
+        try:
+            with open(self._index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def _save_index(self):
+        temp_path = self._index_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self._index, f, ensure_ascii=False)
+        os.replace(temp_path, self._index_path)
@@ -0,0 +1,114 @@
+"""
+分阶段耗时统计与截止时间工具
+"""
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+_local = threading.local()
+
+
+class StageTimer:
+    """按阶段累计耗时的计时器，每次 lap 记录自上一次 lap 以来的时间"""
+
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+        self._last = time.perf_counter()
+
+    def lap(self, stage: str) -> float:
+        """
+        结束当前阶段并累计到指定名称下
+
+        Args:
+            stage: 阶段名称，同名阶段的耗时会累加
+
+        Returns:
+            float: 本次阶段耗时（秒）
+        """
+        now = time.perf_counter()
+        elapsed = now - self._last
+        self._last = now
+        self.timings[stage] = self.timings.get(stage, 0.0) + elapsed
+        return elapsed
+
+    def reset(self):
+        """从当前时刻开始计时下一个阶段，不记录已流逝的时间"""
+        self._last = time.perf_counter()
+
+    def format_summary(self, total: Optional[float] = None) -> str:
+        """生成单行的阶段耗时摘要，如 "page_load=10.02s, summary=0.31s" """
+        parts = [f"{stage}={seconds:.2f}s" for stage, seconds in self.timings.items()]
+        if total is not None:
+            parts.append(f"total={total:.2f}s")
+        return ", ".join(parts)
+
+
+class Deadline:
+    """
+    截止时间
+
+    子截止时间不会晚于父截止时间。activate() 把它设为当前线程的截止时间，
+    深层的等待调用通过 budgeted() 读取，无需逐层传参。
+    """
+
+    def __init__(
+        self, seconds: Optional[float] = None, parent: Optional["Deadline"] = None
+    ):
+        """
+        Args:
+            seconds: 从现在起的可用秒数，None 或不大于0表示不限时
+            parent: 父截止时间
+        """
+        expires_at = time.monotonic() + seconds if seconds and seconds > 0 else None
+        if parent is not None and parent.expires_at is not None:
+            expires_at = (
+                parent.expires_at
+                if expires_at is None
+                else min(expires_at, parent.expires_at)
+            )
+        self.expires_at = expires_at
+
+    @property
+    def limited(self) -> bool:
+        return self.expires_at is not None
+
+    def remaining(self) -> float:
+        """剩余秒数，不限时返回 inf"""
+        if self.expires_at is None:
+            return math.inf
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def child(self, seconds: Optional[float]) -> "Deadline":
+        """创建不晚于当前截止时间的子截止时间"""
+        return Deadline(seconds, parent=self)
+
+    def clamp(self, seconds: float) -> float:
+        """把等待时长限制在剩余时间以内"""
+        return min(seconds, self.remaining())
+
+    @contextmanager
+    def activate(self):
+        """在 with 块内作为当前线程的截止时间"""
+        previous = getattr(_local, "deadline", None)
+        _local.deadline = self
+        try:
+            yield self
+        finally:
+            _local.deadline = previous
+
+    @staticmethod
+    def current() -> Optional["Deadline"]:
+        """当前线程的截止时间，未设置时返回None"""
+        return getattr(_local, "deadline", None)
+
+
+def budgeted(seconds: float) -> float:
+    """按当前线程的截止时间裁剪等待时长"""
+    deadline = Deadline.current()
+    return seconds if deadline is None else deadline.clamp(seconds)
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+测试批量文件名扫描
+"""
+
+import itertools
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加 Everything 搜索服务的源码目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root / "src/mcpsectrace/mcp_servers/everything_mcp/src"))
+
+from mcp_server_everything_search.bulk_matcher import (
+    AhoCorasick,
+    FilenameMatcher,
+    sweep_filenames,
+)
+
+
+def test_aho_corasick_overlapping_patterns():
+    """测试重叠、嵌套的模式在一次遍历中全部找到"""
+    patterns = ["he", "she", "his", "hers"]
+    automaton = AhoCorasick(patterns)
+    assert automaton.find("ushers") == {0, 1, 3}
+    assert automaton.find("ahishers") == {0, 1, 2, 3}
+    assert automaton.find("xyz") == set()
+
+
+def test_aho_corasick_matches_naive_search():
+    """测试随机文本上的匹配结果与逐个子串判断一致"""
+    rng = random.Random(7)
+    patterns = ["".join(rng.choices("abc", k=rng.randint(1, 4))) for _ in range(30)]
+    automaton = AhoCorasick(patterns)
+    for _ in range(200):
+        text = "".join(rng.choices("abcd", k=rng.randint(0, 12)))
+        expected = {i for i, pattern in enumerate(patterns) if pattern in text}
+        assert automaton.find(text) == expected, text
+
+
+def test_filename_matcher_modes():
+    """测试 contains 与 exact 模式，大小写不同的目标文件名都报告命中"""
+    matcher = FilenameMatcher(["evil.dll", "EVIL.DLL", "a.exe", "", "evil.dll"])
+    assert matcher.names == ["evil.dll", "EVIL.DLL", "a.exe"]
+    assert sorted(matcher.match("Not_Evil.DLL")) == ["EVIL.DLL", "evil.dll"]
+    assert matcher.match("data.exe") == ["a.exe"]
+    assert matcher.match("readme.txt") == []
+
+    exact = FilenameMatcher(["evil.dll"], mode="exact")
+    assert exact.match("EVIL.dll") == ["evil.dll"]
+    assert exact.match("not_evil.dll") == []
+
+    with pytest.raises(ValueError):
+        FilenameMatcher(["a"], mode="regex")
+
+
+def test_sweep_filenames():
+    """测试单次遍历得到所有命中，并限制每个文件名保留的路径数"""
+    files = [(f"copy{i}_evil.dll", f"/d/{i}/copy{i}_evil.dll") for i in range(5)]
+    files.append(("dropper.exe", "/d/dropper.exe"))
+    hits, stats = sweep_filenames(
+        iter(files), ["evil.dll", "dropper.exe", "missing.bin"], max_paths_per_name=3
+    )
+    assert hits == {
+        "evil.dll": [
+            "/d/0/copy0_evil.dll",
+            "/d/1/copy1_evil.dll",
+            "/d/2/copy2_evil.dll",
+        ],
+        "dropper.exe": ["/d/dropper.exe"],
+    }
+    assert (stats.scanned, stats.matched_names) == (6, 2)
+    assert "遍历 6 个文件" in stats.format_summary()
+
+
+def test_sweep_without_names_does_not_enumerate():
+    """测试没有目标文件名时不遍历文件列表"""
+    files = itertools.count()
+    hits, stats = sweep_filenames(files, [])
+    assert hits == {}
+    assert stats.scanned == 0
+    assert next(files) == 0
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+测试 locate/mdfind 输出的流式读取与结果数下推
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+# 添加 Everything 搜索服务的源码目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root / "src/mcpsectrace/mcp_servers/everything_mcp/src"))
+
+from mcp_server_everything_search import search_interface
+from mcp_server_everything_search.search_interface import (
+    LinuxSearchProvider,
+    iter_command_lines,
+    stream_command_lines,
+)
+
+# 输出大量行的命令，读够后应被立即终止
+ENDLESS = [
+    sys.executable,
+    "-c",
+    "import itertools\nfor i in itertools.count(): print(i)",
+]
+
+
+def test_stream_stops_after_enough_lines():
+    """测试跳过 offset 行、读够 max_results 行后终止进程"""
+    start = time.monotonic()
+    lines, returncode, stderr = stream_command_lines(ENDLESS, 5, offset=3)
+    assert lines == ["3", "4", "5", "6", "7"]
+    assert returncode == 0
+    assert time.monotonic() - start < 10
+
+
+def test_stream_reports_failure():
+    """测试输出不足时保留命令的返回码和标准错误"""
+    cmd = [
+        sys.executable,
+        "-c",
+        "import sys\nprint('a')\nsys.stderr.write('数据库不存在')\nsys.exit(2)",
+    ]
+    lines, returncode, stderr = stream_command_lines(cmd, 10)
+    assert lines == ["a"]
+    assert returncode == 2
+    assert "数据库不存在" in stderr
+
+
+def test_iter_command_lines():
+    """测试逐行产生输出，提前关闭时终止进程，失败时抛出异常"""
+    lines = iter_command_lines(ENDLESS)
+    assert [next(lines) for _ in range(3)] == ["0", "1", "2"]
+    lines.close()
+
+    with pytest.raises(RuntimeError):
+        list(iter_command_lines([sys.executable, "-c", "import sys; sys.exit(1)"]))
+
+
+def test_locate_limit_pushed_down(monkeypatch):
+    """测试 locate 查询把 offset + max_results 作为 -l 参数传给命令"""
+    commands = []
+
+    def fake_stream(cmd, max_results, offset=0):
+        commands.append((cmd, max_results, offset))
+        return ["/data/a.dll"], 0, ""
+
+    monkeypatch.setattr(
+        search_interface, "_detect_locate", lambda: ("plocate", "plocate")
+    )
+    monkeypatch.setattr(search_interface, "stream_command_lines", fake_stream)
+    provider = LinuxSearchProvider()
+    results = provider.search_files("a.dll", max_results=20, offset=40)
+
+    assert commands == [(["plocate", "-i", "-l", "60", "a.dll"], 20, 40)]
+    assert [r.filename for r in results] == ["a.dll"]
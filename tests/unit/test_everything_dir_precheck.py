@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+测试释放文件各层目录的存在性预检查
+"""
+
+import sys
+from pathlib import Path
+
+# 添加 Everything 搜索服务的源码目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root / "src/mcpsectrace/mcp_servers/everything_mcp/src"))
+
+from mcp_server_everything_search.dir_precheck import DirectoryPrecheck
+
+
+class FakeDirs:
+    """在固定目录集合上判断目录是否存在，并记录检查次数"""
+
+    def __init__(self, directories):
+        self.directories = set(directories)
+        self.calls = []
+
+    def __call__(self, directory):
+        self.calls.append(directory)
+        return directory in self.directories
+
+
+def test_expand_vars():
+    """测试不区分大小写地展开 %VAR%，未定义的变量保留原样"""
+    precheck = DirectoryPrecheck(
+        environ={"AppData": "C:\\Users\\me\\AppData\\Roaming"},
+        target_user="me",
+        isdir=FakeDirs([]),
+    )
+    assert (
+        precheck.expand_vars("%APPDATA%\\x\\a.dll")
+        == "C:\\Users\\me\\AppData\\Roaming\\x\\a.dll"
+    )
+    assert precheck.expand_vars("%NOPE%\\a.dll") == "%NOPE%\\a.dll"
+
+
+def test_normalize_replaces_missing_sandbox_user():
+    """测试沙箱用户目录不存在而本机用户目录存在时替换用户名"""
+    isdir = FakeDirs(["C:\\Users\\me", "C:\\Users\\admin"])
+    precheck = DirectoryPrecheck(environ={}, target_user="me", isdir=isdir)
+    assert (
+        precheck.normalize("C:\\Users\\sandbox\\AppData\\a.dll")
+        == "C:\\Users\\me\\AppData\\a.dll"
+    )
+    # 预期的用户目录本机存在时不替换
+    assert precheck.normalize("C:\\Users\\admin\\a.dll") == "C:\\Users\\admin\\a.dll"
+    # 不是用户目录的路径保持不变
+    assert precheck.normalize("D:\\tools\\a.dll") == "D:\\tools\\a.dll"
+
+
+def test_ancestors_marks_missing_levels_and_caches():
+    """测试各层目录中本机不存在的为 None，每个目录只检查一次"""
+    isdir = FakeDirs(["C:\\Users\\me\\AppData", "C:\\Users\\me", "/opt/app"])
+    precheck = DirectoryPrecheck(environ={}, target_user="me", isdir=isdir)
+
+    path = "C:\\Users\\me\\AppData\\Roaming\\evil.dll"
+    assert precheck.ancestors(path, 2) == [
+        None,
+        "C:\\Users\\me\\AppData",
+        "C:\\Users\\me",
+    ]
+    calls = len(isdir.calls)
+    assert precheck.ancestors(path, 2) == [
+        None,
+        "C:\\Users\\me\\AppData",
+        "C:\\Users\\me",
+    ]
+    # Windows 路径按不区分大小写缓存
+    assert precheck.exists("c:\\users\\ME")
+    assert len(isdir.calls) == calls
+
+    assert precheck.ancestors("/opt/app/bin/tool", 1) == [None, "/opt/app"]
+
+
+def test_from_env(monkeypatch):
+    """测试 EVERYTHING_DIR_PRECHECK=0 时关闭预检查，目标用户读取环境变量"""
+    monkeypatch.setenv("EVERYTHING_DIR_PRECHECK", "0")
+    assert DirectoryPrecheck.from_env() is None
+
+    monkeypatch.setenv("EVERYTHING_DIR_PRECHECK", "1")
+    monkeypatch.setenv("EVERYTHING_TARGET_USER", "analyst")
+    assert DirectoryPrecheck.from_env().target_user == "analyst"
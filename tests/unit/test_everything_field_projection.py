@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+测试 Everything SDK 查询的字段投影
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加 Everything 搜索服务的源码目录和基准脚本目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root / "src/mcpsectrace/mcp_servers/everything_mcp/src"))
+sys.path.insert(0, str(project_root / "scripts"))
+
+from benchmark_everything_projection import FakeEverythingDLL
+from mcp_server_everything_search.everything_sdk import (
+    ALL_FIELDS,
+    EVERYTHING_REQUEST_FILE_NAME,
+    EVERYTHING_REQUEST_PATH,
+    EVERYTHING_REQUEST_SIZE,
+    EverythingSDK,
+    normalize_fields,
+    request_flags_for,
+)
+
+
+def test_normalize_fields():
+    """测试补上必需字段、按固定顺序返回并拒绝未知字段"""
+    assert normalize_fields(None) == ALL_FIELDS
+    assert normalize_fields(["size"]) == ("path", "filename", "size")
+    assert normalize_fields(["modified", "path", "size"]) == (
+        "path",
+        "filename",
+        "size",
+        "modified",
+    )
+    with pytest.raises(ValueError, match="未知字段: owner"):
+        normalize_fields(["size", "owner"])
+
+
+def test_request_flags_for():
+    """测试字段投影只请求需要的标志"""
+    assert request_flags_for(normalize_fields(["size"])) == (
+        EVERYTHING_REQUEST_FILE_NAME | EVERYTHING_REQUEST_PATH | EVERYTHING_REQUEST_SIZE
+    )
+
+
+def test_projected_search_skips_unrequested_getters():
+    """测试投影查询只调用已请求字段的获取函数，值与全字段查询一致"""
+    full_dll = FakeEverythingDLL(5)
+    full = EverythingSDK("fake.dll", dll=full_dll).search_files("sample", 5)
+
+    dll = FakeEverythingDLL(5)
+    projected = EverythingSDK("fake.dll", dll=dll).search_files(
+        "sample", 5, fields=["size", "modified"]
+    )
+
+    assert dll.request_flags == request_flags_for(
+        normalize_fields(["size", "modified"])
+    )
+    assert dll.calls["Everything_GetResultExtensionW"] == 0
+    assert dll.calls["Everything_GetResultDateCreated"] == 0
+    assert dll.calls["Everything_GetResultSize"] == 5
+    assert dll.result_calls() < full_dll.result_calls()
+
+    for full_result, result in zip(full, projected):
+        for field in ALL_FIELDS:
+            expected = (
+                getattr(full_result, field)
+                if field in ("path", "filename", "size", "modified")
+                else None
+            )
+            assert getattr(result, field) == expected, field
+
+
+def test_offset_is_passed_to_everything():
+    """测试 offset 交给 Everything 服务端分页"""
+    dll = FakeEverythingDLL(10)
+    results = EverythingSDK("fake.dll", dll=dll).search_files(
+        "sample", 3, fields=[], offset=4
+    )
+    assert [r.filename for r in results] == [
+        "sample_4.exe",
+        "sample_5.exe",
+        "sample_6.exe",
+    ]
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+测试释放文件的 SHA256 校验
+"""
+
+import hashlib
+import os
+import sys
+from pathlib import Path
+
+# 添加 Everything 搜索服务的源码目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root / "src/mcpsectrace/mcp_servers/everything_mcp/src"))
+
+from mcp_server_everything_search import hash_verify
+from mcp_server_everything_search.hash_verify import (
+    CONFIRMED,
+    MISMATCHED,
+    NO_EXPECTED_HASH,
+    UNREADABLE,
+    HashCache,
+    HashVerifier,
+    sha256_file,
+)
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def test_sha256_file_chunked_and_mmap(tmp_path, monkeypatch):
+    """测试按块读取和 mmap 两种方式的哈希与 hashlib 一致"""
+    data = os.urandom(3000)
+    path = tmp_path / "sample.bin"
+    path.write_bytes(data)
+    monkeypatch.setattr(hash_verify, "READ_CHUNK_SIZE", 512)
+    assert sha256_file(str(path)) == _sha256(data)
+    monkeypatch.setattr(hash_verify, "MMAP_THRESHOLD", 1024)
+    assert sha256_file(str(path)) == _sha256(data)
+
+    empty = tmp_path / "empty.bin"
+    empty.write_bytes(b"")
+    assert sha256_file(str(empty)) == _sha256(b"")
+
+
+def test_hash_cache_keyed_by_size_and_mtime(tmp_path):
+    """测试缓存按路径、大小和修改时间命中，并在重新打开后保留"""
+    db_path = str(tmp_path / "cache/hashes.db")
+    cache = HashCache(db_path)
+    cache.put("/d/a.exe", 10, 100, "aa")
+    assert cache.get("/d/a.exe", 10, 100) == "aa"
+    assert cache.get("/d/a.exe", 10, 101) is None
+    assert cache.get("/d/a.exe", 11, 100) is None
+    cache.close()
+
+    reopened = HashCache(db_path)
+    assert reopened.get("/d/a.exe", 10, 100) == "aa"
+    reopened.close()
+
+
+def test_verify_statuses(tmp_path):
+    """测试一致、不一致、无法读取和无预期哈希四种结论"""
+    good = tmp_path / "good.exe"
+    good.write_bytes(b"payload")
+    other = tmp_path / "other.exe"
+    other.write_bytes(b"different")
+    missing = str(tmp_path / "missing.exe")
+
+    verifier = HashVerifier(workers=2)
+    results = verifier.verify(
+        [
+            (_sha256(b"payload").upper() + " ", [str(other), str(good)]),
+            (_sha256(b"payload"), [str(other)]),
+            (_sha256(b"payload"), [missing]),
+            ("", [str(good)]),
+        ]
+    )
+    assert [r.status for r in results] == [
+        CONFIRMED,
+        MISMATCHED,
+        UNREADABLE,
+        NO_EXPECTED_HASH,
+    ]
+    assert results[0].matched_paths == [str(good)]
+    assert results[2].actual == {missing: None}
+    assert CONFIRMED in results[0].describe()
+    # 重复的候选路径只计算一次
+    assert verifier.stats.hashed_files == 2
+    assert (verifier.stats.confirmed, verifier.stats.mismatched) == (1, 1)
+    assert verifier.stats.unreadable == 1
+
+
+def test_verify_uses_cache_until_file_changes(tmp_path):
+    """测试文件未变化时使用缓存的哈希，修改后重新计算"""
+    path = tmp_path / "a.exe"
+    path.write_bytes(b"v1")
+    cache = HashCache(":memory:")
+    items = [(_sha256(b"v1"), [str(path)])]
+
+    assert HashVerifier(cache).verify(items)[0].status == CONFIRMED
+    verifier = HashVerifier(cache)
+    assert verifier.verify(items)[0].status == CONFIRMED
+    assert (verifier.stats.cache_hits, verifier.stats.hashed_files) == (1, 0)
+
+    path.write_bytes(b"v2-changed")
+    verifier = HashVerifier(cache)
+    assert verifier.verify(items)[0].status == MISMATCHED
+    assert verifier.stats.hashed_files == 1
+    cache.close()
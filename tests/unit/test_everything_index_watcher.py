@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+测试内置索引的增量更新（变更记录与 inotify 监视）
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+# 添加 Everything 搜索服务的源码目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root / "src/mcpsectrace/mcp_servers/everything_mcp/src"))
+
+from mcp_server_everything_search import index_watcher, native_index
+from mcp_server_everything_search.index_watcher import (
+    IN_CREATE,
+    IN_DELETE,
+    IN_ISDIR,
+    IN_MOVED_FROM,
+    IN_Q_OVERFLOW,
+    IndexOverlay,
+    InotifyWatcher,
+    add_tree,
+)
+from mcp_server_everything_search.native_index import (
+    NativeIndex,
+    NativeIndexSearchProvider,
+    build_index,
+)
+from mcp_server_everything_search.search_cache import CachingSearchProvider
+
+
+def test_overlay_add_remove():
+    """测试新增、删除和目录删除对索引路径的隐藏"""
+    overlay = IndexOverlay()
+    overlay.add("/d/new.txt")
+    assert overlay.added_paths() == ["/d/new.txt"]
+    # 新增路径同时隐藏索引中的同名旧条目
+    assert overlay.is_removed("/d/new.txt")
+
+    overlay.remove("/d/old.txt")
+    assert overlay.is_removed("/d/old.txt")
+    assert not overlay.is_removed("/d/other.txt")
+
+    overlay.add("/d/sub/a.txt")
+    overlay.remove("/d/sub", is_dir=True)
+    assert overlay.is_removed("/d/sub/deep/b.txt")
+    assert not overlay.is_removed("/d/subway.txt")
+    assert overlay.added_paths() == ["/d/new.txt"]
+    assert overlay.generation == 4
+
+
+def test_overlay_discard_before_and_limits():
+    """测试重建后丢弃旧记录，以及记录过多或事件丢失时标记重建"""
+    overlay = IndexOverlay(max_changes=2)
+    overlay.add("/d/a")
+    overlay.remove("/d/b")
+    assert overlay.rebuild_reason is not None
+    cutoff = time.time()
+    time.sleep(0.01)
+    overlay.add("/d/c")
+
+    overlay.discard_before(cutoff)
+    assert overlay.rebuild_reason is None
+    assert overlay.added_paths() == ["/d/c"]
+    assert not overlay.is_removed("/d/b")
+
+    overlay.mark_stale("inotify 事件队列溢出")
+    assert overlay.rebuild_reason == "inotify 事件队列溢出"
+
+
+def test_add_tree_records_contents(tmp_path):
+    """测试移入的目录连同其内容一起记录"""
+    (tmp_path / "moved/inner").mkdir(parents=True)
+    (tmp_path / "moved/inner/x.dll").write_bytes(b"")
+    overlay = IndexOverlay()
+    directories = []
+    add_tree(overlay, str(tmp_path / "moved"), directories.append)
+    assert sorted(overlay.added_paths()) == [
+        str(tmp_path / "moved"),
+        str(tmp_path / "moved/inner"),
+        str(tmp_path / "moved/inner/x.dll"),
+    ]
+    assert directories == [str(tmp_path / "moved"), str(tmp_path / "moved/inner")]
+
+
+def _event(wd, mask, name=b""):
+    if name:
+        name = name + b"\0" * (16 - len(name) % 16)
+    return index_watcher._EVENT_HEADER.pack(wd, mask, 0, len(name)) + name
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify 仅限 Linux")
+def test_inotify_event_handling():
+    """测试 inotify 事件解析：新增、删除、移出目录和队列溢出"""
+    overlay = IndexOverlay()
+    watcher = InotifyWatcher(lambda: [], overlay)
+    watcher._watches = {1: "/d", 2: "/d/gone", 3: "/d/gone/sub"}
+    removed_watches = []
+    watcher._libc = type(
+        "Libc",
+        (),
+        {"inotify_rm_watch": lambda self, fd, wd: removed_watches.append(wd)},
+    )()
+
+    watcher._handle(
+        _event(1, IN_CREATE, b"new.txt")
+        + _event(1, IN_DELETE, b"old.txt")
+        + _event(1, IN_MOVED_FROM | IN_ISDIR, b"gone")
+    )
+    assert overlay.added_paths() == ["/d/new.txt"]
+    assert overlay.is_removed("/d/old.txt")
+    assert overlay.is_removed("/d/gone/sub/file")
+    assert sorted(removed_watches) == [2, 3]
+    assert watcher._watches == {1: "/d"}
+
+    watcher._handle(_event(-1, IN_Q_OVERFLOW))
+    assert overlay.rebuild_reason == "inotify 事件队列溢出"
+
+
+def test_index_search_applies_overlay(tmp_path):
+    """测试查询排除已删除的索引条目并追加新增路径"""
+    root = tmp_path / "root"
+    root.mkdir()
+    (root / "evil.dll").write_bytes(b"")
+    (root / "keep.dll").write_bytes(b"")
+    index_path = str(tmp_path / "index.bin")
+    build_index([str(root)], index_path)
+
+    overlay = IndexOverlay()
+    overlay.remove(str(root / "evil.dll"))
+    overlay.add(str(root / "fresh.dll"))
+    index = NativeIndex(index_path)
+    try:
+        # 索引中的匹配在前，新增的匹配追加在末尾
+        assert index.search("*.dll", overlay=overlay) == [
+            str(root / "keep.dll"),
+            str(root / "fresh.dll"),
+        ]
+        assert index.search("evil", overlay=overlay) == []
+    finally:
+        index.close()
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify 仅限 Linux")
+def test_provider_sees_live_changes(tmp_path):
+    """测试开启监视后，建索引之后新增和删除的文件立即反映在查询结果中"""
+    root = tmp_path / "root"
+    (root / "sub").mkdir(parents=True)
+    (root / "sub/old.bin").write_bytes(b"")
+    provider = NativeIndexSearchProvider(
+        index_path=str(tmp_path / "index.bin"),
+        roots=[str(root)],
+        max_age_seconds=0,
+        watch=True,
+    )
+    try:
+        assert [r.filename for r in provider.search_files("old.bin")] == ["old.bin"]
+        generation = provider.index_generation
+        # 等待监视线程添加完目录监视
+        deadline = time.monotonic() + 5
+        while provider._watcher.watch_count < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        (root / "sub/new.bin").write_bytes(b"")
+        os.remove(root / "sub/old.bin")
+        deadline = time.monotonic() + 5
+        while provider.index_generation < generation + 2:
+            assert time.monotonic() < deadline, "未收到文件变更事件"
+            time.sleep(0.02)
+
+        assert [r.filename for r in provider.search_files(".bin")] == ["new.bin"]
+    finally:
+        provider.stop_watching()
+
+
+def test_overlay_changes_since():
+    """测试按版本号取之后变更的路径，无法逐个路径判断时返回 None"""
+    overlay = IndexOverlay(max_changes=3)
+    overlay.add("/d/a")
+    generation = overlay.generation
+    overlay.add("/d/b")
+    overlay.remove("/d/c")
+    assert sorted(overlay.changes_since(generation)) == ["/d/b", "/d/c"]
+    assert overlay.changes_since(overlay.generation) == []
+
+    # 超出记录上限后，更早的版本号无法判断
+    overlay.add("/d/e")
+    assert overlay.changes_since(0) is None
+    generation = overlay.generation
+    overlay.remove("/d/sub", is_dir=True)
+    assert overlay.changes_since(generation) is None
+
+
+class _IdleWatcher:
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+def test_cache_hits_survive_unrelated_changes(tmp_path, monkeypatch):
+    """测试无关路径的文件变更不使缓存失效，匹配查询的变更只淘汰相关条目"""
+    monkeypatch.setattr(native_index, "create_watcher", lambda *a: _IdleWatcher())
+    root = tmp_path / "root"
+    root.mkdir()
+    (root / "evil.dll").write_bytes(b"")
+    (root / "notes.txt").write_bytes(b"")
+    build_index([str(root)], str(tmp_path / "index.bin"))
+    provider = NativeIndexSearchProvider(
+        index_path=str(tmp_path / "index.bin"),
+        roots=[str(root)],
+        max_age_seconds=0,
+        watch=True,
+    )
+    calls = []
+    original_search = provider.search_files
+
+    def counting_search(*args, **kwargs):
+        calls.append(kwargs.get("query", args[0] if args else None))
+        return original_search(*args, **kwargs)
+
+    monkeypatch.setattr(provider, "search_files", counting_search)
+    cache = CachingSearchProvider(provider, ttl_seconds=0)
+    assert [r.filename for r in cache.search_files("evil")] == ["evil.dll"]
+    cache.search_files("notes")
+
+    # /tmp、/var/log 下的写入与查询无关
+    provider._overlay.add("/var/log/syslog.1")
+    provider._overlay.remove("/tmp/build.o")
+    assert [r.filename for r in cache.search_files("evil")] == ["evil.dll"]
+    assert calls == ["evil", "notes"]
+    assert cache.stats.invalidations == 0
+
+    # 新增匹配的文件只使对应查询失效
+    provider._overlay.add(str(root / "evil2.dll"))
+    assert [r.filename for r in cache.search_files("evil")] == [
+        "evil.dll",
+        "evil2.dll",
+    ]
+    cache.search_files("notes")
+    assert calls == ["evil", "notes", "evil"]
+    assert cache.stats.invalidations == 1
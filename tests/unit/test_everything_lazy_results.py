@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+测试搜索结果元数据的延迟读取
+"""
+
+import os
+import sys
+from pathlib import Path
+
+# 添加 Everything 搜索服务的源码目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root / "src/mcpsectrace/mcp_servers/everything_mcp/src"))
+
+from mcp_server_everything_search import search_interface
+from mcp_server_everything_search.search_interface import (
+    LazySearchResult,
+    SearchResult,
+    prefetch_metadata,
+)
+
+
+def _count_stats(monkeypatch):
+    calls = []
+    original_stat = os.stat
+
+    def counting_stat(path, *args, **kwargs):
+        calls.append(path)
+        return original_stat(path, *args, **kwargs)
+
+    monkeypatch.setattr(search_interface.os, "stat", counting_stat)
+    return calls
+
+
+def test_stat_on_first_access_only(tmp_path, monkeypatch):
+    """测试路径信息立即可用，元数据在首次访问时只读取一次"""
+    path = tmp_path / "sample.dll"
+    path.write_bytes(b"12345")
+    calls = _count_stats(monkeypatch)
+
+    result = LazySearchResult(str(path))
+    assert (result.filename, result.extension) == ("sample.dll", "dll")
+    assert not result.metadata_loaded
+    assert calls == []
+
+    assert result.size == 5
+    assert result.modified is not None
+    assert result.accessed is not None
+    assert len(calls) == 1
+    assert isinstance(result, SearchResult)
+
+    # 赋值覆盖缓存的值，不再读取文件
+    result.size = 9
+    assert result.size == 9
+    assert len(calls) == 1
+
+
+def test_missing_file_gives_none(tmp_path):
+    """测试文件不存在时元数据各项为 None"""
+    result = LazySearchResult(str(tmp_path / "gone.txt"))
+    assert result.size is None
+    assert result.created is None
+    assert result.metadata_loaded
+
+
+def test_prefetch_metadata(tmp_path, monkeypatch):
+    """测试批量预读只读取尚未加载的延迟结果"""
+    paths = []
+    for i in range(6):
+        path = tmp_path / f"f{i}.bin"
+        path.write_bytes(b"x" * i)
+        paths.append(str(path))
+    results = [LazySearchResult(path) for path in paths]
+    results[0].load_metadata()
+    plain = SearchResult(path="/nowhere/plain.txt", filename="plain.txt")
+    calls = _count_stats(monkeypatch)
+
+    assert prefetch_metadata(results + [plain], workers=4) == results + [plain]
+    assert sorted(calls) == paths[1:]
+    assert all(result.metadata_loaded for result in results)
+    assert [result.size for result in results] == list(range(6))
+    assert len(calls) == 5
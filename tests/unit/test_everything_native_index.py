@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+测试内置文件名索引
+"""
+
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+# 添加 Everything 搜索服务的源码目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root / "src/mcpsectrace/mcp_servers/everything_mcp/src"))
+
+from mcp_server_everything_search import native_index
+from mcp_server_everything_search.native_index import (
+    NativeIndex,
+    NativeIndexSearchProvider,
+    build_index,
+)
+
+TREE = [
+    "appdata/roaming/Evil.dll",
+    "appdata/roaming/notes.txt",
+    "appdata/temp/dropper.exe",
+    "program files/vendor/agent.sys",
+    "program files/vendor/evil_helper.dll",
+    "docs/report final.docx",
+]
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / "root"
+    for relative in TREE:
+        path = root / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"")
+    return root
+
+
+def _names(paths):
+    return sorted(os.path.basename(path) for path in paths)
+
+
+def test_build_and_search(tree, tmp_path):
+    """测试建立索引后的子串、通配符、path: 和正则查询"""
+    index_path = str(tmp_path / "index.bin")
+    # 6 个文件 + 6 个目录（不含根目录）
+    assert build_index([str(tree)], index_path, workers=4) == 12
+    assert [p.name for p in tmp_path.iterdir() if p.suffix == ".tmp"] == []
+
+    index = NativeIndex(index_path)
+    try:
+        assert _names(index.search("evil")) == ["Evil.dll", "evil_helper.dll"]
+        assert _names(index.search("evil", match_case=True)) == ["evil_helper.dll"]
+        assert _names(index.search("*.dll")) == ["Evil.dll", "evil_helper.dll"]
+        assert _names(index.search("path:roaming .txt")) == ["notes.txt"]
+        assert _names(index.search('path:"program files" agent')) == ["agent.sys"]
+        assert _names(index.search('"report final"')) == ["report final.docx"]
+        assert _names(index.search(r"^drop.*\.exe$", match_regex=True)) == [
+            "dropper.exe"
+        ]
+        # 分页：offset 跳过的匹配不出现在下一页
+        first = index.search("l", max_results=2)
+        rest = index.search("l", max_results=100, offset=2)
+        assert len(first) == 2 and not set(first) & set(rest)
+        assert str(tree / "appdata/roaming/Evil.dll") in index.search("evil.dll")
+    finally:
+        index.close()
+
+
+def test_failed_build_leaves_no_temp_file(tree, tmp_path, monkeypatch):
+    """测试写入失败时删除临时文件，不替换已有索引"""
+    index_path = tmp_path / "index.bin"
+    index_path.write_bytes(b"old")
+
+    class BrokenHeader:
+        size = native_index._HEADER.size
+
+        @staticmethod
+        def pack(*args):
+            raise OSError("磁盘已满")
+
+    monkeypatch.setattr(native_index, "_HEADER", BrokenHeader)
+    with pytest.raises(OSError):
+        build_index([str(tree)], str(index_path))
+    assert index_path.read_bytes() == b"old"
+    assert [p.name for p in tmp_path.iterdir() if p.suffix == ".tmp"] == []
+
+
+def test_concurrent_first_use_builds_once(tree, tmp_path, monkeypatch):
+    """测试首次使用时的并发查询只建立一次索引"""
+    builds = []
+    original_build = native_index.build_index
+
+    def slow_build(*args, **kwargs):
+        builds.append(threading.current_thread().name)
+        time.sleep(0.2)
+        return original_build(*args, **kwargs)
+
+    monkeypatch.setattr(native_index, "build_index", slow_build)
+    provider = NativeIndexSearchProvider(
+        index_path=str(tmp_path / "index.bin"),
+        roots=[str(tree)],
+        max_age_seconds=0,
+        watch=False,
+    )
+
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(provider.search_files("dropper"))
+        )
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(builds) == 1
+    assert [len(result) for result in results] == [1, 1, 1, 1]
+    assert results[0][0].filename == "dropper.exe"
+
+
+def test_background_rebuild_runs_once(tree, tmp_path, monkeypatch):
+    """测试索引过期时多次触发只启动一个后台重建"""
+    index_path = str(tmp_path / "index.bin")
+    build_index([str(tree)], index_path)
+    builds = []
+    release = threading.Event()
+    original_build = native_index.build_index
+
+    def blocked_build(*args, **kwargs):
+        builds.append(1)
+        release.wait(5)
+        return original_build(*args, **kwargs)
+
+    monkeypatch.setattr(native_index, "build_index", blocked_build)
+    provider = NativeIndexSearchProvider(
+        index_path=index_path, roots=[str(tree)], max_age_seconds=1e-9, watch=False
+    )
+    for _ in range(5):
+        assert len(provider.search_files("agent")) == 1
+    release.set()
+    deadline = time.monotonic() + 5
+    while provider._rebuilding and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert builds == [1]
+
+
+def test_bracket_class_is_not_a_literal(tree, tmp_path):
+    """测试通配符中的字符类不作为三元组筛选的字面片段"""
+    for name in ("fooax", "barfx", "abcdef.bin"):
+        (tree / name).write_bytes(b"")
+    index_path = str(tmp_path / "index.bin")
+    build_index([str(tree)], index_path)
+    index = NativeIndex(index_path)
+    try:
+        assert _names(index.search("*[abcdef]x")) == [
+            "barfx",
+            "fooax",
+            "report final.docx",
+        ]
+        assert _names(index.search("*[!z]x")) == [
+            "barfx",
+            "fooax",
+            "report final.docx",
+        ]
+        assert _names(index.search("*[]a]x")) == ["fooax"]
+    finally:
+        index.close()
+    assert native_index._Term("*[abcdef]x", False, False, False).literal() == "x"
+    assert native_index._Term("evil*[]ab]c", False, False, False).literal() == "evil"
+
+
+def test_rebuild_closes_replaced_index(tree, tmp_path):
+    """测试重建后旧索引在进行中的查询结束后关闭"""
+    provider = NativeIndexSearchProvider(
+        index_path=str(tmp_path / "index.bin"),
+        roots=[str(tree)],
+        max_age_seconds=0,
+        watch=False,
+    )
+    assert len(provider.search_files("agent")) == 1
+    first = provider._index
+    provider.rebuild()
+    assert first.closed
+
+    # 遍历全部文件期间重建：旧索引在遍历结束后才关闭
+    files = provider.iter_all_files()
+    next(files)
+    second = provider._index
+    provider.rebuild()
+    assert not second.closed
+    assert len(list(files)) == 11
+    assert second.closed
+    assert not provider._index.closed
+    assert len(provider.search_files("agent")) == 1
+
+
+def test_dir_cache_is_bounded(tree, tmp_path, monkeypatch):
+    """测试目录路径缓存不超过上限"""
+    monkeypatch.setattr(native_index, "DIR_CACHE_SIZE", 2)
+    index_path = str(tmp_path / "index.bin")
+    build_index([str(tree)], index_path)
+    index = NativeIndex(index_path)
+    try:
+        paths = [index.path(entry_id) for entry_id in range(len(index))]
+        assert len(paths) == 12
+        assert len(index._dir_cache) <= 2
+    finally:
+        index.close()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+测试搜索结果的分页游标与按页遍历
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加 Everything 搜索服务的源码目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root / "src/mcpsectrace/mcp_servers/everything_mcp/src"))
+
+from mcp_server_everything_search.pagination import (
+    decode_cursor,
+    encode_cursor,
+    query_signature,
+)
+from mcp_server_everything_search.search_interface import SearchProvider, SearchResult
+
+
+class ListProvider(SearchProvider):
+    """在固定结果列表上按 offset 和 max_results 分页的假提供者"""
+
+    def __init__(self, count):
+        self.paths = [f"/data/file_{i}.bin" for i in range(count)]
+        self.calls = []
+
+    def search_files(self, query, max_results=100, offset=0, **kwargs):
+        self.calls.append((offset, max_results, kwargs))
+        return [
+            SearchResult(path=path, filename=Path(path).name)
+            for path in self.paths[offset : offset + max_results]
+        ]
+
+
+def test_cursor_round_trip():
+    """测试游标编码后可解析出偏移量"""
+    signature = query_signature({"query": "*.dll", "max_results": 100})
+    cursor = encode_cursor(signature, 300)
+    assert decode_cursor(cursor, signature) == 300
+
+
+def test_signature_ignores_key_order():
+    """测试查询参数的摘要与键顺序无关"""
+    assert query_signature({"a": 1, "b": "x"}) == query_signature({"b": "x", "a": 1})
+    assert query_signature({"a": 1}) != query_signature({"a": 2})
+
+
+def test_mismatched_or_invalid_cursor_rejected():
+    """测试查询参数改变或游标损坏时拒绝"""
+    cursor = encode_cursor(query_signature({"query": "a"}), 100)
+    with pytest.raises(ValueError, match="不匹配"):
+        decode_cursor(cursor, query_signature({"query": "b"}))
+    with pytest.raises(ValueError, match="无效的分页游标"):
+        decode_cursor("不是游标", query_signature({"query": "a"}))
+    with pytest.raises(ValueError, match="不匹配"):
+        signature = query_signature({"query": "a"})
+        decode_cursor(encode_cursor(signature, -1), signature)
+
+
+def test_iter_search_pages_through_all_results():
+    """测试按页遍历取到全部结果，最后一页不足页大小时停止"""
+    provider = ListProvider(25)
+    pages = list(provider.iter_search("file", page_size=10, match_case=True))
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert [r.path for page in pages for r in page] == provider.paths
+    assert [call[0] for call in provider.calls] == [0, 10, 20]
+    assert provider.calls[0][2] == {"match_case": True}
+
+
+def test_iter_search_exact_multiple():
+    """测试结果数恰为页大小整数倍时多查一次空页后停止，不产生空页"""
+    provider = ListProvider(20)
+    pages = list(provider.iter_search("file", page_size=10))
+    assert [len(page) for page in pages] == [10, 10]
+    assert len(provider.calls) == 3
+
+
+def test_iter_all_files():
+    """测试枚举全部文件产生文件名和路径"""
+    provider = ListProvider(3)
+    assert list(provider.iter_all_files()) == [
+        ("file_0.bin", "/data/file_0.bin"),
+        ("file_1.bin", "/data/file_1.bin"),
+        ("file_2.bin", "/data/file_2.bin"),
+    ]
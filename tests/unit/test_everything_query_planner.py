@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+测试释放文件分层检查的批量查询规划
+"""
+
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+
+# 添加 Everything 搜索服务的源码目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root / "src/mcpsectrace/mcp_servers/everything_mcp/src"))
+
+from mcp_server_everything_search.dir_precheck import DirectoryPrecheck
+from mcp_server_everything_search.query_planner import (
+    GLOBAL_STATUS,
+    LEVELS,
+    ReleaseFileQueryPlanner,
+)
+from mcp_server_everything_search.search_interface import SearchProvider, SearchResult
+
+FILES = [
+    "/data/users/alice/appdata/roaming/evil.dll",
+    "/data/users/alice/appdata/temp/dropper.exe",
+    "/data/users/alice/appdata/local/payload.bin",
+    "/data/users/alice/readme.txt",
+    "/data/program files/vendor/agent.sys",
+    "/data/x/ab/boundary.dll",
+    "/opt/other/evil.dll",
+    "/opt/other/stray.tmp",
+]
+
+ROWS = [
+    # 预期目录中存在
+    ("evil.dll", "/data/users/alice/appdata/roaming/evil.dll"),
+    # 上一层目录存在
+    ("dropper.exe", "/data/users/alice/appdata/local/dropper.exe"),
+    # 上两层目录存在
+    ("readme.txt", "/data/users/alice/appdata/roaming/readme.txt"),
+    # 含空格的目录
+    ("agent.sys", "/data/program files/vendor/agent.sys"),
+    # 上两层 /data/x/a 不应匹配 /data/x/ab，只能在全局找到
+    ("boundary.dll", "/data/x/a/b/c/boundary.dll"),
+    # 只在全局存在
+    ("stray.tmp", "/data/users/bob/stray.tmp"),
+    # 不存在
+    ("missing.dat", "/data/users/alice/missing.dat"),
+    # 与第一行重复
+    ("evil.dll", "/data/users/alice/appdata/roaming/evil.dll"),
+]
+
+
+class FakeSearchProvider(SearchProvider):
+    """
+    在内存文件列表上模拟搜索
+
+    返回文件名包含查询中任一词的文件（结果是真实匹配的超集），
+    规划器需要自行按目录和文件名过滤。
+    """
+
+    def __init__(self, files, supports_boolean_query=False):
+        self.files = list(files)
+        self.supports_boolean_query = supports_boolean_query
+        self.queries = []
+
+    def search_files(self, query, max_results=100, offset=0, **kwargs):
+        self.queries.append(query)
+        terms = [
+            term.lower()
+            for term in re.split(r'[<>|" ]+', query)
+            if term and not term.startswith("path:")
+        ]
+        matches = [
+            SearchResult(path=path, filename=Path(path).name)
+            for path in self.files
+            if any(term in Path(path).name.lower() for term in terms)
+        ]
+        return matches[offset : offset + max_results]
+
+    def iter_all_files(self):
+        self.queries.append("<全部文件>")
+        for path in self.files:
+            yield Path(path).name, path
+
+
+def row_by_row(files, rows, max_depth=2):
+    """逐行检查的参考实现：逐层在预期目录的祖先目录下查找，最后全局查找"""
+    verdicts = []
+    for file_name, file_path in rows:
+        verdict = None
+        directory = Path(file_path).parent
+        for level, status, _ in LEVELS[: max_depth + 1]:
+            prefix = str(directory).lower().rstrip("/") + "/"
+            if any(
+                path.lower().startswith(prefix)
+                and file_name.lower() in Path(path).name.lower()
+                for path in files
+            ):
+                verdict = (status, level)
+                break
+            directory = directory.parent
+        if verdict is None and any(
+            file_name.lower() in Path(path).name.lower() for path in files
+        ):
+            verdict = (GLOBAL_STATUS, 3)
+        verdicts.append(verdict)
+    return verdicts
+
+
+def _verdicts(checks):
+    return [
+        (check.status, check.level) if check.status is not None else None
+        for check in checks
+    ]
+
+
+def test_batched_verdicts_match_row_by_row():
+    """测试批量查询（含截断拆分）的结论与逐行检查一致"""
+    expected = row_by_row(FILES, ROWS)
+    assert expected[4] == (GLOBAL_STATUS, 3)
+    assert expected[6] is None
+
+    for supports_boolean in (False, True):
+        for max_results in (1000, 2):
+            provider = FakeSearchProvider(FILES, supports_boolean)
+            planner = ReleaseFileQueryPlanner(
+                provider,
+                batch_size=3,
+                max_results=max_results,
+                sweep_threshold=0,
+                workers=1,
+            )
+            checks = planner.resolve(ROWS)
+            assert _verdicts(checks) == expected, (supports_boolean, max_results)
+            assert checks[0].paths == ["/data/users/alice/appdata/roaming/evil.dll"]
+
+    # 支持 OR 查询时合并为批量查询，结果达到上限会拆分重查
+    assert planner.stats.splits > 0
+
+
+def test_batching_reduces_queries():
+    """测试去重与 OR 合并后的查询次数少于逐行检查"""
+    planner = ReleaseFileQueryPlanner(
+        FakeSearchProvider(FILES, supports_boolean_query=True),
+        batch_size=50,
+        sweep_threshold=0,
+        workers=1,
+    )
+    planner.resolve(ROWS)
+    # 每层一个 OR 查询
+    assert planner.stats.queries == 4
+    assert planner.stats.row_by_row_queries == 20
+    assert "逐行检查需 20 次" in planner.stats.format_summary()
+
+
+def test_single_queries_are_quoted():
+    """测试单个组合的查询为目录和文件名加引号，与批量查询的结论一致"""
+    build = ReleaseFileQueryPlanner._build_query
+    assert build([("C:\\My Docs", "a b.txt")], True) == 'path:"C:\\My Docs" "a b.txt"'
+    assert build([("C:\\Temp", "x.dll")], True) == "path:C:\\Temp x.dll"
+    assert build([("", "x.dll")], False) == "x.dll"
+    assert (
+        build([("C:\\A", "x.dll"), ("C:\\A", "y b.dll")], True)
+        == '<path:C:\\A <x.dll|"y b.dll">>'
+    )
+
+
+def test_global_level_sweep_matches_row_by_row():
+    """测试全局层改为批量扫描时只遍历一次全部文件，结论与逐行检查一致"""
+    provider = FakeSearchProvider(FILES)
+    planner = ReleaseFileQueryPlanner(provider, sweep_threshold=1, workers=1)
+    checks = planner.resolve(ROWS)
+    assert _verdicts(checks) == row_by_row(FILES, ROWS)
+    assert provider.queries.count("<全部文件>") == 1
+    assert "第3层" not in planner.stats.queries_by_level
+    assert planner.stats.swept_files == len(FILES)
+
+
+def test_failed_sweep_falls_back_to_queries():
+    """测试批量扫描失败时退回逐个查询"""
+
+    class BrokenSweepProvider(FakeSearchProvider):
+        def iter_all_files(self):
+            raise RuntimeError("无法枚举文件")
+
+    planner = ReleaseFileQueryPlanner(
+        BrokenSweepProvider(FILES), sweep_threshold=1, workers=1
+    )
+    checks = planner.resolve(ROWS)
+    assert _verdicts(checks) == row_by_row(FILES, ROWS)
+    assert planner.stats.queries_by_level["第3层"] == 3
+    assert planner.stats.swept_files is None
+
+
+class SlowSearchProvider(FakeSearchProvider):
+    """记录同时执行的查询数的假提供者"""
+
+    def __init__(self, files, max_concurrency=None):
+        super().__init__(files)
+        self.max_concurrency = max_concurrency
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def search_files(self, query, max_results=100, offset=0, **kwargs):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            time.sleep(0.01)
+            return super().search_files(query, max_results, offset, **kwargs)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+def test_parallel_levels_match_serial():
+    """测试同一层并行发送查询的结论和查询统计与串行一致"""
+    serial = ReleaseFileQueryPlanner(
+        FakeSearchProvider(FILES), sweep_threshold=0, workers=1
+    )
+    expected = _verdicts(serial.resolve(ROWS))
+
+    provider = SlowSearchProvider(FILES)
+    parallel = ReleaseFileQueryPlanner(provider, sweep_threshold=0, workers=4)
+    assert _verdicts(parallel.resolve(ROWS)) == expected
+    assert provider.peak > 1
+    assert parallel.stats.queries == serial.stats.queries
+    assert parallel.stats.queries_by_level == serial.stats.queries_by_level
+
+
+def test_workers_capped_by_provider_concurrency(monkeypatch):
+    """测试并发数不超过提供者的 max_concurrency，默认读取环境变量"""
+    provider = SlowSearchProvider(FILES, max_concurrency=1)
+    planner = ReleaseFileQueryPlanner(provider, sweep_threshold=0, workers=8)
+    assert planner.workers == 1
+    planner.resolve(ROWS)
+    assert provider.peak == 1
+
+    monkeypatch.setenv("EVERYTHING_QUERY_WORKERS", "3")
+    assert ReleaseFileQueryPlanner(FakeSearchProvider(FILES)).workers == 3
+
+
+def test_missing_directories_are_skipped():
+    """测试预检查跳过本机不存在的目录层，结论与逐行检查一致且查询更少"""
+
+    def isdir(directory):
+        prefix = directory.rstrip("/") + "/"
+        return any(path.startswith(prefix) for path in FILES)
+
+    baseline = ReleaseFileQueryPlanner(
+        FakeSearchProvider(FILES), sweep_threshold=0, workers=1
+    )
+    baseline.resolve(ROWS)
+    planner = ReleaseFileQueryPlanner(
+        FakeSearchProvider(FILES),
+        sweep_threshold=0,
+        workers=1,
+        dir_precheck=DirectoryPrecheck(environ={}, target_user=None, isdir=isdir),
+    )
+    checks = planner.resolve(ROWS)
+    assert _verdicts(checks) == row_by_row(FILES, ROWS)
+    # boundary.dll 的三层目录都不存在，stray.tmp 的第0层不存在
+    assert planner.stats.skipped_levels == 4
+    assert planner.stats.queries == baseline.stats.queries - 4
+    assert "目录不存在跳过 4 次" in planner.stats.format_summary()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+测试搜索结果缓存
+"""
+
+import os
+import sys
+from pathlib import Path
+
+# 添加 Everything 搜索服务的源码目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root / "src/mcpsectrace/mcp_servers/everything_mcp/src"))
+
+from mcp_server_everything_search import search_cache
+from mcp_server_everything_search.search_cache import CachingSearchProvider
+from mcp_server_everything_search.search_interface import SearchProvider, SearchResult
+
+
+class CountingProvider(SearchProvider):
+    """记录调用次数的假提供者"""
+
+    locate_cmd = "plocate"
+
+    def __init__(self):
+        self.calls = 0
+        self.index_generation = 0
+
+    def search_files(self, query, max_results=100, **kwargs):
+        self.calls += 1
+        return [SearchResult(path=f"/tmp/{query}", filename=query)]
+
+
+def test_hits_and_lru_eviction():
+    """测试相同参数命中缓存，超出容量时淘汰最久未使用的条目"""
+    provider = CountingProvider()
+    cache = CachingSearchProvider(provider, max_entries=2, ttl_seconds=0)
+
+    assert cache.search_files("a")[0].filename == "a"
+    cache.search_files("a")
+    assert provider.calls == 1
+    # 参数不同视为不同的查询
+    cache.search_files("a", max_results=5)
+    assert provider.calls == 2
+
+    cache.search_files("a")  # a 变为最近使用
+    cache.search_files("b")  # 淘汰 (a, max_results=5)
+    cache.search_files("a")
+    assert provider.calls == 3
+    cache.search_files("a", max_results=5)
+    assert provider.calls == 4
+    assert cache.stats.evictions == 2
+    assert cache.stats.hits == 3
+
+    # 其他属性透传给被包装的提供者
+    assert cache.locate_cmd == "plocate"
+
+
+def test_ttl_expiry(monkeypatch):
+    """测试条目过期后重新查询"""
+    now = [1000.0]
+    monkeypatch.setattr(search_cache.time, "monotonic", lambda: now[0])
+    provider = CountingProvider()
+    cache = CachingSearchProvider(provider, ttl_seconds=10)
+
+    cache.search_files("a")
+    now[0] += 5
+    cache.search_files("a")
+    assert provider.calls == 1
+    now[0] += 11
+    cache.search_files("a")
+    assert provider.calls == 2
+    assert cache.stats.expirations == 1
+
+
+def test_invalidated_by_index_mtime_and_generation(tmp_path):
+    """测试索引数据库修改时间或增量版本号变化时整体失效"""
+    index_db = tmp_path / "plocate.db"
+    index_db.write_bytes(b"")
+    provider = CountingProvider()
+    cache = CachingSearchProvider(provider, ttl_seconds=0, index_paths=[str(index_db)])
+
+    cache.search_files("a")
+    cache.search_files("a")
+    assert provider.calls == 1
+
+    stat = index_db.stat()
+    os.utime(index_db, (stat.st_atime, stat.st_mtime + 60))
+    cache.search_files("a")
+    assert provider.calls == 2
+
+    provider.index_generation += 1
+    cache.search_files("a")
+    assert provider.calls == 3
+    assert cache.stats.invalidations == 2
+
+    before = cache.snapshot()
+    cache.search_files("a")
+    assert cache.stats.since(before).hits == 1
+
+
+def test_from_env(monkeypatch):
+    """测试缓存大小为0时不包装提供者"""
+    provider = CountingProvider()
+    monkeypatch.setenv("EVERYTHING_SEARCH_CACHE_SIZE", "0")
+    assert CachingSearchProvider.from_env(provider) is provider
+
+    monkeypatch.setenv("EVERYTHING_SEARCH_CACHE_SIZE", "8")
+    monkeypatch.setenv("EVERYTHING_SEARCH_CACHE_TTL", "30")
+    cache = CachingSearchProvider.from_env(provider)
+    assert (cache.max_entries, cache.ttl_seconds) == (8, 30.0)
+
+
+def test_results_not_stored_when_index_changes_during_query():
+    """测试查询期间索引更新时不缓存按旧索引得到的结果"""
+
+    class RebuildingProvider(CountingProvider):
+        def search_files(self, query, max_results=100, **kwargs):
+            results = super().search_files(query, max_results, **kwargs)
+            if self.calls == 1:
+                self.index_generation += 1
+            return results
+
+    provider = RebuildingProvider()
+    cache = CachingSearchProvider(provider, ttl_seconds=0)
+    cache.search_files("a")
+    cache.search_files("a")
+    assert provider.calls == 2
+    cache.search_files("a")
+    assert provider.calls == 2
+
+
+def test_entry_stamped_after_query(monkeypatch):
+    """测试条目的时间取查询完成时，慢查询的结果不会提前过期"""
+    now = [1000.0]
+    monkeypatch.setattr(search_cache.time, "monotonic", lambda: now[0])
+
+    class SlowProvider(CountingProvider):
+        def search_files(self, query, max_results=100, **kwargs):
+            now[0] += 8
+            return super().search_files(query, max_results, **kwargs)
+
+    provider = SlowProvider()
+    cache = CachingSearchProvider(provider, ttl_seconds=10)
+    cache.search_files("a")
+    now[0] += 5
+    cache.search_files("a")
+    assert provider.calls == 1
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+测试命令行搜索后端的常驻工作进程
+"""
+
+import io
+import json
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加 Everything 搜索服务的源码目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root / "src/mcpsectrace/mcp_servers/everything_mcp/src"))
+
+from mcp_server_everything_search import search_worker
+from mcp_server_everything_search.search_interface import SearchProvider, SearchResult
+from mcp_server_everything_search.search_worker import (
+    PathSnapshot,
+    WorkerError,
+    WorkerSearchProvider,
+    _PathBuffer,
+    compile_matcher,
+    serve_worker,
+)
+
+PATHS = [
+    "/home/alice/AppData/evil.dll",
+    "/home/alice/notes.txt",
+    "/home/bob/evil_helper.DLL",
+    "/opt/evil/readme.md",
+    "/tmp/dropper.exe",
+]
+
+
+class FakeLocateProvider(SearchProvider):
+    """在固定路径列表上枚举全部文件的假提供者"""
+
+    def __init__(self, paths, index_db_paths=()):
+        self.paths = list(paths)
+        self.index_db_paths = tuple(index_db_paths)
+        self.enumerations = 0
+        self.searches = []
+
+    def iter_all_files(self):
+        self.enumerations += 1
+        for path in self.paths:
+            yield Path(path).name, path
+
+    def search_files(self, query, max_results=100, offset=0, **kwargs):
+        self.searches.append(query)
+        return [SearchResult(path=f"/direct/{query}", filename=query)]
+
+
+def test_compile_matcher():
+    """测试子串、通配符和正则三种匹配规则"""
+    assert compile_matcher("EVIL")("/x/evil.dll")
+    assert not compile_matcher("EVIL", match_case=True)("/x/evil.dll")
+    assert compile_matcher("*.dll")("/x/EVIL.DLL".lower())
+    assert not compile_matcher("*.dll")("/x/evil.dll.bak")
+    assert compile_matcher(r"evil_\w+\.dll$", match_regex=True)("/x/Evil_a.DLL")
+    with pytest.raises(ValueError, match="无效的正则表达式"):
+        compile_matcher("(", match_regex=True)
+
+
+def test_path_buffer_find_lines():
+    """测试在整块文本上定位的行号有序、不重复，且不跨行匹配"""
+    buffer = _PathBuffer(["abcab", "xyz", "ab", "b\na"])
+    assert list(buffer.find_lines("ab")) == [0, 2]
+    assert list(buffer.find_lines("b")) == [0, 2, 3]
+    assert list(buffer.find_lines("zab")) == []
+    assert list(buffer.find_lines("")) == [0, 1, 2, 3]
+
+
+def test_snapshot_search_semantics():
+    """测试快照查询与 locate/mdfind 的匹配规则一致，并支持分页"""
+    snapshot = PathSnapshot(FakeLocateProvider(PATHS))
+    assert snapshot.search("evil") == [PATHS[0], PATHS[2], PATHS[3]]
+    assert snapshot.search("DLL", match_case=True) == [PATHS[2]]
+    assert snapshot.search("*.dll") == [PATHS[0], PATHS[2]]
+    assert snapshot.search(r"\.(exe|md)$", match_regex=True) == [PATHS[3], PATHS[4]]
+    assert snapshot.search("evil", max_results=1, offset=1) == [PATHS[2]]
+
+    # mdfind -name 只匹配文件名，match_path 时匹配完整路径
+    by_name = PathSnapshot(FakeLocateProvider(PATHS), match_name=True)
+    assert by_name.search("evil") == [PATHS[0], PATHS[2]]
+    assert by_name.search("evil", match_path=True) == [PATHS[0], PATHS[2], PATHS[3]]
+
+
+def test_snapshot_reloads_when_database_changes(tmp_path):
+    """测试数据库修改时间不变时复用快照，变化后重新读取"""
+    db = tmp_path / "plocate.db"
+    db.write_bytes(b"")
+    provider = FakeLocateProvider(PATHS, index_db_paths=[str(db)])
+    snapshot = PathSnapshot(provider, max_age_seconds=0)
+    snapshot.search("evil")
+    snapshot.search("notes")
+    assert provider.enumerations == 1
+
+    provider.paths.append("/tmp/new_evil.so")
+    stat = db.stat()
+    os.utime(db, (stat.st_atime, stat.st_mtime + 60))
+    assert snapshot.search("new_evil") == ["/tmp/new_evil.so"]
+    assert provider.enumerations == 2
+
+
+def test_serve_worker_protocol(monkeypatch):
+    """测试工作进程按行处理 JSON 请求，查询出错时返回错误而不退出"""
+    monkeypatch.setattr(
+        SearchProvider,
+        "create_provider",
+        classmethod(lambda cls, backend: FakeLocateProvider(PATHS)),
+    )
+    requests = [
+        {"id": 1, "params": {"query": "*.exe"}},
+        {"id": 2, "params": {"query": "(", "match_regex": True}},
+        {"id": 3, "params": {"query": "notes"}},
+    ]
+    stdin = io.StringIO("\n".join(json.dumps(r) for r in requests) + "\n\n")
+    stdout = io.StringIO()
+    serve_worker("locate", stdin, stdout)
+
+    responses = [json.loads(line) for line in stdout.getvalue().splitlines()]
+    assert responses[0] == {"id": 1, "paths": ["/tmp/dropper.exe"]}
+    assert responses[1]["id"] == 2 and "无效的正则表达式" in responses[1]["error"]
+    assert responses[2] == {"id": 3, "paths": ["/home/alice/notes.txt"]}
+
+
+def test_worker_failure_falls_back_to_command(monkeypatch):
+    """测试工作进程重启后仍失败时改为直接调用被包装的提供者"""
+    attempts = []
+
+    def broken_request(self, params):
+        attempts.append(params["query"])
+        raise WorkerError("搜索工作进程异常退出")
+
+    monkeypatch.setattr(search_worker._Worker, "request", broken_request)
+    inner = FakeLocateProvider(PATHS)
+    provider = WorkerSearchProvider(inner, "locate", workers=2)
+
+    assert [r.path for r in provider.search_files("a.dll")] == ["/direct/a.dll"]
+    assert attempts == ["a.dll", "a.dll"]
+    provider.search_files("b.dll")
+    assert attempts == ["a.dll", "a.dll"]
+    assert inner.searches == ["a.dll", "b.dll"]
+    assert provider.index_db_paths == ()
+
+
+def test_from_env(monkeypatch):
+    """测试默认不启用工作进程，启用时按环境变量设置进程数"""
+    inner = FakeLocateProvider(PATHS)
+    monkeypatch.delenv("EVERYTHING_SEARCH_WORKER", raising=False)
+    assert WorkerSearchProvider.from_env(inner, "locate") is inner
+
+    monkeypatch.setenv("EVERYTHING_SEARCH_WORKER", "true")
+    monkeypatch.setenv("EVERYTHING_SEARCH_WORKER_COUNT", "3")
+    provider = WorkerSearchProvider.from_env(inner, "locate")
+    assert len(provider._workers) == 3
+    assert provider.enumerations == 0
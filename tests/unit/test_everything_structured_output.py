@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+测试工具输出的结构化格式与写入文件
+"""
+
+import json
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+# 添加 Everything 搜索服务的源码目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root / "src/mcpsectrace/mcp_servers/everything_mcp/src"))
+
+from mcp_server_everything_search.structured_output import (
+    render_structured,
+    resolve_output_path,
+    write_output,
+)
+
+SUMMARY = {"query": "*.dll", "total": 2}
+RECORDS = [
+    {"path": "/d/a.dll", "modified": datetime(2024, 1, 2, 3, 4, 5)},
+    {"path": "/d/中文.dll", "modified": None},
+]
+
+
+def test_render_json():
+    """测试 json 格式为单个紧凑对象，时间转为 ISO 格式"""
+    text = render_structured(SUMMARY, RECORDS, "json")
+    assert "\n" not in text
+    assert "中文" in text
+    data = json.loads(text)
+    assert list(data) == ["summary", "records"]
+    assert data["records"][0]["modified"] == "2024-01-02T03:04:05"
+
+
+def test_render_ndjson():
+    """测试 ndjson 首行为摘要，其后每行一条记录"""
+    lines = render_structured(SUMMARY, RECORDS, "ndjson").splitlines()
+    parsed = [json.loads(line) for line in lines]
+    assert parsed[0] == {"type": "summary", **SUMMARY}
+    assert [p["type"] for p in parsed[1:]] == ["record", "record"]
+    assert parsed[2]["path"] == "/d/中文.dll"
+
+    with pytest.raises(ValueError, match="不支持的输出格式"):
+        render_structured(SUMMARY, RECORDS, "xml")
+
+
+def test_resolve_output_path_confined(tmp_path):
+    """测试输出路径限制在输出目录内，拒绝 .. 和指向目录外的符号链接"""
+    out = tmp_path / "out"
+    out.mkdir()
+    assert resolve_output_path("r/a.json", str(out)) == str(out / "r/a.json")
+    assert resolve_output_path(str(out / "b.json"), str(out)) == str(out / "b.json")
+    for bad in ("../escape.json", str(tmp_path / "other.json"), "."):
+        with pytest.raises(ValueError, match="输出目录"):
+            resolve_output_path(bad, str(out))
+
+    os.symlink(tmp_path, out / "link")
+    with pytest.raises(ValueError):
+        resolve_output_path("link/escape.json", str(out))
+
+
+def test_output_dir_from_env(tmp_path, monkeypatch):
+    """测试默认读取 EVERYTHING_OUTPUT_DIR"""
+    monkeypatch.setenv("EVERYTHING_OUTPUT_DIR", str(tmp_path))
+    assert resolve_output_path("x.ndjson") == str(tmp_path / "x.ndjson")
+
+
+def test_write_output(tmp_path):
+    """测试写入完整结果后返回摘要，不覆盖已有文件"""
+    content = render_structured(SUMMARY, RECORDS, "ndjson")
+    reply = write_output(
+        content, "run/result.ndjson", SUMMARY, "json", output_dir=str(tmp_path)
+    )
+    path = tmp_path / "run/result.ndjson"
+    assert path.read_text(encoding="utf-8") == content
+    data = json.loads(reply)
+    assert data["summary"] == SUMMARY
+    assert data["output_file"] == str(path)
+    assert data["bytes"] == path.stat().st_size
+
+    with pytest.raises(ValueError, match="已存在"):
+        write_output("new", str(path), SUMMARY, "json", output_dir=str(tmp_path))
+    assert path.read_text(encoding="utf-8") == content
+
+    reply = write_output(
+        "text",
+        "t.txt",
+        SUMMARY,
+        "text",
+        summary_text="共 2 条",
+        output_dir=str(tmp_path),
+    )
+    assert reply.splitlines() == [
+        f"完整结果已写入: {tmp_path / 't.txt'}（4 字节）",
+        "共 2 条",
+    ]
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+测试微步在线API查询模式（使用模拟服务）
+"""
+
+import csv
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.mcpsectrace.mcp_servers.ioc_mcp import (
+    ThreatBookAPIAnalyzer,
+    ThreatBookAPIClient,
+    ThreatBookAPIError,
+    ThreatDataExtractor,
+)
+
+SHA_OK = "a" * 64
+SHA_MISSING = "b" * 64
+
+MOCK_RESPONSES = {
+    "/v3/scene/ip_reputation": {
+        "8.8.8.8": {
+            "severity": "info",
+            "judgments": ["IDC", "Spam"],
+            "tags_classes": [{"tags_type": "public_info", "tags": ["Google"]}],
+            "basic": {"carrier": "Google", "location": {"country": "United States"}},
+            "is_malicious": False,
+        }
+    },
+    "/v3/ip/query": {
+        "8.8.8.8": {
+            "samples": [
+                {"sha256": SHA_OK, "scan_time": "2024-01-01", "ratio": "3/24"},
+                {"sha256": SHA_MISSING, "malware_type": "Trojan"},
+            ]
+        }
+    },
+    "/v3/file/report": {
+        "summary": {
+            "file_name": "evil.exe",
+            "file_type": "EXE",
+            "threat_level": "malicious",
+            "malware_family": "Mirai",
+            "sandbox_type": "win7_sp1_enx86_office2013",
+        },
+        "dropped": [
+            {"name": "a.dll", "file_type": "DLL", "path": "C:\\a.dll", "sha256": "c1"},
+        ],
+    },
+}
+
+
+def mock_threatbook(request: httpx.Request) -> httpx.Response:
+    """模拟微步在线 v3 API"""
+    if request.url.params.get("apikey") != "test-key":
+        return httpx.Response(
+            200, json={"response_code": -1, "verbose_msg": "无效密钥"}
+        )
+    if request.url.params.get("sha256") == SHA_MISSING:
+        return httpx.Response(200, json={"response_code": 1, "verbose_msg": "无结果"})
+    data = MOCK_RESPONSES.get(request.url.path)
+    if data is None:
+        return httpx.Response(404)
+    return httpx.Response(200, json={"response_code": 0, "data": data})
+
+
+@pytest.fixture
+def client():
+    api_client = ThreatBookAPIClient(
+        "test-key",
+        base_url="https://api.example.test",
+        transport=httpx.MockTransport(mock_threatbook),
+    )
+    yield api_client
+    api_client.close()
+
+
+def test_fetch_target_concurrently(client):
+    """测试并发获取信誉、相关样本和文件报告，单个样本失败不影响整体"""
+    data = client.run(client.fetch_target("ip", "8.8.8.8", max_samples=10))
+    assert data["reputation"]["judgments"] == ["IDC", "Spam"]
+    assert [sample["sha256"] for sample in data["samples"]] == [SHA_OK, SHA_MISSING]
+    assert data["file_reports"][SHA_OK]["summary"]["file_name"] == "evil.exe"
+    assert "无结果" in data["file_reports"][SHA_MISSING]["error"]
+
+
+def test_fetch_target_endpoints_by_type():
+    """测试 IP 请求信誉和分析接口，域名只请求域名分析接口"""
+    paths = []
+
+    def recording(request: httpx.Request) -> httpx.Response:
+        paths.append(request.url.path)
+        if request.url.path == "/v3/domain/query":
+            data = {"evil.test": {"judgments": ["C2"], "samples": []}}
+            return httpx.Response(200, json={"response_code": 0, "data": data})
+        return mock_threatbook(request)
+
+    api_client = ThreatBookAPIClient(
+        "test-key", transport=httpx.MockTransport(recording)
+    )
+    try:
+        api_client.run(api_client.fetch_target("ip", "8.8.8.8", max_samples=0))
+        assert sorted(paths) == ["/v3/ip/query", "/v3/scene/ip_reputation"]
+
+        paths.clear()
+        data = api_client.run(
+            api_client.fetch_target("domain", "evil.test", max_samples=0)
+        )
+        assert paths == ["/v3/domain/query"]
+        assert data["reputation"]["judgments"] == ["C2"]
+    finally:
+        api_client.close()
+
+
+def test_invalid_key_raises():
+    """测试非成功响应码转换为异常"""
+    api_client = ThreatBookAPIClient(
+        "wrong-key", transport=httpx.MockTransport(mock_threatbook)
+    )
+    try:
+        with pytest.raises(ThreatBookAPIError):
+            api_client.run(api_client.ip_reputation("8.8.8.8"))
+    finally:
+        api_client.close()
+
+
+def test_run_analysis_writes_same_structures(client, tmp_path):
+    """测试API结果映射为与浏览器抓取一致的报告和CSV"""
+    result = ThreatBookAPIAnalyzer.run_analysis(client, "ip", "8.8.8.8", str(tmp_path))
+    assert result.success, result.error
+    assert result.related_sample_count == 2
+
+    report = Path(result.report_path).read_text(encoding="utf-8")
+    assert "**情报判定**: IDC、Spam" in report
+    assert "| evil.exe | EXE |" in report
+    assert "⚠️ 获取样本报告失败" in report
+
+    with open(tmp_path / "8.8.8.8_threat_data.csv", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ThreatDataExtractor.TABLE_HEADERS
+    assert rows[1][3] == SHA_OK
+    assert rows[1][5] == "Mirai"
+    assert rows[2][5] == "Trojan"
+
+    with open(tmp_path / "8.8.8.8_release_files.csv", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    assert rows[1] == [
+        "8.8.8.8",
+        SHA_OK,
+        "win7_sp1_enx86_office2013",
+        "a.dll",
+        "DLL",
+        "C:\\a.dll",
+        "c1",
+    ]
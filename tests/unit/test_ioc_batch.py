@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+测试IOC批量分析的规范化、去重和限速逻辑
+"""
+
+import asyncio
+import csv
+import sys
+import threading
+import time
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.mcpsectrace.mcp_servers import ioc_mcp
+from src.mcpsectrace.mcp_servers.ioc_mcp import (
+    AnalysisResult,
+    DriverPool,
+    IOCBatchAnalyzer,
+    ProfileSlots,
+    RateLimiter,
+    profile_slots,
+)
+
+
+def test_normalize_target():
+    """测试单个IOC的规范化"""
+    cases = [
+        ("8.8.8.8", ("ip", "8.8.8.8")),
+        (" 1.2.3[.]4 ", ("ip", "1.2.3.4")),
+        ("hxxp://Evil[.]Example.com:8080/path?x=1", ("domain", "evil.example.com")),
+        ("https://[2001:db8::1]/", ("ip", "2001:db8::1")),
+        ("smsz.one.", ("domain", "smsz.one")),
+        ("10.0.0.1:445", ("ip", "10.0.0.1")),
+        ("not_a_domain", None),
+        ("999.1.1.1", None),
+    ]
+    for raw_value, expected in cases:
+        assert IOCBatchAnalyzer.normalize_target(raw_value) == expected, raw_value
+
+
+def test_normalize_targets_dedup():
+    """测试批量规范化的去重、拆分和无效条目收集"""
+    targets, invalid, duplicate_count = IOCBatchAnalyzer.normalize_targets(
+        [
+            "8.8.8.8",
+            "8.8.8[.]8, du.testjj.com",
+            "DU.TESTJJ.COM;bad_value",
+            "",
+        ]
+    )
+    assert targets == [("ip", "8.8.8.8"), ("domain", "du.testjj.com")]
+    assert invalid == ["bad_value"]
+    assert duplicate_count == 2
+
+
+def test_rate_limiter_spacing():
+    """测试速率限制器的放行间隔"""
+    limiter = RateLimiter(rate_per_minute=600)  # 间隔0.1秒
+    start = time.monotonic()
+    for _ in range(3):
+        limiter.acquire()
+    assert time.monotonic() - start >= 0.2
+
+    unlimited = RateLimiter(rate_per_minute=0)
+    assert unlimited.acquire() == 0.0
+    assert unlimited.acquire() == 0.0
+
+
+def test_profile_slots_distinct():
+    """测试用户数据目录序号分配：同时占用的序号互不相同，归还后复用"""
+    slots = ProfileSlots()
+    assert [slots.acquire() for _ in range(3)] == [0, 1, 2]
+    slots.release(1)
+    assert slots.acquire() == 1
+    assert slots.acquire() == 3
+
+
+def test_driver_pools_do_not_share_profiles():
+    """测试两个同时存在的浏览器池（如批量任务与单目标任务）不会共用用户数据目录"""
+    first = DriverPool(2)
+    second = DriverPool(2)
+    try:
+        indices = [member.profile_index for member in first._members + second._members]
+        assert len(set(indices)) == 4
+    finally:
+        first.close()
+        second.close()
+    assert profile_slots.acquire() == 0
+    profile_slots.release(0)
+
+
+def test_run_batch_cancel_interrupts_targets(monkeypatch):
+    """测试取消批量任务会打断进行中的目标并跳过尚未开始的目标"""
+    started = threading.Event()
+
+    def slow_analysis(target_type, target_value):
+        started.set()
+        ioc_mcp.cancellable_sleep(60)
+        return AnalysisResult(target_type, target_value, success=True)
+
+    monkeypatch.setattr(ioc_mcp, "api_backend_enabled", lambda: True)
+    monkeypatch.setattr(ioc_mcp, "run_api_analysis", slow_analysis)
+    monkeypatch.setattr(ioc_mcp, "remember_result", lambda result: None)
+
+    manager = ioc_mcp.JobManager(max_workers=1)
+    targets = [("ip", f"10.0.0.{i}") for i in range(1, 5)]
+    job = manager.submit(
+        "batch",
+        IOCBatchAnalyzer.run_batch,
+        targets,
+        max_workers=1,
+        rate_limit_per_minute=0,
+    )
+    assert started.wait(5)
+    start = time.monotonic()
+    manager.cancel(job.job_id)
+    assert job.wait(10)
+    assert time.monotonic() - start < 5
+    assert job.status == "cancelled"
+    assert all(not result.success for result in job.result)
+    manager.shutdown()
+
+
+def test_start_target_job_checks_local_store_once(monkeypatch):
+    """测试单目标任务只查询一次本地情报库，且查询不在事件循环线程中执行"""
+    lookups = []
+
+    def fake_local_verdict(target_value, reuse_report=False):
+        lookups.append(threading.current_thread())
+        return None
+
+    monkeypatch.setattr(ioc_mcp, "local_verdict_message", fake_local_verdict)
+    monkeypatch.setattr(ioc_mcp, "api_backend_enabled", lambda: True)
+    monkeypatch.setattr(
+        ioc_mcp,
+        "run_api_analysis",
+        lambda target_type, target_value: AnalysisResult(
+            target_type, target_value, error="离线"
+        ),
+    )
+    monkeypatch.setattr(ioc_mcp, "remember_result", lambda result: None)
+    monkeypatch.setattr(ioc_mcp, "jobs", ioc_mcp.JobManager(enabled=False))
+
+    message = asyncio.run(ioc_mcp.start_target_job("ip", "1.2.3.4", None))
+    assert message == "分析过程中出现错误: 离线"
+    assert len(lookups) == 1
+    assert lookups[0] is not threading.main_thread()
+
+
+def test_save_batch_summary_csv(tmp_path):
+    """测试批量汇总CSV的写入"""
+    results = [
+        AnalysisResult(
+            target_type="ip",
+            target_value="8.8.8.8",
+            success=True,
+            report_path="logs/ioc/8.8.8.8_ip_threat_report.md",
+            related_sample_count=12,
+            elapsed_seconds=42.0,
+        ),
+        AnalysisResult(target_type="domain", target_value="a.com", error="超时"),
+    ]
+    csv_path = IOCBatchAnalyzer.save_batch_summary_csv(results, str(tmp_path))
+
+    with open(csv_path, "r", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == IOCBatchAnalyzer.SUMMARY_HEADERS
+    assert rows[1][:4] == ["8.8.8.8", "ip", "成功", "12"]
+    assert rows[2][2] == "失败"
+    assert rows[2][-1] == "超时"
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+测试IOC浏览器驱动配置（default / lean）
+"""
+
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.mcpsectrace.mcp_servers import ioc_mcp
+from src.mcpsectrace.mcp_servers.ioc_mcp import (
+    SeleniumDriver,
+    driver_screenshots_enabled,
+    screenshots_enabled,
+)
+
+
+class FakeChrome:
+    """记录启动参数和 CDP 命令的假浏览器"""
+
+    def __init__(self, service=None, options=None):
+        self.options = options
+        self.cdp_commands = []
+
+    def execute_cdp_cmd(self, cmd, cmd_args):
+        self.cdp_commands.append((cmd, cmd_args))
+        return {}
+
+    def set_window_size(self, width, height):
+        self.window_size = (width, height)
+
+    def quit(self):
+        pass
+
+
+def _setup(monkeypatch, **kwargs):
+    monkeypatch.setattr(ioc_mcp.webdriver, "Chrome", FakeChrome)
+    monkeypatch.setattr(ioc_mcp, "Service", lambda *args: None)
+    get_config_value = ioc_mcp.get_config_value
+    # 使用系统PATH中的浏览器，其余配置保持默认
+    monkeypatch.setattr(
+        ioc_mcp,
+        "get_config_value",
+        lambda key, default=None: (
+            "" if key.startswith("paths.") else get_config_value(key, default)
+        ),
+    )
+    return SeleniumDriver().setup_driver(**kwargs)
+
+
+def test_screenshots_enabled_by_profile():
+    """测试按传入的驱动配置判断是否截图"""
+    assert screenshots_enabled("default") is True
+    assert screenshots_enabled("lean") is False
+
+    class Driver:
+        driver_profile = "lean"
+
+    assert driver_screenshots_enabled(Driver()) is False
+    assert driver_screenshots_enabled(None) is screenshots_enabled()
+
+
+def test_explicit_lean_profile_blocks_images(monkeypatch):
+    """测试显式传入 lean 时即使全局配置为 default 也不加载图片"""
+    driver = _setup(monkeypatch, profile="lean", capture_network=False)
+    assert driver.driver_profile == "lean"
+    assert "--blink-settings=imagesEnabled=false" in driver.options.arguments
+    blocked = dict(driver.cdp_commands)["Network.setBlockedURLs"]["urls"]
+    assert "*.png" in blocked
+    assert not driver_screenshots_enabled(driver)
+
+    default = _setup(monkeypatch, profile="default", capture_network=False)
+    assert default.driver_profile == "default"
+    assert "--headless=new" not in default.options.arguments
+    assert default.cdp_commands == []
+
+
+def test_lean_blocked_urls_keep_images_for_screenshots():
+    """测试需要截图时 lean 配置不屏蔽图片"""
+    assert "*.png" not in SeleniumDriver._lean_blocked_urls(True)
+    assert "*.png" in SeleniumDriver._lean_blocked_urls(False)
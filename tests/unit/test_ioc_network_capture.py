@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+测试接口响应捕获的离线回放
+"""
+
+import base64
+import json
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.mcpsectrace.mcp_servers.ioc_mcp import NetworkCapture, RecordedNetworkDriver
+
+
+def _entry(method, params):
+    """构造与 chromedriver 性能日志格式一致的条目"""
+    return {
+        "level": "INFO",
+        "message": json.dumps({"message": {"method": method, "params": params}}),
+    }
+
+
+def _response(request_id, url, mime_type="application/json"):
+    return _entry(
+        "Network.responseReceived",
+        {
+            "requestId": request_id,
+            "response": {"url": url, "status": 200, "mimeType": mime_type},
+        },
+    )
+
+
+def _finished(request_id):
+    return _entry("Network.loadingFinished", {"requestId": request_id})
+
+
+def _write_recording(path):
+    encoded = base64.b64encode(json.dumps({"judgments": ["IDC"]}).encode()).decode()
+    recording = {
+        "performance_log": [
+            _response("1", "https://x.threatbook.com/v5/node/ip/summary?q=8.8.8.8"),
+            _response("2", "https://x.threatbook.com/v5/node/ip/intelInsight"),
+            _response("3", "https://x.threatbook.com/static/logo.png", "image/png"),
+            _response("4", "https://x.threatbook.com/v5/node/other"),
+            _finished("1"),
+            _finished("2"),
+            _finished("3"),
+            _finished("4"),
+        ],
+        "bodies": {
+            "1": {"body": json.dumps({"ip": "8.8.8.8"}), "base64Encoded": False},
+            "2": {"body": encoded, "base64Encoded": True},
+        },
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(recording, f)
+
+
+def test_replay_classifies_json_responses(tmp_path):
+    """测试回放录制后按分类收集JSON响应"""
+    recording_path = tmp_path / "recording.json"
+    _write_recording(recording_path)
+
+    capture = NetworkCapture(
+        RecordedNetworkDriver(str(recording_path)),
+        patterns=NetworkCapture.DEFAULT_PATTERNS,
+    )
+    assert capture.collect() == 2
+    assert capture.responses["summary"][0]["data"] == {"ip": "8.8.8.8"}
+    assert capture.responses["intel_insight"][0]["data"] == {"judgments": ["IDC"]}
+    assert capture.responses["related_samples"] == []
+
+    # 日志缓冲已被读取，再次收集不应重复
+    assert capture.collect() == 0
+
+
+def test_saved_recording_replays_identically(tmp_path):
+    """测试 save_recording 的输出可以再次回放"""
+    recording_path = tmp_path / "recording.json"
+    _write_recording(recording_path)
+    capture = NetworkCapture(
+        RecordedNetworkDriver(str(recording_path)),
+        patterns=NetworkCapture.DEFAULT_PATTERNS,
+    )
+    capture.collect()
+
+    replay_path = tmp_path / "replay.json"
+    capture.save_recording(str(replay_path))
+    replayed = NetworkCapture(
+        RecordedNetworkDriver(str(replay_path)),
+        patterns=NetworkCapture.DEFAULT_PATTERNS,
+    )
+    replayed.collect()
+    assert replayed.responses == capture.responses
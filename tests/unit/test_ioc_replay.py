@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+测试IOC抓取流程的离线录制与回放
+"""
+
+import json
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.mcpsectrace.config import get_config_value
+from src.mcpsectrace.mcp_servers.ioc_mcp import build_threatbook_config
+from src.mcpsectrace.mcp_servers.ioc_replay import (
+    RecordingDriver,
+    ReplayServer,
+    url_key,
+)
+from src.mcpsectrace.utils.timing import Deadline, StageTimer, budgeted
+
+
+class FakeDriver:
+    """模拟浏览器：页面内容由URL决定，性能日志在页面加载时产生"""
+
+    def __init__(self):
+        self.current_url = None
+        self._log = []
+        self._bodies = {}
+
+    def get(self, url):
+        self.current_url = url
+        if "/v5/ip/" in url:
+            request_id = str(len(self._bodies) + 1)
+            api_url = "https://x.threatbook.com/v5/node/ip/summary?q=8.8.8.8"
+            self._log += [
+                _entry(
+                    "Network.responseReceived",
+                    {
+                        "requestId": request_id,
+                        "response": {
+                            "url": api_url,
+                            "status": 200,
+                            "mimeType": "application/json",
+                        },
+                    },
+                ),
+                _entry("Network.loadingFinished", {"requestId": request_id}),
+            ]
+            self._bodies[request_id] = {
+                "body": json.dumps({"ip": "8.8.8.8"}),
+                "base64Encoded": False,
+            }
+
+    def get_log(self, log_type):
+        entries, self._log = self._log, []
+        return entries
+
+    def execute_cdp_cmd(self, cmd, cmd_args):
+        return self._bodies[cmd_args["requestId"]]
+
+    def execute_script(self, script):
+        return f"<!DOCTYPE html>\n<html><head></head><body>{self.current_url}</body></html>"
+
+
+def _entry(method, params):
+    return {"message": json.dumps({"message": {"method": method, "params": params}})}
+
+
+def _fetch(url):
+    with urllib.request.urlopen(url, timeout=5) as response:
+        return response.headers.get_content_type(), response.read().decode("utf-8")
+
+
+def test_url_key():
+    """测试回放匹配键忽略协议和主机"""
+    assert url_key("https://x.threatbook.com/v5/ip/8.8.8.8") == "/v5/ip/8.8.8.8"
+    assert url_key("http://127.0.0.1:1234/a?b=1") == "/a?b=1"
+    assert url_key("/a?b=1") == "/a?b=1"
+
+
+def test_record_and_replay(tmp_path):
+    """测试录制的页面和接口可以由本地服务回放"""
+    fake_driver = FakeDriver()
+    driver = RecordingDriver(fake_driver, str(tmp_path))
+    driver.get("https://x.threatbook.com/v5/ip/8.8.8.8")
+
+    # 调用方读取的性能日志不受录制影响
+    assert len(driver.get_log("performance")) == 2
+
+    driver.get("https://s.threatbook.com/report/file/abc")
+    driver.flush()
+
+    manifest = json.loads((tmp_path / "manifest.json").read_text(encoding="utf-8"))
+    assert set(manifest["pages"]) == {"/v5/ip/8.8.8.8", "/report/file/abc"}
+    assert manifest["page_api"] == {"/v5/ip/8.8.8.8": ["/v5/node/ip/summary?q=8.8.8.8"]}
+
+    with ReplayServer(str(tmp_path)) as server:
+        content_type, body = _fetch(server.base_url + "/v5/ip/8.8.8.8")
+        assert content_type == "text/html"
+        assert "https://x.threatbook.com/v5/ip/8.8.8.8" in body
+        # 注入的脚本会重新请求录制时的接口
+        assert "/v5/node/ip/summary?q=8.8.8.8" in body
+
+        content_type, body = _fetch(server.base_url + "/v5/node/ip/summary?q=8.8.8.8")
+        assert content_type == "application/json"
+        assert json.loads(body) == {"ip": "8.8.8.8"}
+
+        with pytest.raises(urllib.error.HTTPError) as exc_info:
+            _fetch(server.base_url + "/missing")
+        assert exc_info.value.code == 404
+
+
+def test_snapshot_keeps_log_for_caller(tmp_path):
+    """测试快照时提前读走的性能日志仍会返回给调用方"""
+    driver = RecordingDriver(FakeDriver(), str(tmp_path))
+    driver.get("https://x.threatbook.com/v5/ip/8.8.8.8")
+    driver.get("https://x.threatbook.com/v5/ip/8.8.8.8")
+    assert len(driver.get_log("performance")) == 4
+
+
+def test_stage_timer():
+    """测试阶段耗时的累计"""
+    timer = StageTimer()
+    time.sleep(0.01)
+    timer.lap("page_load")
+    timer.lap("summary")
+    time.sleep(0.01)
+    timer.lap("page_load")
+
+    assert list(timer.timings) == ["page_load", "summary"]
+    assert timer.timings["page_load"] >= 0.02
+    assert "total=1.00s" in timer.format_summary(total=1.0)
+
+
+def test_deadline_clamps_nested_waits():
+    """测试子截止时间不晚于父截止时间，budgeted 按当前线程的截止时间裁剪"""
+    assert budgeted(3) == 3
+    parent = Deadline(2)
+    child = parent.child(60)
+    assert child.remaining() <= 2
+    assert not Deadline().limited and Deadline().child(5).limited
+    with child.activate():
+        assert Deadline.current() is child
+        assert budgeted(30) <= 2
+        assert budgeted(0.5) == 0.5
+    assert Deadline.current() is None
+
+    short = Deadline(0.01)
+    time.sleep(0.02)
+    assert short.expired()
+    with short.activate():
+        assert budgeted(10) == 0
+
+
+def test_page_load_wait_stays_in_built_config():
+    """测试基准测试的页面等待时间只写入构建的配置，不修改全局配置"""
+    before = get_config_value("ioc.page_load_wait_seconds", default=10)
+    config = build_threatbook_config(
+        "ip",
+        "8.8.8.8",
+        site_url="http://127.0.0.1:1",
+        sample_site_url="http://127.0.0.1:1/",
+        page_load_wait=0,
+    )
+    assert config.page_load_wait_seconds == 0
+    assert config.sample_site_url == "http://127.0.0.1:1"
+    assert build_threatbook_config("ip", "8.8.8.8").page_load_wait_seconds is None
+    assert get_config_value("ioc.page_load_wait_seconds", default=10) == before
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+测试本地威胁情报库
+"""
+
+import csv
+import ipaddress
+import os
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.mcpsectrace.core.ioc_store import IOCStore, PrefixTrie, classify_indicator
+
+SHA_A = "a" * 64
+SHA_B = "b" * 64
+
+
+def test_classify_indicator():
+    """测试指标类型识别与规范化"""
+    assert classify_indicator(" 1.2.3[.]4 ") == ("ip", "1.2.3.4")
+    assert classify_indicator("10.1.2.3/8") == ("cidr", "10.0.0.0/8")
+    assert classify_indicator("2001:DB8::/32") == ("cidr", "2001:db8::/32")
+    assert classify_indicator("Evil.Example.COM.") == ("domain", "evil.example.com")
+    assert classify_indicator(SHA_A.upper()) == ("sha256", SHA_A)
+    assert classify_indicator("xn--fiqs8s.xn--55qx5d") == (
+        "domain",
+        "xn--fiqs8s.xn--55qx5d",
+    )
+    assert classify_indicator("example.c0m") is None
+    assert classify_indicator("not an ioc") is None
+
+
+def test_prefix_trie_collects_all_covering_networks():
+    """测试前缀树返回所有包含该地址的网段，从短到长"""
+    trie = PrefixTrie()
+    for cidr in ["10.0.0.0/8", "10.1.0.0/16", "10.1.2.0/24", "192.168.0.0/16"]:
+        trie.insert(ipaddress.ip_network(cidr), cidr)
+    assert trie.lookup(ipaddress.ip_address("10.1.2.3")) == [
+        "10.0.0.0/8",
+        "10.1.0.0/16",
+        "10.1.2.0/24",
+    ]
+    assert trie.lookup(ipaddress.ip_address("11.0.0.1")) == []
+
+
+def test_feed_and_bulk_lookup(tmp_path):
+    """测试导入情报源后的批量查询（精确、网段与重新打开后的网段索引）"""
+    feed = tmp_path / "feed.csv"
+    feed.write_text(
+        "# 测试情报源\n"
+        "203.0.113.0/24,malicious,C2网段\n"
+        "evil.example.com\n"
+        f"{SHA_A},suspicious\n"
+        "garbage line\n",
+        encoding="utf-8",
+    )
+    db_path = str(tmp_path / "store.sqlite")
+    store = IOCStore(db_path)
+    assert store.ingest_feed(str(feed)) == 3
+
+    results = store.lookup_many(
+        ["203.0.113.7", "evil[.]example.com", SHA_A, "8.8.8.8", "???"]
+    )
+    assert results["203.0.113.7"][0]["value"] == "203.0.113.0/24"
+    assert results["203.0.113.7"][0]["detail"] == {"note": "C2网段"}
+    assert results["evil[.]example.com"][0]["verdict"] == "malicious"
+    assert results[SHA_A][0]["verdict"] == "suspicious"
+    assert results["8.8.8.8"] == []
+    assert "???" not in results
+
+    # 重复导入同一来源不产生重复网段
+    store.ingest_feed(str(feed))
+    assert len(store.lookup("203.0.113.7")) == 1
+    store.close()
+
+    reopened = IOCStore(db_path)
+    assert len(reopened.lookup("203.0.113.200")) == 1
+    reopened.close()
+
+
+def _write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows(rows)
+
+
+def test_sync_analysis_outputs(tmp_path):
+    """测试增量导入历史分析输出"""
+    output_dir = tmp_path / "ioc"
+    output_dir.mkdir()
+    (output_dir / "8.8.8.8_ip_threat_report.md").write_text("# 报告", encoding="utf-8")
+    _write_csv(
+        output_dir / "8.8.8.8_threat_data.csv",
+        [
+            [
+                "文件名称",
+                "类型",
+                "扫描时间",
+                "SHA256",
+                "多引擎检出",
+                "木马家族和类型",
+                "威胁等级",
+            ],
+            ["a.exe", "EXE", "2024-01-01", SHA_A, "3/24", "Mirai", "恶意"],
+        ],
+    )
+    _write_csv(
+        output_dir / "8.8.8.8_release_files.csv",
+        [
+            [
+                "查询目标",
+                "样本SHA256",
+                "环境",
+                "文件名称",
+                "文件类型",
+                "文件路径",
+                "文件SHA256",
+            ],
+            ["8.8.8.8", SHA_A, "win7", "b.dll", "DLL", "C:\\b.dll", SHA_B],
+        ],
+    )
+
+    store = IOCStore(str(tmp_path / "store.sqlite"))
+    assert store.sync_sources(str(output_dir)) == 3
+    assert store.sync_sources(str(output_dir)) == 0
+
+    report = store.fresh_report("8.8.8.8", max_age_days=1)
+    assert report["verdict"] == "has_related_samples"
+    assert store.fresh_report("8.8.8.8", max_age_days=1, verdicts=["malicious"]) is None
+    assert store.fresh_report("8.8.8.8", 1, ["has_related_samples"]) == report
+    assert report["detail"]["related_samples"] == 1
+    assert store.lookup(SHA_A)[0]["verdict"] == "恶意"
+    assert store.lookup(SHA_B)[0]["detail"]["parent_sha256"] == SHA_A
+    store.close()
+
+
+def test_sync_uses_report_mtime_and_skips_partial_reports(tmp_path):
+    """测试历史报告按文件修改时间判断有效期，未完成的报告不导入"""
+    output_dir = tmp_path / "ioc"
+    output_dir.mkdir()
+    old_report = output_dir / "1.1.1.1_ip_threat_report.md"
+    old_report.write_text("# 旧报告", encoding="utf-8")
+    month_ago = time.time() - 30 * 86400
+    os.utime(old_report, (month_ago, month_ago))
+    partial_report = output_dir / "evil.example.com_domain_threat_report.md"
+    partial_report.write_text("# 未完成", encoding="utf-8")
+    progress_path = Path(str(partial_report) + ".progress.json")
+    progress_path.write_text('{"completed": {}, "offset": 0}', encoding="utf-8")
+
+    store = IOCStore(str(tmp_path / "store.sqlite"))
+    assert store.sync_sources(str(output_dir)) == 1
+    assert store.fresh_report("1.1.1.1", max_age_days=7) is None
+    assert store.fresh_report("1.1.1.1", max_age_days=60)["verdict"] == "analyzed"
+    assert store.lookup("evil.example.com") == []
+
+    # 报告写完（进度文件删除）后下次同步导入
+    progress_path.unlink()
+    assert store.sync_sources(str(output_dir)) == 1
+    assert store.fresh_report("evil.example.com", max_age_days=7) is not None
+    store.close()
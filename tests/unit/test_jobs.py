@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+测试后台任务框架
+"""
+
+import asyncio
+import sys
+import threading
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.mcpsectrace.core.jobs import (
+    CANCELLED,
+    FAILED,
+    SUCCEEDED,
+    JobManager,
+    bind_job,
+    cancellable_sleep,
+    current_job,
+    format_job_result,
+    report_progress,
+)
+
+
+def test_job_progress_and_result():
+    """测试任务进度上报、结果获取和失败记录"""
+    manager = JobManager(max_workers=1)
+    updates = []
+
+    def work(n):
+        for i in range(1, n + 1):
+            report_progress(i, n, f"第 {i} 步")
+        return f"完成 {n} 步"
+
+    job = manager.submit("work", work, 3)
+    job.add_listener(lambda j: updates.append(j.progress))
+    assert job.wait(5)
+    assert job.status == SUCCEEDED
+    assert format_job_result(job, job.job_id) == "完成 3 步"
+    assert (job.progress, job.total) == (3, 3)
+
+    failed = manager.submit("boom", lambda: 1 / 0)
+    assert failed.wait(5)
+    assert failed.status == FAILED and "division" in failed.error
+    assert "失败" in format_job_result(failed, failed.job_id)
+    assert "不存在" in format_job_result(manager.get("missing"), "missing")
+    manager.shutdown()
+
+
+def test_cancel_running_and_queued_jobs():
+    """测试取消运行中的任务（在检查点结束）和排队中的任务"""
+    manager = JobManager(max_workers=1)
+    started = threading.Event()
+
+    def long_scan():
+        started.set()
+        for _ in range(600):
+            cancellable_sleep(1)
+        return "不应完成"
+
+    running = manager.submit("scan", long_scan)
+    queued = manager.submit("scan", long_scan)
+    assert started.wait(5)
+
+    assert manager.cancel(queued.job_id).status == CANCELLED
+    manager.cancel(running.job_id)
+    assert running.wait(5)
+    assert running.status == CANCELLED
+    assert running.result is None
+    manager.shutdown()
+
+
+def test_bind_job_in_worker_thread():
+    """测试任务函数自建线程绑定任务后可上报进度并被取消打断"""
+    manager = JobManager(max_workers=1)
+    started = threading.Event()
+    outcome = []
+
+    def work():
+        job = current_job()
+
+        def worker():
+            with bind_job(job):
+                report_progress(1, 2, "子线程")
+                started.set()
+                try:
+                    cancellable_sleep(60)
+                except Exception as e:
+                    outcome.append(type(e).__name__)
+            outcome.append(current_job())
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+        return "子线程已结束"
+
+    job = manager.submit("bind", work)
+    assert started.wait(5)
+    assert job.message == "子线程"
+    manager.cancel(job.job_id)
+    assert job.wait(5)
+    assert job.status == CANCELLED
+    assert outcome == ["JobCancelled", None]
+    manager.shutdown()
+
+
+def test_start_returns_job_id_and_waits():
+    """测试异步工具入口立即返回任务ID，wait_result 等待任务结束"""
+    manager = JobManager(max_workers=1)
+    release = threading.Event()
+
+    async def scenario():
+        text = await manager.start("scan", lambda: release.wait(5) and "扫描完成")
+        job = manager.list_jobs()[0]
+        assert job.job_id in text and not job.finished
+        release.set()
+        finished = await manager.wait_result(job.job_id, wait_seconds=5)
+        return format_job_result(finished, job.job_id)
+
+    assert asyncio.run(scenario()) == "扫描完成"
+
+    sync_manager = JobManager(enabled=False)
+    assert asyncio.run(sync_manager.start("scan", lambda: "直接返回")) == "直接返回"
+    manager.shutdown()
+    sync_manager.shutdown()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+测试增量写入的Markdown报告
+"""
+
+import os
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.mcpsectrace.utils.report_writer import (
+    MarkdownReportWriter,
+    iter_markdown_table,
+)
+
+
+def test_iter_markdown_table():
+    """测试表格按行生成，列数不一致时补齐或截断"""
+    rows = iter([["a", "b"], ["c"], ["d", "e", "f"]])
+    assert "".join(iter_markdown_table(["x", "y"], rows)) == (
+        "| x | y |\n| --- | --- |\n| a | b |\n| c |  |\n| d | e |\n"
+    )
+
+
+def test_write_table_from_generator(tmp_path):
+    """测试从生成器写入表格并返回行数"""
+    report_path = str(tmp_path / "report.md")
+    with MarkdownReportWriter(report_path) as report:
+        count = report.write_table(["n"], ([str(i)] for i in range(3)))
+    assert count == 3
+    assert not os.path.exists(report_path + ".progress.json")
+    assert Path(report_path).read_text(encoding="utf-8").count("\n") == 5
+
+
+def test_resume_from_checkpoint(tmp_path):
+    """测试中断后从最后一个检查点续写，残缺内容被丢弃"""
+    report_path = str(tmp_path / "report.md")
+
+    report = MarkdownReportWriter(report_path)
+    report.write("# 标题\n")
+    report.checkpoint("header")
+    report.write("## 样本A\n")
+    report.checkpoint("sample:a", [["a", "C:\\a.exe"]])
+    report.write("## 样本B（未完成）\n")
+    report.close(completed=False)
+    assert os.path.exists(report_path + ".progress.json")
+
+    resumed = MarkdownReportWriter(report_path)
+    assert resumed.resumed
+    assert resumed.is_completed("sample:a")
+    assert not resumed.is_completed("sample:b")
+    assert resumed.stage_data("sample:a") == [["a", "C:\\a.exe"]]
+    resumed.write("## 样本B\n")
+    resumed.checkpoint("sample:b")
+    resumed.close()
+
+    assert Path(report_path).read_text(encoding="utf-8") == (
+        "# 标题\n## 样本A\n## 样本B\n"
+    )
+    assert not os.path.exists(report_path + ".progress.json")
+
+    # 完成后再次打开从头写入
+    fresh = MarkdownReportWriter(report_path)
+    assert not fresh.resumed
+    fresh.close()
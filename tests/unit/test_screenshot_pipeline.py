@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+测试截图后处理流水线
+"""
+
+import io
+import sys
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.mcpsectrace.utils.screenshot_pipeline import ScreenshotPipeline, dhash
+
+
+def _png(size=(200, 100), bar_x=20):
+    """生成带一个竖条的测试截图"""
+    image = Image.new("RGB", size, "white")
+    ImageDraw.Draw(image).rectangle([bar_x, 10, bar_x + 30, 90], fill="black")
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def test_dhash_distinguishes_layout():
+    """测试相同图像哈希一致，布局不同的图像哈希不同"""
+    first = Image.open(io.BytesIO(_png(bar_x=20)))
+    same = Image.open(io.BytesIO(_png(bar_x=20)))
+    moved = Image.open(io.BytesIO(_png(bar_x=120)))
+    assert dhash(first) == dhash(same)
+    assert dhash(first) != dhash(moved)
+
+
+def test_dedup_across_targets(tmp_path):
+    """测试重复截图返回已有文件，索引在新实例中继续生效"""
+    pipeline = ScreenshotPipeline(str(tmp_path))
+    assert pipeline.submit(_png(), "a_panel_1") == "a_panel_1.png"
+    assert pipeline.submit(_png(), "b_panel_1") == "a_panel_1.png"
+    assert pipeline.submit(_png(bar_x=120), "b_panel_2") == "b_panel_2.png"
+    pipeline.close()
+
+    assert sorted(p.name for p in tmp_path.glob("*.png")) == [
+        "a_panel_1.png",
+        "b_panel_2.png",
+    ]
+
+    reopened = ScreenshotPipeline(str(tmp_path))
+    assert reopened.submit(_png(), "c_panel_1") == "a_panel_1.png"
+    reopened.close()
+
+
+def test_changed_screenshot_does_not_overwrite_shared_file(tmp_path):
+    """测试被其他目标复用的截图在原目标重新分析后保持不变"""
+    pipeline = ScreenshotPipeline(str(tmp_path))
+    assert pipeline.submit(_png(), "a_panel_1") == "a_panel_1.png"
+    assert pipeline.submit(_png(), "b_panel_1") == "a_panel_1.png"
+    pipeline.close()
+    original = (tmp_path / "a_panel_1.png").read_bytes()
+
+    reopened = ScreenshotPipeline(str(tmp_path))
+    changed = reopened.submit(_png(bar_x=120), "a_panel_1")
+    reopened.close()
+
+    assert changed.startswith("a_panel_1-") and changed.endswith(".png")
+    assert (tmp_path / "a_panel_1.png").read_bytes() == original
+    assert (tmp_path / changed).exists()
+
+    # 被引用的文件已删除时，同名截图可以重新使用原文件名
+    (tmp_path / "a_panel_1.png").unlink()
+    fresh = ScreenshotPipeline(str(tmp_path))
+    assert fresh.submit(_png(size=(300, 100)), "a_panel_1") == "a_panel_1.png"
+    fresh.close()
+
+
+def test_webp_downscale(tmp_path):
+    """测试转换为WebP并按最大宽度缩小"""
+    pipeline = ScreenshotPipeline(
+        str(tmp_path), image_format="webp", max_width=100, dedup=False
+    )
+    filename = pipeline.submit(_png(size=(400, 200)), "summary")
+    pipeline.close()
+
+    assert filename == "summary.webp"
+    with Image.open(tmp_path / filename) as image:
+        assert image.format == "WEBP"
+        assert image.size == (100, 50)
+    assert not (tmp_path / "phash_index.json").exists()